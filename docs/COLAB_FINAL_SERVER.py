@@ -1,59 +1,1069 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, make_response, g, has_request_context, send_file
 from flask_cors import CORS
 from pyngrok import ngrok
 import joblib
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
-from PIL import Image
 import io
+import os
+import json
 import base64
+import functools
+import hmac
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 
+from fixora_batcher import MicroBatcher, InflightLimiter, Overloaded, QueueFull, DeadlineExceeded
+from fixora_preprocess import TensorBufferPool
+from fixora_cache import LRUCache, PerceptualCache, content_hash, dhash
+from fixora_urgency import normalize_text, classify_embeddings, iter_records, score_stream
+from fixora_fast_urgency import FastUrgencyModel, split_by_tier
+from fixora_models import ModelLoader, ModelNotReady
+from fixora_backends import artifact_path, load_backend
+from fixora_geoindex import GeoGridIndex, OPEN_STATUSES
+from fixora_similarity import VectorIndex, DuplicateScorer, l2_normalize
+from fixora_metrics import Metrics, ComputeSavings
+from fixora_jobs import JobRunner
+from fixora_runtime import RuntimeConfig
+from fixora_registry import ModelRegistry, ModelVersion, ShadowTraffic
+from fixora_push import PushTokenStore, ExpoPushClient, PushFanout, EXPO_PUSH_URL
+from fixora_orgstats import OrgStats, KINDS as ORG_STAT_KINDS, DELETED as REPORT_DELETED
+from fixora_reportstore import ReportStore, parse_time
+from fixora_ingest import ImageIngest, upload_limits, VARIANTS as IMAGE_VARIANTS
+
+
+# -----------------------
+# PATHS - Your Exact Setup (override with FIXORA_*_PATH, e.g. for the fixora_bench.py stand-in models)
+# -----------------------
+IMG_MODEL_PATH = os.environ.get("FIXORA_IMG_MODEL_PATH", "/content/drive/My Drive/fixora_mobilenetv2_model_finetuned.keras")
+IMG_LABEL_ENCODER_PATH = os.environ.get("FIXORA_IMG_LABEL_ENCODER_PATH", "/content/drive/My Drive/Fixora_Models/image_label_encoder.joblib")
+
+TEXT_CLASSIFIER_PATH = os.environ.get("FIXORA_TEXT_CLASSIFIER_PATH", "/content/drive/My Drive/Urgency_Detection/model_artifacts/classifier.joblib")
+TEXT_LABEL_ENCODER_PATH = os.environ.get("FIXORA_TEXT_LABEL_ENCODER_PATH", "/content/drive/My Drive/Urgency_Detection/model_artifacts/label_encoder.joblib")
+EMBEDDING_MODEL_NAME_PATH = os.environ.get("FIXORA_EMBEDDING_MODEL_NAME_PATH", "/content/drive/My Drive/Urgency_Detection/model_artifacts/embedding_model_name.txt")
+
+# Image inference backend: keras | tflite | onnx (exports made once with fixora_export.py)
+IMG_BACKEND = os.environ.get("FIXORA_IMG_BACKEND", "keras")
+IMG_BACKEND_VARIANT = os.environ.get("FIXORA_IMG_BACKEND_VARIANT", "float")  # float | dynamic | int8
+IMG_BACKEND_PATH = os.environ.get("FIXORA_IMG_BACKEND_PATH") or artifact_path(IMG_MODEL_PATH, IMG_BACKEND, IMG_BACKEND_VARIANT)
+
+# -----------------------
+# MODEL VERSIONS - versioned artifact directories (fixora_registry.py), hot-swapped without a restart
+# -----------------------
+MODEL_REGISTRY_DIR = os.environ.get("FIXORA_MODEL_REGISTRY") or None  # unset: the flat paths above, one implicit version
+MODEL_WATCH_S = float(os.environ.get("FIXORA_MODEL_WATCH_S", "30"))  # poll CURRENT / CANDIDATE (or the flat files); 0 = off
+SHADOW_FRACTION = float(os.environ.get("FIXORA_SHADOW_FRACTION", "0.1"))  # of live inputs mirrored to a candidate
+ADMIN_TOKEN = os.environ.get("FIXORA_ADMIN_TOKEN") or None  # POST /models/reload is disabled without one
+ADMIN_TOKEN_HEADER = "X-Fixora-Admin-Token"
+MODEL_VERSION_HEADER = "X-Fixora-Model-Version"  # on every response: "image=<version>,text=<version>"
+
+# -----------------------
+# CPU RUNTIME - threads / core pinning / precision per model (FIXORA_IMG_*, FIXORA_TEXT_*,
+# FIXORA_ONEDNN or a FIXORA_RUNTIME_PROFILE written by fixora_runtime_bench.py)
+# -----------------------
+runtime = RuntimeConfig.from_env()
+runtime.apply_env()  # oneDNN switch, before TensorFlow is imported
+IMG_BACKEND_THREADS = runtime.image_threads or None  # also FIXORA_IMG_BACKEND_THREADS
+
+
+# -----------------------
+# BATCHING - /classify + /predict image inputs share one MobileNetV2 queue
+# -----------------------
+IMG_BATCH_MAX_SIZE = int(os.environ.get("FIXORA_IMG_BATCH_MAX_SIZE", "16"))
+IMG_BATCH_WAIT_MS = float(os.environ.get("FIXORA_IMG_BATCH_WAIT_MS", "10"))
+
+# -----------------------
+# PREDICTION CACHE - resubmitted / forwarded photos skip MobileNetV2
+# -----------------------
+IMG_CACHE_MAX_ENTRIES = int(os.environ.get("FIXORA_IMG_CACHE_MAX_ENTRIES", "4096"))
+IMG_CACHE_MAX_MB = float(os.environ.get("FIXORA_IMG_CACHE_MAX_MB", "16"))
+IMG_CACHE_TTL_S = float(os.environ.get("FIXORA_IMG_CACHE_TTL_S", "86400"))
+IMG_CACHE_PHASH = os.environ.get("FIXORA_IMG_CACHE_PHASH", "0") == "1"  # also match near-identical re-encodes
+IMG_CACHE_PHASH_DISTANCE = int(os.environ.get("FIXORA_IMG_CACHE_PHASH_DISTANCE", "4"))  # max differing bits of 64
+
+# -----------------------
+# IMAGE INGEST - one decode -> model tensor + thumbnail + preview (content-addressed on disk)
+# -----------------------
+IMAGE_STORE_DIR = os.environ.get("FIXORA_IMAGE_STORE_DIR") or None  # unset = no derivatives, tensor only
+IMAGE_THUMB_EDGE = int(os.environ.get("FIXORA_IMAGE_THUMB_EDGE", "192"))  # list screens
+IMAGE_PREVIEW_EDGE = int(os.environ.get("FIXORA_IMAGE_PREVIEW_EDGE", "800"))  # detail screens; also the max upload edge
+IMAGE_QUALITY = int(os.environ.get("FIXORA_IMAGE_QUALITY", "75"))
+IMAGE_FORMAT = os.environ.get("FIXORA_IMAGE_FORMAT", "auto")  # webp | jpeg | auto (webp if Pillow has it)
+IMAGE_MAX_PENDING = int(os.environ.get("FIXORA_IMAGE_MAX_PENDING", "16"))  # decoded frames waiting to be written
+MAX_UPLOAD_EDGE_HEADER = "X-Fixora-Max-Upload-Edge"  # on every response: clients downscale uploads to this
+
+# -----------------------
+# TEXT - one SentenceTransformer.encode for concurrent descriptions + embedding cache
+# -----------------------
+TEXT_BATCH_MAX_SIZE = int(os.environ.get("FIXORA_TEXT_BATCH_MAX_SIZE", "32"))
+TEXT_BATCH_WAIT_MS = float(os.environ.get("FIXORA_TEXT_BATCH_WAIT_MS", "5"))
+TEXT_CACHE_MAX_ENTRIES = int(os.environ.get("FIXORA_TEXT_CACHE_MAX_ENTRIES", "8192"))
+TEXT_CACHE_MAX_MB = float(os.environ.get("FIXORA_TEXT_CACHE_MAX_MB", "32"))
+TEXT_CACHE_TTL_S = float(os.environ.get("FIXORA_TEXT_CACHE_TTL_S", "86400"))
+URGENCY_BULK_CHUNK_SIZE = int(os.environ.get("FIXORA_URGENCY_BULK_CHUNK_SIZE", "256"))
+
+# Fast lexical urgency tier (fixora_distill.py train); confident answers skip the SentenceTransformer
+# (registry versions: urgency_fast.joblib in the text version directory)
+URGENCY_FAST_PATH = os.environ.get("FIXORA_URGENCY_FAST_PATH") or os.path.join(
+    os.path.dirname(TEXT_CLASSIFIER_PATH), "urgency_fast.joblib")
+URGENCY_FAST_MIN_CONF = os.environ.get("FIXORA_URGENCY_FAST_MIN_CONF")  # default: threshold picked at training
+
+# Consistency verdict shared by /predict and /classify_batch
+MIN_AVG_CONFIDENCE = 0.8
+MAX_IMAGES_PER_REQUEST = int(os.environ.get("FIXORA_MAX_IMAGES_PER_REQUEST", "10"))
+
+DEFAULT_IMAGE_CATEGORIES = [
+    'broken_street_light', 'electric_issue', 'garbage_overflow',
+    'gas_problem', 'open_manhole', 'potholes', 'traffic_lights', 'water_leakage'
+]
 
 # -----------------------
-# PATHS - Your Exact Setup
+# DUPLICATES - open reports in a lat/lon grid for /duplicates/nearby
 # -----------------------
-IMG_MODEL_PATH = "/content/drive/My Drive/fixora_mobilenetv2_model_finetuned.keras"
-IMG_LABEL_ENCODER_PATH = "/content/drive/My Drive/Fixora_Models/image_label_encoder.joblib"
+GEO_CELL_DEG = float(os.environ.get("FIXORA_GEO_CELL_DEG", "0.001"))  # ~111 m of latitude
+GEO_JOURNAL_PATH = os.environ.get("FIXORA_GEO_JOURNAL_PATH") or None  # NDJSON change log, replayed on start (one process)
+DUPLICATE_RADIUS_M = float(os.environ.get("FIXORA_DUPLICATE_RADIUS_M", "100"))
 
-TEXT_CLASSIFIER_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/classifier.joblib"
-TEXT_LABEL_ENCODER_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/label_encoder.joblib"
-EMBEDDING_MODEL_NAME_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/embedding_model_name.txt"
+# Combined geo + image + text scoring when the check includes photos / a description
+DUP_SEARCH_RADIUS_M = float(os.environ.get("FIXORA_DUP_SEARCH_RADIUS_M", "300"))
+DUP_MIN_SCORE = float(os.environ.get("FIXORA_DUP_MIN_SCORE", "0.6"))
+DUP_WEIGHTS = tuple(float(w) for w in os.environ.get("FIXORA_DUP_WEIGHTS", "0.4,0.4,0.2").split(","))  # geo,image,text
+DUP_GEO_SCALE_M = float(os.environ.get("FIXORA_DUP_GEO_SCALE_M", "150"))
+DUP_IMAGE_SIM_FLOOR = float(os.environ.get("FIXORA_DUP_IMAGE_SIM_FLOOR", "0.5"))  # cosine of unrelated photos -> 0
+DUP_TEXT_SIM_FLOOR = float(os.environ.get("FIXORA_DUP_TEXT_SIM_FLOOR", "0.3"))
+DUP_IVF_LISTS = int(os.environ.get("FIXORA_DUP_IVF_LISTS", "0"))  # 0 = flat (exact) vector index
+DUP_SIGNATURE_TTL_S = float(os.environ.get("FIXORA_DUP_SIGNATURE_TTL_S", "3600"))
 
 
 # -----------------------
-# LOAD MODELS
+# ADMISSION - bounded inference queues, per-request deadlines, interactive before bulk
 # -----------------------
-print("🚀 Loading models...")
+REQUEST_DEADLINE_S = float(os.environ.get("FIXORA_REQUEST_DEADLINE_S", "10"))  # app gives up after API_CONFIG.TIMEOUT
+DEADLINE_HEADER = "X-Request-Timeout-Ms"  # client's own budget, overrides the default
+PRIORITY_HEADER = "X-Request-Priority"    # "bulk" demotes a request (it can't promote one)
+MAX_INFLIGHT = int(os.environ.get("FIXORA_MAX_INFLIGHT", "6"))  # admitted inference requests; keep below --threads
+IMG_QUEUE_MAX_ROWS = int(os.environ.get("FIXORA_IMG_QUEUE_MAX_ROWS", "128"))  # queued images before 503/429
+TEXT_QUEUE_MAX_ROWS = int(os.environ.get("FIXORA_TEXT_QUEUE_MAX_ROWS", "512"))
+BULK_QUEUE_SHARE = float(os.environ.get("FIXORA_BULK_QUEUE_SHARE", "0.5"))  # room left for interactive traffic
 
-# Image model
-img_model = load_model(IMG_MODEL_PATH)
-print("✅ Image classification model loaded.")
 
-# For image label encoder (if you trained one)
-try:
-    img_label_encoder = joblib.load(IMG_LABEL_ENCODER_PATH)
-    print("✅ Image label encoder loaded.")
-except:
-    img_label_encoder = None
-    print("⚠️ No image_label_encoder.joblib found. Using default labels.")
+# -----------------------
+# JOBS - async /predict: POST /jobs -> job id; poll / long-poll GET /jobs/<id>, or a webhook
+# -----------------------
+JOB_WORKERS = int(os.environ.get("FIXORA_JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.environ.get("FIXORA_JOB_MAX_PENDING", "64"))  # queued + running before 503
+JOB_TTL_S = float(os.environ.get("FIXORA_JOB_TTL_S", "3600"))  # finished jobs kept this long
+JOB_MAX_WAIT_S = float(os.environ.get("FIXORA_JOB_MAX_WAIT_S", "25"))  # long-poll cap, below the app / ngrok timeouts
+JOB_MAX_LONG_POLLS = int(os.environ.get("FIXORA_JOB_MAX_LONG_POLLS", "2"))  # each one holds a request thread
+WEBHOOK_ALLOWLIST = tuple(  # scheme://host:port[/path]: scheme, host and port must match exactly
+    entry.strip() for entry in os.environ.get("FIXORA_WEBHOOK_ALLOWLIST", "http://127.0.0.1:5055,http://localhost:5055").split(",")
+)
+
+
+# -----------------------
+# NOTIFICATIONS - push fan-out: cached tokens, batched Expo sends (<= 100), receipts
+# -----------------------
+PUSH_SEND_URL = os.environ.get("FIXORA_EXPO_PUSH_URL", EXPO_PUSH_URL)  # fixora_push_stub.py for local tests
+PUSH_ACCESS_TOKEN = os.environ.get("FIXORA_EXPO_ACCESS_TOKEN") or None  # Expo "enhanced push security"
+PUSH_BATCH_WAIT_MS = float(os.environ.get("FIXORA_PUSH_BATCH_WAIT_MS", "50"))  # window for fan-outs to share a send
+PUSH_RETRIES = int(os.environ.get("FIXORA_PUSH_RETRIES", "4"))  # attempts per send / getReceipts request
+PUSH_RECEIPT_DELAY_S = float(os.environ.get("FIXORA_PUSH_RECEIPT_DELAY_S", "900"))  # Expo: check receipts ~15 min later
+PUSH_TTL_S = float(os.environ.get("FIXORA_PUSH_TTL_S", "3600"))  # fan-outs kept for GET /notifications/<id>
+PUSH_MAX_WAIT_S = float(os.environ.get("FIXORA_PUSH_MAX_WAIT_S", "5"))  # POST /notifications/send waits for tickets
+PUSH_TOKEN_JOURNAL_PATH = os.environ.get("FIXORA_PUSH_TOKEN_JOURNAL") or None  # NDJSON, replayed on start
+PUSH_API_KEY = os.environ.get("FIXORA_PUSH_API_KEY") or None  # required on /notifications/* when set
+PUSH_API_KEY_HEADER = "X-Fixora-Push-Key"
+ORG_EVENTS_API_KEY = os.environ.get("FIXORA_ORG_EVENTS_API_KEY") or None  # required on /orgs/events + /duplicates/reports when set
+ORG_EVENTS_API_KEY_HEADER = "X-Fixora-Org-Key"
+
+
+# -----------------------
+# ORG STATS - dashboard counters per organization, updated incrementally from app events
+# -----------------------
+ORG_STATS_SNAPSHOT_PATH = os.environ.get("FIXORA_ORG_STATS_SNAPSHOT") or None  # JSON + .journal; unset = memory only
+ORG_STATS_SNAPSHOT_S = float(os.environ.get("FIXORA_ORG_STATS_SNAPSHOT_S", "60"))
+
+
+# -----------------------
+# REPORT STORE - hot report fields + embeddings as memory-mapped NumPy columns
+# -----------------------
+REPORT_STORE_DIR = os.environ.get("FIXORA_REPORT_STORE_DIR") or None  # generations + log; unset = memory only
+REPORT_STORE_COMPACT_ROWS = int(os.environ.get("FIXORA_REPORT_STORE_COMPACT_ROWS", "4096"))  # log size that triggers compaction
+REPORT_QUERY_MAX_LIMIT = int(os.environ.get("FIXORA_REPORT_QUERY_MAX_LIMIT", "1000"))
 
-# Urgency (text) model
-text_classifier = joblib.load(TEXT_CLASSIFIER_PATH)
-text_label_encoder = joblib.load(TEXT_LABEL_ENCODER_PATH)
-with open(EMBEDDING_MODEL_NAME_PATH, "r") as f:
-    embedding_model_name = f.read().strip()
-embedding_model = SentenceTransformer(embedding_model_name)
 
-print("✅ All models ready to use.")
+# -----------------------
+# METRICS - per-endpoint / per-stage latency histograms + outcome counters for /metrics
+# -----------------------
+METRICS_LOG = os.environ.get("FIXORA_METRICS_LOG", "0") == "1"  # also print one JSON timing line per request
+
+metrics = Metrics()
+early_exit = ComputeSavings()  # images / urgency encodes /analyze skipped by stopping early
+urgency_tiers = ComputeSavings()  # descriptions answered by the fast tier vs the embedding path
+
+
+# -----------------------
+# LOAD MODELS - in background threads, side by side; the HTTP server starts immediately
+# -----------------------
+MODEL_WAIT_S = float(os.environ.get("FIXORA_MODEL_WAIT_S", "5"))  # how long a request waits for a loading model
+MODEL_WARMUP = os.environ.get("FIXORA_WARMUP", "1") == "1"  # one dummy inference so real requests skip graph tracing
+
+IMAGE_MODELS = ("image_model", "image_labels")
+TEXT_MODELS = ("text_classifier", "text_labels", "embedding_model")
+
+# Unversioned artifacts (no FIXORA_MODEL_REGISTRY), in the registry's per-family layout
+FLAT_FILES = {
+    "image": {"model": IMG_MODEL_PATH, "backend": IMG_BACKEND_PATH, "labels": IMG_LABEL_ENCODER_PATH},
+    "text": {
+        "classifier": TEXT_CLASSIFIER_PATH,
+        "labels": TEXT_LABEL_ENCODER_PATH,
+        "embedding_model_name": EMBEDDING_MODEL_NAME_PATH,
+        "urgency_fast": URGENCY_FAST_PATH,
+    },
+}
+registry = ModelRegistry(MODEL_REGISTRY_DIR) if MODEL_REGISTRY_DIR else None
+
+
+def resolve_models(family):
+    """(version to serve, version to shadow or None) for a model family"""
+    if registry is None:
+        return ModelVersion.static(family, FLAT_FILES[family]), None
+    return registry.current(family), registry.candidate(family)
+
+
+def image_backend_path(source):
+    """The file the image backend loads: a flat FIXORA_IMG_BACKEND_PATH, or the version's export"""
+    return source.files.get("backend") or artifact_path(source.path("model"), IMG_BACKEND, IMG_BACKEND_VARIANT)
+
+
+def load_image_model(source):
+    # Framework imports (TensorFlow / TFLite / ONNX Runtime) happen off the main thread
+    print(f"🖼️ Image backend: {IMG_BACKEND} ({image_backend_path(source)}, version {source.version})")
+    runtime.pin("image")  # TensorFlow / ONNX Runtime pool threads started from here inherit the mask
+    if IMG_BACKEND == "keras":
+        runtime.configure_tensorflow()
+    elif runtime.precision["image"] != "float32":
+        print("⚠️ FIXORA_IMG_PRECISION only applies to the keras backend (use a quantized export instead)")
+    return load_backend(IMG_BACKEND, image_backend_path(source), num_threads=IMG_BACKEND_THREADS)
+
+
+def warm_image_model(backend):
+    backend.predict(np.zeros((1, 224, 224, 3), dtype=np.float32))
+
+
+def load_image_label_encoder(source):
+    # For image label encoder (if you trained one)
+    try:
+        return joblib.load(source.path("labels"))
+    except Exception:
+        print("⚠️ No image_label_encoder.joblib found. Using default labels.")
+        return None
+
+
+def load_embedding_model(source):
+    from sentence_transformers import SentenceTransformer
+    with open(source.path("embedding_model_name"), "r") as f:
+        embedding_model_name = f.read().strip()
+    runtime.pin("text")
+    runtime.configure_torch()
+    return runtime.cast_text_model(SentenceTransformer(embedding_model_name))
+
+
+def warm_embedding_model(model):
+    model.encode(["warm up"])
+
+
+def load_fast_urgency(source):
+    # Optional: without it every description takes the embedding path
+    path = source.path("urgency_fast")
+    if not os.path.exists(path):
+        print(f"⚠️ No fast urgency tier at {path}. Using the embedding path only.")
+        return None
+    model = FastUrgencyModel.load(path)
+    if URGENCY_FAST_MIN_CONF:
+        model.min_confidence = float(URGENCY_FAST_MIN_CONF)
+    print(f"⚡ Fast urgency tier: answers at confidence >= {model.min_confidence}")
+    return model
+
+
+def warm_fast_urgency(model):
+    model.predict(["warm up"])
+
+
+models = ModelLoader(warm_up=MODEL_WARMUP, resolve=resolve_models)
+models.add("image_model", load_image_model, warmup=warm_image_model, fork_safe=False,  # TensorFlow: load after fork
+           group="image")
+models.add("image_labels", load_image_label_encoder, required=False, group="image")
+models.add("text_classifier", lambda source: joblib.load(source.path("classifier")), group="text")
+models.add("text_labels", lambda source: joblib.load(source.path("labels")), group="text")
+models.add("embedding_model", load_embedding_model, warmup=warm_embedding_model, group="text")
+models.add("urgency_fast", load_fast_urgency, warmup=warm_fast_urgency, required=False, group="text")
+models.watch(MODEL_WATCH_S)  # new CURRENT / CANDIDATE versions are loaded beside the live ones, then swapped in
+
+# A sample of live inputs also runs through a family's shadow candidate, off the request path
+shadow = ShadowTraffic(fraction=SHADOW_FRACTION)
+
+
+def models_unavailable(names):
+    """503 + Retry-After if any of `names` isn't ready within MODEL_WAIT_S, else None"""
+    try:
+        models.wait(names, timeout=MODEL_WAIT_S)
+        return None
+    except ModelNotReady as e:
+        response = jsonify({"error": str(e), "models": models.status()})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+
+
+# One batched forward pass for all concurrent image requests
+image_batcher = MicroBatcher(
+    lambda batch, model: model.predict(batch),  # the model each request pinned
+    max_batch_size=IMG_BATCH_MAX_SIZE,
+    max_wait_ms=IMG_BATCH_WAIT_MS,
+    name="mobilenetv2",
+    max_queue_rows=IMG_QUEUE_MAX_ROWS,
+    bulk_share=BULK_QUEUE_SHARE,
+    thread_init=lambda: runtime.pin("image"),
+)
+print(f"✅ Image batcher ready (max {IMG_BATCH_MAX_SIZE} / {IMG_BATCH_WAIT_MS} ms window).")
+
+# Inference requests admitted at once (the rest get 503 / 429 + Retry-After immediately)
+inflight = InflightLimiter(MAX_INFLIGHT, bulk_share=BULK_QUEUE_SHARE)
+
+# Reusable float32 input buffers (JPEG draft decode -> normalized tensor, no temporaries)
+image_buffers = TensorBufferPool(capacity=IMG_BATCH_MAX_SIZE)
+
+# Thumbnail / preview written from the decode the model input needs anyway
+image_ingest = ImageIngest(IMAGE_STORE_DIR, thumb_edge=IMAGE_THUMB_EDGE, preview_edge=IMAGE_PREVIEW_EDGE,
+                           quality=IMAGE_QUALITY, image_format=IMAGE_FORMAT,
+                           max_pending=IMAGE_MAX_PENDING) if IMAGE_STORE_DIR else None
+image_limits = image_ingest.limits() if image_ingest else upload_limits(IMAGE_THUMB_EDGE, IMAGE_PREVIEW_EDGE, None)
+
+# (label, softmax) per image, keyed by content hash; dropped when the image model version changes
+cache_kwargs = dict(
+    max_entries=IMG_CACHE_MAX_ENTRIES,
+    max_bytes=int(IMG_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=IMG_CACHE_TTL_S,
+)
+image_cache = LRUCache(name="image", **cache_kwargs)
+image_phash_cache = PerceptualCache(max_distance=IMG_CACHE_PHASH_DISTANCE, name="image_phash", **cache_kwargs)
+
+
+def caches_current(group, *caches):
+    """
+    Keep `caches` on the group's live model version (a swap empties them) and say whether
+    the current request may use them: False while it finishes on the version a swap replaced
+    """
+    live = models.live_version(group)
+    for cache in caches:
+        cache.ensure_version(live)
+    return models.version(group) == live
+
+
+def admission():
+    """(deadline, priority) of the current request; (None, "normal") outside one"""
+    if not has_request_context():
+        return None, "normal"
+    return g.get("deadline"), g.get("priority", "normal")
+
+
+def check_deadline(deadline):
+    """Drop work for a client that has already given up, before decoding / inference"""
+    if deadline is not None and time.perf_counter() >= deadline:
+        raise DeadlineExceeded("Deadline passed before inference")
+
+
+def decode_image_labels(label_idx):
+    """Map an array of softmax indices to the category names the app expects"""
+    label_idx = np.asarray(label_idx, dtype=int)
+    img_label_encoder = models.get("image_labels")
+    if img_label_encoder:
+        return [str(label) for label in img_label_encoder.inverse_transform(label_idx)]
+    return [
+        DEFAULT_IMAGE_CATEGORIES[i] if i < len(DEFAULT_IMAGE_CATEGORIES) else f"class_{i}"
+        for i in label_idx.tolist()
+    ]
+
+
+def decode_image_label(label_idx):
+    """Map a single softmax index to its category name"""
+    return decode_image_labels([label_idx])[0]
+
+
+def predict_image_streams(streams, image_ids=None):
+    """
+    Softmax rows (N, C) for every image stream.
+    Exact re-uploads (same bytes) and, if enabled, perceptual near-duplicates are
+    served from the cache; the rest are decoded into one buffer and run through
+    the batcher in a single forward pass. `image_ids` (a list) receives each
+    image's content id, the key of its stored derivatives.
+    """
+    use_cache = caches_current("image", image_cache, image_phash_cache)
+    model = models.get("image_model")
+
+    streams = list(streams)
+    with metrics.stage("cache_lookup"):
+        keys = [content_hash(fp) for fp in streams]
+        if image_ids is not None:
+            image_ids[:] = keys
+        rows = [None] * len(streams)
+        for i, key in enumerate(keys):
+            hit = image_cache.get(key) if use_cache else None
+            if hit is not None:
+                rows[i] = hit[1]
+
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if not missing:
+        return np.stack(rows)
+
+    # Shed before paying for the JPEG decode
+    deadline, priority = admission()
+    check_deadline(deadline)
+    image_batcher.check_capacity(len(missing), priority, deadline)
+
+    started = time.perf_counter()
+    decode = image_ingest.decoder([keys[i] for i in missing]) if image_ingest else None
+    with image_buffers.preprocess((streams[i] for i in missing), decode=decode) as batch:
+        metrics.add_stage("preprocess", time.perf_counter() - started)  # JPEG decode + resize + normalize
+        phashes = {}
+        if IMG_CACHE_PHASH and use_cache:
+            with metrics.stage("phash_lookup"):
+                for j, i in enumerate(missing):
+                    phashes[j] = dhash(batch[j])
+                    hit = image_phash_cache.get_nearest(phashes[j])
+                    if hit is not None:
+                        rows[i] = hit[1]
+                        image_cache.put(keys[i], hit)
+
+        run = [j for j, i in enumerate(missing) if rows[i] is None]
+        if run:
+            stack = batch if len(run) == len(batch) else batch[run]
+            # wait() never returns while the batcher may still read `batch` (a pooled buffer)
+            future = image_batcher.submit_batch(stack, deadline=deadline, priority=priority, model=model)
+            preds = image_batcher.wait(future, deadline)
+            metrics.add_stage("image_queue", getattr(future, "queue_seconds", None))
+            metrics.add_stage("image_inference", getattr(future, "run_seconds", None))
+            labels = decode_image_labels(np.argmax(preds, axis=1))
+            shadow_image(stack, labels, future)
+            for j, pred, label in zip(run, preds, labels):
+                entry = (label, np.array(pred, dtype=np.float32))
+                rows[missing[j]] = entry[1]
+                if use_cache:
+                    image_cache.put(keys[missing[j]], entry)
+                if j in phashes:
+                    image_phash_cache.put(phashes[j], entry)
+
+    return np.stack(rows)
+
+
+def shadow_image(stack, live_labels, future):
+    """Mirror a sampled forward pass to the image candidate (the stack is a pooled buffer: copied)"""
+    candidate = models.candidate("image")
+    if candidate is None or not shadow.sample():
+        return
+    source, values = candidate
+    inputs = np.array(stack, copy=True)
+    run_seconds, batch_rows = getattr(future, "run_seconds", None), getattr(future, "batch_rows", None)
+    live_ms = run_seconds * 1000.0 / batch_rows if run_seconds and batch_rows else None
+
+    def run():
+        preds = values["image_model"].predict(inputs)
+        label_idx = np.argmax(preds, axis=1)
+        encoder = values["image_labels"]
+        if encoder:
+            return [str(label) for label in encoder.inverse_transform(label_idx)]
+        return [DEFAULT_IMAGE_CATEGORIES[i] if i < len(DEFAULT_IMAGE_CATEGORIES) else f"class_{i}"
+                for i in label_idx.tolist()]
+
+    shadow.submit("image", source.version, live_labels, live_ms, run)
+
+
+# MobileNetV2 penultimate features for duplicate matching (Keras backend only)
+image_embed_batcher = MicroBatcher(
+    lambda batch, model: model.embed(batch),
+    max_batch_size=IMG_BATCH_MAX_SIZE,
+    max_wait_ms=IMG_BATCH_WAIT_MS,
+    name="mobilenetv2-features",
+    max_queue_rows=IMG_QUEUE_MAX_ROWS,
+    bulk_share=BULK_QUEUE_SHARE,
+    thread_init=lambda: runtime.pin("image"),
+)
+image_embedding_cache = LRUCache(name="image_embedding", **cache_kwargs)
+
+
+def image_embeddings_supported():
+    return models.is_ready(IMAGE_MODELS) and getattr(models.get("image_model"), "supports_embeddings", False)
+
+
+def embed_image_streams(streams):
+    """(N, D) penultimate-layer features per image stream, cached by content hash"""
+    use_cache = caches_current("image", image_embedding_cache)
+    streams = list(streams)
+    keys = [content_hash(fp) for fp in streams]
+    rows = [image_embedding_cache.get(k) if use_cache else None for k in keys]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        deadline, priority = admission()
+        check_deadline(deadline)
+        image_embed_batcher.check_capacity(len(missing), priority, deadline)
+        decode = image_ingest.decoder([keys[i] for i in missing]) if image_ingest else None
+        with image_buffers.preprocess((streams[i] for i in missing), decode=decode) as batch:
+            future = image_embed_batcher.submit_batch(batch, deadline=deadline, priority=priority,
+                                                      model=models.get("image_model"))
+            features = image_embed_batcher.wait(future, deadline)
+        for i, feature in zip(missing, features):
+            rows[i] = np.array(feature, dtype=np.float32)
+            if use_cache:
+                image_embedding_cache.put(keys[i], rows[i])
+    return np.stack(rows)
+
+
+# One encode call for all concurrent descriptions
+text_batcher = MicroBatcher(
+    lambda texts, model: np.asarray(model.encode(list(texts)), dtype=np.float32),
+    max_batch_size=TEXT_BATCH_MAX_SIZE,
+    max_wait_ms=TEXT_BATCH_WAIT_MS,
+    name="sentence-transformer",
+    max_queue_rows=TEXT_QUEUE_MAX_ROWS,
+    bulk_share=BULK_QUEUE_SHARE,
+    thread_init=lambda: runtime.pin("text"),
+)
+
+# Sentence embeddings keyed by normalized description, for the live text version
+text_cache = LRUCache(
+    max_entries=TEXT_CACHE_MAX_ENTRIES,
+    max_bytes=int(TEXT_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=TEXT_CACHE_TTL_S,
+    name="text_embedding",
+)
+
+# Normalized text -> Future, so identical descriptions arriving together encode once
+_text_inflight = {}
+_text_inflight_lock = threading.Lock()
+
+
+def embed_texts(texts):
+    """
+    (N, D) sentence embeddings; cached strings skip the encoder, the rest share one encode call.
+    The cache is keyed on the normalized text, but the encoder sees the original string (the
+    first occurrence of each key), so outputs match an unnormalized encode.
+    """
+    model = models.get("embedding_model")
+    keys = [normalize_text(t) for t in texts]
+    originals = {}
+    for key, text in zip(keys, texts):
+        originals.setdefault(key, text)
+    if not caches_current("text", text_cache):
+        # Finishing on the version a swap replaced: no cache, no sharing encodes with newer requests
+        deadline, priority = admission()
+        unique = sorted(originals)
+        future = text_batcher.submit_batch(np.array([originals[k] for k in unique]), deadline=deadline,
+                                           priority=priority, model=model)
+        encoded = dict(zip(unique, text_batcher.wait(future, deadline)))
+        return np.stack([encoded[k] for k in keys])
+
+    with metrics.stage("text_cache_lookup"):
+        rows = [text_cache.get(k) for k in keys]
+
+    missing = sorted({k for k, row in zip(keys, rows) if row is None})
+    if not missing:
+        return np.stack(rows)
+
+    owned, waiting = [], {}
+    with _text_inflight_lock:
+        for k in missing:
+            if k in _text_inflight:
+                waiting[k] = _text_inflight[k]
+            else:
+                _text_inflight[k] = Future()
+                owned.append(k)
+
+    embeddings = {}
+    if owned:
+        try:
+            deadline, priority = admission()
+            future = text_batcher.submit_batch(np.array([originals[k] for k in owned]), deadline=deadline,
+                                               priority=priority, model=model)
+            encoded = text_batcher.wait(future, deadline)
+            metrics.add_stage("text_queue", getattr(future, "queue_seconds", None))
+            metrics.add_stage("text_encode", getattr(future, "run_seconds", None))
+            for k, emb in zip(owned, encoded):
+                text_cache.put(k, emb)
+                embeddings[k] = emb
+                _text_inflight[k].set_result(emb)
+        except Exception as e:
+            for k in owned:
+                if not _text_inflight[k].done():
+                    _text_inflight[k].set_exception(e)
+            raise
+        finally:
+            with _text_inflight_lock:
+                for k in owned:
+                    _text_inflight.pop(k, None)
+    if waiting:
+        with metrics.stage("text_inflight_wait"):
+            for k, future in waiting.items():
+                embeddings[k] = future.result()
+
+    return np.stack([embeddings[k] if row is None else row for k, row in zip(keys, rows)])
+
+
+def fast_urgency_model():
+    return models.get("urgency_fast") if models.is_ready(("urgency_fast",)) else None
+
+
+def fast_tier_info():
+    model = fast_urgency_model()
+    if model is None:
+        return None
+    # metadata["min_confidence"] is the threshold picked at training; this one may be overridden
+    return dict(model.metadata, path=models.source("text").path("urgency_fast"),
+                trained_min_confidence=model.metadata.get("min_confidence"), min_confidence=model.min_confidence)
+
+
+def predict_urgency_texts(texts):
+    """
+    Urgency labels, confidences and the answering tier ("fast" / "full") for N descriptions:
+    the lexical tier answers those it is confident about, the rest share one embedding +
+    predict_proba pass
+    """
+    started_all = time.perf_counter()
+    with metrics.stage("urgency_fast"):
+        labels, confs, tiers, remaining = split_by_tier(fast_urgency_model(), texts)
+    answered = len(texts) - len(remaining)
+    if answered:
+        urgency_tiers.exit("fast", answered)
+        urgency_tiers.skipped("embedding", answered)
+
+    if remaining:
+        started = time.perf_counter()
+        embeddings = embed_texts([texts[i] for i in remaining])
+        with metrics.stage("urgency_classify"):
+            full_labels, full_confs = classify_embeddings(
+                embeddings, models.get("text_classifier"), models.get("text_labels"))
+        urgency_tiers.ran("embedding", time.perf_counter() - started, len(remaining))
+        urgency_tiers.exit("full", len(remaining))
+        for i, label, conf in zip(remaining, full_labels, full_confs):
+            labels[i], confs[i] = label, conf
+    shadow_urgency(texts, labels, (time.perf_counter() - started_all) * 1000.0 / max(1, len(texts)))
+    return labels, confs, tiers
+
+
+def shadow_urgency(texts, live_labels, live_ms):
+    """
+    Mirror sampled descriptions to the text candidate: its own fast tier, encoder and
+    classifier, called directly (the live latency includes batching and caches)
+    """
+    candidate = models.candidate("text")
+    if candidate is None or not texts or not shadow.sample():
+        return
+    source, values = candidate
+
+    def run():
+        labels, _, _, remaining = split_by_tier(values["urgency_fast"], texts)
+        if remaining:
+            embeddings = values["embedding_model"].encode([texts[i] for i in remaining])
+            full_labels, _ = classify_embeddings(np.asarray(embeddings), values["text_classifier"],
+                                                 values["text_labels"])
+            for i, label in zip(remaining, full_labels):
+                labels[i] = label
+        return labels
+
+    shadow.submit("text", source.version, live_labels, live_ms, run)
+
+
+class BulkTextEncoder:
+    """
+    SentenceTransformer stand-in for score_stream: encodes through text_batcher at
+    "bulk" priority, so backfills yield to interactive requests; a full queue slows
+    the stream down instead of failing it, up to the request's `deadline`.
+    """
+
+    def __init__(self, deadline=None):
+        self.model = models.get("embedding_model")  # the whole stream stays on one version
+        self.deadline = deadline
+
+    def encode(self, texts, batch_size=None):
+        rows = []
+        for start in range(0, len(texts), TEXT_BATCH_MAX_SIZE):
+            chunk = np.array(texts[start:start + TEXT_BATCH_MAX_SIZE])
+            while True:
+                check_deadline(self.deadline)
+                try:
+                    future = text_batcher.submit_batch(chunk, deadline=self.deadline, priority="bulk",
+                                                       model=self.model)
+                    break
+                except QueueFull as e:
+                    time.sleep(min(1.0, e.retry_after))
+            rows.append(text_batcher.wait(future, self.deadline))
+        return np.concatenate(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+
+# Async analysis jobs; the text half of a job runs beside its image half
+jobs = JobRunner(
+    workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    ttl_seconds=JOB_TTL_S,
+    webhook_allowlist=WEBHOOK_ALLOWLIST,
+)
+job_text_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job-text")
+long_polls = threading.BoundedSemaphore(max(1, JOB_MAX_LONG_POLLS))
+
+# Notification fan-out: one Expo send per <= 100 messages from all concurrent fan-outs
+push_tokens = PushTokenStore(journal_path=PUSH_TOKEN_JOURNAL_PATH)
+push = PushFanout(
+    ExpoPushClient(PUSH_SEND_URL, access_token=PUSH_ACCESS_TOKEN, retries=PUSH_RETRIES),
+    push_tokens,
+    max_wait_ms=PUSH_BATCH_WAIT_MS,
+    receipt_delay_s=PUSH_RECEIPT_DELAY_S,
+    ttl_seconds=PUSH_TTL_S,
+)
+print(f"✅ Push fan-out ready ({len(push_tokens)} cached token(s), sending to {PUSH_SEND_URL}).")
+
+
+def image_verdict(preds):
+    """/predict's checks on (N, C) softmax rows: denied (images disagree), resubmit (low confidence) or success"""
+    label_idx = np.argmax(preds, axis=1)
+    confs = np.max(preds, axis=1)
+
+    # Check: multiple different problems
+    if np.unique(label_idx).size > 1:
+        return {
+            "status": "denied",
+            "reason": "Multiple images show different problems."
+        }
+
+    issue_type = decode_image_label(label_idx[0])
+    avg_conf = confs.mean()
+
+    # Confidence check
+    if avg_conf < MIN_AVG_CONFIDENCE:
+        return {
+            "status": "resubmit",
+            "issue_type": issue_type,
+            "confidence": round(float(avg_conf), 2),
+            "message": "Confidence below 80%. Please re-upload clearer images."
+        }
+
+    return {
+        "status": "success",
+        "issue_type": issue_type,
+        "issue_confidence": round(float(avg_conf), 2)
+    }
+
+
+def early_image_verdict(preds, total):
+    """
+    image_verdict() as soon as the outcome is settled by the first len(preds) of `total`
+    images: two labels already disagree, or the average confidence can't reach
+    MIN_AVG_CONFIDENCE even if every remaining image scores 1.0. None while it still can.
+    """
+    if np.unique(np.argmax(preds, axis=1)).size > 1:
+        return image_verdict(preds)
+    best_case = (np.max(preds, axis=1).sum() + (total - len(preds))) / total
+    if best_case < MIN_AVG_CONFIDENCE:
+        return image_verdict(preds)
+    return None
+
+
+def analyze_report(images, description):
+    """
+    Job body: image verdict and urgency computed side by side, in /predict's result shape
+    (plus the model versions, since the job outlives its request's response header)
+    """
+    with metrics.request("predict_job") as timing:
+        text_future = job_text_pool.submit(models.bind(predict_urgency_texts), [description]) if description else None
+        if images:
+            result = image_verdict(predict_image_streams(io.BytesIO(data) for data in images))
+        else:
+            result = {"status": "success"}
+        result["model_version"] = models.versions()
+        timing.outcome = result["status"]
+
+        if text_future is not None:
+            if result["status"] != "success":
+                text_future.cancel()  # not needed any more (a running encode just finishes)
+                return result
+            urgencies, urgency_confs, tiers = text_future.result()
+            result["urgency"] = urgencies[0]
+            result["urgency_confidence"] = round(float(urgency_confs[0]), 2) if urgency_confs[0] else None
+            result["urgency_tier"] = tiers[0]
+        return result
+
+
+# Open reports, updated incrementally by the app on create / status change
+report_index = GeoGridIndex(cell_deg=GEO_CELL_DEG, journal_path=GEO_JOURNAL_PATH, name="open_reports")
+print(f"✅ Duplicate index ready ({len(report_index)} open report(s)).")
+
+# Per-organization report / feedback counters behind /orgs/<id>/stats (fed by the same report syncs)
+org_stats = OrgStats(snapshot_path=ORG_STATS_SNAPSHOT_PATH, snapshot_interval_s=ORG_STATS_SNAPSHOT_S)
+
+# Every synced report (any status) as columns behind /reports/query; keeps embeddings across restarts
+report_store = ReportStore(REPORT_STORE_DIR, compact_min_rows=REPORT_STORE_COMPACT_ROWS)
+print(f"✅ Report store ready ({len(report_store)} report(s), loaded in {report_store.counts['load_ms']} ms).")
+
+
+# Embeddings of open reports + the scorer behind /duplicates/nearby with photos / description
+image_vectors = VectorIndex(nlist=DUP_IVF_LISTS, name="image")
+text_vectors = VectorIndex(nlist=DUP_IVF_LISTS, name="text")
+duplicate_scorer = DuplicateScorer(
+    report_index, image_vectors, text_vectors,
+    weights=DUP_WEIGHTS,
+    geo_scale_m=DUP_GEO_SCALE_M,
+    image_floor=DUP_IMAGE_SIM_FLOOR,
+    text_floor=DUP_TEXT_SIM_FLOOR,
+)
+
+# signatureId -> (image vector, text vector) of a checked submission, attached when it is created
+duplicate_signatures = LRUCache(max_entries=4096, ttl_seconds=DUP_SIGNATURE_TTL_S, name="duplicate_signatures")
+
+
+def report_signature(streams, description):
+    """(image vector or None, text vector or None) for a submission: mean of unit image features + text embedding"""
+    image_vec = text_vec = None
+    if streams and image_embeddings_supported():
+        image_vec = l2_normalize(l2_normalize(embed_image_streams(streams)).mean(axis=0))
+    if description and description.strip() and models.is_ready(TEXT_MODELS):
+        text_vec = embed_texts([description])[0]
+    return image_vec, text_vec
+
+
+def index_report(item):
+    """Upsert an app report into the report store and the geo index and attach / drop its embeddings; True if indexed"""
+    fields = report_fields(item)
+    report_id = str(fields["report_id"])
+    signature = duplicate_signatures.get(item["signatureId"]) if item.get("signatureId") else None
+    store_report(item, signature)
+    if not report_index.upsert(**fields):
+        image_vectors.remove(report_id)
+        text_vectors.remove(report_id)
+        return False
+    if signature is not None:
+        for index, vec in zip((image_vectors, text_vectors), signature):
+            if vec is None:
+                continue
+            try:
+                index.add(report_id, vec)
+            except ValueError as e:  # a swapped model with another embedding size
+                print(f"⚠️ Report {report_id} indexed without its {index.name}: {e}")
+    return True
+
+
+def store_report(item, signature=None):
+    """Record an app report (or a change to one) in the report store; status "deleted" drops it"""
+    if item.get("status") == REPORT_DELETED:
+        report_store.remove(item["id"])
+        return
+    fields = report_fields(item)
+    image_vec, text_vec = signature if signature is not None else (None, None)
+    row = dict(
+        organization_id=fields["organization_id"],
+        category=fields["category"],
+        status=item.get("status"),
+        urgency=item.get("urgency") or None,
+        lat=fields["lat"],
+        lon=fields["lon"],
+        created=item.get("createdAt"),
+    )
+    try:
+        report_store.upsert(fields["report_id"], image=image_vec, text=text_vec, **row)
+    except ValueError as e:
+        if signature is None:
+            raise
+        # e.g. a swapped model with another embedding size: keep the report, without its embeddings
+        print(f"⚠️ Report {fields['report_id']} stored without embeddings: {e}")
+        report_store.upsert(fields["report_id"], **row)
+
+
+def restore_from_report_store():
+    """After a restart: re-add open reports' embeddings (and, with an empty geo index, their locations)"""
+    if not len(report_store):
+        return
+    rows = report_store.select(status=OPEN_STATUSES, columns=["org", "category", "status", "lat", "lon", "image", "text"])
+    relocated = 0
+    if len(report_index) == 0:
+        for i in np.flatnonzero(~np.isnan(rows["lat"]) & ~np.isnan(rows["lon"])):
+            relocated += report_index.upsert(report_id=rows["id"][i], lat=float(rows["lat"][i]), lon=float(rows["lon"][i]),
+                                             organization_id=rows["org"][i], category=rows["category"][i],
+                                             status=rows["status"][i])
+    for index, kind in ((image_vectors, "image"), (text_vectors, "text")):
+        for i in np.flatnonzero(rows[f"has_{kind}"]):
+            index.add(str(rows["id"][i]), rows[kind][i])
+    print(f"✅ Restored {len(image_vectors)} image / {len(text_vectors)} text embedding(s) "
+          f"and {relocated} location(s) from the report store.")
+
+
+def report_fields(item):
+    """GeoGridIndex.upsert kwargs from an app report ({id, location: {latitude, longitude}, ...})"""
+    location = item.get("location") or {}
+    return {
+        "report_id": item["id"],
+        "lat": item.get("latitude", location.get("latitude")),
+        "lon": item.get("longitude", location.get("longitude")),
+        "organization_id": item.get("organizationId") or None,
+        "category": item.get("categorySlug") or item.get("category") or None,
+        "status": item.get("status", "pending"),
+    }
+
+
+restore_from_report_store()
+
+
+def image_refs(image_id):
+    """Response fields pointing at an upload's thumbnail / preview (none without FIXORA_IMAGE_STORE_DIR)"""
+    if image_ingest is None:
+        return {}
+    return {"image_id": image_id, **{f"{variant}_url": f"/images/{image_id}/{variant}" for variant in IMAGE_VARIANTS}}
+
+
+def request_image_streams():
+    """
+    File-like objects for every image in the request, without copying buffers:
+    - multipart/form-data: each "images" part (or any file part) is read from its spooled stream
+    - application/octet-stream / image/*: the raw body is a single image
+    """
+    if request.files:
+        parts = request.files.getlist("images") or list(request.files.values())
+        return [(part.filename or f"image_{i}", part.stream) for i, part in enumerate(parts)]
+
+    # BytesIO over a bytes object shares its buffer until written to
+    body = request.get_data(cache=False)
+    if not body:
+        return []
+    return [("image_0", io.BytesIO(body))]
+
+
+# fixora_serve.py --mode prefork preloads in the gunicorn master instead
+if os.environ.get("FIXORA_DEFER_MODEL_LOAD") != "1":
+    print("🚀 Loading models in the background...")
+    models.start()
 
 
 # -----------------------
 # FLASK APP
 # -----------------------
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["Server-Timing", "Retry-After", MODEL_VERSION_HEADER, MAX_UPLOAD_EDGE_HEADER])
+
+
+@app.before_request
+def pin_models():
+    # Everything this request runs uses the versions live now, even if a swap lands meanwhile
+    g.models_pin = models.pin()
+
+
+@app.after_request
+def add_model_version(response):
+    response.headers[MODEL_VERSION_HEADER] = ",".join(
+        f"{group}={version}" for group, version in models.versions().items())
+    return response
+
+
+@app.after_request
+def advertise_upload_edge(response):
+    # Larger photos only cost upload bytes + decode: nothing the server keeps is bigger
+    response.headers[MAX_UPLOAD_EDGE_HEADER] = str(image_limits["max_upload_edge"])
+    return response
+
+
+@app.teardown_request
+def unpin_models(error=None):
+    token = g.pop("models_pin", None)
+    if token is not None:
+        models.unpin(token)
+
+
+def admitted(priority="normal"):
+    """
+    Admission control for an inference view: sets the request's deadline (client
+    header or FIXORA_REQUEST_DEADLINE_S) and queue priority, and refuses it up front
+    when MAX_INFLIGHT requests are already being served. A streamed response keeps
+    its slot until the body has been sent (or the client hung up).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            budget_s = REQUEST_DEADLINE_S
+            header = request.headers.get(DEADLINE_HEADER)
+            if header:
+                try:
+                    budget_s = max(0.0, float(header) / 1000.0)
+                except ValueError:
+                    pass
+            g.deadline = time.perf_counter() + budget_s if budget_s > 0 else None
+            g.priority = "bulk" if request.headers.get(PRIORITY_HEADER, "").lower() == "bulk" else priority
+
+            held = g.priority
+            if not inflight.acquire(held):
+                return overloaded_response(QueueFull("Too many requests in flight",
+                                                     retry_after=image_batcher.retry_after()))
+            try:
+                response = view(*args, **kwargs)
+            except BaseException:
+                inflight.release(held)
+                raise
+            if isinstance(response, Response) and response.is_streamed:
+                # the body is generated after the view returns
+                response.call_on_close(lambda: inflight.release(held))
+            else:
+                inflight.release(held)
+            return response
+        return wrapper
+    return decorator
+
+
+def overloaded_response(error):
+    """
+    Queue full: 503 + Retry-After (429 for bulk callers, which should slow down).
+    Deadline passed before inference: 504, the client has already given up.
+    """
+    expired = isinstance(error, DeadlineExceeded)
+    metrics.set_outcome("expired" if expired else "shed")
+    response = jsonify({"error": str(error), "retry_after": None if expired else error.retry_after})
+    if expired:
+        response.status_code = 504
+    else:
+        response.status_code = 429 if admission()[1] == "bulk" else 503
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def outcome_for_status(status_code):
+    if status_code < 400:
+        return "success"
+    if status_code == 503:
+        return "unavailable"
+    if status_code == 429:
+        return "shed"
+    return "client_error" if status_code < 500 else "error"
+
+
+def timed(endpoint):
+    """
+    Record a view's latency, stage timings and outcome in `metrics`, and return the
+    breakdown to the caller as a Server-Timing header (client RTT - server total = network/ngrok).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with metrics.request(endpoint) as timing:
+                response = make_response(view(*args, **kwargs))
+                if timing.outcome is None:
+                    timing.outcome = outcome_for_status(response.status_code)
+                response.headers["Server-Timing"] = timing.server_timing()
+                if METRICS_LOG:
+                    print(json.dumps({
+                        "endpoint": endpoint,
+                        "status": response.status_code,
+                        "outcome": timing.outcome,
+                        "total_ms": round(timing.elapsed() * 1000.0, 2),
+                        "stages_ms": {k: round(v * 1000.0, 2) for k, v in timing.stages.items()}
+                    }))
+            return response
+        return wrapper
+    return decorator
 
 
 @app.route("/")
@@ -64,95 +1074,217 @@ def home():
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({
-        "status": "healthy",
+        "status": "healthy" if models.is_ready() else "starting",
         "models": {
-            "image_classification": "loaded",
-            "urgency_detection": "loaded"
+            "image_classification": "loaded" if models.is_ready(IMAGE_MODELS) else "loading",
+            "image_backend": f"{IMG_BACKEND}/{IMG_BACKEND_VARIANT}",
+            "urgency_detection": "loaded" if models.is_ready(TEXT_MODELS) else "loading"
+        },
+        "runtime": runtime.summary(),
+        "model_versions": models.reload_status(),
+        "batching": {
+            "image": image_batcher.stats(),
+            "image_features": image_embed_batcher.stats(),
+            "text": text_batcher.stats()
+        },
+        "jobs": jobs.stats(),
+        "notifications": push.stats(),
+        "org_stats": org_stats.summary(),
+        "report_store": report_store.stats(),
+        "images": image_ingest.stats() if image_ingest else dict(image_limits, root=None),
+        "early_exit": early_exit.stats(),
+        "urgency_tiers": dict(urgency_tiers.stats(), fast_tier=fast_tier_info()),
+        "admission": {
+            "inflight": inflight.stats(),
+            "default_deadline_s": REQUEST_DEADLINE_S or None,
+            "deadline_header": DEADLINE_HEADER,
+            "bulk_queue_share": BULK_QUEUE_SHARE
+        },
+        "latency": metrics.summary(),
+        "duplicates": {
+            "geo": report_index.stats(),
+            "image_vectors": image_vectors.stats(),
+            "text_vectors": text_vectors.stats(),
+            "image_embeddings": image_embeddings_supported()
+        },
+        "cache": {
+            "image": image_cache.stats(),
+            "text_embedding": text_cache.stats(),
+            "image_phash": image_phash_cache.stats() if IMG_CACHE_PHASH else None
         }
     })
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus scrape endpoint (?format=json for p50/p95/p99 per endpoint and stage)"""
+    if request.args.get("format") == "json":
+        return jsonify(metrics.summary())
+
+    batchers = (image_batcher, image_embed_batcher, text_batcher, push.batcher)
+    caches = (image_cache, image_phash_cache, image_embedding_cache, text_cache)
+    batcher_stats = [(b.name, b.stats()) for b in batchers]
+    cache_stats = [(c.name, c.stats()) for c in caches]
+    job_stats = jobs.stats()
+    push_stats = push.stats()
+    org_summary = org_stats.summary()
+    store_stats = report_store.stats()
+    ingest_stats = image_ingest.stats() if image_ingest else {}
+    savings = early_exit.stats()
+    tier_stats = urgency_tiers.stats()
+    reloads = models.reload_status()
+    shadow_stats = shadow.stats()["candidates"]
+    gauges = [
+        ("model_ready", "gauge", "1 once the model slot is loaded",
+         [({"model": name}, 1 if st["state"] == "ready" else 0) for name, st in models.status().items()]),
+        ("model_version_info", "gauge", "Model version served per family (1) and shadowed (0)",
+         [({"family": family, "version": version}, 1) for family, version in reloads["live"].items()]
+         + [({"family": family, "version": version}, 0) for family, version in reloads["candidates"].items()]),
+        ("model_reloads_total", "counter", "Background model reloads by result",
+         [({"result": result}, n) for result, n in reloads["counts"].items()]),
+        ("shadow_compared_total", "counter", "Items compared between the live model and a shadow candidate",
+         [({"family": family, "version": version}, st["compared"])
+          for family, versions in shadow_stats.items() for version, st in versions.items()]),
+        ("shadow_agreement", "gauge", "Share of shadowed items where the candidate agreed with the live model",
+         [({"family": family, "version": version}, st["agreement"])
+          for family, versions in shadow_stats.items() for version, st in versions.items()]),
+        ("shadow_latency_ratio", "gauge", "Candidate / live latency per item on shadowed traffic",
+         [({"family": family, "version": version}, st["latency_ratio"])
+          for family, versions in shadow_stats.items() for version, st in versions.items()]),
+        ("batch_forward_passes_total", "counter", "Batched forward passes per batcher",
+         [({"batcher": name}, st["batches"]) for name, st in batcher_stats]),
+        ("batch_items_total", "counter", "Rows run through each batcher",
+         [({"batcher": name}, st["items"]) for name, st in batcher_stats]),
+        ("batch_queue_wait_p95_ms", "gauge", "Recent p95 queue wait per batcher",
+         [({"batcher": name}, st["queue_wait_ms"]["p95"]) for name, st in batcher_stats]),
+        ("requests_inflight", "gauge", "Inference requests currently admitted", [({}, inflight.stats()["inflight"])]),
+        ("requests_rejected_total", "counter", "Requests refused at admission (in-flight cap)",
+         [({}, inflight.stats()["rejected"])]),
+        ("batch_queued_rows", "gauge", "Rows waiting in each batcher queue",
+         [({"batcher": name}, st["queued_rows"]) for name, st in batcher_stats]),
+        ("batch_rejected_total", "counter", "Submits refused because the queue was full",
+         [({"batcher": name}, st["rejected"]) for name, st in batcher_stats]),
+        ("batch_expired_total", "counter", "Queued inputs dropped after their deadline",
+         [({"batcher": name}, st["expired"]) for name, st in batcher_stats]),
+        ("cache_hits_total", "counter", "Cache hits",
+         [({"cache": name}, st["hits"]) for name, st in cache_stats]),
+        ("cache_misses_total", "counter", "Cache misses",
+         [({"cache": name}, st["misses"]) for name, st in cache_stats]),
+        ("cache_entries", "gauge", "Entries held per cache",
+         [({"cache": name}, st["entries"]) for name, st in cache_stats]),
+        ("open_reports", "gauge", "Open reports in the duplicate index", [({}, len(report_index))]),
+        ("jobs_pending", "gauge", "Async jobs queued or running", [({}, job_stats["pending"])]),
+        ("jobs_total", "counter", "Async jobs submitted, rejected, done and failed",
+         [({"state": state}, job_stats[state]) for state in ("submitted", "rejected", "done", "failed")]),
+        ("job_webhooks_total", "counter", "Webhook deliveries",
+         [({"result": "delivered"}, job_stats["webhooks_delivered"]),
+          ({"result": "failed"}, job_stats["webhooks_failed"])]),
+        ("push_recipients_total", "counter",
+         "Notification recipients by outcome (sent / failed = ticket, delivered / receipt_failed = receipt of a sent one)",
+         [({"status": status}, push_stats[status])
+          for status in ("sent", "delivered", "failed", "receipt_failed", "no_token")]),
+        ("push_requests_total", "counter", "Requests to the Expo push service (incl. retries)",
+         [({}, push_stats["client"]["requests"])]),
+        ("push_retries_total", "counter", "Expo push requests retried after 429 / 5xx / connection errors",
+         [({}, push_stats["client"]["retries"])]),
+        ("push_tokens_cached", "gauge", "Push tokens held by the fan-out", [({}, push_stats["tokens"]["tokens"])]),
+        ("push_tokens_evicted_total", "counter", "Tokens dropped after DeviceNotRegistered",
+         [({}, push_stats["tokens_evicted"])]),
+        ("org_stats_entities", "gauge", "Reports / feedback requests tracked by the org aggregates",
+         [({"type": kind}, n) for kind, n in org_summary["entities"].items()]),
+        ("org_stats_events_total", "counter", "Report / feedback events applied to the org aggregates",
+         [({}, org_summary["events"])]),
+        ("report_store_rows", "gauge", "Rows in the report store by segment (base = memory-mapped generation)",
+         [({"segment": "base"}, store_stats["base_rows"]), ({"segment": "tail"}, store_stats["tail_rows"]),
+          ({"segment": "dead"}, store_stats["dead_rows"])]),
+        ("report_store_compactions_total", "counter", "Report store generations written",
+         [({}, store_stats["compactions"])]),
+        ("image_ingest_total", "counter", "Decoded uploads by derivative outcome (skipped_busy = writer queue full)",
+         [({"result": result}, ingest_stats[result]) for result in ("written", "already_stored", "skipped_busy", "failed")
+          if result in ingest_stats]),
+        ("image_ingest_bytes_total", "counter", "Upload bytes decoded / derivative bytes written",
+         [({"direction": "in"}, ingest_stats["bytes_in"]), ({"direction": "written"}, ingest_stats["bytes_written"])]
+         if ingest_stats else []),
+        ("early_exit_total", "counter", "/analyze outcomes (*_early = decided before the last image)",
+         [({"reason": reason}, n) for reason, n in sorted(savings["exits"].items())]),
+        ("early_exit_skipped_total", "counter", "Image inferences / urgency encodes skipped by early exit",
+         [({"unit": unit}, st["skipped"]) for unit, st in savings["units"].items()]),
+        ("early_exit_saved_seconds", "gauge", "Compute time saved by early exit (skipped units x average cost)",
+         [({"unit": unit}, (st["saved_ms_estimate"] or 0.0) / 1000.0) for unit, st in savings["units"].items()]),
+        ("urgency_tier_total", "counter", "Descriptions answered per urgency tier",
+         [({"tier": tier}, n) for tier, n in sorted(tier_stats["exits"].items())]),
+        ("urgency_fast_saved_seconds", "gauge", "Embedding time saved by the fast urgency tier (estimate)",
+         [({}, (tier_stats["units"].get("embedding", {}).get("saved_ms_estimate") or 0.0) / 1000.0)]),
+    ]
+    return Response(metrics.prometheus(gauges), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness probe: 200 once every required model is loaded (and warmed up), else 503"""
+    is_ready = models.is_ready()
+    return jsonify({
+        "ready": is_ready,
+        "uptime_seconds": models.uptime(),
+        "models": models.status()
+    }), 200 if is_ready else 503
+
+
 # ============================================
 # ENDPOINT 1: /predict (Combined - Original)
 # ============================================
 @app.route("/predict", methods=["POST"])
+@timed("predict")
+@admitted()
 def predict():
     """
     Original endpoint for combined prediction
     Expects: multipart form data with images + description
     """
+    unavailable = models_unavailable(IMAGE_MODELS + TEXT_MODELS)
+    if unavailable:
+        return unavailable
+
     try:
-        files = request.files.getlist("images")
-        description = request.form.get("description", "")
+        with metrics.stage("parse"):  # multipart upload is read + spooled here
+            files = request.files.getlist("images")
+            description = request.form.get("description", "")
 
         if not files:
             return jsonify({"error": "No images uploaded"}), 400
         if not description.strip():
             return jsonify({"error": "No description provided"}), 400
+        if len(files) > MAX_IMAGES_PER_REQUEST:
+            return jsonify({"error": f"At most {MAX_IMAGES_PER_REQUEST} images per request"}), 400
 
         print(f"🖼️ {len(files)} image(s) received | Description: {description[:60]}...")
 
         # IMAGE PREDICTION
-        image_preds, confs = [], []
-        for f in files:
-            img = Image.open(io.BytesIO(f.read())).convert("RGB").resize((224, 224))
-            arr = np.expand_dims(np.array(img) / 255.0, axis=0)
-            pred = img_model.predict(arr)[0]
-            conf = float(np.max(pred))
-            label_idx = np.argmax(pred)
-
-            if img_label_encoder:
-                label = img_label_encoder.inverse_transform([label_idx])[0]
-            else:
-                default_categories = [
-                    'broken_street_light', 'electric_issue', 'garbage_overflow',
-                    'gas_problem', 'open_manhole', 'potholes', 'traffic_lights', 'water_leakage'
-                ]
-                label = default_categories[label_idx] if label_idx < len(default_categories) else f"class_{label_idx}"
-
-            image_preds.append(label)
-            confs.append(conf)
-
-        # Check: multiple different problems
-        if len(set(image_preds)) > 1:
-            return jsonify({
-                "status": "denied",
-                "reason": "Multiple images show different problems."
-            }), 400
-
-        issue_type = image_preds[0]
-        avg_conf = np.mean(confs)
-
-        # Confidence check
-        if avg_conf < 0.8:
-            return jsonify({
-                "status": "resubmit",
-                "issue_type": issue_type,
-                "confidence": round(float(avg_conf), 2),
-                "message": "Confidence below 80%. Please re-upload clearer images."
-            }), 200
+        # Decode every photo into one (N, 224, 224, 3) stack -> single forward pass
+        preds = predict_image_streams(f.stream for f in files)
 
-        # URGENCY DETECTION
-        text_embedding = embedding_model.encode([description])
-        urgency_encoded = text_classifier.predict(text_embedding)
-        urgency = text_label_encoder.inverse_transform(urgency_encoded)[0]
+        # Denied (images disagree) / resubmit (low confidence) skip urgency detection
+        verdict = image_verdict(preds)
+        if verdict["status"] != "success":
+            metrics.set_outcome(verdict["status"])
+            return jsonify(verdict), 400 if verdict["status"] == "denied" else 200
 
-        urgency_conf = None
-        if hasattr(text_classifier, "predict_proba"):
-            proba = text_classifier.predict_proba(text_embedding)[0]
-            urgency_conf = float(np.max(proba))
+        # URGENCY DETECTION
+        urgencies, urgency_confs, tiers = predict_urgency_texts([description])
+        urgency, urgency_conf = urgencies[0], urgency_confs[0]
 
-        result = {
-            "status": "success",
-            "issue_type": issue_type,
-            "issue_confidence": round(float(avg_conf), 2),
-            "urgency": urgency,
-            "urgency_confidence": round(float(urgency_conf), 2) if urgency_conf else None
-        }
+        result = dict(
+            verdict,
+            urgency=urgency,
+            urgency_confidence=round(float(urgency_conf), 2) if urgency_conf else None,
+            urgency_tier=tiers[0]
+        )
 
         print("✅ Final result:", result)
         return jsonify(result), 200
 
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         print(f"❌ Error in /predict: {str(e)}")
         import traceback
@@ -164,13 +1296,20 @@ def predict():
 # ENDPOINT 2: /classify (Image Only - for FIXORA)
 # ============================================
 @app.route("/classify", methods=["POST"])
+@timed("classify")
+@admitted("interactive")
 def classify_image():
     """
     Image classification only (used by FIXORA app)
     Expects: JSON with base64 encoded image
     """
+    unavailable = models_unavailable(IMAGE_MODELS)
+    if unavailable:
+        return unavailable
+
     try:
-        data = request.get_json()
+        with metrics.stage("parse"):
+            data = request.get_json()
         image_base64 = data.get('image')
         
         if not image_base64:
@@ -179,23 +1318,15 @@ def classify_image():
         print(f"🖼️ /classify: Decoding base64 image...")
         
         # Decode base64 image
-        image_data = base64.b64decode(image_base64)
-        img = Image.open(io.BytesIO(image_data)).convert("RGB").resize((224, 224))
+        with metrics.stage("base64_decode"):
+            image_data = base64.b64decode(image_base64)
         
-        # Predict
-        arr = np.expand_dims(np.array(img) / 255.0, axis=0)
-        pred = img_model.predict(arr)[0]
+        # Predict (cached, or coalesced with other in-flight requests)
+        image_ids = []
+        pred = predict_image_streams([io.BytesIO(image_data)], image_ids=image_ids)[0]
         conf = float(np.max(pred))
-        label_idx = np.argmax(pred)
-        
-        if img_label_encoder:
-            label = img_label_encoder.inverse_transform([label_idx])[0]
-        else:
-            default_categories = [
-                'broken_street_light', 'electric_issue', 'garbage_overflow',
-                'gas_problem', 'open_manhole', 'potholes', 'traffic_lights', 'water_leakage'
-            ]
-            label = default_categories[label_idx] if label_idx < len(default_categories) else f"class_{label_idx}"
+        label_idx = int(np.argmax(pred))
+        label = decode_image_label(label_idx)
         
         print(f"✅ Classification: {label} ({conf:.2%})")
         
@@ -203,9 +1334,12 @@ def classify_image():
             'category': label,
             'predicted_category': label,
             'confidence': float(conf),
-            'accuracy': float(conf)
+            'accuracy': float(conf),
+            **image_refs(image_ids[0])
         }), 200
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         print(f"❌ Error in /classify: {str(e)}")
         import traceback
@@ -213,17 +1347,105 @@ def classify_image():
         return jsonify({'error': str(e)}), 500
 
 
+# ============================================
+# ENDPOINT 2b: /classify_batch (N images in one round-trip - for FIXORA)
+# ============================================
+@app.route("/classify_batch", methods=["POST"])
+@timed("classify_batch")
+@admitted("interactive")
+def classify_batch():
+    """
+    Classify several images in one request (used by FIXORA classifyMultipleImages)
+    Expects: multipart form data with "images" parts, or a raw
+             application/octet-stream / image/* body holding one image
+    Returns: per-image results + the same consistency verdict as /predict
+    """
+    unavailable = models_unavailable(IMAGE_MODELS)
+    if unavailable:
+        return unavailable
+
+    try:
+        streams = request_image_streams()
+
+        if not streams:
+            return jsonify({'error': 'No images provided'}), 400
+        if len(streams) > MAX_IMAGES_PER_REQUEST:
+            return jsonify({'error': f'At most {MAX_IMAGES_PER_REQUEST} images per request'}), 400
+
+        print(f"🖼️ /classify_batch: {len(streams)} image(s) received")
+
+        image_ids = []
+        preds = predict_image_streams((stream for _, stream in streams), image_ids=image_ids)
+
+        label_idx = np.argmax(preds, axis=1)
+        confs = np.max(preds, axis=1)
+        labels = decode_image_labels(label_idx)
+
+        results = [
+            {
+                'index': i,
+                'filename': name,
+                'category': label,
+                'predicted_category': label,
+                'confidence': float(conf),
+                'accuracy': float(conf),
+                **image_refs(image_id)
+            }
+            for i, ((name, _), label, conf, image_id) in enumerate(zip(streams, labels, confs, image_ids))
+        ]
+
+        same_category = bool(np.unique(label_idx).size == 1)
+        avg_conf = float(confs.mean())
+        meets_threshold = avg_conf >= MIN_AVG_CONFIDENCE
+
+        if not same_category:
+            status = "denied"
+        elif not meets_threshold:
+            status = "resubmit"
+        else:
+            status = "success"
+        metrics.set_outcome(status)
+
+        print(f"✅ /classify_batch: {status} | {labels} (avg {avg_conf:.2%})")
+
+        return jsonify({
+            'status': status,
+            'category': labels[0] if same_category else None,
+            'categories': sorted(set(labels)),
+            'same_category': same_category,
+            'average_confidence': avg_conf,
+            'meets_threshold': meets_threshold,
+            'image_count': len(results),
+            'results': results
+        }), 200
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"❌ Error in /classify_batch: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 # ============================================
 # ENDPOINT 3: /predict_urgency (Text Only - for FIXORA)
 # ============================================
 @app.route("/predict_urgency", methods=["POST"])
+@timed("predict_urgency")
+@admitted()
 def predict_urgency():
     """
     Urgency prediction from text only (used by FIXORA app)
     Expects: JSON with text description
     """
+    unavailable = models_unavailable(TEXT_MODELS)
+    if unavailable:
+        return unavailable
+
     try:
-        data = request.get_json()
+        with metrics.stage("parse"):
+            data = request.get_json()
         description = data.get('text', '')
         
         if not description.strip():
@@ -231,24 +1453,21 @@ def predict_urgency():
         
         print(f"🔮 Predicting urgency for: {description[:60]}...")
         
-        # Urgency prediction
-        text_embedding = embedding_model.encode([description])
-        urgency_encoded = text_classifier.predict(text_embedding)
-        urgency = text_label_encoder.inverse_transform(urgency_encoded)[0]
-        
-        urgency_conf = None
-        if hasattr(text_classifier, "predict_proba"):
-            proba = text_classifier.predict_proba(text_embedding)[0]
-            urgency_conf = float(np.max(proba))
+        # Urgency prediction (cached embedding or batched encode, one predict_proba)
+        urgencies, urgency_confs, tiers = predict_urgency_texts([description])
+        urgency, urgency_conf = urgencies[0], urgency_confs[0]
         
-        print(f"✅ Urgency: {urgency} (confidence: {urgency_conf:.2%})" if urgency_conf else f"✅ Urgency: {urgency}")
+        print(f"✅ Urgency: {urgency} (confidence: {urgency_conf:.2%}, {tiers[0]} tier)" if urgency_conf else f"✅ Urgency: {urgency}")
         
         return jsonify({
             'urgency': urgency,
             'predicted_urgency': urgency,
-            'confidence': urgency_conf
+            'confidence': urgency_conf,
+            'tier': tiers[0]
         }), 200
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         print(f"❌ Error in /predict_urgency: {str(e)}")
         import traceback
@@ -256,6 +1475,709 @@ def predict_urgency():
         return jsonify({'error': str(e)}), 500
 
 
+# ============================================
+# ENDPOINT 4: /predict_urgency_batch (bulk backfill)
+# ============================================
+@app.route("/predict_urgency_batch", methods=["POST"])
+@admitted("bulk")
+def predict_urgency_batch():
+    """
+    Bulk urgency scoring for backfilling historical reports
+    Expects: a JSON array (application/json) or NDJSON stream (application/x-ndjson)
+             of strings or {"id": ..., "text"/"description": ...} objects
+    Returns: NDJSON, one {"index", "id", "urgency", "confidence"} line per input,
+             streamed as each chunk is scored (memory stays flat)
+    Query:   ?chunk_size=N (default FIXORA_URGENCY_BULK_CHUNK_SIZE)
+    The stream stops with an {"error", "scored"} line at the request deadline, checked
+    per chunk: send X-Request-Timeout-Ms sized for the whole backfill.
+    """
+    unavailable = models_unavailable(TEXT_MODELS)
+    if unavailable:
+        return unavailable
+
+    try:
+        text_batcher.check_capacity(min(TEXT_BATCH_MAX_SIZE, TEXT_QUEUE_MAX_ROWS), "bulk")
+    except QueueFull as e:
+        return overloaded_response(e)
+
+    fmt = "json" if request.mimetype == "application/json" else "ndjson"
+    chunk_size = max(1, min(request.args.get("chunk_size", URGENCY_BULK_CHUNK_SIZE, type=int), 4096))
+    stream = request.stream
+    deadline, _ = admission()
+
+    print(f"📦 /predict_urgency_batch: streaming {fmt} input in chunks of {chunk_size}")
+
+    def until_deadline(records):
+        # checked as each chunk starts filling, so a chunk the fast tier answers alone stops too
+        for i, record in enumerate(records):
+            if i % chunk_size == 0:
+                check_deadline(deadline)
+            yield record
+
+    def generate():
+        scored = 0
+        try:
+            records = until_deadline(iter_records(stream, fmt))
+            for result in score_stream(records, BulkTextEncoder(deadline), models.get("text_classifier"),
+                                       models.get("text_labels"), chunk_size=chunk_size,
+                                       fast_model=fast_urgency_model()):
+                scored += 1
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            print(f"❌ Error in /predict_urgency_batch after {scored} record(s): {str(e)}")
+            yield json.dumps({"error": str(e), "scored": scored}) + "\n"
+            return
+        print(f"✅ /predict_urgency_batch: {scored} record(s) scored")
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# ============================================
+# ENDPOINT 5: /duplicates (nearby open reports - for FIXORA)
+# ============================================
+def org_events_denied():
+    """
+    403 unless the request carries FIXORA_ORG_EVENTS_API_KEY (open when none is configured).
+    Guards every route that changes reports: they feed the organization counters and the report store.
+    """
+    if not ORG_EVENTS_API_KEY:
+        return None
+    supplied = request.headers.get(ORG_EVENTS_API_KEY_HEADER, "")
+    if hmac.compare_digest(supplied.encode(), ORG_EVENTS_API_KEY.encode()):
+        return None
+    return jsonify({"error": "Invalid organization events key"}), 403
+
+
+@app.route("/duplicates/reports", methods=["POST"])
+def upsert_reports():
+    """
+    Keep the open-report index in sync (called by the app on create / status change)
+    Expects: JSON report {"id", "location": {"latitude", "longitude"} | "latitude"/"longitude",
+             "organizationId", "categorySlug", "status", "signatureId"} or {"reports": [...]}
+             for a bulk sync. A status outside pending / assigned / in_progress removes the
+             report; "signatureId" (from /duplicates/nearby) attaches its image/text embeddings.
+    Header:  X-Fixora-Org-Key when FIXORA_ORG_EVENTS_API_KEY is set
+    """
+    denied = org_events_denied()
+    if denied:
+        return denied
+    try:
+        data = request.get_json() or {}
+        items = data.get("reports") if isinstance(data.get("reports"), list) else [data]
+        if not items or not all(isinstance(item, dict) and item.get("id") for item in items):
+            return jsonify({'error': 'Each report needs an id'}), 400
+
+        indexed = removed = 0
+        for item in items:
+            org_stats.apply(dict(item, type="report"))
+            if index_report(item):
+                indexed += 1
+            else:
+                removed += 1
+
+        return jsonify({
+            'indexed': indexed,
+            'removed_or_ignored': removed,
+            'open_reports': len(report_index)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error in /duplicates/reports: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/duplicates/reports/<report_id>", methods=["DELETE"])
+def close_report(report_id):
+    """
+    Remove a deleted report everywhere: index, embeddings, report store and organization counters
+    (a status change is a POST). X-Fixora-Org-Key when FIXORA_ORG_EVENTS_API_KEY is set.
+    """
+    denied = org_events_denied()
+    if denied:
+        return denied
+    image_vectors.remove(report_id)
+    text_vectors.remove(report_id)
+    report_store.remove(report_id)  # else a restart restores its embeddings / location
+    org_stats.apply({"type": "report", "id": report_id, "deleted": True})
+    return jsonify({
+        'removed': report_index.remove(report_id),
+        'open_reports': len(report_index)
+    }), 200
+
+
+@app.route("/duplicates/nearby", methods=["GET", "POST"])
+@timed("duplicates_nearby")
+@admitted()
+def duplicates_nearby():
+    """
+    Closest open report within a radius (replaces the app's full Firestore scan)
+    Expects: JSON body, form fields or query args: latitude, longitude, radiusMeters (default 100),
+             organizationId, category / categorySlug, excludeId, limit (for "matches").
+             With photos (multipart "images" or JSON base64 "images") and/or a "description",
+             open reports within FIXORA_DUP_SEARCH_RADIUS_M are scored on geo distance, image and
+             text similarity together, and a "signatureId" is returned for /duplicates/reports.
+    Returns: the checkForDuplicates shape {isDuplicate, originalReport, distance, distanceText}
+             plus "matches": candidates best first (with "score" / "scores" when combined)
+    """
+    try:
+        params = request.get_json(silent=True) if request.is_json else None
+        params = params or request.form or request.args
+        try:
+            lat = float(params.get("latitude"))
+            lon = float(params.get("longitude"))
+            radius = float(params.get("radiusMeters") or DUPLICATE_RADIUS_M)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'latitude and longitude are required'}), 400
+        limit = max(1, min(int(params.get("limit") or 10), 100))
+        filters = dict(
+            organization_id=params.get("organizationId") or None,
+            category=params.get("categorySlug") or params.get("category") or None,
+            limit=limit,
+            exclude_id=params.get("excludeId") or None,
+        )
+
+        if request.files:
+            streams = [part.stream for part in request.files.getlist("images")]
+        else:
+            streams = [io.BytesIO(base64.b64decode(b64)) for b64 in (params.get("images") or []) if b64] \
+                if request.is_json else []
+        if len(streams) > MAX_IMAGES_PER_REQUEST:
+            return jsonify({'error': f'At most {MAX_IMAGES_PER_REQUEST} images per request'}), 400
+        image_vec, text_vec = report_signature(streams, params.get("description") or "")
+
+        signature_id = None
+        if image_vec is None and text_vec is None:
+            matches = [dict(record, distance=distance)
+                       for record, distance in report_index.within(lat, lon, radius, **filters)]
+            is_duplicate = bool(matches)
+        else:
+            signature_id = uuid.uuid4().hex
+            duplicate_signatures.put(signature_id, (image_vec, text_vec))
+            matches = duplicate_scorer.score(lat, lon, max(radius, DUP_SEARCH_RADIUS_M),
+                                             image_vec=image_vec, text_vec=text_vec, **filters)
+            is_duplicate = bool(matches) and matches[0]['score'] >= DUP_MIN_SCORE
+
+        closest = matches[0] if is_duplicate else None
+        return jsonify({
+            'isDuplicate': is_duplicate,
+            'originalReport': closest,
+            'distance': closest['distance'] if closest else None,
+            'distanceText': (('same location' if closest['distance'] < 10 else f"{round(closest['distance'])}m away")
+                             if closest else None),
+            'score': closest.get('score') if closest else None,
+            'signatureId': signature_id,
+            'signals': {'image': image_vec is not None, 'text': text_vec is not None},
+            'matches': matches
+        }), 200
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"❌ Error in /duplicates/nearby: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+# ============================================
+# ENDPOINT 6: /jobs (async /predict - for FIXORA)
+# ============================================
+@app.route("/jobs", methods=["POST"])
+@timed("jobs_submit")
+def submit_job():
+    """
+    Asynchronous /predict: queue the analysis and return a job id immediately
+    Expects: multipart form data with "images" parts and/or "description", optional
+             "callbackUrl" (or JSON {"description", "callbackUrl"} for a text-only job)
+    Returns: 202 {"jobId", "status", "statusUrl"}; the result (same shape as /predict)
+             comes from GET /jobs/<id> (?wait=N to long-poll) or is POSTed to callbackUrl
+    """
+    try:
+        if request.mimetype == "application/json":
+            data = request.get_json(silent=True) or {}
+            images, description, callback_url = [], data.get("description") or "", data.get("callbackUrl")
+        else:
+            with metrics.stage("parse"):
+                # Read now: the upload streams are gone once this request returns
+                images = [f.read() for f in request.files.getlist("images")]
+            description = request.form.get("description", "")
+            callback_url = request.form.get("callbackUrl")
+
+        description = description.strip()
+        if not images and not description:
+            return jsonify({'error': 'Provide images and/or a description'}), 400
+        if len(images) > MAX_IMAGES_PER_REQUEST:
+            return jsonify({'error': f'At most {MAX_IMAGES_PER_REQUEST} images per request'}), 400
+
+        unavailable = models_unavailable((IMAGE_MODELS if images else ()) + (TEXT_MODELS if description else ()))
+        if unavailable:
+            return unavailable
+
+        # The job runs on the model versions this request pinned
+        job = jobs.submit(models.bind(functools.partial(analyze_report, images, description)),
+                          callback_url=callback_url)
+        print(f"📥 Job {job.id}: {len(images)} image(s), {len(description)} char description")
+
+        response = jsonify(dict(job.to_dict(), statusUrl=f"/jobs/{job.id}"))
+        response.status_code = 202
+        response.headers["Location"] = f"/jobs/{job.id}"
+        return response
+
+    except QueueFull as e:
+        return overloaded_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error in /jobs: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Job status and, once finished, its result
+    Query: ?wait=N long-polls up to N seconds (max FIXORA_JOB_MAX_WAIT_S) for the job to
+           finish. Long-polls hold a request thread, so beyond FIXORA_JOB_MAX_LONG_POLLS
+           concurrent ones the status is returned at once with Retry-After: 1.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+
+    wait = min(max(0.0, request.args.get("wait", 0.0, type=float)), JOB_MAX_WAIT_S)
+    busy = False
+    if wait > 0 and not job.finished:
+        if long_polls.acquire(blocking=False):
+            try:
+                jobs.wait(job, wait)
+            finally:
+                long_polls.release()
+        else:
+            busy = True
+
+    response = jsonify(job.to_dict())
+    if busy or not job.finished:
+        response.headers["Retry-After"] = "1"
+    return response
+
+
+# ============================================
+# ENDPOINT 7: /analyze (Combined, early exit)
+# ============================================
+@app.route("/analyze", methods=["POST"])
+@timed("analyze")
+@admitted()
+def analyze():
+    """
+    Pipelined /predict: images are decoded and classified one at a time and the rest
+    are skipped once the verdict is settled (two disagree, or the average confidence
+    can no longer reach 80%); urgency is only predicted for submissions that pass
+    Expects: multipart form data with images + description (same as /predict)
+    Returns: /predict's result plus images_checked / images_total
+    """
+    unavailable = models_unavailable(IMAGE_MODELS + TEXT_MODELS)
+    if unavailable:
+        return unavailable
+
+    try:
+        with metrics.stage("parse"):
+            files = request.files.getlist("images")
+            description = request.form.get("description", "")
+
+        if not files:
+            return jsonify({"error": "No images uploaded"}), 400
+        if not description.strip():
+            return jsonify({"error": "No description provided"}), 400
+        if len(files) > MAX_IMAGES_PER_REQUEST:
+            return jsonify({"error": f"At most {MAX_IMAGES_PER_REQUEST} images per request"}), 400
+
+        # IMAGE PREDICTION, one photo at a time
+        rows, verdict = [], None
+        for f in files:
+            started = time.perf_counter()
+            rows.append(predict_image_streams([f.stream])[0])
+            early_exit.ran("image", time.perf_counter() - started)
+            verdict = early_image_verdict(np.stack(rows), len(files))
+            if verdict is not None:
+                break
+        verdict = verdict or image_verdict(np.stack(rows))
+        checked = {"images_checked": len(rows), "images_total": len(files)}
+
+        if verdict["status"] != "success":
+            early_exit.skipped("image", len(files) - len(rows))
+            early_exit.skipped("text")
+            early_exit.exit(verdict["status"] if len(rows) == len(files) else f"{verdict['status']}_early")
+            metrics.set_outcome(verdict["status"])
+            print(f"⏹️ {verdict['status']} after {len(rows)}/{len(files)} image(s), urgency skipped")
+            return jsonify(dict(verdict, **checked)), 400 if verdict["status"] == "denied" else 200
+
+        # URGENCY DETECTION (passing submissions only)
+        started = time.perf_counter()
+        urgencies, urgency_confs, tiers = predict_urgency_texts([description])
+        early_exit.ran("text", time.perf_counter() - started)
+        early_exit.exit("passed")
+
+        result = dict(
+            verdict,
+            urgency=urgencies[0],
+            urgency_confidence=round(float(urgency_confs[0]), 2) if urgency_confs[0] else None,
+            urgency_tier=tiers[0],
+            **checked
+        )
+        print("✅ Final result:", result)
+        return jsonify(result), 200
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"❌ Error in /analyze: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+# ============================================
+# ENDPOINT 8: /models (versions, hot swap, shadow traffic)
+# ============================================
+def admin_denied():
+    """403 unless the request carries FIXORA_ADMIN_TOKEN (always 403 when none is configured)"""
+    supplied = request.headers.get(ADMIN_TOKEN_HEADER, "")
+    if ADMIN_TOKEN and hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return None
+    error = "Invalid admin token" if ADMIN_TOKEN else "Set FIXORA_ADMIN_TOKEN to enable model reloads"
+    return jsonify({"error": error}), 403
+
+
+@app.route("/models", methods=["GET"])
+def model_versions():
+    """Served and shadowed version per family, the registry's versions and shadow comparisons"""
+    return jsonify(dict(
+        models.reload_status(),
+        registry=registry.describe() if registry is not None else None,
+        shadow=shadow.stats(),
+    ))
+
+
+@app.route("/models/reload", methods=["POST"])
+def reload_models():
+    """
+    Load a model version in the background and swap it in once warm (requests already
+    running finish on the old one). Header X-Fixora-Admin-Token: FIXORA_ADMIN_TOKEN.
+    Expects: JSON {"family": "image" | "text" (default: both),
+                   "version": registry version (default: CURRENT; none without a registry),
+                   "shadow": true to load it as the shadow candidate instead}
+    Returns: 202 {"started": {family: "swap" | "shadow" | null}} - follow progress on GET /models
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    data = request.get_json(silent=True) or {}
+    families = [data["family"]] if data.get("family") else ["image", "text"]
+    version, as_shadow = data.get("version"), bool(data.get("shadow"))
+    if any(family not in FLAT_FILES for family in families):
+        return jsonify({"error": f"Unknown family; expected one of {', '.join(FLAT_FILES)}"}), 400
+    if version and (registry is None or len(families) != 1):
+        return jsonify({"error": "A version needs FIXORA_MODEL_REGISTRY and a single family"}), 400
+
+    started = {}
+    try:
+        for family in families:
+            if version:
+                # Move the registry pointer too, or the watcher would switch straight back
+                if as_shadow:
+                    registry.set_candidate(family, version)
+                else:
+                    registry.promote(family, version)
+            source, candidate = resolve_models(family)
+            if as_shadow:
+                if candidate is None:
+                    return jsonify({"error": f"No {family} candidate to shadow"}), 400
+                started[family] = "shadow" if models.reload(family, candidate, shadow=True) else None
+            else:
+                started[family] = "swap" if models.reload(family, source) else None
+    except KeyError as e:
+        return jsonify({"error": str(e).strip("'\"")}), 404
+
+    busy = [family for family, action in started.items() if action is None]
+    response = jsonify({"started": started, "busy": busy, "status": models.reload_status()})
+    response.status_code = 409 if busy and len(busy) == len(started) else 202
+    return response
+
+
+@app.route("/models/candidate", methods=["DELETE"])
+def drop_candidate():
+    """Stop shadowing a family's candidate (?family=image|text); also clears the registry's CANDIDATE"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    family = request.args.get("family", "")
+    if family not in FLAT_FILES:
+        return jsonify({"error": f"Unknown family; expected one of {', '.join(FLAT_FILES)}"}), 400
+    if registry is not None:
+        registry.set_candidate(family, None)
+    return jsonify({"dropped": models.drop_candidate(family)}), 200
+
+
+# ============================================
+# ENDPOINT 9: /notifications (push fan-out - for FIXORA)
+# ============================================
+def push_denied():
+    """403 unless the request carries FIXORA_PUSH_API_KEY (open when none is configured)"""
+    if not PUSH_API_KEY:
+        return None
+    supplied = request.headers.get(PUSH_API_KEY_HEADER, "")
+    if hmac.compare_digest(supplied.encode(), PUSH_API_KEY.encode()):
+        return None
+    return jsonify({"error": "Invalid push API key"}), 403
+
+
+@app.route("/notifications/tokens", methods=["POST"])
+def register_push_tokens():
+    """
+    Cache users' Expo push tokens (called by the app when it registers for notifications)
+    Expects: JSON {"userId", "pushToken"} or {"tokens": {userId: pushToken, ...}};
+             a null pushToken forgets the user's token (e.g. on sign-out)
+    """
+    denied = push_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    tokens = data.get("tokens") if isinstance(data.get("tokens"), dict) else {data.get("userId"): data.get("pushToken")}
+    if not tokens or not all(tokens):
+        return jsonify({'error': 'Provide userId + pushToken or a tokens map'}), 400
+    try:
+        changed = sum(push_tokens.upsert(user_id, token) for user_id, token in tokens.items())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'updated': changed, 'cached_tokens': len(push_tokens)}), 200
+
+
+@app.route("/notifications/send", methods=["POST"])
+@timed("notifications_send")
+def send_notifications():
+    """
+    Send one notification to many users in batched Expo requests
+    Expects: JSON {"userIds": [...], "title", "body", "data": {...}, optional "tokens":
+             {userId: pushToken} for users whose token the app already has (they are cached)}
+    Returns: {"notificationId", "status", "counts", "recipients": [{"userId", "status",
+             "ticketId" | "error"}], "missingTokens"} once every ticket is in (or after
+             FIXORA_PUSH_MAX_WAIT_S with status "sending"); receipts follow on
+             GET /notifications/<id>. Users in missingTokens have no cached token: register
+             it or pass it in "tokens".
+    """
+    denied = push_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    user_ids = data.get("userIds")
+    if not isinstance(user_ids, list) or not user_ids or not all(user_ids):
+        return jsonify({'error': 'userIds must be a non-empty list'}), 400
+    if not data.get("title") and not data.get("body"):
+        return jsonify({'error': 'Provide a title and/or body'}), 400
+    if data.get("tokens") is not None and not isinstance(data["tokens"], dict):
+        return jsonify({'error': 'tokens must map userId -> pushToken'}), 400
+    if len(json.dumps(data.get("data") or {})) > 4096:
+        return jsonify({'error': 'data must be under 4 KiB (Expo payload limit)'}), 400
+
+    try:
+        record = push.send(user_ids, data.get("title"), data.get("body"), data=data.get("data"),
+                           tokens=data.get("tokens"), sound=data.get("sound", "default"),
+                           priority=data.get("priority", "high"))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    with metrics.stage("tickets"):
+        push.wait(record, PUSH_MAX_WAIT_S)
+
+    result = record.to_dict()
+    print(f"🔔 Notification {record.id}: {len(result['recipients'])} recipient(s) {result['counts']}")
+    response = jsonify(dict(result, statusUrl=f"/notifications/{record.id}"))
+    response.status_code = 200 if record.finished else 202
+    return response
+
+
+@app.route("/notifications/<notification_id>", methods=["GET"])
+def get_notification(notification_id):
+    """Per-recipient tickets and, once Expo has them, delivery receipts"""
+    denied = push_denied()
+    if denied:
+        return denied
+    record = push.get(notification_id)
+    if record is None:
+        return jsonify({'error': 'Unknown or expired notification'}), 404
+    return jsonify(record.to_dict())
+
+
+# ============================================
+# ENDPOINT 10: /orgs (dashboard aggregates - for FIXORA)
+# ============================================
+@app.route("/orgs/events", methods=["POST"])
+@timed("org_events")
+def org_events():
+    """
+    Apply report / feedback changes to the organization counters
+    Expects: JSON event {"type": "report" | "feedback", "id", ...changed fields} or
+             {"events": [...], "seed": {"organizationId", "type"}}. With "seed" the events
+             are the organization's full set of that type (a one-off Firestore scan): entities
+             missing from it are dropped and the organization is marked seeded for it; a seed
+             with none of that type is refused while the organization has some (400).
+             Reports synced through /duplicates/reports are counted too; report events also
+             update the report store.
+    Header:  X-Fixora-Org-Key when FIXORA_ORG_EVENTS_API_KEY is set
+    """
+    denied = org_events_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    events = data.get("events") if isinstance(data.get("events"), list) else [data]
+    seed = data.get("seed")
+    if seed is not None and not (isinstance(seed, dict) and seed.get("organizationId")
+                                 and seed.get("type") in ORG_STAT_KINDS):
+        return jsonify({'error': f'seed needs an organizationId and a type ({", ".join(ORG_STAT_KINDS)})'}), 400
+    if not all(isinstance(event, dict) for event in events):
+        return jsonify({'error': 'Each event must be an object'}), 400
+    try:
+        changed = org_stats.apply_many(events, seed=(seed["organizationId"], seed["type"]) if seed else None)
+        for event in events:
+            if event.get("type") == "report" and event.get("id"):
+                store_report(event)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'applied': len(events), 'changed': changed}), 200
+
+
+@app.route("/orgs/<org_id>/stats", methods=["GET"])
+@timed("org_stats")
+def get_org_stats(org_id):
+    """Report counts (by status / category / urgency) and feedback rates for one organization"""
+    return jsonify(org_stats.stats(org_id))
+
+
+# ============================================
+# ENDPOINT 11: /reports (columnar report store - for FIXORA)
+# ============================================
+def report_filters(args):
+    """ReportStore.select filters from query args; raises ValueError on a malformed value"""
+    def values(name):
+        raw = args.get(name)
+        return [v.strip() for v in raw.split(",") if v.strip()] if raw else None
+
+    status = values("status")
+    if status == ["open"]:
+        status = list(OPEN_STATUSES)
+    filters = {
+        "organization_id": values("organizationId"),
+        "category": values("categorySlug") or values("category"),
+        "status": status,
+        "urgency": values("urgency"),
+        "since": parse_time(args.get("since")) if args.get("since") else None,
+        "until": parse_time(args.get("until")) if args.get("until") else None,
+    }
+    for name in ("since", "until"):
+        if args.get(name) and filters[name] is None:
+            raise ValueError(f"{name} must be epoch seconds / ms or an ISO-8601 time")
+    if args.get("latitude") or args.get("longitude"):
+        filters["near"] = (float(args["latitude"]), float(args["longitude"]),
+                           float(args.get("radiusMeters", DUPLICATE_RADIUS_M)))
+    return filters
+
+
+@app.route("/reports/query", methods=["GET"])
+@timed("reports_query")
+def query_reports():
+    """
+    Reports matching vectorized filters over the report store (no Firestore read)
+    Query args: organizationId, category / categorySlug, status (comma list, or "open"),
+                urgency, since / until (created time), latitude + longitude + radiusMeters
+                (nearest first, with distance_m), limit (default 100)
+    """
+    try:
+        filters = report_filters(request.args)
+        limit = min(int(request.args.get("limit", 100)), REPORT_QUERY_MAX_LIMIT)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
+    started = time.perf_counter()
+    rows = report_store.select(**filters)
+    total = len(rows["id"])
+    reports = report_store.records({k: v[:limit] for k, v in rows.items()})
+    return jsonify({
+        'count': total,
+        'reports': reports,
+        'query_ms': round((time.perf_counter() - started) * 1000.0, 2),
+    })
+
+
+@app.route("/reports/counts", methods=["GET"])
+@timed("reports_counts")
+def count_reports():
+    """Counts by one of org / category / status / urgency (arg "by", default status), same filters as /reports/query"""
+    by = request.args.get("by", "status")
+    try:
+        counts = report_store.count_by(by, **report_filters(request.args))
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'by': by, 'counts': counts, 'total': sum(counts.values())})
+
+
+@app.route("/reports/compact", methods=["POST"])
+def compact_reports():
+    """Write a new report store generation now (needs FIXORA_ADMIN_TOKEN)"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    if not REPORT_STORE_DIR:
+        return jsonify({'error': 'Set FIXORA_REPORT_STORE_DIR to persist the report store'}), 409
+    compacted = report_store.compact()
+    return jsonify(dict(report_store.stats(), compacted=compacted)), 200 if compacted else 409
+
+
+# ============================================
+# ENDPOINT 12: /images (upload limits + stored thumbnails / previews - for FIXORA)
+# ============================================
+@app.route("/images/limits", methods=["GET"])
+def image_upload_limits():
+    """Largest useful upload (long edge in px) and the derivative sizes; also sent as X-Fixora-Max-Upload-Edge"""
+    return jsonify(dict(image_limits, stored=image_ingest is not None))
+
+
+@app.route("/images/<image_id>", methods=["GET"])
+def image_metadata(image_id):
+    """Source size and derivative sizes of an uploaded image (image_id from /classify)"""
+    meta = image_ingest.describe(image_id) if image_ingest else None
+    if meta is None:
+        return jsonify({'error': 'Unknown image'}), 404
+    return jsonify(dict(meta, **{f"{variant}_url": f"/images/{image_id}/{variant}" for variant in IMAGE_VARIANTS}))
+
+
+@app.route("/images/<image_id>/<variant>", methods=["GET"])
+def image_derivative(image_id, variant):
+    """Thumbnail / preview bytes; content-addressed, so cacheable forever (202 + Retry-After while being written)"""
+    if image_ingest is None:
+        return jsonify({'error': 'Set FIXORA_IMAGE_STORE_DIR to keep thumbnails / previews'}), 404
+    if variant not in IMAGE_VARIANTS:
+        return jsonify({'error': f'variant must be one of {", ".join(IMAGE_VARIANTS)}'}), 400
+    path = image_ingest.path(image_id, variant)
+    if path is None and image_ingest.pending(image_id):
+        image_ingest.wait(image_id, timeout=2)  # written right after the request that uploaded it
+        path = image_ingest.path(image_id, variant)
+        if path is None and image_ingest.pending(image_id):
+            response = jsonify({'error': 'Image derivatives are still being written', 'retry_after': 1})
+            response.status_code = 202
+            response.headers["Retry-After"] = "1"
+            return response
+    if path is None:
+        return jsonify({'error': 'Unknown image'}), 404
+    return send_file(path, mimetype=f"image/{image_ingest.format}", max_age=365 * 24 * 3600, conditional=True)
+
+
 # -----------------------
 # START NGROK TUNNEL
 # -----------------------
@@ -266,13 +2188,33 @@ if __name__ == "__main__":
     print("=" * 70)
     print("📍 Available endpoints:")
     print("   - GET  /                   (health check)")
-    print("   - GET  /health             (detailed health)")
+    print("   - GET  /health             (detailed health + batching/cache stats)")
+    print("   - GET  /ready              (readiness: per-model state + load time)")
+    print("   - GET  /metrics            (Prometheus: latency per endpoint / stage, outcomes)")
     print("   - POST /predict            (combined: images + text → issue + urgency)")
     print("   - POST /classify           (image only → category)")
+    print("   - POST /classify_batch     (N images, multipart/raw → categories + verdict)")
     print("   - POST /predict_urgency    (text only → urgency)")
+    print("   - POST /predict_urgency_batch (JSON array / NDJSON → streamed NDJSON urgencies)")
+    print("   - POST /duplicates/reports (index / update / close open reports)")
+    print("   - DEL  /duplicates/reports/<id> (remove a deleted report: index, store, org counters)")
+    print("   - POST /duplicates/nearby  (closest open report; + photos/description → geo+image+text score)")
+    print("   - POST /jobs               (async /predict → job id; result via GET /jobs/<id>?wait=N or webhook)")
+    print("   - POST /analyze            (/predict with early exit: stops at the first failing image)")
+    print("   - GET  /models             (model versions served / shadowed, shadow comparisons)")
+    print("   - POST /models/reload      (hot-swap a model version; needs FIXORA_ADMIN_TOKEN)")
+    print("   - POST /notifications/tokens (cache users' Expo push tokens)")
+    print("   - POST /notifications/send (one notification → many users, batched Expo sends)")
+    print("   - GET  /notifications/<id> (per-recipient tickets + delivery receipts)")
+    print("   - POST /orgs/events        (report / feedback changes → organization counters; FIXORA_ORG_EVENTS_API_KEY)")
+    print("   - GET  /orgs/<id>/stats    (dashboard counts + feedback rates, no history scan)")
+    print("   - GET  /reports/query      (filter reports by org / category / status / urgency / time / area)")
+    print("   - GET  /reports/counts     (report counts by org / category / status / urgency)")
+    print("   - GET  /images/limits      (max useful upload resolution; clients downscale to it)")
+    print("   - GET  /images/<id>/<variant> (thumb / preview stored from the upload's decode)")
     print("=" * 70)
     print("🎯 For FIXORA app, use:")
     print(f"   - Image Classification: {public_url}/classify")
     print(f"   - Urgency Prediction:   {public_url}/predict_urgency")
     print("=" * 70)
-    app.run(port=5000)
+    app.run(port=5000, threaded=True)
@@ -0,0 +1,180 @@
+"""
+Pluggable inference backends for the Fixora image classifier.
+
+All backends expose the same call: `predict(batch)` with an (N, 224, 224, 3)
+float32 batch in [0, 1], returning (N, num_classes) softmax rows. Backends with
+`supports_embeddings` also have `embed(batch)`, returning the penultimate-layer
+features (the input of the final classification layer) used for visual
+duplicate matching; the TFLite / ONNX exports only carry the softmax output.
+
+  keras   the original .keras model, called through a traced tf.function instead
+          of Model.predict, which has heavy per-call overhead for small batches
+  tflite  TensorFlow Lite (float32, dynamic-range or full-int8 quantized);
+          the .tflite file is memory-mapped, so pre-fork workers share it
+  onnx    ONNX Runtime on CPU (float32 or dynamically quantized)
+
+Exports are produced once from the .keras model with `fixora_export.py`.
+Frameworks are imported lazily so only the selected one is loaded.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+
+BACKENDS = ("keras", "tflite", "onnx")
+EXTENSIONS = {"keras": ".keras", "tflite": ".tflite", "onnx": ".onnx"}
+
+
+class KerasBackend:
+    name = "keras"
+    supports_embeddings = True
+
+    def __init__(self, path, **_):
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+        self.path = path
+        self.model = load_model(path)
+        self._forward = tf.function(lambda x: self.model(x, training=False), reduce_retracing=True)
+        self._embed = None
+        self._embed_lock = threading.Lock()
+
+    def predict(self, batch):
+        return np.asarray(self._forward(np.asarray(batch, dtype=np.float32)))
+
+    def embed(self, batch):
+        if self._embed is None:
+            with self._embed_lock:
+                if self._embed is None:
+                    import tensorflow as tf
+                    features = tf.keras.Model(self.model.inputs[0], self.model.layers[-1].input)
+                    self._embed = tf.function(lambda x: features(x, training=False), reduce_retracing=True)
+        return np.asarray(self._embed(np.asarray(batch, dtype=np.float32)))
+
+
+class TFLiteBackend:
+    name = "tflite"
+    supports_embeddings = False
+
+    def __init__(self, path, num_threads=None, **_):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                from ai_edge_litert.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+        self.path = path
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+        self._lock = threading.Lock()  # an Interpreter must not be invoked concurrently
+
+    def _resize(self, n):
+        if n != self._batch_size:
+            shape = list(self.input["shape"])
+            shape[0] = n
+            self.interpreter.resize_tensor_input(self.input["index"], shape)
+            self.interpreter.allocate_tensors()
+            self.input = self.interpreter.get_input_details()[0]
+            self.output = self.interpreter.get_output_details()[0]
+            self._batch_size = n
+
+    def predict(self, batch):
+        with self._lock:
+            self._resize(len(batch))
+            x = np.asarray(batch, dtype=np.float32)
+            if self.input["dtype"] != np.float32:
+                # Full-int8 model: quantize the input with its scale / zero point
+                scale, zero_point = self.input["quantization"]
+                info = np.iinfo(self.input["dtype"])
+                x = np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(self.input["dtype"])
+            self.interpreter.set_tensor(self.input["index"], x)
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self.output["index"])
+            if self.output["dtype"] != np.float32:
+                scale, zero_point = self.output["quantization"]
+                out = (out.astype(np.float32) - zero_point) * scale
+            return np.array(out, dtype=np.float32)
+
+
+class ONNXBackend:
+    name = "onnx"
+    supports_embeddings = False
+
+    def __init__(self, path, num_threads=None, **_):
+        import onnxruntime as ort
+        self.path = path
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = int(num_threads)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+_BACKEND_CLASSES = {"keras": KerasBackend, "tflite": TFLiteBackend, "onnx": ONNXBackend}
+
+
+def artifact_path(keras_path, backend, variant=None):
+    """Default export location next to the .keras model, e.g. model.int8.tflite"""
+    stem = os.path.splitext(keras_path)[0]
+    if backend == "keras":
+        return keras_path
+    suffix = f".{variant}" if variant and variant != "float" else ""
+    return f"{stem}{suffix}{EXTENSIONS[backend]}"
+
+
+def load_backend(backend, path, num_threads=None):
+    if backend not in _BACKEND_CLASSES:
+        raise ValueError(f"Unknown image backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+    return _BACKEND_CLASSES[backend](path, num_threads=num_threads)
+
+
+# -----------------------
+# EXPORT
+# -----------------------
+def export_tflite(keras_model, out_path, variant="float", representative_batches=None):
+    """
+    variant: "float"   - float32
+             "dynamic" - dynamic-range quantization (int8 weights, float activations)
+             "int8"    - full integer quantization; needs representative_batches
+                         (an iterable of (1, 224, 224, 3) float32 arrays) for calibration
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if variant in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "int8":
+        if representative_batches is None:
+            raise ValueError("int8 export needs calibration images (--calibration-dir)")
+        batches = list(representative_batches)
+        converter.representative_dataset = lambda: ([b] for b in batches)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+    return out_path
+
+
+def export_onnx(keras_model, out_path, variant="float", opset=13):
+    """variant: "float" or "dynamic" (onnxruntime dynamic int8 weight quantization)"""
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="input"),)
+    float_path = out_path if variant == "float" else out_path + ".float.tmp"
+    tf2onnx.convert.from_keras(keras_model, input_signature=spec, opset=opset, output_path=float_path)
+    if variant == "dynamic":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(float_path, out_path, weight_type=QuantType.QInt8)
+        os.remove(float_path)
+    return out_path
@@ -0,0 +1,103 @@
+"""
+Offline urgency backfill for historical Fixora reports.
+
+Scores a JSON array or NDJSON file of descriptions with the same urgency models
+as COLAB_FINAL_SERVER.py, without starting the server or loading the image model.
+Input elements are strings or {"id": ..., "text"/"description": ...} objects
+(e.g. a Firestore export of reports); output is NDJSON, one line per input:
+
+    {"index": 0, "id": "<reportId>", "urgency": "High", "confidence": 0.93}
+
+With --fast-model (a fixora_distill.py artifact) descriptions the lexical tier is
+confident about skip the SentenceTransformer, and each line gets a "tier".
+
+Usage:
+    python fixora_backfill.py reports.ndjson -o urgencies.ndjson
+    python fixora_backfill.py reports.json --format json --chunk-size 1024
+    python fixora_backfill.py reports.ndjson --fast-model urgency_fast.joblib -o urgencies.ndjson
+    cat reports.ndjson | python fixora_backfill.py - > urgencies.ndjson
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import joblib
+from sentence_transformers import SentenceTransformer
+
+from fixora_urgency import iter_records, score_stream
+
+
+# Same artifacts as COLAB_FINAL_SERVER.py
+TEXT_CLASSIFIER_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/classifier.joblib"
+TEXT_LABEL_ENCODER_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/label_encoder.joblib"
+EMBEDDING_MODEL_NAME_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/embedding_model_name.txt"
+
+
+def detect_format(path, fmt):
+    if fmt != "auto":
+        return fmt
+    return "json" if path.lower().endswith(".json") else "ndjson"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="input file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output NDJSON file (default: stdout)")
+    parser.add_argument("--format", choices=["auto", "json", "ndjson"], default="auto")
+    parser.add_argument("--chunk-size", type=int, default=512, help="descriptions encoded per chunk")
+    parser.add_argument("--encode-batch-size", type=int, default=64, help="SentenceTransformer batch size")
+    parser.add_argument("--classifier", default=TEXT_CLASSIFIER_PATH)
+    parser.add_argument("--label-encoder", default=TEXT_LABEL_ENCODER_PATH)
+    parser.add_argument("--embedding-model-name", default=EMBEDDING_MODEL_NAME_PATH,
+                        help="file holding the SentenceTransformer model name")
+    parser.add_argument("--fast-model", help="fast lexical tier (fixora_distill.py train); default: full path only")
+    parser.add_argument("--fast-min-confidence", type=float,
+                        help="override the threshold stored with --fast-model")
+    args = parser.parse_args()
+
+    print("🚀 Loading urgency models...", file=sys.stderr)
+    text_classifier = joblib.load(args.classifier)
+    text_label_encoder = joblib.load(args.label_encoder)
+    with open(args.embedding_model_name, "r") as f:
+        embedding_model = SentenceTransformer(f.read().strip())
+    fast_model = None
+    if args.fast_model:
+        from fixora_fast_urgency import FastUrgencyModel
+        fast_model = FastUrgencyModel.load(args.fast_model)
+        if args.fast_min_confidence is not None:
+            fast_model.min_confidence = args.fast_min_confidence
+        print(f"⚡ Fast tier: {args.fast_model} (min confidence {fast_model.min_confidence})", file=sys.stderr)
+    print("✅ Urgency models ready.", file=sys.stderr)
+
+    src = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    fmt = detect_format(args.input, args.format)
+
+    started = time.perf_counter()
+    scored = errors = 0
+    try:
+        results = score_stream(
+            iter_records(src, fmt), embedding_model, text_classifier, text_label_encoder,
+            chunk_size=args.chunk_size, encode_batch_size=args.encode_batch_size, fast_model=fast_model,
+        )
+        for result in results:
+            dst.write(json.dumps(result) + "\n")
+            scored += 1
+            errors += "error" in result
+            if scored % args.chunk_size == 0:
+                rate = scored / (time.perf_counter() - started)
+                print(f"📦 {scored} scored ({rate:.0f}/s)", file=sys.stderr)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Done: {scored} record(s), {errors} without description, {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Request-coalescing micro-batcher for the Fixora inference server.
+
+Concurrent callers submit single model inputs (or a small stacked group, e.g.
+all photos of one report); a background worker collects them for up to
+`max_wait_ms` (or until `max_batch_size` rows are waiting), runs ONE batched
+forward pass and hands every caller its own output rows. A group is never
+split across forward passes.
+
+Inputs are anything NumPy can stack: image tensors, or strings for a text encoder.
+Each returned Future carries `queue_seconds` (time waiting for the batch),
+`run_seconds` (the forward pass it shared) and `batch_rows` (rows in that pass)
+for per-request latency breakdowns.
+
+Inputs submitted with a `model` run on that model (`predict_fn(stack, model)`),
+and inputs for different models never share a forward pass: after a hot swap,
+requests admitted before it finish on the model they started with.
+
+Admission control:
+- the queue is bounded (`max_queue_rows`); a submit that doesn't fit raises
+  QueueFull with a Retry-After estimate instead of growing the backlog, and
+  "bulk" work may only fill `bulk_share` of it
+- a submit with a deadline is also refused up front when the rows queued ahead
+  of it (at the recent forward-pass rate) can't be done before that deadline
+- inputs are served by priority ("interactive" before "normal" before "bulk"),
+  FIFO within a priority
+- an input with a deadline that passes while it is queued is dropped before
+  the forward pass (DeadlineExceeded), and `wait()` withdraws it from the queue
+  when the caller stops waiting, so queued rows that are views into a caller's
+  reusable buffer are never read after the caller has released it
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+
+PRIORITIES = ("interactive", "normal", "bulk")  # served in this order
+
+
+class Overloaded(Exception):
+    """Base for inputs the batcher refuses or drops; `retry_after` is in seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(Overloaded):
+    pass
+
+
+class DeadlineExceeded(Overloaded):
+    pass
+
+
+class _Pending:
+    __slots__ = ("rows", "single", "future", "enqueued_at", "deadline", "priority", "model")
+
+    def __init__(self, rows, single, deadline=None, priority="normal", model=None):
+        self.rows = rows
+        self.model = model
+        self.single = single
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.deadline = deadline
+        self.priority = PRIORITIES.index(priority)
+
+
+class _PriorityQueue:
+    """One FIFO per priority, bounded in rows; expired inputs are failed as they surface"""
+
+    def __init__(self, max_rows, bulk_share):
+        self.max_rows = max_rows
+        self.bulk_rows = max(1, int(max_rows * bulk_share)) if max_rows else None
+        self.rows = 0
+        self.expired = 0
+        self._fifos = [deque() for _ in PRIORITIES]
+        self._cond = threading.Condition()
+
+    def put(self, pending, front=False):
+        """False if the input would overflow the queue (or the bulk share of it)"""
+        n = len(pending.rows)
+        with self._cond:
+            if not front and self.max_rows:
+                limit = self.bulk_rows if pending.priority == len(PRIORITIES) - 1 else self.max_rows
+                # An oversized group is still admitted into an empty queue, it just runs alone
+                if self.rows and self.rows + n > limit:
+                    return False
+            fifo = self._fifos[pending.priority]
+            fifo.appendleft(pending) if front else fifo.append(pending)
+            self.rows += n
+            self._cond.notify()
+        return True
+
+    def get(self, timeout=None):
+        """Next live input by priority, or None after `timeout` seconds (None = block)"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while True:
+                for fifo in self._fifos:
+                    while fifo:
+                        pending = fifo.popleft()
+                        self.rows -= len(pending.rows)
+                        if self._expired(pending):
+                            continue
+                        return pending
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def _expired(self, pending):
+        if pending.future.cancelled():
+            return True
+        if pending.deadline is not None and time.perf_counter() >= pending.deadline:
+            pending.rows = None
+            self.expired += 1
+            if pending.future.set_running_or_notify_cancel():
+                pending.future.set_exception(DeadlineExceeded("Deadline passed while queued"))
+            return True
+        return False
+
+    def withdraw(self, future):
+        """Remove a still-queued input and cancel its future; False once it has been taken"""
+        with self._cond:
+            for fifo in self._fifos:
+                for pending in fifo:
+                    if pending.future is future:
+                        fifo.remove(pending)
+                        self.rows -= len(pending.rows)
+                        pending.rows = None
+                        return future.cancel()
+        return False
+
+    def depth(self):
+        with self._cond:
+            return self.rows, [len(f) for f in self._fifos]
+
+    def rows_ahead(self, priority):
+        """Queued rows that would run before a new input of this priority"""
+        with self._cond:
+            return sum(len(p.rows) for fifo in self._fifos[:priority + 1] for p in fifo)
+
+
+class MicroBatcher:
+    """
+    Collects single inputs from many threads into batched model calls.
+
+    predict_fn:      callable taking an (N, ...) array (and the inputs' `model`, when
+                     submitted with one) and returning N output rows
+    max_batch_size:  upper bound on rows per forward pass (a larger group still
+                     runs, alone)
+    max_wait_ms:     how long the first queued input may wait for company
+    max_queue_rows:  queued rows beyond which submits raise QueueFull (0 = unbounded)
+    bulk_share:      fraction of max_queue_rows "bulk" inputs may occupy, so
+                     interactive traffic always finds room
+    thread_init:     called once in the worker thread before its first batch
+                     (e.g. pinning it to the model's cores)
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10, name="batcher",
+                 max_queue_rows=0, bulk_share=0.5, thread_init=None):
+        self.predict_fn = predict_fn
+        self.thread_init = thread_init
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.max_queue_rows = max(0, int(max_queue_rows))
+        self.bulk_share = min(1.0, max(0.0, float(bulk_share)))
+
+        self._queue = None
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = {}
+        self._waits_ms = deque(maxlen=2048)
+        self._wait_total_ms = 0.0
+        self._items = 0
+        self._batches = 0
+        self._rejected = 0
+        self._withdrawn = 0
+        self._row_seconds = None  # EWMA of forward-pass seconds per row, for Retry-After
+
+        self._ensure_worker()
+
+    # -----------------------
+    # PUBLIC API
+    # -----------------------
+    def submit(self, array, deadline=None, priority="normal", model=None):
+        """Queue one input (without batch axis). Returns a Future for its output row."""
+        return self._submit(_Pending(np.expand_dims(array, axis=0), True, deadline, priority, model))
+
+    def submit_batch(self, stack, deadline=None, priority="normal", model=None):
+        """
+        Queue an (N, ...) stack that must run in the same forward pass.
+        Returns a Future for the (N, ...) output rows.
+
+        deadline:  time.perf_counter() value after which the stack is dropped
+                   instead of run (DeadlineExceeded)
+        priority:  "interactive" | "normal" | "bulk"
+        model:     run on this model (passed to predict_fn) instead of predict_fn's own
+        Raises QueueFull if the queue has no room for it.
+        """
+        return self._submit(_Pending(np.asarray(stack), False, deadline, priority, model))
+
+    def _submit(self, pending):
+        if pending.deadline is not None and time.perf_counter() >= pending.deadline:
+            raise DeadlineExceeded("Deadline passed before inference")
+        self._ensure_worker()
+        self._check_eta(len(pending.rows), pending.priority, pending.deadline)
+        if not self._queue.put(pending):
+            self._reject("queue is full")
+        return pending.future
+
+    def wait(self, future, deadline=None):
+        """
+        Result of a submitted future, waiting at most until `deadline`. A still-queued
+        input is then withdrawn and DeadlineExceeded raised; one already in a forward
+        pass is waited for, because that pass may still be reading its rows.
+        """
+        timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            if self._queue.withdraw(future):
+                with self._stats_lock:
+                    self._withdrawn += 1
+                raise DeadlineExceeded("Deadline passed while queued")
+            return future.result()
+
+    def predict(self, array, timeout=None):
+        """Blocking helper: submit one input and wait for its output row."""
+        return self.submit(array).result(timeout=timeout)
+
+    def check_capacity(self, rows, priority="normal", deadline=None):
+        """Raise QueueFull early (e.g. before decoding a request) if `rows` wouldn't be admitted now"""
+        self._check_eta(rows, PRIORITIES.index(priority), deadline)
+        if not self.max_queue_rows:
+            return
+        queued = self._queue.depth()[0]
+        limit = self._queue.bulk_rows if priority == PRIORITIES[-1] else self.max_queue_rows
+        if queued and queued + rows > limit:
+            self._reject("queue is full")
+
+    def _check_eta(self, rows, priority, deadline):
+        """QueueFull if the backlog ahead plus these rows can't run before `deadline`"""
+        if deadline is None or not self._row_seconds:
+            return
+        eta = (self._queue.rows_ahead(priority) + rows) * self._row_seconds + self.max_wait
+        if time.perf_counter() + eta > deadline:
+            self._reject(f"backlog needs ~{eta:.1f}s, more than the request's deadline allows")
+
+    def _reject(self, reason):
+        with self._stats_lock:
+            self._rejected += 1
+        raise QueueFull(f"{self.name} {reason}", retry_after=self.retry_after())
+
+    def retry_after(self):
+        """Whole seconds until the current backlog has drained, at the recent rate (1-30)"""
+        queued = self._queue.depth()[0] if self._queue is not None else 0
+        per_row = self._row_seconds or 0.0
+        return int(min(30, max(1, math.ceil(queued * per_row))))
+
+    def stats(self):
+        """Batch-size histogram and queue wait times, for tuning the window."""
+        with self._stats_lock:
+            waits = sorted(self._waits_ms)
+            histogram = {str(k): v for k, v in sorted(self._batch_sizes.items())}
+            batches, items, wait_total = self._batches, self._items, self._wait_total_ms
+
+        def pct(p):
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(p / 100.0 * len(waits)))], 3)
+
+        queued_rows, queued_by_priority = self._queue.depth() if self._queue is not None else (0, [])
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000.0, 3),
+            "max_queue_rows": self.max_queue_rows or None,
+            "queued_rows": queued_rows,
+            "queued_inputs": dict(zip(PRIORITIES, queued_by_priority)),
+            "rejected": self._rejected,
+            "expired": (self._queue.expired if self._queue is not None else 0) + self._withdrawn,
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": round(items / batches, 3) if batches else None,
+            "batch_size_histogram": histogram,
+            "queue_wait_ms": {
+                "avg": round(wait_total / items, 3) if items else None,
+                "p50": pct(50),
+                "p95": pct(95),
+                "p99": pct(99),
+                "max": round(waits[-1], 3) if waits else None,
+            },
+        }
+
+    # -----------------------
+    # WORKER
+    # -----------------------
+    def _ensure_worker(self):
+        """(Re)start the worker thread; threads don't survive fork, so pre-fork workers get their own"""
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._queue = _PriorityQueue(self.max_queue_rows, self.bulk_share)
+            self._worker = threading.Thread(target=self._run, args=(self._queue,), name=f"{self.name}-worker", daemon=True)
+            self._worker.start()
+            self._worker_pid = os.getpid()
+
+    def _collect(self, queue):
+        first = queue.get()
+        first.future.set_running_or_notify_cancel()
+        batch = [first]
+        rows = len(first.rows)
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            pending = queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            if pending is None:
+                break
+            if rows + len(pending.rows) > self.max_batch_size or pending.model is not first.model:
+                # Keep groups whole (and one model per pass): this one opens the next forward pass
+                queue.put(pending, front=True)
+                break
+            pending.future.set_running_or_notify_cancel()
+            batch.append(pending)
+            rows += len(pending.rows)
+        return batch, rows
+
+    def _record(self, batch, rows, started):
+        with self._stats_lock:
+            self._batch_sizes[rows] = self._batch_sizes.get(rows, 0) + 1
+            self._batches += 1
+            self._items += rows
+            for p in batch:
+                wait_ms = (started - p.enqueued_at) * 1000.0
+                self._waits_ms.append(wait_ms)
+                self._wait_total_ms += wait_ms * len(p.rows)
+
+    def _run(self, queue):
+        if self.thread_init is not None:
+            try:
+                self.thread_init()
+            except Exception as e:
+                print(f"⚠️ {self.name}: worker init failed: {e}")
+        while True:
+            batch, rows = self._collect(queue)
+            started = time.perf_counter()
+            self._record(batch, rows, started)
+            try:
+                if len(batch) == 1:
+                    stack = batch[0].rows
+                else:
+                    stack = np.concatenate([p.rows for p in batch])
+                model = batch[0].model
+                outputs = self.predict_fn(stack) if model is None else self.predict_fn(stack, model)
+                run_seconds = time.perf_counter() - started
+                per_row = run_seconds / rows
+                self._row_seconds = per_row if self._row_seconds is None else 0.8 * self._row_seconds + 0.2 * per_row
+                offset = 0
+                for p in batch:
+                    p.future.queue_seconds = started - p.enqueued_at
+                    p.future.run_seconds = run_seconds
+                    p.future.batch_rows = rows
+                    n = len(p.rows)
+                    out = outputs[offset:offset + n]
+                    p.future.set_result(out[0] if p.single else out)
+                    offset += n
+            except Exception as e:
+                for p in batch:
+                    if not p.future.done():
+                        p.future.set_exception(e)
+
+
+# -----------------------
+# ADMISSION
+# -----------------------
+class InflightLimiter:
+    """
+    Caps requests admitted concurrently, so excess load is refused at the door in
+    microseconds instead of queueing for request threads (where deadlines can't see
+    it) and competing with admitted requests for the CPU. "bulk" requests may hold at
+    most `bulk_share` of the slots; the rest are kept free for interactive traffic.
+    """
+
+    def __init__(self, limit, bulk_share=0.5):
+        self.limit = max(0, int(limit))
+        self.bulk_limit = max(1, int(self.limit * bulk_share)) if self.limit else 0
+        self.inflight = 0
+        self.bulk_inflight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, priority="normal"):
+        bulk = priority == PRIORITIES[-1]
+        with self._lock:
+            if self.limit and (self.inflight >= self.limit or (bulk and self.bulk_inflight >= self.bulk_limit)):
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            self.bulk_inflight += bulk
+            return True
+
+    def release(self, priority="normal"):
+        with self._lock:
+            self.inflight -= 1
+            self.bulk_inflight -= priority == PRIORITIES[-1]
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit or None, "bulk_limit": self.bulk_limit or None,
+                    "inflight": self.inflight, "rejected": self.rejected}
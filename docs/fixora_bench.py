@@ -0,0 +1,610 @@
+"""
+Reproducible benchmark suite for the Fixora inference server (COLAB_FINAL_SERVER.py).
+
+  standin  build local stand-in artifacts with the production shapes, so nothing
+           from Google Drive is needed:
+             - MobileNetV2 (random weights), 224x224x3 -> 8-way softmax, saved as .keras
+             - a MiniLM-L6-shaped SentenceTransformer (6 layers, 384-d, random
+               weights, word-level vocab built from the text corpus)
+             - a LogisticRegression urgency classifier + label encoders (joblib)
+  micro    microbenchmarks: JPEG decode, preprocessing, image inference (batch 1/8/16),
+           text encoding (batch 1/32) and the urgency classifier
+  load     start the server on the stand-ins (fixora_serve.py --mode threads), then
+           closed- and open-loop load on /classify, /predict and /predict_urgency
+           with fixora_loadtest.py: throughput, tail latency and server peak RSS
+  scaling  the load run once per serving configuration (--mode threads, --mode prefork
+           --workers 2/4/...), written as SCALING.md: req/s and speedup over threads
+  all      standin (if missing) + micro + load, written as JSON + Markdown
+  compare  diff a new run against the committed baseline and flag regressions
+
+Random weights cost exactly as much compute as trained ones, so latency and
+memory are representative; predictions are not (accuracy is out of scope here).
+Caches are disabled during load runs unless --with-cache, so every request
+pays for inference.
+
+Usage:
+    python fixora_bench.py all --out benchmarks/                 # the committed baseline
+    python fixora_bench.py micro --json micro.json
+    python fixora_bench.py load --endpoints classify --concurrency 1,4 --duration 10
+    python fixora_bench.py scaling --configs threads,prefork:2,prefork:4 --out benchmarks/
+    python fixora_bench.py compare benchmarks/baseline.json new.json --threshold 0.15
+"""
+
+import argparse
+import datetime
+import importlib.metadata
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from fixora_loadtest import build_requests, process_tree_memory, run_closed_loop, run_open_loop
+from fixora_preprocess import load_image, to_tensor
+from fixora_preprocess_bench import synthetic_jpegs
+
+
+DEFAULT_MODELS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fixora_bench")
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Model output order (same as DEFAULT_IMAGE_CATEGORIES in COLAB_FINAL_SERVER.py)
+DEFAULT_IMAGE_CATEGORIES = [
+    'broken_street_light', 'electric_issue', 'garbage_overflow',
+    'gas_problem', 'open_manhole', 'potholes', 'traffic_lights', 'water_leakage'
+]
+URGENCY_LABELS = ["High", "Low", "Medium"]
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+
+STANDIN_FILES = {
+    "FIXORA_IMG_MODEL_PATH": "mobilenetv2_standin.keras",
+    "FIXORA_IMG_LABEL_ENCODER_PATH": "image_label_encoder.joblib",
+    "FIXORA_TEXT_CLASSIFIER_PATH": "classifier.joblib",
+    "FIXORA_TEXT_LABEL_ENCODER_PATH": "label_encoder.joblib",
+    "FIXORA_EMBEDDING_MODEL_NAME_PATH": "embedding_model_name.txt",
+}
+
+
+# -----------------------
+# CORPORA
+# -----------------------
+_ISSUES = [
+    ("pothole", "potholes"), ("huge pothole", "potholes"), ("broken street light", "broken_street_light"),
+    ("street lamp that keeps flickering", "broken_street_light"), ("exposed electric wire", "electric_issue"),
+    ("sparking transformer", "electric_issue"), ("overflowing garbage bin", "garbage_overflow"),
+    ("pile of uncollected rubbish", "garbage_overflow"), ("gas smell", "gas_problem"),
+    ("leaking gas pipe", "gas_problem"), ("open manhole", "open_manhole"), ("missing drain cover", "open_manhole"),
+    ("traffic light stuck on red", "traffic_lights"), ("dead traffic signal", "traffic_lights"),
+    ("burst water pipe", "water_leakage"), ("water leaking from the main", "water_leakage"),
+]
+_PLACES = ["near the school gate", "on the main road", "outside the market", "at the bus stop",
+           "in front of the hospital", "on our lane", "next to the temple", "by the railway crossing",
+           "at the junction", "behind the community hall"]
+_DURATIONS = ["since yesterday", "for three days", "for over a week", "since last month", "since this morning"]
+_IMPACTS = ["cars are swerving to avoid it", "children walk past it every day", "it is very dark at night",
+            "the smell is unbearable", "two bikes have already fallen", "people are scared to go near it",
+            "the road is flooding", "shops have had to close early", "elderly residents cannot cross safely"]
+_URGENT = ["Please fix this urgently.", "This is dangerous, someone will get hurt.", "Please look into it.",
+           "It is getting worse every day.", "Kindly send someone soon.", ""]
+
+
+def synthetic_descriptions(count, seed=0):
+    """Citizen-style report descriptions, 1-4 sentences (about 8-60 words)"""
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(count):
+        issue, _ = _ISSUES[rng.integers(len(_ISSUES))]
+        sentences = [f"There is a {issue} {_PLACES[rng.integers(len(_PLACES))]} "
+                     f"{_DURATIONS[rng.integers(len(_DURATIONS))]}."]
+        for _ in range(rng.integers(0, 3)):
+            sentences.append(f"{_IMPACTS[rng.integers(len(_IMPACTS))].capitalize()}.")
+        sentences.append(_URGENT[rng.integers(len(_URGENT))])
+        texts.append(" ".join(s for s in sentences if s))
+    return texts
+
+
+def urgency_label(text):
+    """Keyword rule used only to give the stand-in classifier three non-trivial classes"""
+    lowered = text.lower()
+    if any(w in lowered for w in ("gas", "spark", "dangerous", "hurt", "manhole", "wire")):
+        return "High"
+    if any(w in lowered for w in ("urgently", "worse", "fallen", "flooding")):
+        return "Medium"
+    return "Low"
+
+
+def jpeg_corpus(count, seed=0):
+    """Phone photos as the app uploads them (full 12 MP, expo quality 0.6) + a downscaled variant"""
+    return {
+        "phone_4032x3024_q60": synthetic_jpegs(count, size=(4032, 3024), quality=60, seed=seed),
+        "resized_1600x1200_q85": synthetic_jpegs(count, size=(1600, 1200), quality=85, seed=seed + 1),
+    }
+
+
+# -----------------------
+# STAND-IN MODELS
+# -----------------------
+def standin_env(models_dir):
+    return {var: os.path.join(models_dir, name) for var, name in STANDIN_FILES.items()}
+
+
+def _build_text_encoder(path, corpus):
+    """MiniLM-L6-shaped SentenceTransformer with random weights and a corpus word-level vocab"""
+    from sentence_transformers import SentenceTransformer, models as st_models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    hf_dir = os.path.join(path, "hf")
+    os.makedirs(hf_dir, exist_ok=True)
+    words = sorted({w.strip(".,").lower() for text in corpus for w in text.split()} - {""})
+    chars = sorted({c for w in words for c in w})
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words + chars + [f"##{c}" for c in chars] + [".", ","]
+    with open(os.path.join(hf_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(dict.fromkeys(vocab)) + "\n")
+    BertTokenizerFast(vocab_file=os.path.join(hf_dir, "vocab.txt"), do_lower_case=True).save_pretrained(hf_dir)
+    config = BertConfig(vocab_size=len(dict.fromkeys(vocab)), hidden_size=EMBEDDING_DIM, num_hidden_layers=6,
+                        num_attention_heads=12, intermediate_size=1536, max_position_embeddings=512)
+    BertModel(config).save_pretrained(hf_dir)
+
+    transformer = st_models.Transformer(hf_dir, max_seq_length=128)
+    dimension = getattr(transformer, "get_embedding_dimension", None) or transformer.get_word_embedding_dimension
+    pooling = st_models.Pooling(dimension(), pooling_mode="mean")
+    SentenceTransformer(modules=[transformer, pooling, st_models.Normalize()]).save(path)
+    return path
+
+
+def build_standins(models_dir, seed=0):
+    import joblib
+    import tensorflow as tf
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import LabelEncoder
+
+    os.makedirs(models_dir, exist_ok=True)
+    paths = standin_env(models_dir)
+    tf.keras.utils.set_random_seed(seed)
+
+    started = time.perf_counter()
+    base = tf.keras.applications.MobileNetV2(input_shape=(224, 224, 3), include_top=False, weights=None, pooling="avg")
+    x = tf.keras.layers.Dropout(0.2)(base.output)
+    outputs = tf.keras.layers.Dense(len(DEFAULT_IMAGE_CATEGORIES), activation="softmax")(x)
+    tf.keras.Model(base.input, outputs).save(paths["FIXORA_IMG_MODEL_PATH"])
+    print(f"✅ image model  -> {paths['FIXORA_IMG_MODEL_PATH']} ({time.perf_counter() - started:.1f}s)")
+
+    joblib.dump(LabelEncoder().fit(DEFAULT_IMAGE_CATEGORIES), paths["FIXORA_IMG_LABEL_ENCODER_PATH"])
+
+    corpus = synthetic_descriptions(2000, seed=seed)
+    encoder_dir = os.path.join(models_dir, "embedding_model")
+    try:
+        _build_text_encoder(encoder_dir, corpus)
+        from sentence_transformers import SentenceTransformer
+        embeddings = SentenceTransformer(encoder_dir).encode(corpus, batch_size=64)
+        with open(paths["FIXORA_EMBEDDING_MODEL_NAME_PATH"], "w") as f:
+            f.write(encoder_dir + "\n")
+        print(f"✅ text encoder -> {encoder_dir}")
+    except ImportError as e:
+        print(f"⚠️ sentence-transformers / transformers not installed ({e}); text benchmarks will be skipped")
+        embeddings = np.random.default_rng(seed).normal(size=(len(corpus), EMBEDDING_DIM)).astype(np.float32)
+
+    label_encoder = LabelEncoder().fit(URGENCY_LABELS)
+    y = label_encoder.transform([urgency_label(t) for t in corpus])
+    classifier = LogisticRegression(max_iter=500).fit(embeddings, y)
+    joblib.dump(classifier, paths["FIXORA_TEXT_CLASSIFIER_PATH"])
+    joblib.dump(label_encoder, paths["FIXORA_TEXT_LABEL_ENCODER_PATH"])
+    print(f"✅ urgency classifier + label encoders -> {models_dir}")
+    return paths
+
+
+def has_text_encoder(models_dir):
+    return os.path.exists(standin_env(models_dir)["FIXORA_EMBEDDING_MODEL_NAME_PATH"])
+
+
+def ensure_standins(models_dir):
+    """Build missing stand-ins; the text encoder is retried once sentence-transformers is installed"""
+    paths = standin_env(models_dir)
+    missing = [p for var, p in paths.items() if var != "FIXORA_EMBEDDING_MODEL_NAME_PATH" and not os.path.exists(p)]
+    if missing or (not has_text_encoder(models_dir) and importlib.util.find_spec("sentence_transformers")):
+        print(f"🔧 Building stand-in models in {models_dir}...")
+        build_standins(models_dir)
+
+
+# -----------------------
+# MICROBENCHMARKS
+# -----------------------
+def timed_ms(fn, repeat, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+        "samples": len(samples),
+    }
+
+
+def run_micro(models_dir, image_count=6, repeat=20):
+    ensure_standins(models_dir)
+    paths = standin_env(models_dir)
+    results = {}
+
+    corpus = jpeg_corpus(image_count)
+    for name, images in corpus.items():
+        avg_kb = round(sum(len(b) for b in images) / len(images) / 1024, 1)
+        decoded = [load_image(io.BytesIO(b)) for b in images]
+        buffer = np.empty((224, 224, 3), dtype=np.float32)
+        cycle = {"i": 0}
+
+        def decode():
+            load_image(io.BytesIO(images[cycle["i"] % len(images)]))
+            cycle["i"] += 1
+
+        def preprocess():
+            to_tensor(decoded[cycle["i"] % len(decoded)], out=buffer)
+            cycle["i"] += 1
+
+        results[f"decode[{name}]"] = dict(timed_ms(decode, repeat), avg_kb=avg_kb)
+        results[f"preprocess[{name}]"] = timed_ms(preprocess, repeat * 5)
+        print(f"📷 {name}: decode p50 {results[f'decode[{name}]']['p50_ms']} ms, "
+              f"normalize p50 {results[f'preprocess[{name}]']['p50_ms']} ms")
+
+    from fixora_backends import load_backend
+    backend = load_backend("keras", paths["FIXORA_IMG_MODEL_PATH"])
+    rng = np.random.default_rng(0)
+    for batch_size in (1, 8, 16):
+        batch = rng.random((batch_size, 224, 224, 3), dtype=np.float32)
+        row = timed_ms(lambda: backend.predict(batch), max(5, repeat // max(1, batch_size // 4)))
+        row["per_image_ms"] = round(row["p50_ms"] / batch_size, 3)
+        results[f"image_inference[keras,b{batch_size}]"] = row
+        print(f"🖼️ image inference b{batch_size}: p50 {row['p50_ms']} ms ({row['per_image_ms']} ms/image)")
+
+    texts = synthetic_descriptions(256, seed=1)
+    try:
+        import joblib
+        from sentence_transformers import SentenceTransformer
+        from fixora_urgency import classify_embeddings
+
+        with open(paths["FIXORA_EMBEDDING_MODEL_NAME_PATH"]) as f:
+            encoder = SentenceTransformer(f.read().strip())
+        classifier = joblib.load(paths["FIXORA_TEXT_CLASSIFIER_PATH"])
+        label_encoder = joblib.load(paths["FIXORA_TEXT_LABEL_ENCODER_PATH"])
+        for batch_size in (1, 32):
+            cycle = {"i": 0}
+
+            def encode():
+                start = (cycle["i"] * batch_size) % (len(texts) - batch_size)
+                encoder.encode(texts[start:start + batch_size])
+                cycle["i"] += 1
+
+            row = timed_ms(encode, max(5, repeat // max(1, batch_size // 8)))
+            row["per_text_ms"] = round(row["p50_ms"] / batch_size, 3)
+            results[f"text_encode[b{batch_size}]"] = row
+            print(f"🔮 text encode b{batch_size}: p50 {row['p50_ms']} ms ({row['per_text_ms']} ms/text)")
+        embeddings = encoder.encode(texts[:32])
+        results["urgency_classify[b32]"] = timed_ms(
+            lambda: classify_embeddings(embeddings, classifier, label_encoder), repeat * 5)
+    except ImportError as e:
+        print(f"⚠️ text benchmarks skipped: {e}")
+    return results
+
+
+# -----------------------
+# LOAD
+# -----------------------
+def start_server(models_dir, port, threads, with_cache=False, mode="threads", workers=1):
+    env = dict(os.environ, **standin_env(models_dir))
+    env.update({"FIXORA_IMG_BACKEND": "keras", "PYTHONUNBUFFERED": "1"})
+    if not with_cache:
+        env.update({"FIXORA_IMG_CACHE_MAX_ENTRIES": "0", "FIXORA_TEXT_CACHE_MAX_ENTRIES": "0"})
+    log = open(os.path.join(models_dir, f"server_{port}.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "fixora_serve.py"), "--mode", mode, "--host", "127.0.0.1",
+         "--port", str(port), "--threads", str(threads), "--workers", str(workers)],
+        cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 600
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"Server exited early, see {log.name}")
+        try:
+            with urllib.request.urlopen(base_url + "/ready", timeout=2) as resp:
+                return proc, base_url
+        except urllib.error.HTTPError as e:
+            # 503 until every slot loads; without a text encoder stand-in the image slots are enough
+            states = {name: slot["state"] for name, slot in json.loads(e.read()).get("models", {}).items()}
+            if states and all(s in ("ready", "failed") for s in states.values()):
+                if all(states.get(name) == "ready" for name in ("image_model", "image_labels")):
+                    return proc, base_url
+                proc.terminate()
+                raise SystemExit(f"Image model failed to load, see {log.name}")
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+        time.sleep(1)
+    proc.terminate()
+    raise SystemExit(f"Server not ready after 600s, see {log.name}")
+
+
+def warm_up(base_url, requests, concurrency, duration=5.0):
+    """Discarded closed-loop pass, so the batch shapes seen under load are traced before measuring"""
+    run_closed_loop(base_url, requests, max(concurrency), duration, timeout=120)
+
+
+def run_load(models_dir, endpoints, concurrency, open_fractions, duration, port=5077, threads=8, with_cache=False,
+             mode="threads", workers=1):
+    ensure_standins(models_dir)
+    jpeg = synthetic_jpegs(1, size=(4032, 3024), quality=60, seed=7)[0]
+    descriptions = synthetic_descriptions(64, seed=2)
+    proc, base_url = start_server(models_dir, port, threads, with_cache, mode=mode, workers=workers)
+    results = []
+    try:
+        print(f"🚀 Server ready at {base_url} (pid {proc.pid}), memory {process_tree_memory(proc.pid)}")
+        for endpoint in endpoints:
+            if endpoint != "classify" and not has_text_encoder(models_dir):
+                print(f"⚠️ {endpoint} skipped: no text encoder stand-in (install sentence-transformers)")
+                continue
+            requests = build_requests(endpoint, jpeg, descriptions=descriptions, variants=64)
+            warm_up(base_url, requests, concurrency)
+            best_rps = 0.0
+            for level in concurrency:
+                row = run_closed_loop(base_url, requests, level, duration, timeout=120)
+                row.update(endpoint=endpoint, server_memory=process_tree_memory(proc.pid))
+                best_rps = max(best_rps, row["throughput_rps"])
+                results.append(row)
+                print(_load_line(row))
+            for fraction in open_fractions:
+                rate = round(best_rps * fraction, 2)
+                if rate <= 0:
+                    continue
+                row = run_open_loop(base_url, requests, rate, duration, timeout=120)
+                row.update(endpoint=endpoint, load_fraction=fraction, server_memory=process_tree_memory(proc.pid))
+                results.append(row)
+                print(_load_line(row))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return results
+
+
+def _load_line(row):
+    lat = row["latency_ms"]
+    level = f"c={row['concurrency']}" if row["mode"] == "closed" else f"r={row['offered_rps']}"
+    memory = row.get("server_memory") or {}
+    return (f"   {row['endpoint']:<16} {row['mode']:<6} {level:<8} {row['throughput_rps']:7.2f} req/s   "
+            f"p50 {lat['p50']} ms  p95 {lat['p95']} ms  p99 {lat['p99']} ms  {row['statuses']}  "
+            f"peak RSS {memory.get('peak_rss_mb')} MB")
+
+
+# -----------------------
+# REPORT
+# -----------------------
+def environment():
+    info = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    try:
+        with open("/proc/cpuinfo") as f:
+            info["cpu"] = next((l.split(":", 1)[1].strip() for l in f if l.startswith("model name")), None)
+    except OSError:
+        pass
+    for name, dists in (("tensorflow", ("tensorflow", "tensorflow-cpu")), ("keras", ("keras",)),
+                        ("torch", ("torch",)), ("sentence-transformers", ("sentence-transformers",)),
+                        ("pillow", ("pillow",)), ("flask", ("flask",)), ("gunicorn", ("gunicorn",))):
+        info[name] = None
+        for dist in dists:
+            try:
+                info[name] = importlib.metadata.version(dist)
+                break
+            except importlib.metadata.PackageNotFoundError:
+                pass
+    return info
+
+
+def write_markdown(report, path):
+    lines = ["# Fixora inference benchmark", "",
+             "Generated by `python fixora_bench.py all`. Stand-in models with production shapes (random",
+             "weights); caches disabled during load runs. Client and server share the host below.", "",
+             "## Environment", ""]
+    lines += [f"- {k}: {v}" for k, v in report["environment"].items()]
+    lines += ["", "## Microbenchmarks", "", "| benchmark | p50 ms | p95 ms | mean ms | per item ms |",
+              "|---|---:|---:|---:|---:|"]
+    for name, row in report["micro"].items():
+        per_item = row.get("per_image_ms", row.get("per_text_ms", ""))
+        lines.append(f"| {name} | {row['p50_ms']} | {row['p95_ms']} | {row['mean_ms']} | {per_item} |")
+    lines += ["", "## Load", ""]
+    settings = report.get("load_settings")
+    if settings:
+        lines += [", ".join(f"{k}: {v}" for k, v in settings.items()), ""]
+    lines += ["| endpoint | mode | level | req/s | p50 ms | p95 ms | p99 ms | statuses | peak RSS MB |",
+              "|---|---|---|---:|---:|---:|---:|---|---:|"]
+    for row in report["load"]:
+        lat = row["latency_ms"]
+        level = f"c={row['concurrency']}" if row["mode"] == "closed" else f"{row['offered_rps']} req/s offered"
+        memory = row.get("server_memory") or {}
+        lines.append(f"| {row['endpoint']} | {row['mode']} | {level} | {row['throughput_rps']} | {lat['p50']} | "
+                     f"{lat['p95']} | {lat['p99']} | {row['statuses']} | {memory.get('peak_rss_mb')} |")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def run_scaling(models_dir, configs, endpoints, concurrency, duration, port=5077, threads=8):
+    """Closed-loop load per (mode, workers) config; rows carry serve_mode / workers"""
+    rows = []
+    for mode, workers in configs:
+        print(f"\n🔧 {mode} x{workers}")
+        for row in run_load(models_dir, endpoints, concurrency, [], duration, port=port, threads=threads,
+                            mode=mode, workers=workers):
+            rows.append(dict(row, serve_mode=mode, workers=workers))
+    return rows
+
+
+def write_scaling_markdown(report, path):
+    rows = report["scaling"]
+    reference = {}
+    for row in rows:
+        if row["serve_mode"] == "threads":
+            reference[(row["endpoint"], row["concurrency"])] = row["throughput_rps"]
+    lines = ["# Fixora serving scaling", "",
+             "Generated by `python fixora_bench.py scaling`. Stand-in models with production shapes (random",
+             "weights), caches disabled, closed-loop load; client and server share the host below.",
+             "Speedup is req/s over `--mode threads` at the same concurrency.", "",
+             "## Environment", ""]
+    lines += [f"- {k}: {v}" for k, v in report["environment"].items()]
+    settings = report.get("load_settings")
+    if settings:
+        lines += ["", ", ".join(f"{k}: {v}" for k, v in settings.items())]
+    lines += ["", "| endpoint | mode | workers | concurrency | req/s | speedup | p50 ms | p99 ms | statuses | peak RSS MB |",
+              "|---|---|---:|---:|---:|---:|---:|---:|---|---:|"]
+    for row in rows:
+        lat = row["latency_ms"]
+        base = reference.get((row["endpoint"], row["concurrency"]))
+        speedup = round(row["throughput_rps"] / base, 2) if base else ""
+        memory = row.get("server_memory") or {}
+        lines.append(f"| {row['endpoint']} | {row['serve_mode']} | {row['workers']} | {row['concurrency']} | "
+                     f"{row['throughput_rps']} | {speedup} | {lat['p50']} | {lat['p99']} | {row['statuses']} | "
+                     f"{memory.get('peak_rss_mb')} |")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def compare(baseline, current, threshold):
+    """Relative regressions above `threshold`: slower micro p50, lower throughput, higher load p99"""
+    regressions = []
+    for name, row in baseline.get("micro", {}).items():
+        new = current.get("micro", {}).get(name)
+        if new and row["p50_ms"] and new["p50_ms"] > row["p50_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p50 {row['p50_ms']} -> {new['p50_ms']} ms")
+
+    def key(row):
+        return (row["endpoint"], row["mode"], row.get("concurrency"), row.get("load_fraction"))
+
+    new_load = {key(r): r for r in current.get("load", [])}
+    for row in baseline.get("load", []):
+        new = new_load.get(key(row))
+        if not new:
+            continue
+        if row["mode"] == "closed" and new["throughput_rps"] < row["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{key(row)}: {row['throughput_rps']} -> {new['throughput_rps']} req/s")
+        old_p99, new_p99 = row["latency_ms"]["p99"], new["latency_ms"]["p99"]
+        if old_p99 and new_p99 and new_p99 > old_p99 * (1 + threshold):
+            regressions.append(f"{key(row)}: p99 {old_p99} -> {new_p99} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("--models", default=DEFAULT_MODELS_DIR, help="stand-in artifacts directory")
+
+    def load_args(p):
+        p.add_argument("--endpoints", default="classify,predict_urgency,predict")
+        p.add_argument("--concurrency", default="1,4,16", help="closed-loop levels")
+        p.add_argument("--open-fractions", default="0.5,0.9",
+                       help="open-loop arrival rates as fractions of the best closed-loop throughput")
+        p.add_argument("--duration", type=float, default=15.0, help="seconds per level")
+        p.add_argument("--threads", type=int, default=8, help="server request threads")
+        p.add_argument("--port", type=int, default=5077)
+        p.add_argument("--with-cache", action="store_true", help="keep the prediction caches enabled")
+
+    p = sub.add_parser("standin", help="build the stand-in model artifacts")
+    common(p)
+    p = sub.add_parser("micro", help="decode / preprocess / inference microbenchmarks")
+    common(p)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--json", help="write results as JSON")
+    p = sub.add_parser("load", help="closed + open loop HTTP load on the stand-in server")
+    common(p)
+    load_args(p)
+    p.add_argument("--json", help="write results as JSON")
+    p = sub.add_parser("all", help="micro + load, written as baseline.json + BASELINE.md")
+    common(p)
+    load_args(p)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--out", default=os.path.join(HERE, "benchmarks"))
+    p = sub.add_parser("scaling", help="load per serving config (threads / prefork:N), written as SCALING.md")
+    common(p)
+    load_args(p)
+    p.add_argument("--configs", default="threads,prefork:2,prefork:4",
+                   help="comma list of threads | prefork:<workers>")
+    p.add_argument("--out", default=os.path.join(HERE, "benchmarks"))
+    p = sub.add_parser("compare", help="flag regressions against a baseline report")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--threshold", type=float, default=0.15, help="relative change that counts (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    if args.command == "standin":
+        for var, path in build_standins(args.models).items():
+            print(f"export {var}='{path}'")
+        return
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for line in regressions:
+            print(f"❌ {line}")
+        print("✅ No regressions" if not regressions else f"{len(regressions)} regression(s)")
+        sys.exit(1 if regressions else 0)
+
+    report = {"environment": environment()}
+    if args.command == "scaling":
+        configs = [("threads", 1) if c == "threads" else ("prefork", int(c.split(":", 1)[1]))
+                   for c in args.configs.split(",")]
+        report["scaling"] = run_scaling(args.models, configs, args.endpoints.split(","),
+                                        [int(c) for c in args.concurrency.split(",")], args.duration,
+                                        port=args.port, threads=args.threads)
+        report["load_settings"] = {"duration_s": args.duration, "server_threads": args.threads,
+                                   "image": "4032x3024 JPEG q60"}
+        os.makedirs(args.out, exist_ok=True)
+        with open(os.path.join(args.out, "scaling.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        write_scaling_markdown(report, os.path.join(args.out, "SCALING.md"))
+        print(f"\n📝 Report written to {args.out}/scaling.json and SCALING.md")
+        return
+    if args.command in ("micro", "all"):
+        report["micro"] = run_micro(args.models, repeat=args.repeat)
+    if args.command in ("load", "all"):
+        report["load"] = run_load(
+            args.models, args.endpoints.split(","), [int(c) for c in args.concurrency.split(",")],
+            [float(f) for f in args.open_fractions.split(",") if f], args.duration,
+            port=args.port, threads=args.threads, with_cache=args.with_cache,
+        )
+        report["load_settings"] = {"duration_s": args.duration, "server_threads": args.threads,
+                                   "caches": args.with_cache, "image": "4032x3024 JPEG q60"}
+
+    if args.command == "all":
+        os.makedirs(args.out, exist_ok=True)
+        with open(os.path.join(args.out, "baseline.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        write_markdown(report, os.path.join(args.out, "BASELINE.md"))
+        print(f"\n📝 Report written to {args.out}/baseline.json and BASELINE.md")
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
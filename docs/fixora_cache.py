@@ -0,0 +1,179 @@
+"""
+Prediction caches for the Fixora inference server.
+
+- LRUCache: thread-safe, bounded by entry count and approximate bytes, with TTL
+  and hit/miss/eviction counters.
+- content_hash / dhash: exact (blake2b of the raw bytes) and perceptual
+  (64-bit difference hash) image keys.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+_HASH_CHUNK = 1 << 20
+
+
+def content_hash(fp):
+    """
+    blake2b hex digest of a file-like object's bytes (or a bytes-like object).
+    Streams are rewound afterwards so they can still be decoded.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(fp, (bytes, bytearray, memoryview)):
+        h.update(fp)
+        return h.hexdigest()
+    if hasattr(fp, "getbuffer"):
+        # BytesIO: hash its buffer in place, no copy
+        view = fp.getbuffer()
+        try:
+            h.update(view)
+        finally:
+            view.release()
+        return h.hexdigest()
+    start = fp.tell()
+    for chunk in iter(lambda: fp.read(_HASH_CHUNK), b""):
+        h.update(chunk)
+    fp.seek(start)
+    return h.hexdigest()
+
+
+def dhash(pixels, hash_size=8):
+    """
+    64-bit difference hash of an image tensor (H, W, 3) in [0, 1] or uint8.
+    Robust to re-encoding and resizing; identical for near-identical photos.
+    """
+    pixels = np.asarray(pixels)
+    if pixels.dtype != np.uint8:
+        pixels = (np.clip(pixels, 0.0, 1.0) * 255.0).astype(np.uint8)
+    gray = Image.fromarray(pixels).convert("L").resize((hash_size + 1, hash_size), Image.BOX)
+    g = np.asarray(gray, dtype=np.int16)
+    bits = (g[:, 1:] > g[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with TTL.
+
+    max_entries:  entry bound
+    max_bytes:    approximate memory bound (uses value.nbytes when present)
+    ttl_seconds:  entries older than this are treated as misses (None = no expiry)
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=None, ttl_seconds=None, name="cache"):
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.ttl = float(ttl_seconds) if ttl_seconds else None
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _sizeof(value):
+        if isinstance(value, tuple):
+            return sum(LRUCache._sizeof(v) for v in value)
+        return int(getattr(value, "nbytes", 64))
+
+    def ensure_version(self, version):
+        """Drop every entry when `version` (e.g. the registry's live model version) changes"""
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.invalidations += 1
+                self._data.clear()
+                self._bytes = 0
+                self._version = version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at, size = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, time.monotonic(), size)
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class PerceptualCache(LRUCache):
+    """
+    LRUCache keyed by 64-bit perceptual hashes, matched by Hamming distance.
+    A lookup scans the (bounded) key set in one vectorized pass.
+    """
+
+    def __init__(self, max_distance=4, **kwargs):
+        super().__init__(**kwargs)
+        self.max_distance = int(max_distance)
+
+    def get_nearest(self, phash):
+        with self._lock:
+            keys = list(self._data.keys())
+        if not keys:
+            self.get(phash)  # counts the miss
+            return None
+        xor = np.array(keys, dtype=np.uint64) ^ np.uint64(phash)
+        distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            self.get(phash)
+            return None
+        return self.get(keys[best])
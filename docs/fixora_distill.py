@@ -0,0 +1,263 @@
+"""
+Train and benchmark the fast urgency tier (fixora_fast_urgency.FastUrgencyModel).
+
+  train  label a file of report descriptions with the full urgency path
+         (SentenceTransformer + text_classifier, the "teacher"), fit the lexical
+         model on part of them weighted by the teacher's confidence, pick
+         min_confidence on the held-out rest and save urgency_fast.joblib
+  bench  score held-out descriptions with both tiers and write the accuracy /
+         latency trade-off per threshold: share answered by the fast tier,
+         agreement with the full path, accuracy against reference labels (when
+         the input has them), per-description latency and speedup
+
+Input is the same JSON array / NDJSON as fixora_backfill.py (strings or
+{"id", "text"/"description"} objects; bench also reads an optional "label").
+--standin uses fixora_bench.py's stand-in models and synthetic descriptions
+instead (with the stand-in keyword rule as reference labels); those descriptions
+are templated, so they flatter the lexical tier compared to real reports.
+
+Usage:
+    python fixora_distill.py train reports.ndjson -o urgency_fast.joblib
+    python fixora_distill.py bench holdout.ndjson --fast-model urgency_fast.joblib --markdown tiers.md
+    python fixora_distill.py train --standin -o ~/.cache/fixora_bench/urgency_fast.joblib
+    python fixora_distill.py bench --standin --fast-model ~/.cache/fixora_bench/urgency_fast.joblib \\
+        --markdown benchmarks/URGENCY_TIERS.md
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from fixora_fast_urgency import FastUrgencyModel, agreement_table
+from fixora_urgency import classify_embeddings, iter_json_array, iter_ndjson
+
+
+# Same artifacts as COLAB_FINAL_SERVER.py
+TEXT_CLASSIFIER_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/classifier.joblib"
+TEXT_LABEL_ENCODER_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/label_encoder.joblib"
+EMBEDDING_MODEL_NAME_PATH = "/content/drive/My Drive/Urgency_Detection/model_artifacts/embedding_model_name.txt"
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.97, 0.99]
+
+
+# -----------------------
+# INPUT
+# -----------------------
+def read_descriptions(path):
+    """(texts, reference labels or None) from a JSON array / NDJSON file; labels need every item to have one"""
+    texts, labels = [], []
+    with open(path, "rb") as f:
+        items = iter_json_array(f) if path.lower().endswith(".json") else iter_ndjson(f)
+        for item in items:
+            text = item.get("text", item.get("description")) if isinstance(item, dict) else item
+            if isinstance(text, str) and text.strip():
+                texts.append(text)
+                labels.append(item.get("label") if isinstance(item, dict) else None)
+    return texts, (labels if labels and all(labels) else None)
+
+
+def standin_descriptions(count, seed):
+    from fixora_bench import synthetic_descriptions, urgency_label
+    texts = synthetic_descriptions(count, seed=seed)
+    return texts, [urgency_label(t) for t in texts]
+
+
+# -----------------------
+# FULL PATH (TEACHER)
+# -----------------------
+class Teacher:
+    def __init__(self, classifier_path, label_encoder_path, embedding_model_name_path, encode_batch_size=64):
+        import joblib
+        from sentence_transformers import SentenceTransformer
+
+        self.text_classifier = joblib.load(classifier_path)
+        self.text_label_encoder = joblib.load(label_encoder_path)
+        with open(embedding_model_name_path, "r") as f:
+            self.embedding_model = SentenceTransformer(f.read().strip())
+        self.encode_batch_size = encode_batch_size
+
+    @classmethod
+    def from_args(cls, args):
+        if args.standin:
+            from fixora_bench import DEFAULT_MODELS_DIR, ensure_standins, standin_env
+            models_dir = args.models_dir or DEFAULT_MODELS_DIR
+            ensure_standins(models_dir)
+            paths = standin_env(models_dir)
+            return cls(paths["FIXORA_TEXT_CLASSIFIER_PATH"], paths["FIXORA_TEXT_LABEL_ENCODER_PATH"],
+                       paths["FIXORA_EMBEDDING_MODEL_NAME_PATH"])
+        return cls(args.classifier, args.label_encoder, args.embedding_model_name)
+
+    def predict(self, texts):
+        embeddings = self.embedding_model.encode(list(texts),
+                                                 batch_size=self.encode_batch_size)
+        return classify_embeddings(np.asarray(embeddings), self.text_classifier, self.text_label_encoder)
+
+
+def per_description_ms(fn, texts):
+    """Median latency of fn([text]) over `texts`, one description per call as /predict_urgency sees it"""
+    fn(texts[:1])
+    samples = []
+    for text in texts:
+        started = time.perf_counter()
+        fn([text])
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return float(np.median(samples))
+
+
+# -----------------------
+# COMMANDS
+# -----------------------
+def load_input(args, seed):
+    if args.standin:
+        return standin_descriptions(args.count, seed)
+    if not args.input:
+        sys.exit("❌ An input file is required without --standin")
+    return read_descriptions(args.input)
+
+
+def cmd_train(args):
+    texts, _ = load_input(args, seed=args.seed)
+    teacher = Teacher.from_args(args)
+    print(f"🧑‍🏫 Labelling {len(texts)} description(s) with the full path...")
+    started = time.perf_counter()
+    teacher_labels, teacher_confs = teacher.predict(texts)
+    print(f"✅ Labelled in {time.perf_counter() - started:.1f}s")
+
+    order = np.random.default_rng(args.seed).permutation(len(texts))
+    n_holdout = max(1, int(len(texts) * args.holdout))
+    holdout, train = order[:n_holdout], order[n_holdout:]
+    weights = np.asarray([c if c is not None else 1.0 for c in teacher_confs])
+
+    fast = FastUrgencyModel(C=args.C).fit([texts[i] for i in train], [teacher_labels[i] for i in train],
+                                          weights=weights[train])
+    table = fast.calibrate([texts[i] for i in holdout], [teacher_labels[i] for i in holdout],
+                           target_agreement=args.target_agreement)
+    for row in table:
+        print(f"   >= {row['threshold']:.2f}: fast {row['fast_share']:.1%}, agreement {row['agreement']:.2%}")
+    fast.save(args.output)
+    print(f"✅ Fast tier -> {args.output} (min confidence {fast.min_confidence}, "
+          f"{fast.metadata['holdout_fast_share']:.1%} of held-out descriptions answered fast)")
+
+
+def cmd_bench(args):
+    texts, reference = load_input(args, seed=args.seed)
+    teacher = Teacher.from_args(args)
+    fast = FastUrgencyModel.load(args.fast_model)
+
+    teacher_labels, _ = teacher.predict(texts)
+    fast_labels, fast_confs = fast.predict(texts)
+    table = agreement_table(fast_labels, fast_confs, teacher_labels, THRESHOLDS + [fast.min_confidence])
+
+    sample = texts[:args.latency_sample]
+    full_ms = per_description_ms(teacher.predict, sample)
+    fast_ms = per_description_ms(fast.predict, sample)
+    labels, confs = np.asarray(fast_labels), np.asarray(fast_confs)
+    teacher_arr = np.asarray(teacher_labels)
+    for row in table:
+        answered = confs >= row["threshold"]
+        tiered = np.where(answered, labels, teacher_arr)
+        # a description the fast tier passes on pays for both tiers
+        row["ms_per_description"] = round(fast_ms + (1.0 - row["fast_share"]) * full_ms, 2)
+        row["speedup"] = round(full_ms / row["ms_per_description"], 2)
+        row["accuracy"] = round(float(np.mean(tiered == np.asarray(reference))), 4) if reference else None
+
+    report = {
+        "descriptions": len(texts),
+        "standin": bool(args.standin),
+        "fast_model": {"path": args.fast_model, "min_confidence": fast.min_confidence, **fast.metadata},
+        "full_ms": round(full_ms, 2),
+        "fast_ms": round(fast_ms, 2),
+        "full_accuracy": round(float(np.mean(teacher_arr == np.asarray(reference))), 4) if reference else None,
+        "fast_only_accuracy": round(float(np.mean(labels == np.asarray(reference))), 4) if reference else None,
+        "thresholds": table,
+    }
+    print(f"⏱️ full path {full_ms:.2f} ms / description, fast tier {fast_ms:.2f} ms")
+    for row in table:
+        accuracy = f", accuracy {row['accuracy']:.2%}" if row["accuracy"] is not None else ""
+        print(f"   >= {row['threshold']:.2f}: fast {row['fast_share']:.1%}, agreement {row['agreement']:.2%}"
+              f"{accuracy}, {row['ms_per_description']:.2f} ms ({row['speedup']:.2f}x)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.markdown:
+        write_markdown(report, args.markdown)
+        print(f"📝 {args.markdown}")
+
+
+def write_markdown(report, path):
+    fast_model = report["fast_model"]
+    lines = [
+        "# Urgency tiers: accuracy / latency",
+        "",
+        f"{report['descriptions']} held-out descriptions"
+        + (" (synthetic, stand-in models from fixora_bench.py)" if report["standin"] else "") + ". "
+        f"Fast tier trained on {fast_model.get('trained_on')} teacher-labelled descriptions; "
+        f"min_confidence {fast_model['min_confidence']} was picked for "
+        f"{fast_model.get('target_agreement', 0):.0%} agreement on {fast_model.get('holdout')} others.",
+        "",
+        f"- full path (SentenceTransformer + classifier): {report['full_ms']} ms / description",
+        f"- fast tier (hashed n-grams + logistic regression): {report['fast_ms']} ms / description",
+    ]
+    if report["full_accuracy"] is not None:
+        lines += [f"- accuracy against reference labels: full path {report['full_accuracy']:.2%}, "
+                  f"fast tier alone {report['fast_only_accuracy']:.2%}"]
+    if report["standin"]:
+        lines += ["", "The stand-in encoder has random weights, so both tiers are near chance against the",
+                  "keyword-rule labels; agreement with the full path and latency are what carry over."]
+    lines += [
+        "",
+        "Latency is one description per call, as /predict_urgency sees it; a description the fast",
+        "tier passes on pays for both tiers.",
+        "",
+        "| min confidence | answered fast | agreement with full path | accuracy | ms / description | speedup |",
+        "|---:|---:|---:|---:|---:|---:|",
+    ]
+    for row in report["thresholds"]:
+        accuracy = f"{row['accuracy']:.2%}" if row["accuracy"] is not None else "-"
+        marker = " **(default)**" if row["threshold"] == fast_model["min_confidence"] else ""
+        lines.append(f"| {row['threshold']:.2f}{marker} | {row['fast_share']:.1%} | {row['agreement']:.2%} | "
+                     f"{accuracy} | {row['ms_per_description']:.2f} | {row['speedup']:.2f}x |")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p, count):
+        p.add_argument("input", nargs="?", help="JSON array / NDJSON of descriptions")
+        p.add_argument("--standin", action="store_true", help="stand-in models + synthetic descriptions")
+        p.add_argument("--models-dir", help="stand-in directory (default: fixora_bench.py's)")
+        p.add_argument("--count", type=int, default=count, help="synthetic descriptions with --standin")
+        p.add_argument("--classifier", default=TEXT_CLASSIFIER_PATH)
+        p.add_argument("--label-encoder", default=TEXT_LABEL_ENCODER_PATH)
+        p.add_argument("--embedding-model-name", default=EMBEDDING_MODEL_NAME_PATH,
+                       help="file holding the SentenceTransformer model name")
+
+    train = sub.add_parser("train", help="distill the full path into the fast tier")
+    common(train, count=3000)
+    train.add_argument("-o", "--output", default="urgency_fast.joblib")
+    train.add_argument("--holdout", type=float, default=0.2, help="share kept back to pick min_confidence")
+    train.add_argument("--target-agreement", type=float, default=0.99,
+                       help="tiered answers must agree with the full path this often")
+    train.add_argument("--C", type=float, default=8.0, help="inverse regularization of the logistic regression")
+    train.add_argument("--seed", type=int, default=1)
+
+    bench = sub.add_parser("bench", help="accuracy / latency per threshold")
+    common(bench, count=1000)
+    bench.add_argument("--fast-model", required=True)
+    bench.add_argument("--latency-sample", type=int, default=200, help="descriptions timed one at a time")
+    bench.add_argument("--seed", type=int, default=2, help="synthetic seed (keep it different from train's)")
+    bench.add_argument("--out", help="JSON report")
+    bench.add_argument("--markdown", help="Markdown table")
+
+    args = parser.parse_args()
+    {"train": cmd_train, "bench": cmd_bench}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
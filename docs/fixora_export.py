@@ -0,0 +1,251 @@
+"""
+Export the Fixora MobileNetV2 classifier to TFLite / ONNX and check the exports.
+
+  export   convert fixora_mobilenetv2_model_finetuned.keras once into the
+           selected variants (written next to the .keras file by default)
+  compare  run every backend on a held-out image folder and report accuracy
+           parity against the Keras model, latency and memory. Each backend
+           runs in its own subprocess so RSS numbers aren't polluted.
+
+Held-out folder layout: one sub-folder per category (e.g. potholes/, water_leakage/)
+to also get accuracy against the true labels, or a flat folder for parity only.
+
+Usage:
+    python fixora_export.py export --formats tflite,tflite-dynamic,tflite-int8,onnx,onnx-dynamic \
+        --calibration-dir holdout/
+    python fixora_export.py compare --holdout holdout/ --json export_report.json
+Then serve with e.g. FIXORA_IMG_BACKEND=tflite FIXORA_IMG_BACKEND_VARIANT=dynamic.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from fixora_backends import artifact_path, export_onnx, export_tflite, load_backend
+from fixora_preprocess import load_image, to_tensor
+
+
+IMG_MODEL_PATH = "/content/drive/My Drive/fixora_mobilenetv2_model_finetuned.keras"
+
+FORMATS = {
+    "tflite": ("tflite", "float"),
+    "tflite-dynamic": ("tflite", "dynamic"),
+    "tflite-int8": ("tflite", "int8"),
+    "onnx": ("onnx", "float"),
+    "onnx-dynamic": ("onnx", "dynamic"),
+}
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+# Model output order (same as DEFAULT_IMAGE_CATEGORIES in COLAB_FINAL_SERVER.py)
+DEFAULT_IMAGE_CATEGORIES = [
+    'broken_street_light', 'electric_issue', 'garbage_overflow',
+    'gas_problem', 'open_manhole', 'potholes', 'traffic_lights', 'water_leakage'
+]
+
+
+def load_holdout(folder, limit=None):
+    """(tensors (N, 224, 224, 3) float32, labels or None per image, file names)"""
+    entries = []
+    subdirs = sorted(d for d in os.listdir(folder) if os.path.isdir(os.path.join(folder, d)))
+    if subdirs:
+        for label in subdirs:
+            for name in sorted(os.listdir(os.path.join(folder, label))):
+                if name.lower().endswith(IMAGE_EXTS):
+                    entries.append((os.path.join(folder, label, name), label))
+    else:
+        entries = [(os.path.join(folder, n), None) for n in sorted(os.listdir(folder))
+                   if n.lower().endswith(IMAGE_EXTS)]
+    if limit:
+        entries = entries[:limit]
+    if not entries:
+        raise SystemExit(f"No images found in {folder}")
+    tensors = np.stack([to_tensor(load_image(path)) for path, _ in entries])
+    return tensors, [label for _, label in entries], [path for path, _ in entries]
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+# -----------------------
+# EXPORT
+# -----------------------
+def cmd_export(args):
+    from tensorflow.keras.models import load_model
+
+    model = load_model(args.model)
+    calibration = None
+    for fmt in args.formats.split(","):
+        backend, variant = FORMATS[fmt]
+        out = artifact_path(args.model, backend, variant)
+        if args.out_dir:
+            out = os.path.join(args.out_dir, os.path.basename(out))
+        started = time.perf_counter()
+        if backend == "tflite":
+            if variant == "int8" and calibration is None:
+                if not args.calibration_dir:
+                    raise SystemExit("tflite-int8 needs --calibration-dir")
+                tensors, _, _ = load_holdout(args.calibration_dir, limit=args.calibration_size)
+                calibration = [t[None] for t in tensors]
+            export_tflite(model, out, variant, calibration)
+        else:
+            export_onnx(model, out, variant)
+        size_mb = os.path.getsize(out) / 1024 / 1024
+        print(f"✅ {fmt:<15} -> {out} ({size_mb:.1f} MB, {time.perf_counter() - started:.1f}s)")
+
+
+# -----------------------
+# PROBE (runs in a subprocess per backend)
+# -----------------------
+def cmd_probe(args):
+    baseline = rss_mb()
+    started = time.perf_counter()
+    backend = load_backend(args.backend, args.path, num_threads=args.threads)
+    load_seconds = time.perf_counter() - started
+    loaded = rss_mb()
+
+    tensors = np.load(args.inputs)
+    backend.predict(tensors[:1])  # warm-up
+
+    preds = np.concatenate([backend.predict(tensors[i:i + 8]) for i in range(0, len(tensors), 8)])
+    np.save(args.out, preds)
+
+    def latency(batch_size, rounds):
+        samples = []
+        for r in range(rounds):
+            i = (r * batch_size) % max(1, len(tensors) - batch_size + 1)
+            batch = tensors[i:i + batch_size]
+            t = time.perf_counter()
+            backend.predict(batch)
+            samples.append((time.perf_counter() - t) * 1000.0 / len(batch))
+        return round(statistics.median(samples), 3)
+
+    print(json.dumps({
+        "load_seconds": round(load_seconds, 3),
+        "rss_model_mb": round(loaded - baseline, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "latency_ms_per_image_b1": latency(1, args.rounds),
+        "latency_ms_per_image_b8": latency(min(8, len(tensors)), max(3, args.rounds // 4)),
+    }))
+
+
+# -----------------------
+# COMPARE
+# -----------------------
+def cmd_compare(args):
+    tensors, labels, _ = load_holdout(args.holdout, limit=args.limit)
+    print(f"📷 {len(tensors)} held-out image(s)")
+
+    candidates = [("keras", "float", args.model)]
+    for fmt in (args.formats.split(",") if args.formats else FORMATS):
+        backend, variant = FORMATS[fmt]
+        path = artifact_path(args.model, backend, variant)
+        if args.out_dir:
+            path = os.path.join(args.out_dir, os.path.basename(path))
+        if os.path.exists(path):
+            candidates.append((backend, variant, path))
+        else:
+            print(f"⚠️ skipping {fmt}: {path} not found (run export first)")
+
+    report, reference = [], None
+    categories = args.categories.split(",") if args.categories else DEFAULT_IMAGE_CATEGORIES
+    truth = None
+    if any(labels):
+        unknown = sorted(set(l for l in labels if l not in categories))
+        if unknown:
+            print(f"⚠️ sub-folders not in the category list, accuracy skipped: {unknown}")
+        else:
+            truth = np.array([categories.index(l) for l in labels])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = os.path.join(tmp, "inputs.npy")
+        np.save(inputs, tensors)
+        for backend, variant, path in candidates:
+            out = os.path.join(tmp, f"{backend}-{variant}.npy")
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "probe", "--backend", backend, "--path", path,
+                 "--inputs", inputs, "--out", out, "--rounds", str(args.rounds)]
+                + (["--threads", str(args.threads)] if args.threads else []),
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"❌ {backend}/{variant} failed:\n{proc.stderr[-2000:]}")
+                continue
+            row = json.loads(proc.stdout.strip().splitlines()[-1])
+            preds = np.load(out)
+            if reference is None:
+                reference = preds
+            row.update({
+                "backend": backend,
+                "variant": variant,
+                "path": path,
+                "size_mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+                "top1_agreement_vs_keras": round(float(np.mean(preds.argmax(1) == reference.argmax(1))), 4),
+                "max_abs_softmax_diff": round(float(np.abs(preds - reference).max()), 5),
+                "mean_abs_confidence_diff": round(float(np.abs(preds.max(1) - reference.max(1)).mean()), 5),
+            })
+            if truth is not None:
+                row["accuracy"] = round(float(np.mean(preds.argmax(1) == truth)), 4)
+            report.append(row)
+
+    print(f"\n{'backend':<8} {'variant':<8} {'MB':>6} {'agree':>7} {'acc':>7} {'maxΔp':>8} "
+          f"{'b1 ms':>7} {'b8 ms':>7} {'RSS MB':>7} {'load s':>7}")
+    for r in report:
+        print(f"{r['backend']:<8} {r['variant']:<8} {r['size_mb']:>6} {r['top1_agreement_vs_keras']:>7} "
+              f"{r.get('accuracy', '-'):>7} {r['max_abs_softmax_diff']:>8} {r['latency_ms_per_image_b1']:>7} "
+              f"{r['latency_ms_per_image_b8']:>7} {r['rss_model_mb']:>7} {r['load_seconds']:>7}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"images": len(tensors), "results": report}, f, indent=2)
+        print(f"\n📝 Report written to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="convert the .keras model")
+    p.add_argument("--model", default=IMG_MODEL_PATH)
+    p.add_argument("--formats", default="tflite,tflite-dynamic,onnx", help=",".join(FORMATS))
+    p.add_argument("--out-dir", help="default: next to the .keras model")
+    p.add_argument("--calibration-dir", help="images for tflite-int8 calibration")
+    p.add_argument("--calibration-size", type=int, default=200)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("compare", help="accuracy parity + latency/memory on a held-out folder")
+    p.add_argument("--model", default=IMG_MODEL_PATH)
+    p.add_argument("--holdout", required=True)
+    p.add_argument("--formats", help="subset of exports to compare (default: all found)")
+    p.add_argument("--out-dir", help="where the exports live (default: next to the .keras model)")
+    p.add_argument("--limit", type=int, help="max held-out images")
+    p.add_argument("--rounds", type=int, default=50, help="latency samples per backend")
+    p.add_argument("--threads", type=int, help="intra-op threads for tflite/onnx")
+    p.add_argument("--categories", help="comma-separated model class order (default: the 8 Fixora categories)")
+    p.add_argument("--json", help="also write the report as JSON")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("probe", help=argparse.SUPPRESS)
+    p.add_argument("--backend", required=True)
+    p.add_argument("--path", required=True)
+    p.add_argument("--inputs", required=True)
+    p.add_argument("--out", required=True)
+    p.add_argument("--rounds", type=int, default=50)
+    p.add_argument("--threads", type=int)
+    p.set_defaults(func=cmd_probe)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Fast lexical tier for Fixora urgency prediction.
+
+FastUrgencyModel hashes word 1-2-grams and character 3-5-grams of the normalized
+description (sklearn HashingVectorizer: no vocabulary to store or grow) into a
+logistic regression. It is distilled from the full path (SentenceTransformer +
+text_classifier): trained on the labels that path assigns to real descriptions,
+weighted by its confidence, so it learns to agree with the production model
+rather than with a separate labelling.
+
+The server answers from this tier when its confidence is at least
+`min_confidence` and sends only the remaining descriptions through the
+embedding model; every response says which tier answered. `min_confidence` is
+picked on held-out descriptions when the model is trained (the lowest threshold
+whose tiered answers still agree with the full path on `target_agreement` of
+them) and can be overridden with FIXORA_URGENCY_FAST_MIN_CONF.
+
+Train and benchmark with fixora_distill.py.
+"""
+
+import time
+
+import numpy as np
+
+from fixora_urgency import normalize_text
+
+
+FAST, FULL = "fast", "full"
+
+
+class FastUrgencyModel:
+    """
+        fast = FastUrgencyModel().fit(texts, teacher_labels, weights=teacher_confidences)
+        fast.calibrate(holdout_texts, holdout_teacher_labels, target_agreement=0.99)
+        labels, confs = fast.predict(["Gas smell near the school"])
+        fast.save("urgency_fast.joblib")
+    """
+
+    def __init__(self, n_features=2 ** 18, C=8.0, min_confidence=0.9):
+        self.n_features = int(n_features)
+        self.C = float(C)
+        self.min_confidence = float(min_confidence)
+        self.classifier = None
+        self.metadata = {}
+        self._vectorizers = None
+
+    def _features(self, texts):
+        from scipy.sparse import hstack
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.preprocessing import normalize
+
+        if self._vectorizers is None:
+            self._vectorizers = (
+                HashingVectorizer(analyzer="word", ngram_range=(1, 2), n_features=self.n_features,
+                                  alternate_sign=False, norm=None, lowercase=False),
+                HashingVectorizer(analyzer="char_wb", ngram_range=(3, 5), n_features=self.n_features,
+                                  alternate_sign=False, norm=None, lowercase=False),
+            )
+        normalized = [normalize_text(t) for t in texts]
+        return normalize(hstack([v.transform(normalized) for v in self._vectorizers]).tocsr())
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_vectorizers"] = None  # stateless, rebuilt on first use
+        return state
+
+    def fit(self, texts, labels, weights=None):
+        from sklearn.linear_model import LogisticRegression
+
+        started = time.perf_counter()
+        self.classifier = LogisticRegression(C=self.C, max_iter=2000)
+        self.classifier.fit(self._features(texts), np.asarray(labels), sample_weight=weights)
+        self.metadata.update(trained_on=len(texts), classes=[str(c) for c in self.classifier.classes_],
+                             fit_seconds=round(time.perf_counter() - started, 2))
+        return self
+
+    def predict(self, texts):
+        """Labels + confidences (max class probability) for N descriptions"""
+        proba = self.classifier.predict_proba(self._features(texts))
+        best = np.argmax(proba, axis=1)
+        return [str(c) for c in self.classifier.classes_[best]], proba[np.arange(len(best)), best].tolist()
+
+    def calibrate(self, texts, teacher_labels, target_agreement=0.99):
+        """Lowest min_confidence at which tiered answers agree with the teacher on target_agreement"""
+        labels, confs = self.predict(texts)
+        table = agreement_table(labels, confs, teacher_labels)
+        passing = [row for row in table if row["agreement"] >= target_agreement]
+        self.min_confidence = min(row["threshold"] for row in passing) if passing else 1.01  # never answer
+        chosen = next((row for row in table if row["threshold"] == self.min_confidence), None)
+        self.metadata.update(target_agreement=target_agreement, holdout=len(texts),
+                             min_confidence=self.min_confidence,
+                             holdout_fast_share=chosen["fast_share"] if chosen else 0.0,
+                             fast_only_agreement=round(float(np.mean(np.asarray(labels) == np.asarray(teacher_labels))), 4))
+        return table
+
+    def save(self, path):
+        import joblib
+        joblib.dump(self, path)
+        return path
+
+    @staticmethod
+    def load(path):
+        import joblib
+        return joblib.load(path)
+
+
+def agreement_table(labels, confs, teacher_labels, thresholds=None):
+    """
+    Per threshold: the share of descriptions the fast tier answers and how often the
+    tiered result (fast when confident, else the teacher) agrees with the teacher.
+    """
+    labels, confs, teacher = np.asarray(labels), np.asarray(confs), np.asarray(teacher_labels)
+    if thresholds is None:
+        thresholds = [round(t, 2) for t in np.arange(0.5, 1.0, 0.05)] + [0.97, 0.99]
+    rows = []
+    for threshold in sorted(set(thresholds)):
+        fast = confs >= threshold
+        agree = np.where(fast, labels == teacher, True)
+        rows.append({
+            "threshold": float(threshold),
+            "fast_share": round(float(fast.mean()), 4) if len(fast) else 0.0,
+            "agreement": round(float(agree.mean()), 4) if len(agree) else 1.0,
+            "fast_agreement": round(float((labels == teacher)[fast].mean()), 4) if fast.any() else None,
+        })
+    return rows
+
+
+def split_by_tier(fast_model, texts, min_confidence=None):
+    """
+    Run the fast tier over `texts`: (labels, confs, tiers) with the confident ones filled in
+    and the indices that still need the full path.
+    """
+    n = len(texts)
+    labels, confs, tiers = [None] * n, [None] * n, [FULL] * n
+    if fast_model is None or not n:
+        return labels, confs, tiers, list(range(n))
+    threshold = fast_model.min_confidence if min_confidence is None else min_confidence
+    fast_labels, fast_confs = fast_model.predict(texts)
+    remaining = []
+    for i, (label, conf) in enumerate(zip(fast_labels, fast_confs)):
+        if conf >= threshold:
+            labels[i], confs[i], tiers[i] = label, float(conf), FAST
+        else:
+            remaining.append(i)
+    return labels, confs, tiers, remaining
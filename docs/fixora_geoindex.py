@@ -0,0 +1,253 @@
+"""
+In-memory spatial index of open Fixora reports for duplicate detection.
+
+Reports are bucketed into a fixed lat/lon grid (default 0.001 deg, ~111 m of
+latitude). A "closest open report within R metres" query only looks at the
+grid cells overlapping the circle's bounding box and runs one vectorized
+haversine over those candidates, instead of scanning every open report of the
+organization like the app's Firestore query does.
+
+The index is updated incrementally: `upsert()` when a report is created or its
+status changes, `remove()` when it is closed. A report whose status is not one
+of OPEN_STATUSES is removed on upsert, so the app can simply forward every
+status change.
+
+Optionally every change is appended to an NDJSON journal which is replayed on
+start-up (and compacted once it grows well past the live set), so a restart
+doesn't forget the open reports. The index lives in one process: serve it with
+`fixora_serve.py --mode threads` (or dev), and give each journal a single writer.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+
+EARTH_RADIUS_M = 6371000.0  # same as calculateDistance in duplicateDetectionService.js
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+
+OPEN_STATUSES = ("pending", "assigned", "in_progress")
+
+
+def haversine_m(lat, lon, lats, lons):
+    """Great-circle distance in metres from (lat, lon) to every (lats[i], lons[i])"""
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlmb = np.radians(lons) - math.radians(lon)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoGridIndex:
+    """
+        index = GeoGridIndex()
+        index.upsert("r1", 6.9271, 79.8612, organization_id="colombo", category="potholes")
+        hit = index.nearest(6.9272, 79.8613, radius_m=100, organization_id="colombo")
+        # -> ({"id": "r1", ...}, 14.2) or None
+        index.remove("r1")
+    """
+
+    def __init__(self, cell_deg=0.001, journal_path=None, name="geo"):
+        self.cell_deg = float(cell_deg)
+        self.name = name
+        self.journal_path = journal_path
+        self._n_lon_cells = int(math.ceil(360.0 / self.cell_deg))
+        self._reports = {}  # id -> record dict
+        self._cells = {}    # (lat_cell, lon_cell) -> set of ids
+        self._lock = threading.RLock()
+        self._journal = None
+        self._journal_lines = 0
+
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.candidates_scanned = 0
+
+        if journal_path:
+            self._replay()
+            self._journal = open(journal_path, "a", encoding="utf-8")
+
+    # -----------------------
+    # GRID
+    # -----------------------
+    def _cell(self, lat, lon):
+        return (int(math.floor(lat / self.cell_deg)),
+                int(math.floor((lon + 180.0) / self.cell_deg)) % self._n_lon_cells)
+
+    def _cells_around(self, lat, lon, radius_m):
+        """Grid cells overlapping the bounding box of a circle, or None if that's most of the grid"""
+        dlat = radius_m / METERS_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(89.0, abs(lat))))
+        dlon = min(180.0, radius_m / (METERS_PER_DEGREE * cos_lat))
+        lat_lo = int(math.floor((lat - dlat) / self.cell_deg))
+        lat_hi = int(math.floor((lat + dlat) / self.cell_deg))
+        lon_lo = int(math.floor((lon - dlon + 180.0) / self.cell_deg))
+        lon_hi = int(math.floor((lon + dlon + 180.0) / self.cell_deg))
+        n_cells = (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1)
+        if n_cells > max(64, len(self._cells)):
+            return None  # huge radius: walking the occupied cells is cheaper
+        return [(i, j % self._n_lon_cells)
+                for i in range(lat_lo, lat_hi + 1) for j in range(lon_lo, lon_hi + 1)]
+
+    # -----------------------
+    # UPDATES
+    # -----------------------
+    def upsert(self, report_id, lat=None, lon=None, organization_id=None, category=None,
+               status="pending", _log=True, **extra):
+        """
+        Add or move an open report. A closed status removes it; a status-only update
+        (no coordinates) for an unknown report is ignored. Returns True if indexed.
+        """
+        report_id = str(report_id)
+        if status is not None and status not in OPEN_STATUSES:
+            self.remove(report_id, _log=_log)
+            return False
+
+        with self._lock:
+            current = self._reports.get(report_id)
+            if lat is None or lon is None:
+                if current is None:
+                    return False
+                lat, lon = current["latitude"], current["longitude"]
+            lat, lon = float(lat), float(lon)
+            if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+                raise ValueError(f"Invalid coordinates ({lat}, {lon})")
+
+            record = dict(current or {}, **extra)
+            record.update({"id": report_id, "latitude": lat, "longitude": lon})
+            if organization_id is not None:
+                record["organizationId"] = organization_id
+            if category is not None:
+                record["categorySlug"] = category
+            if status is not None:
+                record["status"] = status
+            record["indexedAt"] = time.time()
+
+            if current is not None:
+                self._discard(report_id, current)
+            self._reports[report_id] = record
+            self._cells.setdefault(self._cell(lat, lon), set()).add(report_id)
+            if _log:
+                self._log({"op": "upsert", "report": record})
+        return True
+
+    def remove(self, report_id, _log=True):
+        """Drop a closed (resolved / rejected / deleted) report; True if it was indexed"""
+        report_id = str(report_id)
+        with self._lock:
+            current = self._reports.pop(report_id, None)
+            if current is None:
+                return False
+            self._discard(report_id, current)
+            if _log:
+                self._log({"op": "remove", "id": report_id})
+        return True
+
+    def _discard(self, report_id, record):
+        cell = self._cell(record["latitude"], record["longitude"])
+        ids = self._cells.get(cell)
+        if ids is not None:
+            ids.discard(report_id)
+            if not ids:
+                del self._cells[cell]
+
+    # -----------------------
+    # QUERIES
+    # -----------------------
+    def within(self, lat, lon, radius_m, organization_id=None, category=None, limit=None, exclude_id=None):
+        """[(record, distance_m), ...] inside the radius, closest first"""
+        started = time.perf_counter()
+        with self._lock:
+            cells = self._cells_around(lat, lon, radius_m)
+            if cells is None:
+                ids = list(self._reports)
+            else:
+                ids = [rid for cell in cells for rid in self._cells.get(cell, ())]
+            records = [
+                self._reports[rid] for rid in ids
+                if (organization_id is None or self._reports[rid].get("organizationId") == organization_id)
+                and (category is None or self._reports[rid].get("categorySlug") == category)
+                and rid != exclude_id
+            ]
+            self.queries += 1
+            self.candidates_scanned += len(records)
+
+        results = []
+        if records:
+            lats = np.fromiter((r["latitude"] for r in records), dtype=np.float64, count=len(records))
+            lons = np.fromiter((r["longitude"] for r in records), dtype=np.float64, count=len(records))
+            dist = haversine_m(lat, lon, lats, lons)
+            inside = np.flatnonzero(dist <= radius_m)
+            order = inside[np.argsort(dist[inside], kind="stable")]
+            if limit:
+                order = order[:limit]
+            results = [(dict(records[i]), float(dist[i])) for i in order]
+
+        with self._lock:
+            self.query_seconds += time.perf_counter() - started
+        return results
+
+    def nearest(self, lat, lon, radius_m, organization_id=None, category=None, exclude_id=None):
+        """(record, distance_m) of the closest open report within radius_m, or None"""
+        hits = self.within(lat, lon, radius_m, organization_id, category, limit=1, exclude_id=exclude_id)
+        return hits[0] if hits else None
+
+    def __len__(self):
+        return len(self._reports)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "reports": len(self._reports),
+                "occupied_cells": len(self._cells),
+                "cell_deg": self.cell_deg,
+                "queries": self.queries,
+                "avg_query_us": round(self.query_seconds / self.queries * 1e6, 1) if self.queries else None,
+                "avg_candidates": round(self.candidates_scanned / self.queries, 2) if self.queries else None,
+                "journal": self.journal_path,
+            }
+
+    # -----------------------
+    # JOURNAL
+    # -----------------------
+    def _log(self, entry):
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        self._journal_lines += 1
+        if self._journal_lines > max(1024, 4 * len(self._reports)):
+            self._compact()
+
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                if entry.get("op") == "upsert":
+                    r = dict(entry["report"])
+                    self.upsert(r.pop("id"), r.pop("latitude"), r.pop("longitude"), _log=False, **r)
+                elif entry.get("op") == "remove":
+                    self.remove(entry["id"], _log=False)
+        self._compact()
+
+    def _compact(self):
+        """Rewrite the journal as one upsert per live report"""
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in self._reports.values():
+                f.write(json.dumps({"op": "upsert", "report": record}) + "\n")
+        os.replace(tmp, self.journal_path)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal_lines = len(self._reports)
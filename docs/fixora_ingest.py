@@ -0,0 +1,230 @@
+"""
+Image ingest for the Fixora inference server: one decode per uploaded photo
+produces the model tensor and the display derivatives.
+
+- The JPEG is decoded in draft mode at the smallest DCT scale that still covers
+  the preview (instead of the model's 224x224), the tensor is resized from that
+  frame, and the frame itself - EXIF-rotated - becomes a medium preview and a
+  small thumbnail (WebP, or JPEG where Pillow lacks WebP).
+- Derivatives are stored content-addressed by the upload's hash (the same key
+  as the prediction cache):  <root>/ab/abcdef.../{preview,thumb}.webp + meta.json
+  An image already stored (or skipped while the writer is busy) is decoded at the
+  same draft scale without keeping the frame, so its tensor is identical to the
+  one its first upload produced.
+- Resizing / encoding / writing runs on a background thread with a bounded
+  queue, so requests only pay for the decode; past the bound new derivatives
+  are skipped (counted in stats) rather than held in memory.
+- `limits()` is the resolution contract for clients: nothing the server makes
+  from an upload is larger than `max_upload_edge` pixels on the long side, so
+  clients can downscale to it before uploading without losing detail the server
+  would have used (the tensor still shifts slightly with resampling).
+"""
+
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from PIL import Image, features
+
+from fixora_preprocess import TARGET_SIZE, decode_frame, preprocess_into, to_tensor
+
+
+VARIANTS = ("thumb", "preview")
+IMAGE_ID_PATTERN = re.compile(r"^[0-9a-f]{16,64}$")
+
+# EXIF orientation -> transposes that display the photo upright (as ImageOps.exif_transpose)
+_ORIENTATION = {
+    2: (Image.Transpose.FLIP_LEFT_RIGHT,),
+    3: (Image.Transpose.ROTATE_180,),
+    4: (Image.Transpose.FLIP_TOP_BOTTOM,),
+    5: (Image.Transpose.TRANSPOSE,),
+    6: (Image.Transpose.ROTATE_270,),
+    7: (Image.Transpose.TRANSVERSE,),
+    8: (Image.Transpose.ROTATE_90,),
+}
+
+
+def upload_limits(thumb_edge, preview_edge, image_format, size=TARGET_SIZE):
+    """What clients may downscale to: the largest thing the server makes from an upload"""
+    return {
+        "max_upload_edge": max(int(preview_edge), *size),
+        "model_input": list(size),
+        "thumb_edge": int(thumb_edge),
+        "preview_edge": int(preview_edge),
+        "format": image_format,
+    }
+
+
+class ImageIngest:
+    """
+        ingest = ImageIngest("/content/fixora_images", thumb_edge=192, preview_edge=800)
+        ingest.decode(fp, image_id, out)        # tensor into `out`, derivatives queued once per id
+        ingest.path(image_id, "thumb")          # -> file path once written, else None
+        ingest.wait(image_id, timeout=2)        # -> True once that photo's derivatives are stored
+        ingest.limits()                         # {"max_upload_edge": 800, ...}
+    """
+
+    def __init__(self, root, thumb_edge=192, preview_edge=800, quality=75, image_format="auto", max_pending=16,
+                 size=TARGET_SIZE):
+        self.root = root
+        self.thumb_edge = int(thumb_edge)
+        self.preview_edge = max(int(preview_edge), self.thumb_edge)
+        self.quality = int(quality)
+        if image_format == "auto":
+            image_format = "webp" if features.check("webp") else "jpeg"
+        self.format = image_format.lower()
+        self.extension = "jpg" if self.format == "jpeg" else self.format
+        self.max_pending = int(max_pending)
+        self.size = size
+        self._lock = threading.Lock()
+        self._pending = set()  # ids queued / being written
+        self._futures = {}  # id -> its write, once queued
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-ingest")
+        self.counts = {"ingested": 0, "already_stored": 0, "skipped_busy": 0, "written": 0, "failed": 0,
+                       "bytes_in": 0, "bytes_written": 0}
+        os.makedirs(root, exist_ok=True)
+
+    # -----------------------
+    # DECODE
+    # -----------------------
+    def decoder(self, image_ids):
+        """decode(i, fp, out) for TensorBufferPool.preprocess: row i belongs to image_ids[i]"""
+        return lambda i, fp, out: self.decode(fp, image_ids[i], out)
+
+    def decode(self, fp, image_id, out=None):
+        """Write the model tensor of `fp` into `out`; queue its derivatives if not stored yet"""
+        if self.stored(image_id):
+            with self._lock:
+                self.counts["already_stored"] += 1
+            return preprocess_into(fp, out, self.size, self.preview_edge)
+        if not self._reserve(image_id):
+            return preprocess_into(fp, out, self.size, self.preview_edge)
+        try:
+            img = Image.open(fp)
+            source = {"width": img.width, "height": img.height, "format": img.format}
+            orientation = img.getexif().get(0x0112, 1)
+            frame = decode_frame(img, self.size, self.preview_edge)
+            tensor = to_tensor(frame.resize(self.size) if frame.size != self.size else frame, out=out)
+        except Exception:
+            self._release(image_id)
+            raise
+        with self._lock:
+            self.counts["ingested"] += 1
+            self.counts["bytes_in"] += _stream_size(fp)
+        future = self._writer.submit(self._write, image_id, frame, orientation, source)
+        with self._lock:
+            if image_id in self._pending:  # not already written and released
+                self._futures[image_id] = future
+        return tensor
+
+    def _reserve(self, image_id):
+        with self._lock:
+            if image_id in self._pending:
+                return False  # the same photo in flight on another request
+            if len(self._pending) >= self.max_pending:
+                self.counts["skipped_busy"] += 1
+                return False
+            self._pending.add(image_id)
+            return True
+
+    def _release(self, image_id):
+        with self._lock:
+            self._pending.discard(image_id)
+            self._futures.pop(image_id, None)
+
+    # -----------------------
+    # DERIVATIVES
+    # -----------------------
+    def _write(self, image_id, frame, orientation, source):
+        try:
+            for method in _ORIENTATION.get(orientation, ()):
+                frame = frame.transpose(method)
+            preview = frame.copy()
+            preview.thumbnail((self.preview_edge, self.preview_edge), Image.LANCZOS)
+            thumb = preview.copy()
+            thumb.thumbnail((self.thumb_edge, self.thumb_edge), Image.LANCZOS)
+
+            directory = self._dir(image_id)
+            os.makedirs(directory, exist_ok=True)
+            meta = {"id": image_id, "format": self.format, "source": source, "variants": {}}
+            written = 0
+            for name, image in (("preview", preview), ("thumb", thumb)):
+                path = os.path.join(directory, f"{name}.{self.extension}")
+                tmp = f"{path}.{os.getpid()}.tmp"  # prefork workers may write the same photo at once
+                image.save(tmp, format=self.format.upper(), quality=self.quality)
+                os.replace(tmp, path)
+                meta["variants"][name] = {"width": image.width, "height": image.height,
+                                          "bytes": os.path.getsize(path)}
+                written += meta["variants"][name]["bytes"]
+            # meta.json last: its presence means every variant is complete
+            tmp = os.path.join(directory, f"meta.json.{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(directory, "meta.json"))
+            with self._lock:
+                self.counts["written"] += 1
+                self.counts["bytes_written"] += written
+        except Exception as e:
+            print(f"⚠️ Could not write derivatives for {image_id}: {e}")
+            with self._lock:
+                self.counts["failed"] += 1
+        finally:
+            self._release(image_id)
+
+    def _dir(self, image_id):
+        return os.path.join(self.root, image_id[:2], image_id)
+
+    def stored(self, image_id):
+        return os.path.exists(os.path.join(self._dir(image_id), "meta.json"))
+
+    def path(self, image_id, variant):
+        """File of a stored derivative, or None"""
+        if variant not in VARIANTS or not IMAGE_ID_PATTERN.match(image_id or "") or not self.stored(image_id):
+            return None
+        path = os.path.join(self._dir(image_id), f"{variant}.{self.extension}")
+        return path if os.path.exists(path) else None  # written with another FIXORA_IMAGE_FORMAT
+
+    def describe(self, image_id):
+        """meta.json of a stored image ({"id", "format", "source", "variants": {...}}), or None"""
+        if not IMAGE_ID_PATTERN.match(image_id or "") or not self.stored(image_id):
+            return None
+        with open(os.path.join(self._dir(image_id), "meta.json")) as f:
+            return json.load(f)
+
+    def pending(self, image_id):
+        with self._lock:
+            return image_id in self._pending
+
+    def wait(self, image_id, timeout=None):
+        """Wait up to `timeout` for this photo's queued derivatives only; True once stored"""
+        with self._lock:
+            future = self._futures.get(image_id)
+        if future is not None:
+            try:
+                future.result(timeout)
+            except FutureTimeout:
+                return False
+        return self.stored(image_id)
+
+    def flush(self, timeout=None):
+        """Wait for queued derivatives (tests / shutdown)"""
+        self._writer.submit(lambda: None).result(timeout)
+
+    def limits(self):
+        return upload_limits(self.thumb_edge, self.preview_edge, self.format, self.size)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, pending=len(self._pending), root=self.root, **self.limits())
+
+
+def _stream_size(fp):
+    if hasattr(fp, "getbuffer"):
+        with fp.getbuffer() as view:
+            return view.nbytes
+    try:
+        return os.fstat(fp.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return 0
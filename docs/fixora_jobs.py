@@ -0,0 +1,247 @@
+"""
+Asynchronous jobs for the Fixora inference server.
+
+`POST /jobs` hands the work to a bounded worker pool and returns a job id at
+once; the client then polls `GET /jobs/<id>`, long-polls it (`?wait=20` returns
+as soon as the job finishes), or has the finished job POSTed to a callback URL
+(webhook). A burst of submissions waits in the pool's queue instead of holding
+HTTP connections open over ngrok, and beyond `max_pending` jobs submit raises
+QueueFull (503 + Retry-After).
+
+Jobs live in memory for `ttl_seconds` after they finish. They belong to the
+process that accepted them, so serve with `fixora_serve.py --mode threads` (or
+dev); a pre-fork worker can't answer for another worker's job.
+
+Webhooks are only sent to URLs whose scheme, host and port match an entry of
+`webhook_allowlist` exactly (by default the local machine, e.g.
+fixora_webhook_stub.py) and whose path is under that entry's path, with retries
+and exponential backoff.
+"""
+
+import json
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fixora_batcher import QueueFull
+
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+DEFAULT_WEBHOOK_ALLOWLIST = ("http://127.0.0.1:5055", "http://localhost:5055")  # fixora_webhook_stub.py
+
+
+def _origin(url):
+    """(scheme, hostname, port, path) of a URL; the port defaults by scheme, ValueError if malformed"""
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    port = parts.port or {"http": 80, "https": 443}.get(scheme)
+    return scheme, (parts.hostname or "").lower(), port, parts.path or "/"
+
+
+def _allows(entry, target):
+    """Same scheme, host and port, and the target path under the entry's path"""
+    if entry[:3] != target[:3]:
+        return False
+    prefix = entry[3].rstrip("/")
+    return target[3] == prefix or target[3].startswith(prefix + "/")
+
+
+class _RefuseRedirect(urllib.request.HTTPRedirectHandler):
+    """A 3xx from the receiver is an error, not a hop to a host the allowlist never saw"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_NO_REDIRECTS = urllib.request.build_opener(_RefuseRedirect)
+
+
+class Job:
+    __slots__ = ("id", "state", "result", "error", "created_at", "started_at", "finished_at",
+                 "callback_url", "webhook", "_done")
+
+    def __init__(self, callback_url=None):
+        self.id = uuid.uuid4().hex
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.callback_url = callback_url
+        self.webhook = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def to_dict(self):
+        out = {
+            "jobId": self.id,
+            "status": self.state,
+            "createdAt": self.created_at,
+            "queuedMs": round(((self.started_at or time.time()) - self.created_at) * 1000.0, 1),
+        }
+        if self.finished:
+            out["runMs"] = round((self.finished_at - self.started_at) * 1000.0, 1) if self.started_at else None
+            out["result"] = self.result
+            if self.error:
+                out["error"] = self.error
+        if self.webhook is not None:
+            out["webhook"] = dict(self.webhook)
+        return out
+
+
+class JobRunner:
+    """
+        jobs = JobRunner(workers=4, max_pending=64)
+        job = jobs.submit(lambda: analyze(...), callback_url="http://127.0.0.1:5055/hook")
+        jobs.wait(job, timeout=20)
+        jobs.get(job.id).to_dict()   # {"jobId", "status", "result", ...}
+    """
+
+    def __init__(self, workers=4, max_pending=64, ttl_seconds=3600, webhook_allowlist=DEFAULT_WEBHOOK_ALLOWLIST,
+                 webhook_timeout=5.0, webhook_retries=3, name="jobs"):
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.ttl_seconds = float(ttl_seconds)
+        self.webhook_allowlist = tuple(p for p in webhook_allowlist if p)
+        self._allowed = [_origin(entry) for entry in self.webhook_allowlist]
+        self.webhook_timeout = float(webhook_timeout)
+        self.webhook_retries = max(1, int(webhook_retries))
+        self.name = name
+
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{name}-worker")
+        self._webhooks = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"{name}-webhook")
+        self._run_seconds = None  # EWMA, for Retry-After
+        self.counts = {"submitted": 0, "rejected": 0, DONE: 0, FAILED: 0, "webhooks_delivered": 0,
+                       "webhooks_failed": 0}
+
+    # -----------------------
+    # PUBLIC API
+    # -----------------------
+    def check_callback(self, url):
+        """ValueError unless `url` is an http(s) URL matching an allowlist entry (scheme, host, port, path prefix)"""
+        if not url:
+            return None
+        try:
+            target = _origin(url)
+        except ValueError:
+            raise ValueError("callbackUrl must be an http(s) URL")
+        if target[0] not in ("http", "https") or not target[1]:
+            raise ValueError("callbackUrl must be an http(s) URL")
+        if not any(_allows(entry, target) for entry in self._allowed):
+            raise ValueError("callbackUrl is not in FIXORA_WEBHOOK_ALLOWLIST")
+        return url
+
+    def submit(self, fn, callback_url=None):
+        """Queue `fn()` (its return value must be JSON-serializable); QueueFull past max_pending"""
+        callback_url = self.check_callback(callback_url)
+        job = Job(callback_url)
+        with self._lock:
+            self._expire()
+            if self._pending >= self.max_pending:
+                self.counts["rejected"] += 1
+                raise QueueFull(f"{self.name}: {self._pending} jobs pending", retry_after=self.retry_after())
+            self._pending += 1
+            self._jobs[job.id] = job
+            self.counts["submitted"] += 1
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def wait(self, job, timeout):
+        """True once the job has finished (blocks at most `timeout` seconds)"""
+        return job._done.wait(timeout=max(0.0, timeout))
+
+    def retry_after(self):
+        per_job = self._run_seconds or 1.0
+        return int(min(60, max(1, round(self._pending * per_job / self.workers))))
+
+    def stats(self):
+        with self._lock:
+            states = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "jobs": states,
+                "avg_run_ms": round(self._run_seconds * 1000.0, 1) if self._run_seconds else None,
+                **self.counts,
+            }
+
+    # -----------------------
+    # WORKER
+    # -----------------------
+    def _run(self, job, fn):
+        job.state = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn()
+            job.state = DONE
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.state = FAILED
+            print(f"❌ Job {job.id} failed: {job.error}")
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+            seconds = job.finished_at - job.started_at
+            with self._lock:
+                self._pending -= 1
+                self.counts[job.state] += 1
+                self._run_seconds = seconds if self._run_seconds is None else 0.8 * self._run_seconds + 0.2 * seconds
+            job._done.set()
+            if job.callback_url:
+                job.webhook = {"url": job.callback_url, "delivered": False, "attempts": 0}
+                self._webhooks.submit(self._deliver, job)
+
+    def _expire(self):
+        """Drop finished jobs older than ttl_seconds (caller holds the lock)"""
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [jid for jid, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _deliver(self, job):
+        body = json.dumps(job.to_dict()).encode("utf-8")
+        for attempt in range(1, self.webhook_retries + 1):
+            job.webhook["attempts"] = attempt
+            try:
+                req = urllib.request.Request(job.callback_url, data=body, method="POST", headers={
+                    "Content-Type": "application/json",
+                    "X-Fixora-Job-Id": job.id,
+                })
+                with _NO_REDIRECTS.open(req, timeout=self.webhook_timeout) as resp:
+                    job.webhook.update(delivered=True, status=resp.status)
+                    job.webhook.pop("error", None)
+                with self._lock:
+                    self.counts["webhooks_delivered"] += 1
+                return
+            except urllib.error.HTTPError as e:
+                job.webhook.update(status=e.code, error=str(e))
+                if 400 <= e.code < 500 and e.code != 429:
+                    break  # the receiver rejected it; retrying won't help
+            except Exception as e:
+                job.webhook["error"] = f"{type(e).__name__}: {e}"
+            if attempt < self.webhook_retries:
+                time.sleep(2 ** (attempt - 1))
+        with self._lock:
+            self.counts["webhooks_failed"] += 1
+        print(f"⚠️ Webhook for job {job.id} not delivered after {job.webhook['attempts']} attempt(s)")
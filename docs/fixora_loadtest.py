@@ -0,0 +1,285 @@
+"""
+HTTP load generator for the Fixora inference server.
+
+closed  N concurrent clients each send a request, wait for the answer, and
+        immediately send the next one, for --duration seconds (max throughput).
+open    requests arrive at --rate per second (Poisson arrivals) whether or not
+        earlier ones finished, like real app traffic; latency is measured from
+        the scheduled send time, so server queueing isn't hidden
+        (no coordinated omission).
+
+Prints throughput and latency percentiles per endpoint, e.g. to compare
+`fixora_serve.py --mode threads` against `--mode prefork --workers 2/4/8` on the
+same host. With --server-pid (Linux) it also reports the server's peak RSS.
+
+Usage:
+    python fixora_loadtest.py --url http://127.0.0.1:5000 --endpoint classify --concurrency 16
+    python fixora_loadtest.py --endpoint predict_urgency --concurrency 1,2,4,8,16 --duration 20
+    python fixora_loadtest.py --endpoint classify --mode open --rate 2,5,10 --server-pid 1234
+    python fixora_loadtest.py --endpoint classify --image photo.jpg
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import urllib.error
+import urllib.request
+import uuid
+
+import numpy as np
+from PIL import Image
+
+
+SAMPLE_DESCRIPTIONS = [
+    "Large pothole in the middle of the road, cars are swerving to avoid it",
+    "Street light has been out for a week near the school gate",
+    "Gas smell near the market, people are worried it might explode",
+    "Garbage has not been collected for days and is overflowing onto the street",
+    "Open manhole without any cover on the main footpath, very dangerous at night",
+    "Water pipe burst and water is flooding the street",
+]
+
+
+def synthetic_jpeg(width=1600, height=1200, seed=0):
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (height // 32, width // 32, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(coarse).resize((width, height), Image.BICUBIC).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def multipart_body(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def build_requests(endpoint, image_bytes, images_per_report=3, descriptions=None, variants=None):
+    """A rotation of (path, body, content_type) so caches don't see one payload only"""
+    descriptions = descriptions or SAMPLE_DESCRIPTIONS
+    requests = []
+    for i in range(variants or len(descriptions)):
+        text = descriptions[i % len(descriptions)]
+        # Vary the bytes after the JPEG end marker so the content-hash cache doesn't answer everything
+        img = image_bytes + i.to_bytes(4, "big")
+        if endpoint == "classify":
+            body = json.dumps({"image": base64.b64encode(img).decode()}).encode()
+            requests.append(("/classify", body, "application/json"))
+        elif endpoint == "predict_urgency":
+            body = json.dumps({"text": f"{text} (#{i})"}).encode()
+            requests.append(("/predict_urgency", body, "application/json"))
+        elif endpoint == "predict":
+            files = [("images", (f"img_{k}.jpg", img)) for k in range(images_per_report)]
+            body, ctype = multipart_body({"description": text}, files)
+            requests.append(("/predict", body, ctype))
+        else:
+            raise ValueError(f"Unknown endpoint {endpoint}")
+    return requests
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values)))]
+
+
+def send(base_url, request, timeout):
+    """POST one (path, body, content_type); returns the HTTP status (or "error")"""
+    path, body, ctype = request
+    req = urllib.request.Request(base_url + path, data=body, headers={"Content-Type": ctype})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return "error"
+
+
+def summarize(latencies, statuses, wall):
+    latencies.sort()
+    return {
+        "requests": sum(statuses.values()),
+        "ok": len(latencies),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1) if latencies else None,
+            "p95": round(percentile(latencies, 95), 1) if latencies else None,
+            "p99": round(percentile(latencies, 99), 1) if latencies else None,
+            "max": round(latencies[-1], 1) if latencies else None,
+        },
+    }
+
+
+def run_closed_loop(base_url, requests, concurrency, duration, timeout=30.0):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(worker_id):
+        i = worker_id
+        while time.perf_counter() < stop_at:
+            request = requests[i % len(requests)]
+            i += concurrency
+            started = time.perf_counter()
+            status = send(base_url, request, timeout)
+            elapsed = (time.perf_counter() - started) * 1000.0
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    return dict(mode="closed", concurrency=concurrency, **summarize(latencies, statuses, wall))
+
+
+def run_open_loop(base_url, requests, rate, duration, timeout=30.0, max_in_flight=256, seed=0):
+    """
+    Poisson arrivals at `rate` req/s for `duration` s. Latency runs from each request's
+    scheduled start, so time spent queued behind a slow server counts against it.
+    """
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    rng = np.random.default_rng(seed)
+    gaps = rng.exponential(1.0 / rate, size=int(rate * duration * 2) + 16)
+    schedule = np.cumsum(gaps)
+    schedule = schedule[schedule < duration]
+    lag_ms = []
+
+    def fire(request, scheduled_at):
+        status = send(base_url, request, timeout)
+        elapsed = (time.perf_counter() - scheduled_at) * 1000.0
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for i, offset in enumerate(schedule):
+            scheduled_at = started + offset
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag_ms.append(-delay * 1000.0)
+            pool.submit(fire, requests[i % len(requests)], scheduled_at)
+    wall = time.perf_counter() - started
+
+    result = dict(mode="open", offered_rps=rate, **summarize(latencies, statuses, wall))
+    result["dispatch_lag_ms_max"] = round(max(lag_ms), 1) if lag_ms else 0.0
+    return result
+
+
+# -----------------------
+# SERVER MEMORY (Linux /proc)
+# -----------------------
+def _proc_status(pid):
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                fields[key] = value.strip()
+    except OSError:
+        return None
+    return fields
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(c) for c in f.read().split()]
+    except OSError:
+        return []
+
+
+def process_tree_memory(pid):
+    """
+    {"rss_mb", "peak_rss_mb"} summed over `pid` and its children (e.g. gunicorn
+    master + workers). Peak is each process's VmHWM high-water mark. None off Linux.
+    """
+    pids, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        pids.append(p)
+        stack.extend(_children(p))
+    rss = peak = 0.0
+    for p in pids:
+        status = _proc_status(p)
+        if status is None:
+            continue
+        rss += int(status.get("VmRSS", "0 kB").split()[0]) / 1024.0
+        peak += int(status.get("VmHWM", "0 kB").split()[0]) / 1024.0
+    if not rss and not os.path.exists(f"/proc/{pid}"):
+        return None
+    return {"processes": len(pids), "rss_mb": round(rss, 1), "peak_rss_mb": round(peak, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoint", choices=["classify", "predict_urgency", "predict"], default="classify")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", default="8", help="closed loop: comma-separated list to sweep, e.g. 1,4,16")
+    parser.add_argument("--rate", default="5", help="open loop: comma-separated req/s to sweep, e.g. 2,5,10")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per level")
+    parser.add_argument("--image", help="JPEG to send (default: synthetic 1600x1200)")
+    parser.add_argument("--variants", type=int, help="distinct payloads to rotate through (default: 6)")
+    parser.add_argument("--server-pid", type=int, help="also report this process tree's RSS / peak RSS (Linux)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = synthetic_jpeg()
+    requests = build_requests(args.endpoint, image_bytes, variants=args.variants)
+    base_url = args.url.rstrip("/")
+
+    levels = args.concurrency if args.mode == "closed" else args.rate
+    for level in [float(c) for c in levels.split(",")]:
+        if args.mode == "closed":
+            result = run_closed_loop(base_url, requests, int(level), args.duration)
+            label = f"c={int(level):<4}"
+        else:
+            result = run_open_loop(base_url, requests, level, args.duration)
+            label = f"r={level:<6g}"
+        result["endpoint"] = args.endpoint
+        if args.server_pid:
+            result["server_memory"] = process_tree_memory(args.server_pid)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            lat = result["latency_ms"]
+            memory = result.get("server_memory") or {}
+            print(f"{args.endpoint:<16} {label} {result['throughput_rps']:8.2f} req/s   "
+                  f"p50 {lat['p50']} ms   p95 {lat['p95']} ms   p99 {lat['p99']} ms   {result['statuses']}"
+                  + (f"   peak RSS {memory['peak_rss_mb']} MB" if memory else ""))
+
+
+if __name__ == "__main__":
+    main()
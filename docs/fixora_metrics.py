@@ -0,0 +1,292 @@
+"""
+Request metrics for the Fixora inference server.
+
+- Histogram: fixed log-spaced buckets (constant memory, one bisect + add per
+  observation), with p50/p95/p99 estimated from the buckets.
+- Metrics: per-endpoint request latency, per-stage latency (decode,
+  preprocess, queue wait, inference, encode, classify, ...) and request
+  counters by outcome (success / resubmit / denied / client_error /
+  unavailable / error), rendered in the Prometheus text format for /metrics.
+- ComputeSavings: units of work run vs. skipped by early exits, and the
+  time that saved (estimated from the average cost of a unit that ran).
+
+A request's stages are collected on a thread-local RequestTiming, so helpers
+deep in the call stack can time themselves with `metrics.stage("preprocess")`
+without threading a timer through every call. Outside a tracked request
+stage() is a no-op.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds; +Inf is implied
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count, self.min, self.max
+
+    def quantile(self, q, snapshot=None):
+        """Linear interpolation inside the bucket holding the q-th observation, clamped to [min, max]"""
+        counts, _, count, low, high = snapshot or self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else high
+                return min(high, max(low, lower + (upper - lower) * (rank - seen) / n))
+            seen += n
+        return high
+
+    def summary(self):
+        snap = self.snapshot()
+        counts, total, count = snap[:3]
+        ms = lambda s: round(s * 1000.0, 3) if s is not None else None
+        return {
+            "count": count,
+            "avg_ms": ms(total / count) if count else None,
+            "p50_ms": ms(self.quantile(0.50, snap)),
+            "p95_ms": ms(self.quantile(0.95, snap)),
+            "p99_ms": ms(self.quantile(0.99, snap)),
+        }
+
+
+class RequestTiming:
+    """Stage durations of one request, in the order they first ran"""
+
+    __slots__ = ("endpoint", "started", "stages", "outcome")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.outcome = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total=None):
+        """Server-Timing header value, e.g. 'decode;dur=1.2, inference;dur=31.0, total;dur=40.3'"""
+        parts = [f"{name};dur={seconds * 1000.0:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={(total if total is not None else self.elapsed()) * 1000.0:.1f}")
+        return ", ".join(parts)
+
+
+class ComputeSavings:
+    """
+    Work skipped by short-circuiting, per unit of work ("image", "text"): how many
+    units ran and how many were skipped, with the skipped time estimated from the
+    recent average cost (EWMA) of the units that did run.
+    """
+
+    def __init__(self, alpha=0.2):
+        self.alpha = float(alpha)
+        self._lock = threading.Lock()
+        self._units = {}  # unit -> [ran, skipped, avg seconds]
+        self._exits = {}  # reason -> count
+
+    def _unit(self, unit):
+        return self._units.setdefault(unit, [0, 0, None])
+
+    def ran(self, unit, seconds, n=1):
+        with self._lock:
+            counts = self._unit(unit)
+            counts[0] += n
+            per_unit = seconds / max(1, n)
+            counts[2] = per_unit if counts[2] is None else (1.0 - self.alpha) * counts[2] + self.alpha * per_unit
+
+    def skipped(self, unit, n=1):
+        if n > 0:
+            with self._lock:
+                self._unit(unit)[1] += n
+
+    def exit(self, reason, n=1):
+        with self._lock:
+            self._exits[reason] = self._exits.get(reason, 0) + n
+
+    def stats(self):
+        with self._lock:
+            return {
+                "exits": dict(self._exits),
+                "units": {
+                    unit: {
+                        "ran": ran,
+                        "skipped": skipped,
+                        "avg_ms": round(avg * 1000.0, 2) if avg is not None else None,
+                        "saved_ms_estimate": round(skipped * avg * 1000.0, 1) if avg is not None else None,
+                    }
+                    for unit, (ran, skipped, avg) in sorted(self._units.items())
+                },
+            }
+
+
+def _labels(pairs):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+
+class Metrics:
+    """
+        metrics = Metrics()
+        with metrics.request("classify") as timing:
+            with metrics.stage("decode"):
+                ...
+            metrics.set_outcome("success")
+        metrics.prometheus()
+    """
+
+    def __init__(self, namespace="fixora"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._requests = {}   # endpoint -> Histogram
+        self._stages = {}     # (endpoint, stage) -> Histogram
+        self._counters = {}   # (endpoint, outcome) -> int
+        self._local = threading.local()
+
+    def _histogram(self, table, key):
+        hist = table.get(key)
+        if hist is None:
+            with self._lock:
+                hist = table.setdefault(key, Histogram())
+        return hist
+
+    # -----------------------
+    # RECORDING
+    # -----------------------
+    def current(self):
+        return getattr(self._local, "timing", None)
+
+    @contextmanager
+    def request(self, endpoint):
+        """Track one request on this thread; an escaping exception counts as outcome "error"."""
+        timing = RequestTiming(endpoint)
+        previous, self._local.timing = self.current(), timing
+        try:
+            yield timing
+        except Exception:
+            timing.outcome = "error"
+            raise
+        finally:
+            self._local.timing = previous
+            self.finish(timing)
+
+    def finish(self, timing, total=None):
+        self._histogram(self._requests, timing.endpoint).observe(total if total is not None else timing.elapsed())
+        for stage, seconds in timing.stages.items():
+            self._histogram(self._stages, (timing.endpoint, stage)).observe(seconds)
+        key = (timing.endpoint, timing.outcome or "success")
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    @contextmanager
+    def stage(self, name):
+        timing = self.current()
+        if timing is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing.add(name, time.perf_counter() - started)
+
+    def add_stage(self, name, seconds):
+        """Record a duration measured elsewhere (e.g. queue wait reported by a batcher)"""
+        timing = self.current()
+        if timing is not None and seconds is not None:
+            timing.add(name, seconds)
+
+    def set_outcome(self, outcome):
+        timing = self.current()
+        if timing is not None:
+            timing.outcome = outcome
+
+    # -----------------------
+    # REPORTING
+    # -----------------------
+    def summary(self):
+        """{endpoint: {latency, stages, outcomes}} with bucket-estimated percentiles"""
+        with self._lock:
+            requests = dict(self._requests)
+            stages = dict(self._stages)
+            counters = dict(self._counters)
+        out = {}
+        for endpoint, hist in sorted(requests.items()):
+            out[endpoint] = {
+                "latency": hist.summary(),
+                "stages": {stage: h.summary() for (ep, stage), h in sorted(stages.items()) if ep == endpoint},
+                "outcomes": {outcome: n for (ep, outcome), n in sorted(counters.items()) if ep == endpoint},
+            }
+        return out
+
+    def _histogram_lines(self, name, table, label_names):
+        lines = []
+        for key, hist in sorted(table.items()):
+            labels = list(zip(label_names, key if isinstance(key, tuple) else (key,)))
+            counts, total, count = hist.snapshot()[:3]
+            cumulative = 0
+            for bound, n in zip(list(hist.buckets) + ["+Inf"], counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return lines
+
+    def prometheus(self, gauges=()):
+        """
+        Prometheus text exposition. `gauges` adds extra series as
+        (name, type, help, [(labels dict, value), ...]) tuples.
+        """
+        ns = self.namespace
+        with self._lock:
+            requests = dict(self._requests)
+            stages = dict(self._stages)
+            counters = dict(self._counters)
+
+        lines = [f"# HELP {ns}_request_duration_seconds End-to-end request latency per endpoint",
+                 f"# TYPE {ns}_request_duration_seconds histogram"]
+        lines += self._histogram_lines(f"{ns}_request_duration_seconds", requests, ("endpoint",))
+        lines += [f"# HELP {ns}_stage_duration_seconds Latency of each request stage",
+                  f"# TYPE {ns}_stage_duration_seconds histogram"]
+        lines += self._histogram_lines(f"{ns}_stage_duration_seconds", stages, ("endpoint", "stage"))
+        lines += [f"# HELP {ns}_requests_total Requests per endpoint and outcome",
+                  f"# TYPE {ns}_requests_total counter"]
+        for (endpoint, outcome), n in sorted(counters.items()):
+            lines.append(f"{ns}_requests_total{_labels([('endpoint', endpoint), ('outcome', outcome)])} {n}")
+
+        for name, kind, help_text, samples in gauges:
+            lines += [f"# HELP {ns}_{name} {help_text}", f"# TYPE {ns}_{name} {kind}"]
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{ns}_{name}{_labels(sorted(labels.items()))} {float(value):g}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,405 @@
+"""
+Background model loading for the Fixora inference server.
+
+Every model is loaded (and optionally warmed up) in its own thread, so the HTTP
+server comes up immediately and slow artifacts (TensorFlow, SentenceTransformer)
+load side by side instead of one after another. Each slot reports its own
+state and timings for the readiness probe.
+
+For pre-fork servers, `preload()` loads the fork-safe slots in the master so
+workers share their memory copy-on-write; `after_fork()` then loads the rest
+(e.g. TensorFlow, which must not be initialized before fork) in each worker.
+
+Hot swap: slots belong to a `group` (a model family) whose artifacts come from a
+versioned source (fixora_registry.ModelVersion). `reload()` loads and warms a new
+version of every slot in the group in the background while the old one keeps
+serving, then swaps the whole group at once (or keeps it as a shadow candidate).
+A request calls `pin()` first: until `unpin()` it sees the models and versions
+that were live when it started, even if a swap happens meanwhile, and the old
+models stay in memory until their last request is done. `watch()` polls the
+sources and reloads a group when its version changes.
+"""
+
+import contextvars
+import functools
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+PENDING, LOADING, WARMING, READY, FAILED = "pending", "loading", "warming", "ready", "failed"
+
+# (models, sources) a request pinned; see ModelLoader.pin
+_PINNED = contextvars.ContextVar("fixora_pinned_models", default=None)
+
+
+class ModelNotReady(Exception):
+    """Raised when a model is requested before it finished loading (or after it failed)"""
+
+
+class ModelSlot:
+    def __init__(self, name, loader, warmup=None, required=True, fork_safe=True, group=None):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.required = required
+        self.fork_safe = fork_safe
+        self.group = group  # loader(source) for grouped slots, loader() otherwise
+
+        self.state = PENDING
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.ready_at = None
+        self._done = threading.Event()
+
+    def call_loader(self, source):
+        return self.loader(source) if self.group else self.loader()
+
+    def load(self, warm_up=True, source=None):
+        self.state = LOADING
+        started = time.perf_counter()
+        try:
+            value = self.call_loader(source)
+            self.load_seconds = time.perf_counter() - started
+            if warm_up and self.warmup is not None and value is not None:
+                self.state = WARMING
+                warm_started = time.perf_counter()
+                self.warmup(value)
+                self.warmup_seconds = time.perf_counter() - warm_started
+            self.value = value
+            self.state = READY
+            self.ready_at = time.time()
+            print(f"✅ {self.name} ready ({self.load_seconds:.1f}s load"
+                  + (f", {self.warmup_seconds:.1f}s warm-up)" if self.warmup_seconds is not None else ")"))
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = FAILED
+            print(f"❌ {self.name} failed to load: {self.error}")
+            traceback.print_exc()
+        finally:
+            self._done.set()
+
+    def warm(self):
+        """Run the warm-up on an already loaded model (e.g. in a worker after fork)"""
+        if self.warmup is None or self.value is None:
+            return
+        try:
+            started = time.perf_counter()
+            self.warmup(self.value)
+            self.warmup_seconds = time.perf_counter() - started
+        except Exception as e:
+            print(f"⚠️ {self.name} warm-up failed: {e}")
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise ModelNotReady(f"Model '{self.name}' is still {self.state}")
+        if self.state != READY:
+            raise ModelNotReady(f"Model '{self.name}' failed to load: {self.error}")
+        return self.value
+
+    def status(self):
+        return {
+            "state": self.state,
+            "required": self.required,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+class ModelLoader:
+    """
+    Named model slots loaded concurrently in background threads.
+
+        models = ModelLoader()
+        models.add("image", load_image_model, warmup=warm_image_model)
+        models.start()
+        ...
+        img_model = models.get("image")          # raises ModelNotReady until loaded
+    """
+
+    def __init__(self, warm_up=True, resolve=None):
+        self.warm_up = warm_up
+        self.resolve = resolve  # group -> (live source, shadow candidate source or None)
+        self._slots = {}
+        self._started_at = None
+        self._executor = None
+
+        self._lock = threading.Lock()
+        self._sources = {}     # group -> live source
+        self._candidates = {}  # group -> (source, {name: value}) loaded beside the live models
+        self._reloads = {}     # group -> last reload's status
+        self.reload_counts = {"swapped": 0, "shadowed": 0, "failed": 0}
+        self._watch_interval = 0
+        self._watch_pid = None
+
+    def add(self, name, loader, warmup=None, required=True, fork_safe=True, group=None):
+        self._slots[name] = ModelSlot(name, loader, warmup=warmup, required=required, fork_safe=fork_safe, group=group)
+
+    def _groups(self):
+        return sorted({slot.group for slot in self._slots.values() if slot.group})
+
+    def _group_slots(self, group):
+        return [slot for slot in self._slots.values() if slot.group == group]
+
+    def _source_for(self, slot):
+        """The group's live source, resolved on first use (None for ungrouped slots)"""
+        if not slot.group:
+            return None
+        with self._lock:
+            if slot.group not in self._sources:
+                self._sources[slot.group] = self.resolve(slot.group)[0]
+            return self._sources[slot.group]
+
+    def _load_slot(self, slot, warm_up):
+        try:
+            source = self._source_for(slot)
+        except Exception as e:
+            slot.error = f"{type(e).__name__}: {e}"
+            slot.state = FAILED
+            slot._done.set()
+            print(f"❌ {slot.name}: no {slot.group} version to load: {slot.error}")
+            return
+        slot.load(warm_up, source)
+
+    def start(self):
+        """Kick off every pending load in parallel and return immediately"""
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        self._start_watch()
+        pending = [slot for slot in self._slots.values() if slot.state == PENDING]
+        if not pending:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="model-load")
+        for slot in pending:
+            self._executor.submit(self._load_slot, slot, self.warm_up)
+        self._executor.shutdown(wait=False)
+
+    def preload(self):
+        """
+        Load every fork-safe slot in parallel and block until done, without warm-up
+        (inference would start framework thread pools that don't survive fork).
+        Call in a pre-fork master; workers call after_fork().
+        """
+        self._started_at = time.perf_counter()
+        slots = [slot for slot in self._slots.values() if slot.fork_safe and slot.state == PENDING]
+        with ThreadPoolExecutor(max_workers=max(1, len(slots)), thread_name_prefix="model-preload") as pool:
+            list(pool.map(lambda slot: self._load_slot(slot, False), slots))
+
+    def after_fork(self):
+        """In a forked worker: warm up the inherited models and load the rest in the background"""
+        preloaded = [slot for slot in self._slots.values() if slot.state == READY]
+        self.start()
+        if self.warm_up and preloaded:
+            threading.Thread(
+                target=lambda: [slot.warm() for slot in preloaded], name="model-warmup", daemon=True
+            ).start()
+
+    def get(self, name, timeout=0):
+        """The loaded model (the pinned one inside a pin), waiting up to `timeout` seconds for it"""
+        pinned = _PINNED.get()
+        if pinned is not None and name in pinned[0]:
+            return pinned[0][name]
+        return self._slots[name].wait(timeout)
+
+    def wait(self, names, timeout=0):
+        """Wait for several models, sharing one `timeout` budget"""
+        deadline = time.perf_counter() + (timeout or 0)
+        for name in names:
+            self.get(name, max(0.0, deadline - time.perf_counter()))
+
+    def is_ready(self, names=None):
+        slots = [self._slots[n] for n in names] if names else [s for s in self._slots.values() if s.required]
+        return all(s.state == READY for s in slots)
+
+    def status(self):
+        return {name: slot.status() for name, slot in self._slots.items()}
+
+    def uptime(self):
+        return round(time.perf_counter() - self._started_at, 3) if self._started_at else None
+
+    # -----------------------
+    # VERSIONS / PINNING
+    # -----------------------
+    def pin(self):
+        """
+        Freeze the models and versions the calling context sees (a request, or a job
+        via bind()) until unpin(token): a swap meanwhile doesn't change them.
+        """
+        with self._lock:
+            values = {name: slot.value for name, slot in self._slots.items() if slot.state == READY}
+            sources = dict(self._sources)
+        return _PINNED.set((values, sources))
+
+    def unpin(self, token):
+        try:
+            _PINNED.reset(token)
+        except ValueError:  # reset from another context (e.g. a streamed response's teardown)
+            _PINNED.set(None)
+
+    def bind(self, fn):
+        """`fn` to run in another thread with the caller's pinned models"""
+        return functools.partial(contextvars.copy_context().run, fn)
+
+    def source(self, group):
+        """The group's source: the pinned one inside a pin, else the live one"""
+        pinned = _PINNED.get()
+        if pinned is not None and group in pinned[1]:
+            return pinned[1][group]
+        with self._lock:
+            return self._sources.get(group)
+
+    def version(self, group):
+        source = self.source(group)
+        return source.version if source is not None else None
+
+    def live_version(self, group):
+        with self._lock:
+            source = self._sources.get(group)
+        return source.version if source is not None else None
+
+    def versions(self):
+        return {group: self.version(group) for group in self._groups()}
+
+    def candidate(self, group):
+        """(source, {name: model}) of the group's shadow candidate, or None"""
+        with self._lock:
+            return self._candidates.get(group)
+
+    def drop_candidate(self, group):
+        with self._lock:
+            dropped = self._candidates.pop(group, None)
+        if dropped is not None:
+            print(f"🗑️ {group}: dropped shadow candidate {dropped[0].version}")
+        return dropped is not None
+
+    # -----------------------
+    # HOT SWAP
+    # -----------------------
+    def reload(self, group, source, shadow=False):
+        """
+        Load + warm `source` for every slot of `group` in a background thread, then
+        swap the group to it in one step (or keep it as the shadow candidate). The live
+        models serve meanwhile and stay live if anything fails. False if a reload of
+        the group is already running.
+        """
+        with self._lock:
+            status = self._reloads.get(group)
+            if status is not None and status["state"] == LOADING:
+                return False
+            self._reloads[group] = {"version": source.version, "shadow": shadow, "state": LOADING,
+                                    "started_at": time.time(), "seconds": None, "error": None}
+        threading.Thread(target=self._reload, args=(group, source, shadow), name=f"model-reload-{group}",
+                         daemon=True).start()
+        return True
+
+    def _reload(self, group, source, shadow):
+        status = self._reloads[group]
+        started = time.perf_counter()
+        print(f"🔄 {group}: loading {source.version}" + (" as shadow candidate" if shadow else ""))
+        try:
+            values = {}
+            for slot in self._group_slots(group):
+                value = slot.call_loader(source)
+                if value is None and slot.required:
+                    raise ValueError(f"{slot.name} loader returned nothing")
+                if self.warm_up and slot.warmup is not None and value is not None:
+                    slot.warmup(value)
+                values[slot.name] = value
+        except Exception as e:
+            with self._lock:
+                status.update(state=FAILED, error=f"{type(e).__name__}: {e}",
+                              seconds=round(time.perf_counter() - started, 3))
+                self.reload_counts["failed"] += 1
+            print(f"❌ {group}: {source.version} failed to load, keeping {self.live_version(group)}: {status['error']}")
+            traceback.print_exc()
+            return
+
+        with self._lock:
+            if shadow:
+                self._candidates[group] = (source, values)
+                self.reload_counts["shadowed"] += 1
+            else:
+                previous = self._sources.get(group)
+                for slot in self._group_slots(group):
+                    slot.value = values[slot.name]
+                    slot.error = None
+                    slot.state = READY
+                    slot.ready_at = time.time()
+                    slot._done.set()
+                self._sources[group] = source
+                candidate = self._candidates.get(group)
+                if candidate is not None and candidate[0].version == source.version:
+                    del self._candidates[group]
+                self.reload_counts["swapped"] += 1
+            status.update(state=READY, seconds=round(time.perf_counter() - started, 3))
+        if shadow:
+            print(f"👥 {group}: {source.version} loaded as shadow candidate ({status['seconds']}s)")
+        else:
+            print(f"✅ {group}: now serving {source.version}"
+                  + (f" (was {previous.version})" if previous is not None else "") + f" ({status['seconds']}s)")
+
+    def sync(self, group, source, candidate=None, force=False):
+        """
+        Reload `group` if `source` isn't the live version (or `force`), else load /
+        drop its shadow candidate to match `candidate`. A version whose reload
+        failed isn't retried until it changes (or `force`). What was started, or None.
+        """
+        with self._lock:
+            live = self._sources.get(group)
+            loaded = self._candidates.get(group)
+            last = self._reloads.get(group)
+        if last is not None and last["state"] == LOADING:
+            return None
+
+        def failed(version):
+            return not force and last is not None and last["state"] == FAILED and last["version"] == version
+
+        if live is None and any(slot.state in (PENDING, LOADING, WARMING) for slot in self._group_slots(group)):
+            return None  # still on its initial load
+        if live is None or force or source.version != live.version:
+            if failed(source.version):
+                return None
+            return "swap" if self.reload(group, source) else None
+        if candidate is None or candidate.version == live.version:
+            return "drop" if self.drop_candidate(group) else None
+        if loaded is None or loaded[0].version != candidate.version:
+            if failed(candidate.version):
+                return None
+            return "shadow" if self.reload(group, candidate, shadow=True) else None
+        return None
+
+    def watch(self, interval):
+        """Poll resolve() every `interval` seconds and sync() each group (0 = off); runs once started"""
+        self._watch_interval = max(0.0, float(interval))
+        if self._started_at is not None:
+            self._start_watch()
+
+    def _start_watch(self):
+        if not self._watch_interval or self.resolve is None or self._watch_pid == os.getpid():
+            return
+        self._watch_pid = os.getpid()  # threads don't survive fork: every worker polls for itself
+        threading.Thread(target=self._watch, name="model-watch", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self._watch_interval)
+            for group in self._groups():
+                try:
+                    self.sync(group, *self.resolve(group))
+                except Exception as e:
+                    print(f"⚠️ {group}: could not check for a new version: {e}")
+
+    def reload_status(self):
+        with self._lock:
+            return {
+                "live": {group: source.version for group, source in self._sources.items()},
+                "candidates": {group: source.version for group, (source, _) in self._candidates.items()},
+                "reloads": {group: dict(status) for group, status in self._reloads.items()},
+                "counts": dict(self.reload_counts),
+                "watch_s": self._watch_interval or None,
+            }
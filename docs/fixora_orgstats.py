@@ -0,0 +1,348 @@
+"""
+Per-organization dashboard aggregates for the Fixora app.
+
+The admin dashboard used to read every report and every feedback request of
+the organization and recount them on each load. OrgStats keeps the counters
+instead, updated as the app reports changes:
+
+  reports    total, by status / category / urgency
+  feedback   requests by status; for completed ones the rating sum, resolved /
+             not resolved and would-recommend counts
+
+Each event is an upsert of one report or feedback request ({"type", "id",
+...changed fields}); the last known state of every entity is kept as a small
+tuple, so an update subtracts the entity's old contribution and adds the new
+one, a partial update (e.g. status only) keeps the other fields and a
+re-delivered event changes nothing. Reading an organization's stats costs the
+same whatever its history.
+
+An organization's counts are only complete once its history has been loaded:
+`apply_many(events, seed=(org, kind))` takes the full set of one kind (the
+app's one-off Firestore scan), drops entities of that kind the scan didn't
+contain and marks the organization seeded for it.
+
+State is snapshotted to JSON every `snapshot_interval_s` (when changed) and on
+exit; events since the last snapshot go to an NDJSON journal next to it, so a
+restart loads the snapshot and replays only the journal. One process owns the
+files (`fixora_serve.py --mode threads`, or dev).
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+
+REPORT, FEEDBACK = "report", "feedback"
+KINDS = (REPORT, FEEDBACK)
+OPEN_STATUSES = ("pending", "assigned", "in_progress")  # same as the duplicate index
+DELETED = "deleted"
+
+def category_key(value):
+    """"Broken Street Light" / "broken_street_light" -> "broken_street_light\""""
+    return "_".join(str(value).strip().lower().split()) if value else None
+
+
+def _event_fields(kind, event):
+    """
+    The entity state an event sets (None = not given, keep the old value):
+    report (organizationId, status, category, urgency), feedback (organizationId,
+    status, rating, isResolved, wouldRecommend)
+    """
+    if kind == REPORT:
+        category = (event.get("categorySlug") or event.get("category")
+                    or (event.get("classificationMetadata") or {}).get("category"))
+        urgency = event.get("urgency") or (event.get("predictionMetadata") or {}).get("urgency")
+        return (event.get("organizationId") or None, event.get("status"), category_key(category), urgency or None)
+    rating = event.get("rating")
+    return (
+        event.get("organizationId") or None,
+        event.get("status"),
+        float(rating) if isinstance(rating, (int, float)) and not isinstance(rating, bool) else None,
+        None if event.get("isResolved") is None else bool(event["isResolved"]),
+        None if event.get("wouldRecommend") is None else bool(event["wouldRecommend"]),
+    )
+
+
+def _empty_counters():
+    return {
+        REPORT: {"total": 0, "status": {}, "category": {}, "urgency": {}},
+        FEEDBACK: {"requests": 0, "status": {}, "completed": 0, "rating_sum": 0.0, "rated": 0,
+                   "resolved": 0, "not_resolved": 0, "recommended": 0},
+    }
+
+
+def _bump(counter, key, sign):
+    if key is None:
+        return
+    n = counter.get(key, 0) + sign
+    if n:
+        counter[key] = n
+    else:
+        counter.pop(key, None)
+
+
+class OrgStats:
+    """
+        org_stats = OrgStats(snapshot_path="org_stats.json")
+        org_stats.apply({"type": "report", "id": "r1", "organizationId": "o1", "status": "pending",
+                         "categorySlug": "potholes", "urgency": "High"})
+        org_stats.apply({"type": "report", "id": "r1", "status": "resolved"})   # partial update
+        org_stats.stats("o1")   # {"reports": {...}, "feedback": {...}, "seeded": {...}}
+    """
+
+    def __init__(self, snapshot_path=None, snapshot_interval_s=60, name="org_stats"):
+        self.name = name
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal" if snapshot_path else None
+        self.snapshot_interval_s = max(1.0, float(snapshot_interval_s))
+        self._orgs = {}                               # org id -> counters
+        self._entities = {kind: {} for kind in KINDS}  # kind -> id -> state tuple
+        self._seeded = {}                             # org id -> {kind: seeded at}
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._journal = None
+        self._changes = 0  # since the last snapshot
+        self._snapshot_pid = None
+        self.counts = {"events": 0, "unchanged": 0, "snapshots": 0, "snapshot_ms": None, "loaded_from": None}
+
+        if snapshot_path:
+            self._load()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            atexit.register(self.snapshot)
+
+    # -----------------------
+    # EVENTS
+    # -----------------------
+    def apply(self, event, _log=True):
+        """Upsert one report / feedback request ({"type", "id", ...}); True if any counter changed"""
+        kind = event.get("type")
+        if kind not in KINDS or not event.get("id"):
+            raise ValueError('Each event needs a "type" (report | feedback) and an "id"')
+        entity_id = str(event["id"])
+        with self._lock:
+            entities = self._entities[kind]
+            old = entities.get(entity_id)
+            if event.get("deleted") or event.get("status") == DELETED:
+                new = None
+            else:
+                given = _event_fields(kind, event)
+                new = tuple(g if g is not None else (old[i] if old else None) for i, g in enumerate(given))
+            self.counts["events"] += 1
+            if new == old:
+                self.counts["unchanged"] += 1
+                return False
+            if old is not None:
+                self._contribute(kind, old, -1)
+            if new is None:
+                entities.pop(entity_id, None)
+            else:
+                entities[entity_id] = new
+                self._contribute(kind, new, +1)
+            if _log:
+                self._log({"op": "set", "type": kind, "id": entity_id, "state": new})
+        return True
+
+    def apply_many(self, events, seed=None):
+        """
+        Apply a list of events. seed=(org id, kind): the events are ALL of that organization's
+        entities of that kind, so others still held for it are dropped and it is marked seeded.
+        Returns the number of events that changed something. A seed without any event of its
+        kind would wipe everything held for the organization, so it is refused (ValueError)
+        while something is held; deletions are sent as events instead.
+        """
+        with self._lock:
+            if seed is not None:
+                org_id, kind = seed
+                if kind not in KINDS:
+                    raise ValueError(f"Unknown kind {kind!r}")
+                present = {str(e["id"]) for e in events if e.get("type") == kind and e.get("id")}
+                if not present and any(state[0] == org_id for state in self._entities[kind].values()):
+                    raise ValueError(f"A {kind} seed needs the organization's {kind} events; "
+                                     "an empty one would drop them all")
+            changed = sum(self.apply(event) for event in events)
+            if seed is not None:
+                stale = [eid for eid, state in self._entities[kind].items()
+                         if state[0] == org_id and eid not in present]
+                for entity_id in stale:
+                    changed += self.apply({"type": kind, "id": entity_id, "deleted": True})
+                self._seeded.setdefault(org_id, {})[kind] = time.time()
+                self._log({"op": "seeded", "organizationId": org_id, "type": kind,
+                           "at": self._seeded[org_id][kind]})
+        return changed
+
+    def _contribute(self, kind, state, sign):
+        org_id = state[0]
+        if org_id is None:
+            return  # not assigned to an organization (yet)
+        counters = self._orgs.setdefault(org_id, _empty_counters())[kind]
+        if kind == REPORT:
+            _, status, category, urgency = state
+            counters["total"] += sign
+            _bump(counters["status"], status or "pending", sign)
+            _bump(counters["category"], category, sign)
+            _bump(counters["urgency"], urgency, sign)
+            return
+        _, status, rating, is_resolved, would_recommend = state
+        counters["requests"] += sign
+        _bump(counters["status"], status or "pending", sign)
+        if status == "completed":
+            counters["completed"] += sign
+            if rating:
+                counters["rating_sum"] += sign * rating
+                counters["rated"] += sign
+            counters["resolved" if is_resolved else "not_resolved"] += sign
+            if would_recommend:
+                counters["recommended"] += sign
+
+    # -----------------------
+    # QUERIES
+    # -----------------------
+    def stats(self, org_id):
+        """Dashboard numbers for one organization (feedback in getOrganizationFeedbackStats' shape)"""
+        with self._lock:
+            counters = self._orgs.get(org_id) or _empty_counters()
+            reports, feedback = counters[REPORT], counters[FEEDBACK]
+            seeded = self._seeded.get(org_id, {})
+            completed = feedback["completed"]
+
+            def rate(n):
+                return round(n / completed * 100.0, 1) if completed else 0
+
+            return {
+                "organizationId": org_id,
+                "reports": {
+                    "totalReports": reports["total"],
+                    "pendingReports": reports["status"].get("pending", 0),
+                    "openReports": sum(reports["status"].get(s, 0) for s in OPEN_STATUSES),
+                    "byStatus": dict(reports["status"]),
+                    "byCategory": dict(reports["category"]),
+                    "byUrgency": dict(reports["urgency"]),
+                },
+                "feedback": {
+                    "totalFeedbacks": completed,
+                    # Unrated feedback counts as 0, like the app's own average
+                    "averageRating": round(feedback["rating_sum"] / completed, 1) if completed else 0,
+                    "resolvedCount": feedback["resolved"],
+                    "notResolvedCount": feedback["not_resolved"],
+                    "resolutionRate": rate(feedback["resolved"]),
+                    "recommendationRate": rate(feedback["recommended"]),
+                    "ratedCount": feedback["rated"],
+                    "pendingRequests": feedback["status"].get("pending", 0),
+                    "totalRequests": feedback["requests"],
+                },
+                "seeded": {kind: kind in seeded for kind in KINDS},
+                "seededAt": {kind: seeded[kind] for kind in KINDS if kind in seeded},
+            }
+
+    def summary(self):
+        with self._lock:
+            return dict(self.counts, name=self.name, organizations=len(self._orgs),
+                        entities={kind: len(ids) for kind, ids in self._entities.items()},
+                        unsnapshotted_changes=self._changes, snapshot=self.snapshot_path)
+
+    # -----------------------
+    # PERSISTENCE
+    # -----------------------
+    def _log(self, entry):
+        """Caller holds the lock"""
+        self._changes += 1
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        self._ensure_snapshotter()
+
+    def snapshot(self):
+        """Write the state to snapshot_path and start a fresh journal; False if unchanged / not persisted"""
+        if not self.snapshot_path:
+            return False
+        with self._snapshot_lock:
+            with self._lock:
+                if not self._changes:
+                    return False
+                started = time.perf_counter()
+                # Copy under the lock (state tuples are immutable) and rotate the journal; the
+                # slow part, writing the JSON, runs while events keep coming in
+                state = {
+                    "version": 1,
+                    "savedAt": time.time(),
+                    "orgs": json.loads(json.dumps(self._orgs)),
+                    "entities": {kind: dict(ids) for kind, ids in self._entities.items()},
+                    "seeded": json.loads(json.dumps(self._seeded)),
+                }
+                if self._journal is not None:
+                    self._journal.close()
+                    os.replace(self.journal_path, self.journal_path + ".prev")
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+                self._changes = 0
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(tmp, self.snapshot_path)
+            # Replaying a journal entry only re-sets a state, so a crash before this is harmless
+            if os.path.exists(self.journal_path + ".prev"):
+                os.remove(self.journal_path + ".prev")
+            with self._lock:
+                self.counts["snapshots"] += 1
+                self.counts["snapshot_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        return True
+
+    def _ensure_snapshotter(self):
+        """Start the periodic snapshot thread (caller holds the lock); threads don't survive fork"""
+        if self._snapshot_pid == os.getpid():
+            return
+        self._snapshot_pid = os.getpid()
+        threading.Thread(target=self._snapshot_loop, name=f"{self.name}-snapshot", daemon=True).start()
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_interval_s)
+            try:
+                self.snapshot()
+            except OSError as e:
+                print(f"⚠️ {self.name}: snapshot failed: {e}")
+
+    def _load(self):
+        started = time.perf_counter()
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, encoding="utf-8") as f:
+                    state = json.load(f)
+                self._orgs = state.get("orgs", {})
+                self._entities = {kind: {eid: tuple(s) for eid, s in state.get("entities", {}).get(kind, {}).items()}
+                                  for kind in KINDS}
+                self._seeded = state.get("seeded", {})
+                self.counts["loaded_from"] = "snapshot"
+            except (OSError, ValueError) as e:
+                print(f"⚠️ {self.name}: could not read snapshot {self.snapshot_path}: {e}")
+        replayed = 0
+        for path in (self.journal_path + ".prev", self.journal_path):  # .prev: a snapshot was interrupted
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if entry.get("op") == "set":
+                        self._set(entry["type"], entry["id"], entry["state"])
+                    elif entry.get("op") == "seeded":
+                        self._seeded.setdefault(entry["organizationId"], {})[entry["type"]] = entry["at"]
+                    replayed += 1
+        self._changes = replayed
+        print(f"📊 {self.name}: {sum(len(e) for e in self._entities.values())} entities in {len(self._orgs)} "
+              f"organization(s), {replayed} journal entries replayed in "
+              f"{(time.perf_counter() - started) * 1000.0:.0f} ms")
+
+    def _set(self, kind, entity_id, state):
+        """Journal replay: put an entity in a known state"""
+        old = self._entities[kind].pop(entity_id, None)
+        if old is not None:
+            self._contribute(kind, old, -1)
+        if state is not None:
+            state = tuple(state)
+            self._entities[kind][entity_id] = state
+            self._contribute(kind, state, +1)
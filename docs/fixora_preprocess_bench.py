@@ -0,0 +1,99 @@
+"""
+Benchmark: legacy image preprocessing vs fixora_preprocess (draft decode + float32 buffer).
+
+Usage:
+    python fixora_preprocess_bench.py                  # synthetic 12 MP phone-style JPEGs
+    python fixora_preprocess_bench.py /path/to/photos  # your own JPEG/PNG folder
+    python fixora_preprocess_bench.py --count 20 --repeat 5
+
+Reports per-image CPU time (time.process_time) and the pixel difference between
+the two paths, so you can see what draft decoding costs in fidelity.
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from fixora_preprocess import TensorBufferPool, legacy_preprocess, preprocess_into
+
+
+def synthetic_jpegs(count, size=(4032, 3024), quality=90, seed=0):
+    """Phone-sized JPEGs with smooth structure + sensor-like noise (realistic file sizes)"""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    images = []
+    for _ in range(count):
+        coarse = rng.integers(0, 256, (h // 64, w // 64, 3), dtype=np.uint8)
+        img = Image.fromarray(coarse).resize(size, Image.BICUBIC)
+        pixels = np.asarray(img, dtype=np.int16) + rng.integers(-12, 13, (h, w, 3), dtype=np.int16)
+        buf = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buf, "JPEG", quality=quality)
+        images.append(buf.getvalue())
+    return images
+
+
+def folder_images(path):
+    exts = (".jpg", ".jpeg", ".png", ".webp")
+    images = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(exts):
+            with open(os.path.join(path, name), "rb") as f:
+                images.append(f.read())
+    return images
+
+
+def time_per_image(fn, images, repeat):
+    samples = []
+    for _ in range(repeat):
+        for data in images:
+            start = time.process_time()
+            fn(data)
+            samples.append((time.process_time() - start) * 1000.0)
+    return samples
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    print(f"{name:<28} mean {statistics.mean(samples):8.2f} ms   p50 {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", nargs="?", help="folder of real photos (default: synthetic 12 MP JPEGs)")
+    parser.add_argument("--count", type=int, default=10, help="synthetic images to generate")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the image set")
+    args = parser.parse_args()
+
+    images = folder_images(args.folder) if args.folder else synthetic_jpegs(args.count)
+    if not images:
+        raise SystemExit("No images found")
+    avg_kb = sum(len(b) for b in images) / len(images) / 1024
+    print(f"📷 {len(images)} image(s), avg {avg_kb:.0f} KB, {args.repeat} pass(es)")
+
+    pool = TensorBufferPool(capacity=1)
+    buf = pool.acquire(1)
+
+    legacy = summarize("legacy (full decode, f64)", time_per_image(
+        lambda data: legacy_preprocess(io.BytesIO(data)), images, args.repeat))
+    fast = summarize("draft + float32 buffer", time_per_image(
+        lambda data: preprocess_into(io.BytesIO(data), buf[0]), images, args.repeat))
+    print(f"⚡ speedup: {legacy / fast:.1f}x")
+
+    diffs = []
+    for data in images:
+        ref = legacy_preprocess(io.BytesIO(data)).astype(np.float32)
+        new = preprocess_into(io.BytesIO(data), buf[0])
+        diffs.append(np.abs(ref - new))
+    diffs = np.stack(diffs)
+    print(f"🔍 pixel diff vs legacy: mean {diffs.mean():.4f}, max {diffs.max():.4f} (0-1 scale)")
+
+
+if __name__ == "__main__":
+    main()
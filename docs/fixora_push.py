@@ -0,0 +1,605 @@
+"""
+Push-notification fan-out for the Fixora app (Expo push service).
+
+The app used to notify N users with N Firestore reads for their push tokens
+and N POSTs to Expo, all from the phone. The server instead:
+
+- caches push tokens (PushTokenStore): the app registers a token when it gets
+  one and passes along any tokens it already has, so a fan-out needs no reads
+- coalesces messages from every concurrent fan-out into Expo's batched send
+  format (a JSON array of at most 100 messages) through a MicroBatcher, one
+  message per distinct token
+- sends over a small pool of keep-alive HTTP connections (ExpoPushClient),
+  retrying 429 / 5xx / connection errors with exponential backoff (honouring
+  Retry-After)
+- records a ticket per recipient, then polls Expo's receipts endpoint in the
+  background (up to 1000 ids per request) and records each receipt; a
+  DeviceNotRegistered ticket or receipt evicts the token
+
+Every fan-out is kept for `ttl_seconds` so `GET /notifications/<id>` can show
+per-recipient tickets and receipts. Tokens can be journaled to NDJSON like the
+geo index; the store and the fan-outs live in one process (`fixora_serve.py
+--mode threads`, or dev).
+
+Point `send_url` at fixora_push_stub.py to try it without Expo.
+"""
+
+import gzip
+import heapq
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from fixora_batcher import MicroBatcher, QueueFull
+
+
+EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+MAX_MESSAGES_PER_SEND = 100   # Expo rejects larger send requests
+MAX_IDS_PER_RECEIPTS = 1000   # ... and larger getReceipts requests
+TOKEN_PATTERN = re.compile(r"^Expo(nent)?PushToken\[[^\]]+\]$")
+UNREGISTERED = "DeviceNotRegistered"
+
+# Recipient states: waiting for a ticket, ticket ok, receipt ok (handed to APNs / FCM), failed
+QUEUED, SENT, DELIVERED, FAILED, NO_TOKEN = "queued", "sent", "delivered", "failed", "no_token"
+
+
+class PushError(Exception):
+    """A send / getReceipts request that failed for good (after retries, or rejected)"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def valid_token(token):
+    return isinstance(token, str) and bool(TOKEN_PATTERN.match(token))
+
+
+def receipts_url_for(send_url):
+    """Expo serves receipts next to send: .../push/send -> .../push/getReceipts"""
+    base = send_url.rsplit("/", 1)[0] if send_url.endswith("/send") else send_url.rstrip("/")
+    return f"{base}/getReceipts"
+
+
+# -----------------------
+# TOKENS
+# -----------------------
+class PushTokenStore:
+    """
+        tokens = PushTokenStore(journal_path="push_tokens.ndjson")
+        tokens.upsert("user-1", "ExponentPushToken[xxxx]")
+        found, missing = tokens.lookup(["user-1", "user-2"])   # {"user-1": token}, ["user-2"]
+        tokens.remove("user-1", token="ExponentPushToken[xxxx]")  # only if still that token
+    """
+
+    def __init__(self, journal_path=None, name="push_tokens"):
+        self.name = name
+        self.journal_path = journal_path
+        self._tokens = {}  # user id -> token
+        self._lock = threading.RLock()
+        self._journal = None
+        self._journal_lines = 0
+
+        if journal_path:
+            self._replay()
+            self._journal = open(journal_path, "a", encoding="utf-8")
+
+    def upsert(self, user_id, token, _log=True):
+        """Cache a user's token (None removes it); ValueError for a malformed token. True if it changed."""
+        if token is None:
+            return self.remove(user_id, _log=_log)
+        if not valid_token(token):
+            raise ValueError(f"Not an Expo push token: {str(token)[:64]}")
+        user_id = str(user_id)
+        with self._lock:
+            if self._tokens.get(user_id) == token:
+                return False
+            self._tokens[user_id] = token
+            if _log:
+                self._log({"op": "upsert", "userId": user_id, "token": token})
+        return True
+
+    def remove(self, user_id, token=None, _log=True):
+        """Forget a user's token (with `token`: only while it is still that one); True if removed"""
+        user_id = str(user_id)
+        with self._lock:
+            current = self._tokens.get(user_id)
+            if current is None or (token is not None and current != token):
+                return False
+            del self._tokens[user_id]
+            if _log:
+                self._log({"op": "remove", "userId": user_id})
+        return True
+
+    def get(self, user_id):
+        with self._lock:
+            return self._tokens.get(str(user_id))
+
+    def lookup(self, user_ids):
+        with self._lock:
+            found = {uid: self._tokens[uid] for uid in user_ids if uid in self._tokens}
+        return found, [uid for uid in user_ids if uid not in found]
+
+    def users_with(self, token):
+        with self._lock:
+            return [uid for uid, t in self._tokens.items() if t == token]
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def stats(self):
+        with self._lock:
+            return {"name": self.name, "tokens": len(self._tokens), "journal": self.journal_path}
+
+    # -----------------------
+    # JOURNAL
+    # -----------------------
+    def _log(self, entry):
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        self._journal_lines += 1
+        if self._journal_lines > max(1024, 4 * len(self._tokens)):
+            self._compact()
+
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                if entry.get("op") == "upsert" and valid_token(entry.get("token")):
+                    self._tokens[entry["userId"]] = entry["token"]
+                elif entry.get("op") == "remove":
+                    self._tokens.pop(entry.get("userId"), None)
+        self._compact()
+
+    def _compact(self):
+        """Rewrite the journal as one upsert per cached token"""
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for user_id, token in self._tokens.items():
+                f.write(json.dumps({"op": "upsert", "userId": user_id, "token": token}) + "\n")
+        os.replace(tmp, self.journal_path)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal_lines = len(self._tokens)
+
+
+# -----------------------
+# HTTP
+# -----------------------
+class _ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, reused across requests (fresh ones after fork)"""
+
+    _STALE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+    def __init__(self, url, size=2, timeout=10.0):
+        parts = urllib.parse.urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host, self.port = parts.hostname, parts.port
+        self.size = max(1, int(size))
+        self.timeout = float(timeout)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.opened = 0
+        self.reused = 0
+
+    def request(self, method, path, body, headers):
+        """(status, lower-cased headers, body bytes)"""
+        conn, reused = self._take()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except self._STALE:
+            conn.close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection before reading this one: redo it once
+            conn, _ = self._take(fresh=True)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._give(conn)
+        return resp.status, {k.lower(): v for k, v in resp.getheaders()}, data
+
+    def _take(self, fresh=False):
+        with self._lock:
+            if self._pid != os.getpid():  # sockets are shared with the parent after fork
+                self._idle, self._pid = [], os.getpid()
+            if self._idle and not fresh:
+                self.reused += 1
+                return self._idle.pop(), True
+            self.opened += 1
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout), False
+
+    def _give(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {"opened": self.opened, "reused": self.reused, "idle": len(self._idle)}
+
+
+class ExpoPushClient:
+    """
+        client = ExpoPushClient("http://127.0.0.1:5056/--/api/v2/push/send")
+        tickets = client.send([{"to": token, "title": "...", "body": "..."}])  # one ticket per message
+        receipts = client.receipts([t["id"] for t in tickets if t["status"] == "ok"])
+    """
+
+    def __init__(self, send_url=EXPO_PUSH_URL, receipts_url=None, access_token=None, timeout=10.0,
+                 retries=3, backoff_s=0.5, max_backoff_s=30.0, pool_size=2):
+        self.send_url = send_url
+        self.receipts_url = receipts_url or receipts_url_for(send_url)
+        self.access_token = access_token
+        self.retries = max(1, int(retries))
+        self.backoff_s = max(0.0, float(backoff_s))
+        self.max_backoff_s = float(max_backoff_s)
+        self._pool = _ConnectionPool(send_url, size=pool_size, timeout=timeout)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "retries": 0, "failed": 0, "messages": 0, "receipt_ids": 0}
+
+    def send(self, messages):
+        """One ticket per message ({"status": "ok", "id"} or {"status": "error", "message", "details"})"""
+        if len(messages) > MAX_MESSAGES_PER_SEND:
+            raise ValueError(f"At most {MAX_MESSAGES_PER_SEND} messages per send")
+        tickets = self._post(self.send_url, list(messages)).get("data")
+        if not isinstance(tickets, list) or len(tickets) != len(messages):
+            raise PushError(f"Expected {len(messages)} tickets, got {json.dumps(tickets)[:200]}")
+        with self._lock:
+            self.counts["messages"] += len(messages)
+        return tickets
+
+    def receipts(self, ids):
+        """{ticket id: receipt} for the receipts Expo has ready (missing ids: not yet)"""
+        if len(ids) > MAX_IDS_PER_RECEIPTS:
+            raise ValueError(f"At most {MAX_IDS_PER_RECEIPTS} ids per receipts request")
+        data = self._post(self.receipts_url, {"ids": list(ids)}).get("data") or {}
+        with self._lock:
+            self.counts["receipt_ids"] += len(ids)
+        return data
+
+    def _post(self, url, payload):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Accept": "application/json", "Accept-Encoding": "gzip"}
+        if self.access_token:
+            headers["Authorization"] = f"Bearer {self.access_token}"
+
+        error, status = None, None
+        for attempt in range(1, self.retries + 1):
+            with self._lock:
+                self.counts["requests"] += 1
+                if attempt > 1:
+                    self.counts["retries"] += 1
+            retry_after = None
+            try:
+                status, resp_headers, data = self._pool.request("POST", path, body, headers)
+                if resp_headers.get("content-encoding") == "gzip":
+                    data = gzip.decompress(data)
+                if status == 200:
+                    return json.loads(data)
+                error = f"HTTP {status}: {data[:200].decode('utf-8', 'replace')}"
+                if status != 429 and status < 500:
+                    break  # the request itself was rejected; retrying won't help
+                try:
+                    retry_after = float(resp_headers.get("retry-after"))
+                except (TypeError, ValueError):
+                    pass
+            except (http.client.HTTPException, OSError, ValueError) as e:
+                error, status = f"{type(e).__name__}: {e}", None
+            if attempt < self.retries:
+                delay = retry_after if retry_after is not None else self.backoff_s * 2 ** (attempt - 1)
+                time.sleep(min(self.max_backoff_s, max(0.0, delay)))
+        with self._lock:
+            self.counts["failed"] += 1
+        raise PushError(error, status)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, send_url=self.send_url, connections=self._pool.stats())
+
+
+# -----------------------
+# FAN-OUT
+# -----------------------
+class Fanout:
+    """One notification sent to a list of users, with a ticket / receipt per recipient"""
+
+    __slots__ = ("id", "created_at", "recipients", "_pending", "_done")
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.recipients = OrderedDict()  # user id -> {"status", "ticketId", "error", "receipt"}
+        self._pending = 0
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        """True once every recipient has its ticket (receipts arrive later)"""
+        return self._done.is_set()
+
+    def to_dict(self):
+        counts = {}
+        for r in self.recipients.values():
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        return {
+            "notificationId": self.id,
+            "status": "sent" if self.finished else "sending",
+            "createdAt": self.created_at,
+            "counts": counts,
+            "recipients": [dict(r, userId=uid) for uid, r in self.recipients.items()],
+            "missingTokens": [uid for uid, r in self.recipients.items() if r["status"] == NO_TOKEN],
+        }
+
+
+class PushFanout:
+    """
+        fanout = PushFanout(ExpoPushClient(...), PushTokenStore())
+        record = fanout.send(["user-1", "user-2"], "New Assignment", "You've been assigned ...",
+                             data={"reportId": "r1"}, tokens={"user-2": "ExponentPushToken[yyyy]"})
+        fanout.wait(record, timeout=5)
+        fanout.get(record.id).to_dict()   # per-recipient status / ticketId / error / receipt
+    """
+
+    def __init__(self, client, tokens, max_batch_size=MAX_MESSAGES_PER_SEND, max_wait_ms=50,
+                 max_queue_messages=10000, receipt_delay_s=900, receipt_attempts=3, ttl_seconds=3600,
+                 name="push"):
+        self.client = client
+        self.tokens = tokens
+        self.receipt_delay_s = max(0.0, float(receipt_delay_s))
+        self.receipt_attempts = max(1, int(receipt_attempts))
+        self.ttl_seconds = float(ttl_seconds)
+        self.name = name
+        self.batch_size = min(MAX_MESSAGES_PER_SEND, max(1, int(max_batch_size)))
+        # Messages from concurrent fan-outs share one send request (object rows: message dicts)
+        self.batcher = MicroBatcher(self._send_batch, max_batch_size=self.batch_size, max_wait_ms=max_wait_ms,
+                                    name=f"{name}-send", max_queue_rows=max_queue_messages)
+
+        self._records = OrderedDict()  # id -> Fanout, oldest first
+        self._lock = threading.Lock()
+        self._receipts = []  # heap of (due, ticket id)
+        self._tickets = {}   # ticket id -> (Fanout, token, attempts)
+        self._receipt_cond = threading.Condition(self._lock)
+        self._poller_pid = None
+        # sent / failed: ticket outcomes (one per message); delivered / receipt_failed: receipts of sent ones
+        self.counts = {"fanouts": 0, "recipients": 0, "messages": 0, SENT: 0, DELIVERED: 0, FAILED: 0,
+                       "receipt_failed": 0, NO_TOKEN: 0, "receipts_unavailable": 0, "tokens_evicted": 0}
+
+    # -----------------------
+    # PUBLIC API
+    # -----------------------
+    def send(self, user_ids, title, body, data=None, tokens=None, sound="default", priority="high"):
+        """
+        Queue one notification to `user_ids` and return its Fanout at once. `tokens`
+        ({user id: token}) are cached first; users without a cached token are
+        reported as "no_token". Malformed tokens raise ValueError.
+        """
+        for user_id, token in (tokens or {}).items():
+            if token:
+                self.tokens.upsert(user_id, token)
+        record = Fanout()
+        user_ids = list(dict.fromkeys(str(uid) for uid in user_ids))
+        found, missing = self.tokens.lookup(user_ids)
+        by_token = OrderedDict()  # one message per device, even if several users share it
+        for user_id in user_ids:
+            if user_id in found:
+                record.recipients[user_id] = {"status": QUEUED}
+                by_token.setdefault(found[user_id], []).append(user_id)
+            else:
+                record.recipients[user_id] = {"status": NO_TOKEN}
+
+        messages = []
+        for token in by_token:
+            message = {"to": token, "title": title, "body": body, "data": data or {}, "priority": priority}
+            if sound:
+                message["sound"] = sound
+            messages.append(message)
+        record._pending = len(messages)
+
+        with self._lock:
+            self._expire()
+            self._records[record.id] = record
+            self.counts["fanouts"] += 1
+            self.counts["recipients"] += len(user_ids)
+            self.counts["messages"] += len(messages)
+            self.counts[NO_TOKEN] += len(missing)
+        if not messages:
+            record._done.set()
+
+        tokens_in_order = list(by_token.items())
+        for start in range(0, len(messages), self.batch_size):
+            chunk = messages[start:start + self.batch_size]
+            rows = np.empty(len(chunk), dtype=object)
+            for i, message in enumerate(chunk):
+                rows[i] = message
+            targets = tokens_in_order[start:start + self.batch_size]
+            try:
+                future = self.batcher.submit_batch(rows)
+            except QueueFull as e:
+                self._record_tickets(record, targets, [_error_ticket(str(e), "QueueFull")] * len(chunk))
+                continue
+            future.add_done_callback(
+                lambda f, targets=targets: self._record_tickets(
+                    record, targets, f.result() if f.exception() is None
+                    else [_error_ticket(str(f.exception()), "TransportError")] * len(targets)))
+        return record
+
+    def get(self, fanout_id):
+        with self._lock:
+            self._expire()
+            return self._records.get(fanout_id)
+
+    def wait(self, record, timeout):
+        """True once every recipient has a ticket (blocks at most `timeout` seconds)"""
+        return record._done.wait(timeout=max(0.0, timeout))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts, pending_receipts=len(self._tickets), fanouts_held=len(self._records))
+        return {
+            **counts,
+            "tokens": self.tokens.stats(),
+            "batching": self.batcher.stats(),
+            "client": self.client.stats(),
+            "receipt_delay_s": self.receipt_delay_s,
+        }
+
+    # -----------------------
+    # TICKETS
+    # -----------------------
+    def _send_batch(self, rows):
+        """Batcher worker: one send request for up to 100 messages -> one ticket each"""
+        try:
+            return self.client.send(list(rows))
+        except PushError as e:
+            print(f"⚠️ {self.name}: send of {len(rows)} message(s) failed: {e}")
+            return [_error_ticket(str(e), "TransportError")] * len(rows)
+
+    def _record_tickets(self, record, targets, tickets):
+        now = time.time()
+        evict = []
+        with self._lock:
+            for (token, user_ids), ticket in zip(targets, tickets):
+                ok = isinstance(ticket, dict) and ticket.get("status") == "ok" and ticket.get("id")
+                for user_id in user_ids:
+                    recipient = record.recipients[user_id]
+                    if ok:
+                        recipient.update(status=SENT, ticketId=ticket["id"])
+                    else:
+                        recipient.update(status=FAILED, error=_error_of(ticket))
+                    self.counts[SENT if ok else FAILED] += 1
+                if ok:
+                    self._tickets[ticket["id"]] = (record, token, 0)
+                    heapq.heappush(self._receipts, (now + self.receipt_delay_s, ticket["id"]))
+                elif _error_of(ticket) == UNREGISTERED:
+                    evict.append((token, user_ids))
+            record._pending -= len(targets)
+            if record._pending <= 0:
+                record._done.set()
+            if self._tickets:
+                self._ensure_poller()
+                self._receipt_cond.notify()
+        for token, user_ids in evict:
+            self._evict(token, user_ids)
+
+    def _evict(self, token, user_ids):
+        for user_id in user_ids:
+            if self.tokens.remove(user_id, token=token):
+                with self._lock:
+                    self.counts["tokens_evicted"] += 1
+                print(f"🔕 Dropped push token of {user_id} ({UNREGISTERED})")
+
+    def _expire(self):
+        """Drop fan-outs older than ttl_seconds (caller holds the lock)"""
+        cutoff = time.time() - self.ttl_seconds
+        while self._records:
+            fanout_id, record = next(iter(self._records.items()))
+            if record.created_at >= cutoff or not record.finished:
+                break
+            del self._records[fanout_id]
+
+    # -----------------------
+    # RECEIPTS
+    # -----------------------
+    def _ensure_poller(self):
+        """Start the receipt poller (caller holds the lock); threads don't survive fork"""
+        if self._poller_pid == os.getpid():
+            return
+        self._poller_pid = os.getpid()
+        threading.Thread(target=self._poll_receipts, name=f"{self.name}-receipts", daemon=True).start()
+
+    def _poll_receipts(self):
+        while True:
+            with self._lock:
+                while not self._receipts or self._receipts[0][0] > time.time():
+                    timeout = self._receipts[0][0] - time.time() if self._receipts else None
+                    self._receipt_cond.wait(timeout=timeout)
+                ids = []
+                while self._receipts and self._receipts[0][0] <= time.time() and len(ids) < MAX_IDS_PER_RECEIPTS:
+                    ticket_id = heapq.heappop(self._receipts)[1]
+                    if ticket_id in self._tickets:
+                        ids.append(ticket_id)
+            if not ids:
+                continue
+            try:
+                receipts = self.client.receipts(ids)
+            except PushError as e:
+                print(f"⚠️ {self.name}: receipts for {len(ids)} ticket(s) failed: {e}")
+                receipts = {}
+            self._record_receipts(ids, receipts)
+
+    def _record_receipts(self, ids, receipts):
+        now = time.time()
+        evict = []
+        with self._lock:
+            for ticket_id in ids:
+                record, token, attempts = self._tickets.pop(ticket_id)
+                receipt = receipts.get(ticket_id)
+                if receipt is None:
+                    if attempts + 1 < self.receipt_attempts:
+                        # Not ready yet (or the request failed): ask again later
+                        self._tickets[ticket_id] = (record, token, attempts + 1)
+                        heapq.heappush(self._receipts, (now + max(1.0, self.receipt_delay_s), ticket_id))
+                    else:
+                        self.counts["receipts_unavailable"] += 1
+                    continue
+                ok = receipt.get("status") == "ok"
+                user_ids = [uid for uid, r in record.recipients.items() if r.get("ticketId") == ticket_id]
+                for user_id in user_ids:
+                    recipient = record.recipients[user_id]
+                    recipient["receipt"] = receipt
+                    if ok:
+                        recipient["status"] = DELIVERED
+                    else:
+                        recipient.update(status=FAILED, error=_error_of(receipt))
+                    self.counts[DELIVERED if ok else "receipt_failed"] += 1  # already counted as sent
+                if not ok and _error_of(receipt) == UNREGISTERED:
+                    evict.append((token, user_ids))
+        for token, user_ids in evict:
+            self._evict(token, user_ids)
+
+
+def _error_ticket(message, error):
+    return {"status": "error", "message": message, "details": {"error": error}}
+
+
+def _error_of(ticket):
+    """Expo's error code (details.error) of an error ticket / receipt, else its message"""
+    if not isinstance(ticket, dict):
+        return "InvalidTicket"
+    details = ticket.get("details") or {}
+    return details.get("error") or ticket.get("message") or "Unknown"
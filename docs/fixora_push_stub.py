@@ -0,0 +1,150 @@
+"""
+Local stand-in for the Expo push service, to exercise the server's
+notification fan-out (fixora_push.py) without sending real notifications:
+
+    python fixora_push_stub.py --port 5056
+    FIXORA_EXPO_PUSH_URL=http://127.0.0.1:5056/--/api/v2/push/send \\
+        FIXORA_PUSH_RECEIPT_DELAY_S=2 python COLAB_FINAL_SERVER.py
+    curl http://127.0.0.1:5056/stats
+
+POST /--/api/v2/push/send answers one ticket per message (and, like Expo,
+rejects more than 100 messages); POST /--/api/v2/push/getReceipts answers the
+receipts (at most 1000 ids). Tokens containing "gone" get a DeviceNotRegistered
+ticket, tokens containing "unregistered" an ok ticket and a DeviceNotRegistered
+receipt. GET /stats counts requests, messages, batch sizes and the TCP
+connections they arrived on (keep-alive reuse).
+
+--fail-first N answers the first N send requests with 429 (Retry-After:
+--retry-after), --fail-rate P a random share of them with 503, and
+--latency-ms adds a delay to every request.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+TOKEN_PATTERN = re.compile(r"^Expo(nent)?PushToken\[[^\]]+\]$")
+MAX_MESSAGES, MAX_RECEIPT_IDS = 100, 1000
+
+
+def make_handler(fail_first, fail_rate, retry_after, latency_ms):
+    lock = threading.Lock()
+    receipts = {}  # ticket id -> receipt
+    state = {"failures_left": fail_first, "connections": 0, "send_requests": 0, "receipt_requests": 0,
+             "messages": 0, "failed_requests": 0, "rejected_requests": 0, "batch_sizes": {}}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse shows up in /stats
+
+        def setup(self):
+            super().setup()
+            with lock:
+                state["connections"] += 1
+
+        def _reply(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/stats":
+                return self._reply(404, {"errors": [{"code": "NOT_FOUND", "message": self.path}]})
+            with lock:
+                stats = dict(state, batch_sizes=dict(sorted(state["batch_sizes"].items())),
+                             max_batch=max(state["batch_sizes"], default=0), receipts=len(receipts))
+            stats.pop("failures_left")
+            self._reply(200, stats)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            if self.path.endswith("/push/send"):
+                return self._send(payload)
+            if self.path.endswith("/push/getReceipts"):
+                return self._receipts(payload)
+            self._reply(404, {"errors": [{"code": "NOT_FOUND", "message": self.path}]})
+
+        def _send(self, payload):
+            messages = payload if isinstance(payload, list) else [payload]
+            with lock:
+                state["send_requests"] += 1
+                if state["failures_left"] > 0 or random.random() < fail_rate:
+                    throttled = state["failures_left"] > 0
+                    state["failures_left"] = max(0, state["failures_left"] - 1)
+                    state["failed_requests"] += 1
+                    print(f"↩️  {'429' if throttled else '503'} for {len(messages)} message(s)")
+                    return self._reply(429 if throttled else 503,
+                                       {"errors": [{"code": "TOO_MANY_REQUESTS", "message": "stub failure"}]},
+                                       {"Retry-After": str(retry_after)})
+                if len(messages) > MAX_MESSAGES:
+                    state["rejected_requests"] += 1
+                    return self._reply(400, {"errors": [{"code": "PUSH_TOO_MANY_NOTIFICATIONS",
+                                                         "message": f"{len(messages)} > {MAX_MESSAGES} messages"}]})
+                state["messages"] += len(messages)
+                state["batch_sizes"][len(messages)] = state["batch_sizes"].get(len(messages), 0) + 1
+                tickets = []
+                for message in messages:
+                    token = str(message.get("to", ""))
+                    if not TOKEN_PATTERN.match(token) or "gone" in token:
+                        tickets.append({"status": "error", "message": f"{token} is not a registered push token",
+                                        "details": {"error": "DeviceNotRegistered", "expoPushToken": token}})
+                        continue
+                    ticket_id = str(uuid.uuid4())
+                    tickets.append({"status": "ok", "id": ticket_id})
+                    receipts[ticket_id] = ({"status": "error", "message": "device is no longer registered",
+                                            "details": {"error": "DeviceNotRegistered"}}
+                                           if "unregistered" in token else {"status": "ok"})
+            print(f"📨 send: {len(messages)} message(s) on connection {self.client_address[1]}")
+            self._reply(200, {"data": tickets})
+
+        def _receipts(self, payload):
+            ids = (payload or {}).get("ids") or []
+            with lock:
+                state["receipt_requests"] += 1
+                if len(ids) > MAX_RECEIPT_IDS:
+                    state["rejected_requests"] += 1
+                    return self._reply(400, {"errors": [{"code": "PUSH_TOO_MANY_RECEIPTS",
+                                                         "message": f"{len(ids)} > {MAX_RECEIPT_IDS} ids"}]})
+                data = {tid: receipts[tid] for tid in ids if tid in receipts}
+            print(f"🧾 getReceipts: {len(data)}/{len(ids)} ready")
+            self._reply(200, {"data": data})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N send requests with 429")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="answer this share of send requests with 503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on failures")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every request")
+    args = parser.parse_args()
+
+    handler = make_handler(args.fail_first, args.fail_rate, args.retry_after, args.latency_ms)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"📲 Expo push stub listening on http://{args.host}:{args.port}/--/api/v2/push/send (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
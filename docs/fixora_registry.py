@@ -0,0 +1,349 @@
+"""
+Versioned model artifacts for the Fixora inference server.
+
+A registry is a directory with one sub-directory per model family and one per
+version inside it:
+
+    registry/
+      image/
+        2024-06-01/   model.keras  [label_encoder.joblib]  [fixora_export.py exports]
+        2024-07-15/   ...
+        CURRENT       "2024-07-15"   the version the server answers with
+        CANDIDATE     "2024-08-02"   optional: loaded beside CURRENT and shadowed
+      text/
+        v3/           classifier.joblib  label_encoder.joblib  embedding_model_name.txt
+                      [urgency_fast.joblib]
+        CURRENT       "v3"
+
+Versions are immutable once published (`publish` copies into a temporary
+directory and renames it into place); switching versions only rewrites the
+CURRENT / CANDIDATE pointer, atomically. The server (FIXORA_MODEL_REGISTRY)
+polls the pointers and hot-swaps, see fixora_models.ModelLoader.reload. Without
+a CURRENT file the highest version (natural sort) is served.
+
+Without a registry the server's flat FIXORA_*_PATH files are a single implicit
+version per family, named after their sizes and mtimes, so replacing a file in
+place is picked up the same way.
+
+ShadowTraffic mirrors a sample of live inputs to a candidate and compares its
+labels and latency with the live model's.
+
+Usage:
+    python fixora_registry.py list registry/
+    python fixora_registry.py publish registry/ image 2024-08-02 model=retrained.keras labels=image_label_encoder.joblib
+    python fixora_registry.py candidate registry/ image 2024-08-02     # shadow it
+    python fixora_registry.py promote registry/ image 2024-08-02       # serve it
+    python fixora_registry.py candidate registry/ image --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# family -> artifact key -> file name inside a version directory
+LAYOUT = {
+    "image": {"model": "model.keras", "labels": "label_encoder.joblib"},
+    "text": {
+        "classifier": "classifier.joblib",
+        "labels": "label_encoder.joblib",
+        "embedding_model_name": "embedding_model_name.txt",
+        "urgency_fast": "urgency_fast.joblib",
+    },
+}
+REQUIRED = {"image": ("model",), "text": ("classifier", "labels", "embedding_model_name")}
+
+CURRENT, CANDIDATE = "CURRENT", "CANDIDATE"
+
+_VERSION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class ModelVersion:
+    """One family's artifacts: `path(key)` -> file, `version` -> its name"""
+
+    def __init__(self, family, version, files, directory=None):
+        self.family = family
+        self.version = version
+        self.files = dict(files)
+        self.directory = directory
+
+    @classmethod
+    def static(cls, family, files):
+        """Unversioned files, named "local-<hash of their sizes + mtimes>" so in-place replacements show up"""
+        stamp = hashlib.sha1()
+        for key in sorted(files):
+            try:
+                st = os.stat(files[key])
+                stamp.update(f"{key}:{files[key]}:{st.st_size}:{st.st_mtime_ns};".encode())
+            except OSError:
+                stamp.update(f"{key}:{files[key]}:missing;".encode())
+        return cls(family, f"local-{stamp.hexdigest()[:10]}", files)
+
+    def path(self, key):
+        return self.files[key]
+
+    def to_dict(self):
+        return {"family": self.family, "version": self.version, "directory": self.directory}
+
+    def __repr__(self):
+        return f"ModelVersion({self.family}={self.version})"
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def _write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    """
+        registry = ModelRegistry("/content/drive/My Drive/fixora_registry")
+        registry.current("image")                    # ModelVersion served now
+        registry.publish("image", "2024-08-02", {"model": "retrained.keras"})
+        registry.promote("image", "2024-08-02")
+    """
+
+    def __init__(self, root, layout=LAYOUT):
+        self.root = root
+        self.layout = layout
+
+    def _family_dir(self, family):
+        if family not in self.layout:
+            raise KeyError(f"Unknown model family '{family}' (expected one of {', '.join(self.layout)})")
+        return os.path.join(self.root, family)
+
+    def versions(self, family):
+        family_dir = self._family_dir(family)
+        if not os.path.isdir(family_dir):
+            return []
+        names = [n for n in os.listdir(family_dir)
+                 if _VERSION_NAME.match(n) and n not in (CURRENT, CANDIDATE)
+                 and os.path.isdir(os.path.join(family_dir, n))]
+        return sorted(names, key=_natural_key)
+
+    def resolve(self, family, version):
+        """ModelVersion for a published version; KeyError if it doesn't exist"""
+        directory = os.path.join(self._family_dir(family), str(version))
+        if not _VERSION_NAME.match(str(version)) or not os.path.isdir(directory):
+            raise KeyError(f"No {family} version '{version}' in {self.root}")
+        files = {key: os.path.join(directory, name) for key, name in self.layout[family].items()}
+        return ModelVersion(family, str(version), files, directory)
+
+    def _pointer(self, family, name):
+        try:
+            with open(os.path.join(self._family_dir(family), name)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current(self, family):
+        version = self._pointer(family, CURRENT)
+        if version is None:
+            versions = self.versions(family)
+            if not versions:
+                raise KeyError(f"No {family} versions in {self.root}")
+            version = versions[-1]
+        return self.resolve(family, version)
+
+    def candidate(self, family):
+        """Version to shadow beside CURRENT, or None"""
+        version = self._pointer(family, CANDIDATE)
+        return self.resolve(family, version) if version else None
+
+    def promote(self, family, version):
+        """Serve `version` (and stop shadowing it)"""
+        source = self.resolve(family, version)
+        _write_atomic(os.path.join(self._family_dir(family), CURRENT), source.version + "\n")
+        if self._pointer(family, CANDIDATE) == source.version:
+            self.set_candidate(family, None)
+        return source
+
+    def set_candidate(self, family, version):
+        path = os.path.join(self._family_dir(family), CANDIDATE)
+        if version is None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        source = self.resolve(family, version)
+        _write_atomic(path, source.version + "\n")
+        return source
+
+    def publish(self, family, version, files):
+        """Copy {artifact key: path} into a new version directory (files or directories, e.g. a SavedModel)"""
+        family_dir = self._family_dir(family)
+        if not _VERSION_NAME.match(str(version)):
+            raise ValueError(f"Invalid version name '{version}'")
+        if os.path.exists(os.path.join(family_dir, version)):
+            raise FileExistsError(f"{family} version '{version}' already exists; versions are immutable")
+        unknown = set(files) - set(self.layout[family])
+        if unknown:
+            raise KeyError(f"Unknown {family} artifact(s): {', '.join(sorted(unknown))}")
+        missing = [key for key in REQUIRED.get(family, ()) if key not in files]
+        if missing:
+            raise KeyError(f"{family} version needs: {', '.join(missing)}")
+
+        os.makedirs(family_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=family_dir, prefix=".publish-")
+        try:
+            for key, src in files.items():
+                dst = os.path.join(staging, self.layout[family][key])
+                if os.path.isdir(src):
+                    shutil.copytree(src, dst)
+                else:
+                    shutil.copy2(src, dst)
+            os.rename(staging, os.path.join(family_dir, version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return self.resolve(family, version)
+
+    def describe(self):
+        out = {}
+        for family in self.layout:
+            out[family] = {
+                "current": self._pointer(family, CURRENT),
+                "candidate": self._pointer(family, CANDIDATE),
+                "versions": self.versions(family),
+            }
+        return out
+
+
+# -----------------------
+# SHADOW TRAFFIC
+# -----------------------
+class ShadowTraffic:
+    """
+    Runs a sampled `fraction` of live inputs through a candidate model in one
+    background thread, off the request path, and compares it with the live model:
+    label agreement and latency per item, side by side. Beyond `max_pending`
+    queued comparisons samples are dropped rather than queued.
+
+        if shadow.sample():
+            shadow.submit("image", candidate.version, live_labels, live_ms_per_item,
+                          lambda: candidate_labels_for(copy_of_inputs))
+    """
+
+    def __init__(self, fraction=0.1, max_pending=4):
+        self.fraction = min(1.0, max(0.0, float(fraction)))
+        self.max_pending = max(1, int(max_pending))
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._dropped = 0
+        self._stats = {}  # (group, version) -> counters
+        self._executor = None
+        self._executor_pid = None
+
+    def sample(self):
+        return self.fraction > 0 and random.random() < self.fraction
+
+    def submit(self, group, version, live_labels, live_ms_per_item, run):
+        """Queue `run()` (-> candidate labels for the same inputs); False if dropped"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._dropped += 1
+                return False
+            self._pending += 1
+            if self._executor_pid != os.getpid():  # threads don't survive fork
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+                self._executor_pid = os.getpid()
+        self._executor.submit(self._compare, group, version, list(live_labels), live_ms_per_item, run)
+        return True
+
+    def _compare(self, group, version, live_labels, live_ms_per_item, run):
+        started = time.perf_counter()
+        try:
+            labels = list(run())
+            error = None
+        except Exception as e:
+            labels, error = None, f"{type(e).__name__}: {e}"
+        candidate_ms = (time.perf_counter() - started) * 1000.0 / max(1, len(live_labels))
+        with self._lock:
+            self._pending -= 1
+            st = self._stats.setdefault((group, version), {
+                "compared": 0, "agreed": 0, "errors": 0, "live_ms": 0.0, "candidate_ms": 0.0, "last_error": None})
+            if error is not None:
+                st["errors"] += 1
+                st["last_error"] = error
+                return
+            st["compared"] += len(live_labels)
+            st["agreed"] += sum(1 for a, b in zip(live_labels, labels) if a == b)
+            if live_ms_per_item is not None:
+                st["live_ms"] += live_ms_per_item * len(live_labels)
+                st["candidate_ms"] += candidate_ms * len(live_labels)
+
+    def stats(self):
+        with self._lock:
+            out = {"fraction": self.fraction, "pending": self._pending, "dropped": self._dropped, "candidates": {}}
+            for (group, version), st in self._stats.items():
+                n = st["compared"]
+                live_ms = st["live_ms"] / n if n else None
+                candidate_ms = st["candidate_ms"] / n if n else None
+                out["candidates"].setdefault(group, {})[version] = {
+                    "compared": n,
+                    "agreement": round(st["agreed"] / n, 4) if n else None,
+                    "live_ms_per_item": round(live_ms, 3) if live_ms else None,
+                    "candidate_ms_per_item": round(candidate_ms, 3) if candidate_ms else None,
+                    "latency_ratio": round(candidate_ms / live_ms, 3) if live_ms and candidate_ms else None,
+                    "errors": st["errors"],
+                    "last_error": st["last_error"],
+                }
+            return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="versions and pointers per family")
+    p.add_argument("root")
+    p = sub.add_parser("publish", help="copy artifacts into a new version")
+    p.add_argument("root")
+    p.add_argument("family", choices=sorted(LAYOUT))
+    p.add_argument("version")
+    p.add_argument("files", nargs="+", metavar="KEY=PATH", help="e.g. model=retrained.keras")
+    p = sub.add_parser("promote", help="serve a version")
+    p.add_argument("root")
+    p.add_argument("family", choices=sorted(LAYOUT))
+    p.add_argument("version")
+    p = sub.add_parser("candidate", help="shadow a version beside the current one")
+    p.add_argument("root")
+    p.add_argument("family", choices=sorted(LAYOUT))
+    p.add_argument("version", nargs="?")
+    p.add_argument("--clear", action="store_true", help="stop shadowing")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "list":
+        print(json.dumps(registry.describe(), indent=2))
+    elif args.command == "publish":
+        files = dict(item.split("=", 1) for item in args.files)
+        source = registry.publish(args.family, args.version, files)
+        print(f"✅ Published {args.family} {source.version} -> {source.directory}")
+    elif args.command == "promote":
+        registry.promote(args.family, args.version)
+        print(f"✅ {args.family}: serving {args.version} (picked up on the server's next poll)")
+    elif args.command == "candidate":
+        if args.clear or not args.version:
+            registry.set_candidate(args.family, None)
+            print(f"✅ {args.family}: no candidate")
+        else:
+            registry.set_candidate(args.family, args.version)
+            print(f"✅ {args.family}: shadowing {args.version}")
+
+
+if __name__ == "__main__":
+    main()
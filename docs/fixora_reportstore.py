@@ -0,0 +1,619 @@
+"""
+Columnar store of the hot report fields for the Fixora server.
+
+Every report the app syncs is kept as one row of NumPy columns:
+
+  id                    report id (bytes; the base is sorted by it)
+  org, category,        int32 codes into append-only dictionaries (-1 = unknown)
+  status, urgency
+  lat, lon, created     float64 (NaN = unknown; created in epoch seconds)
+  image, text           optional float32 embeddings (+ has_image / has_text)
+
+so filters like "open potholes reports of organization X near here" are a few
+vectorized comparisons over contiguous arrays instead of a pass over JSON
+documents, and duplicate candidates / analytics / backfills read only the
+columns they need.
+
+Storage (with a directory; without one the store is memory only):
+
+  CURRENT               name of the live generation directory
+  gen-000042/           one .npy file per column + manifest.json (dictionaries, dims)
+  log.ndjson            upserts / removals since that generation was written
+
+Start-up maps the generation's columns with np.load(mmap_mode="r") - nothing
+is read until a query touches it, ids are looked up by binary search over the
+sorted id column - and replays only the log. Updates append to the log and to
+an in-memory tail segment and mark the row they replace dead. Once the tail and
+the dead rows outgrow `compact_min_rows` / `compact_ratio` of the base, a
+background compaction merges the live rows into a new generation; updates
+arriving meanwhile go to a fresh tail and the next log, and rows they replace
+are marked dead in the new base when it is swapped in.
+
+One process owns a directory (`fixora_serve.py --mode threads`, or dev).
+"""
+
+import base64
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from fixora_geoindex import METERS_PER_DEGREE, haversine_m
+
+
+CODED = ("org", "category", "status", "urgency")
+FLOATS = ("lat", "lon", "created")
+VECTORS = ("image", "text")
+
+# upsert keyword -> column
+_FIELD_COLUMNS = {"organization_id": "org", "category": "category", "status": "status", "urgency": "urgency",
+                  "lat": "lat", "lon": "lon", "created": "created"}
+
+
+def parse_time(value):
+    """Epoch seconds from epoch s / ms, an ISO-8601 string or a Firestore {seconds, nanoseconds}"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, dict):
+        seconds = value.get("seconds", value.get("_seconds"))
+        return float(seconds) + float(value.get("nanoseconds", value.get("_nanoseconds", 0))) / 1e9 \
+            if seconds is not None else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value) / 1000.0 if value > 1e11 else float(value)  # ms since the epoch
+    try:
+        parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def _encode_vector(vector):
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(text):
+    return np.frombuffer(base64.b64decode(text), dtype=np.float32)
+
+
+def _decode_ids(ids):
+    try:
+        return np.asarray(ids).astype(str)  # ASCII ids (Firestore's) convert without a per-item decode
+    except UnicodeDecodeError:
+        return np.char.decode(np.asarray(ids), "utf-8")
+
+
+class _Segment:
+    """
+    Rows in columns: the memory-mapped base (read-only, sorted by id) or an
+    in-memory tail that grows by doubling. `dead` marks rows replaced or removed.
+    """
+
+    def __init__(self, dims, capacity=256):
+        self.n = 0
+        self.base = False
+        self.ids = np.empty(capacity, dtype=object)
+        self.cols = {c: np.full(capacity, -1, dtype=np.int32) for c in CODED}
+        self.cols.update({c: np.full(capacity, np.nan) for c in FLOATS})
+        self.vectors = {k: None for k in VECTORS}
+        self.has = {k: np.zeros(capacity, dtype=bool) for k in VECTORS}
+        self.dead = np.zeros(capacity, dtype=bool)
+        self.index = {}  # id -> row (tails only)
+        for kind, dim in dims.items():
+            if dim:
+                self.vectors[kind] = np.zeros((capacity, dim), dtype=np.float32)
+
+    @classmethod
+    def load(cls, directory, manifest):
+        seg = cls.__new__(cls)
+        seg.n = int(manifest["rows"])
+        seg.base = True
+        seg.index = None
+
+        def mmap(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        seg.ids = mmap("id")
+        seg.cols = {c: mmap(c) for c in CODED + FLOATS}
+        seg.vectors = {k: mmap(k) if manifest["dims"].get(k) else None for k in VECTORS}
+        seg.has = {k: mmap(f"has_{k}") for k in VECTORS}
+        seg.dead = np.zeros(seg.n, dtype=bool)  # the only per-row allocation at start-up
+        return seg
+
+    @property
+    def capacity(self):
+        return len(self.dead)
+
+    def find(self, report_id):
+        """Live row of `report_id` in this segment, or None"""
+        if self.base:
+            key = report_id.encode("utf-8")
+            row = int(np.searchsorted(self.ids, key))
+            found = row < self.n and self.ids[row] == key
+        else:
+            row = self.index.get(report_id)
+            found = row is not None
+        return row if found and not self.dead[row] else None
+
+    def row(self, row):
+        """(codes + floats dict, {kind: vector or None}) of one row"""
+        fields = {c: self.cols[c][row].item() for c in CODED + FLOATS}
+        vectors = {k: np.array(self.vectors[k][row]) if self.has[k][row] else None for k in VECTORS}
+        return fields, vectors
+
+    def append(self, report_id, fields, vectors):
+        if self.n == self.capacity:
+            self._grow()
+        row = self.n
+        self.ids[row] = report_id
+        for c, value in fields.items():
+            self.cols[c][row] = value
+        for kind, vector in vectors.items():
+            if vector is not None:
+                self.vectors[kind][row] = vector
+                self.has[kind][row] = True
+        self.index[report_id] = row
+        self.n += 1
+        return row
+
+    def ensure_dim(self, kind, dim):
+        if self.vectors[kind] is None:
+            self.vectors[kind] = np.zeros((self.capacity, dim), dtype=np.float32)
+
+    def _grow(self):
+        capacity = self.capacity * 2
+
+        def grown(array, fill):
+            out = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            out[:self.n] = array[:self.n]
+            return out
+
+        self.ids = grown(self.ids, None)
+        self.cols = {c: grown(a, -1 if c in CODED else np.nan) for c, a in self.cols.items()}
+        self.vectors = {k: grown(v, 0) if v is not None else None for k, v in self.vectors.items()}
+        self.has = {k: grown(a, False) for k, a in self.has.items()}
+        self.dead = grown(self.dead, False)
+
+
+class ReportStore:
+    """
+        store = ReportStore("/content/report_store")
+        store.upsert("r1", organization_id="colombo", category="potholes", status="pending",
+                     urgency="High", lat=6.9271, lon=79.8612, created="2025-01-05T10:00:00Z",
+                     image=image_vec, text=text_vec)
+        rows = store.select(organization_id="colombo", category="potholes", status=OPEN_STATUSES)
+        rows["id"], rows["lat"], rows["image"]          # numpy columns of the matching rows
+        store.count_by("urgency", organization_id="colombo")   # {"High": 12, "Low": 40}
+    """
+
+    def __init__(self, directory=None, compact_min_rows=4096, compact_ratio=0.25, name="reports"):
+        self.directory = directory
+        self.compact_min_rows = max(1, int(compact_min_rows))
+        self.compact_ratio = max(0.0, float(compact_ratio))
+        self.name = name
+        self._lock = threading.RLock()
+        self._dicts = {c: [] for c in CODED}   # code -> value
+        self._codes = {c: {} for c in CODED}   # value -> code
+        self._dims = {k: None for k in VECTORS}
+        self._base = None
+        self._frozen = []  # tails being merged by a running compaction
+        self._tail = _Segment(self._dims)
+        self._killed = 0   # rows marked dead since the last compaction
+        self._generation = 0
+        self._log = None
+        self._compacting = False
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.counts = {"upserts": 0, "removals": 0, "compactions": 0, "compact_ms": None, "load_ms": None,
+                       "replayed": 0}
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            started = time.perf_counter()
+            self._load()
+            self.counts["load_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+            self._log = open(self._path("log.ndjson"), "a", encoding="utf-8")
+
+    # -----------------------
+    # UPDATES
+    # -----------------------
+    def upsert(self, report_id, organization_id=None, category=None, status=None, urgency=None,
+               lat=None, lon=None, created=None, image=None, text=None, _log=True):
+        """Add or update a report; fields left as None keep their stored value"""
+        report_id = str(report_id)
+        given = {"organization_id": organization_id, "category": category, "status": status,
+                 "urgency": urgency, "lat": lat, "lon": lon, "created": created}
+        with self._lock:
+            # Convert / validate everything before the current row is touched: a bad value
+            # (e.g. embeddings of another size after a model swap) leaves the report as it was
+            updates = {}
+            for key, value in given.items():
+                if value is None:
+                    continue
+                column = _FIELD_COLUMNS[key]
+                if column in CODED:
+                    updates[column] = str(value)
+                elif column == "created":
+                    parsed = parse_time(value)
+                    if parsed is not None:
+                        updates[column] = parsed
+                else:
+                    updates[column] = float(value)
+            new_vectors = {}
+            for kind, vector in (("image", image), ("text", text)):
+                if vector is None:
+                    continue
+                new_vectors[kind] = np.asarray(vector, dtype=np.float32).reshape(-1)
+                dim = self._dims[kind]
+                if dim is not None and dim != len(new_vectors[kind]):
+                    raise ValueError(f"{kind} embeddings have {dim} dimensions, got {len(new_vectors[kind])}")
+
+            location = self._locate(report_id)
+            if location is not None:
+                seg, row = location
+                fields, vectors = seg.row(row)
+                seg.dead[row] = True
+                self._killed += 1
+            else:
+                fields = {c: (-1 if c in CODED else np.nan) for c in CODED + FLOATS}
+                vectors = {k: None for k in VECTORS}
+            for column, value in updates.items():
+                fields[column] = self._code(column, value) if column in CODED else value
+            for kind, vector in new_vectors.items():
+                self._check_dim(kind, len(vector))
+                vectors[kind] = vector
+            self._tail.append(report_id, fields, vectors)
+            self.counts["upserts"] += 1
+            if _log and self._log is not None:
+                entry = {"op": "upsert", "id": report_id}
+                entry.update({k: v for k, v in given.items() if v is not None})
+                if entry.get("created") is not None:
+                    entry["created"] = fields["created"]
+                entry.update({k: _encode_vector(v) for k, v in (("image", image), ("text", text)) if v is not None})
+                self._write(entry)
+            self._maybe_compact()
+
+    def remove(self, report_id, _log=True):
+        """Drop a deleted report; True if it was stored"""
+        report_id = str(report_id)
+        with self._lock:
+            location = self._locate(report_id)
+            if location is None:
+                return False
+            seg, row = location
+            seg.dead[row] = True
+            self._killed += 1
+            self.counts["removals"] += 1
+            if _log and self._log is not None:
+                self._write({"op": "remove", "id": report_id})
+            self._maybe_compact()
+        return True
+
+    def get(self, report_id):
+        """One report as a dict (None if unknown)"""
+        with self._lock:
+            location = self._locate(str(report_id))
+            if location is None:
+                return None
+            fields, vectors = location[0].row(location[1])
+        record = {"id": str(report_id)}
+        for c in CODED:
+            record[c] = self._dicts[c][fields[c]] if fields[c] >= 0 else None
+        for c in FLOATS:
+            record[c] = None if np.isnan(fields[c]) else fields[c]
+        record.update({f"has_{k}": v is not None for k, v in vectors.items()})
+        return record
+
+    def _locate(self, report_id):
+        """(segment, row) of the live row for `report_id` (caller holds the lock)"""
+        for seg in [self._tail] + self._frozen[::-1] + ([self._base] if self._base is not None else []):
+            row = seg.find(report_id)
+            if row is not None:
+                return seg, row
+        return None
+
+    def _code(self, column, value):
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._dicts[column])
+            self._dicts[column].append(value)
+        return code
+
+    def _check_dim(self, kind, dim):
+        if self._dims[kind] is None:
+            self._dims[kind] = dim
+        elif self._dims[kind] != dim:
+            raise ValueError(f"{kind} embeddings have {self._dims[kind]} dimensions, got {dim}")
+        self._tail.ensure_dim(kind, dim)
+
+    # -----------------------
+    # QUERIES
+    # -----------------------
+    def select(self, organization_id=None, category=None, status=None, urgency=None, since=None, until=None,
+               near=None, limit=None, columns=None):
+        """
+        Matching live rows as {column: array}: "id" plus `columns` (default every scalar
+        column, decoded; add "image" / "text" for embeddings). Each filter takes a value or
+        a list of values; since / until bound `created`; near=(lat, lon, radius_m) adds a
+        "distance_m" column and sorts by it.
+        """
+        started = time.perf_counter()
+        columns = list(columns) if columns is not None else list(CODED + FLOATS)
+        parts, dicts = self._matching(organization_id, category, status, urgency, since, until, near)
+        out = {"id": np.concatenate([_decode_ids(seg.ids[rows]) if seg.base else seg.ids[rows].astype(str)
+                                     for seg, rows in parts])
+               if parts else np.zeros(0, dtype=str)}
+        for c in columns:
+            if c in CODED:
+                codes = np.concatenate([seg.cols[c][rows] for seg, rows in parts]) if parts \
+                    else np.zeros(0, dtype=np.int32)
+                out[c] = dicts[c][codes]
+            elif c in FLOATS:
+                out[c] = np.concatenate([seg.cols[c][rows] for seg, rows in parts]) if parts else np.zeros(0)
+            elif c in VECTORS:
+                dim = self._dims[c] or 0
+                out[c] = np.concatenate([seg.vectors[c][rows] if seg.vectors[c] is not None
+                                         else np.zeros((len(rows), dim), dtype=np.float32) for seg, rows in parts]) \
+                    if parts else np.zeros((0, dim), dtype=np.float32)
+                out[f"has_{c}"] = np.concatenate([seg.has[c][rows] for seg, rows in parts]) if parts \
+                    else np.zeros(0, dtype=bool)
+            else:
+                raise ValueError(f"Unknown column {c!r}")
+
+        if near is not None:
+            lats = np.concatenate([seg.cols["lat"][rows] for seg, rows in parts]) if parts else np.zeros(0)
+            lons = np.concatenate([seg.cols["lon"][rows] for seg, rows in parts]) if parts else np.zeros(0)
+            out["distance_m"] = haversine_m(near[0], near[1], lats, lons)
+            order = np.argsort(out["distance_m"], kind="stable")
+            out = {k: v[order] for k, v in out.items()}
+        if limit is not None:
+            out = {k: v[:int(limit)] for k, v in out.items()}
+
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - started
+        return out
+
+    def count_by(self, column, **filters):
+        """{value: live rows} of a coded column over the rows matching `filters` (see select)"""
+        if column not in CODED:
+            raise ValueError(f"count_by needs one of {', '.join(CODED)}")
+        started = time.perf_counter()
+        parts, dicts = self._matching(**filters)
+        counts = np.zeros(len(dicts[column]), dtype=np.int64)  # last slot: code -1
+        for seg, rows in parts:
+            counts += np.bincount(np.asarray(seg.cols[column][rows]) % len(counts), minlength=len(counts))
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - started
+        return {dicts[column][code]: int(n) for code in np.flatnonzero(counts) for n in [counts[code]]}
+
+    def records(self, rows):
+        """JSON-ready list of dicts from a select() result (NaN -> None, no embeddings)"""
+        keys = [k for k in rows if k not in VECTORS]
+        out = []
+        for i in range(len(rows["id"])):
+            record = {}
+            for k in keys:
+                value = rows[k][i]
+                if isinstance(value, np.generic):
+                    value = value.item()
+                if isinstance(value, float) and np.isnan(value):
+                    value = None
+                record[k] = value
+            out.append(record)
+        return out
+
+    def _matching(self, organization_id=None, category=None, status=None, urgency=None, since=None, until=None,
+                  near=None):
+        """([(segment, matching rows)], {column: decoding array}) for the given filters"""
+        with self._lock:
+            segments = [(seg, seg.n) for seg in self._segments()]
+            wanted = {c: self._wanted_codes(c, v) for c, v in
+                      (("org", organization_id), ("category", category), ("status", status), ("urgency", urgency))
+                      if v is not None}
+            dicts = {c: np.asarray(self._dicts[c] + [None], dtype=object) for c in CODED}  # code -1 -> None
+        parts = []
+        if all(len(codes) for codes in wanted.values()):  # a value never seen matches nothing
+            for seg, n in segments:
+                rows = self._match(seg, n, wanted, since, until, near)
+                if len(rows):
+                    parts.append((seg, rows))
+        return parts, dicts
+
+    def _wanted_codes(self, column, values):
+        values = [values] if isinstance(values, str) or not hasattr(values, "__iter__") else list(values)
+        return [self._codes[column][str(v)] for v in values if str(v) in self._codes[column]]
+
+    @staticmethod
+    def _match(seg, n, wanted, since, until, near):
+        mask = ~seg.dead[:n]
+        for column, codes in wanted.items():
+            col = seg.cols[column][:n]
+            if len(codes) == 1:
+                mask &= col == codes[0]
+            else:
+                # lookup[code + 1] -> wanted; -1 and codes added since the query started clip onto False ends
+                lookup = np.zeros(max(codes) + 3, dtype=bool)
+                lookup[np.asarray(codes) + 1] = True
+                mask &= np.take(lookup, col + 1, mode="clip")
+        if since is not None:
+            mask &= seg.cols["created"][:n] >= since
+        if until is not None:
+            mask &= seg.cols["created"][:n] < until
+        if near is not None:
+            lat, lon, radius_m = near
+            dlat = radius_m / METERS_PER_DEGREE
+            dlon = dlat / max(np.cos(np.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+            lats, lons = seg.cols["lat"][:n], seg.cols["lon"][:n]
+            mask &= (np.abs(lats - lat) <= dlat) & (np.abs((lons - lon + 180.0) % 360.0 - 180.0) <= dlon)
+            rows = np.flatnonzero(mask)
+            if len(rows):
+                rows = rows[haversine_m(lat, lon, lats[rows], lons[rows]) <= radius_m]
+            return rows
+        return np.flatnonzero(mask)
+
+    def __len__(self):
+        with self._lock:
+            return sum(seg.n - int(seg.dead[:seg.n].sum()) for seg in self._segments())
+
+    def stats(self):
+        with self._lock:
+            base_rows = self._base.n if self._base is not None else 0
+            return {
+                "name": self.name,
+                "rows": len(self),
+                "base_rows": base_rows,
+                "tail_rows": self._tail.n + sum(seg.n for seg in self._frozen),
+                "dead_rows": sum(int(seg.dead[:seg.n].sum()) for seg in self._segments()),
+                "dims": dict(self._dims),
+                "generation": self._generation if self.directory else None,
+                "directory": self.directory,
+                "compacting": self._compacting,
+                "queries": self.queries,
+                "avg_query_us": round(self.query_seconds / self.queries * 1e6, 1) if self.queries else None,
+                **self.counts,
+            }
+
+    def _segments(self):
+        return ([self._base] if self._base is not None else []) + self._frozen + [self._tail]
+
+    # -----------------------
+    # PERSISTENCE
+    # -----------------------
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _write(self, entry):
+        self._log.write(json.dumps(entry) + "\n")
+        self._log.flush()
+
+    def _load(self):
+        current = self._path("CURRENT")
+        if os.path.exists(current):
+            with open(current) as f:
+                generation_dir = f.read().strip()
+            with open(self._path(generation_dir, "manifest.json")) as f:
+                manifest = json.load(f)
+            self._generation = int(manifest["generation"])
+            self._dicts = {c: list(manifest["dictionaries"][c]) for c in CODED}
+            self._codes = {c: {v: i for i, v in enumerate(values)} for c, values in self._dicts.items()}
+            self._dims = {k: manifest["dims"].get(k) for k in VECTORS}
+            self._base = _Segment.load(self._path(generation_dir), manifest)
+            self._tail = _Segment(self._dims)
+        # .prev: a compaction was interrupted; replaying an entry twice leaves the same row
+        for name in ("log.ndjson.prev", "log.ndjson"):
+            if not os.path.exists(self._path(name)):
+                continue
+            with open(self._path(name), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if entry.get("op") == "upsert":
+                        kwargs = {k: entry.get(k) for k in _FIELD_COLUMNS}
+                        kwargs.update({k: _decode_vector(entry[k]) for k in VECTORS if entry.get(k)})
+                        self.upsert(entry["id"], _log=False, **kwargs)
+                    elif entry.get("op") == "remove":
+                        self.remove(entry["id"], _log=False)
+                    self.counts["replayed"] += 1
+
+    def _maybe_compact(self):
+        """Start a background compaction once the tail + dead rows outgrow the base (caller holds the lock)"""
+        if not self.directory or self._compacting:
+            return
+        base_rows = self._base.n if self._base is not None else 0
+        if self._tail.n + self._killed < max(self.compact_min_rows, self.compact_ratio * base_rows):
+            return
+        self._compacting = True
+        threading.Thread(target=self.compact, args=(True,), name=f"{self.name}-compact", daemon=True).start()
+
+    def compact(self, _started=False):
+        """Merge the live rows into a new memory-mapped generation; False if one is already running"""
+        if not self.directory:
+            return False
+        started = time.perf_counter()
+        with self._lock:
+            if self._compacting and not _started:
+                return False
+            self._compacting = True
+            # Freeze: new updates go to a fresh tail and log while the old ones are merged
+            self._frozen.append(self._tail)
+            merging = [seg for seg in [self._base] + self._frozen if seg is not None]
+            self._tail = _Segment(self._dims)
+            self._killed = 0
+            self._log.close()
+            os.replace(self._path("log.ndjson"), self._path("log.ndjson.prev"))
+            self._log = open(self._path("log.ndjson"), "a", encoding="utf-8")
+            dictionaries = {c: list(values) for c, values in self._dicts.items()}
+            dims = dict(self._dims)
+            generation = self._generation + 1
+            keep = [(seg, np.flatnonzero(~seg.dead[:seg.n])) for seg in merging]
+        try:
+            generation_dir = f"gen-{generation:06d}"
+            order, rows = self._write_generation(generation_dir, keep, dictionaries, dims, generation)
+            base = _Segment.load(self._path(generation_dir), json.load(open(self._path(generation_dir, "manifest.json"))))
+            tmp = self._path("CURRENT.tmp")
+            with open(tmp, "w") as f:
+                f.write(generation_dir)
+            os.replace(tmp, self._path("CURRENT"))
+            with self._lock:
+                # Rows replaced while merging are dead in the new base too
+                base.dead[:] = np.concatenate([seg.dead[idx] for seg, idx in keep])[order] if rows \
+                    else np.zeros(0, dtype=bool)
+                old_dir = self._generation_dir()
+                self._base = base
+                self._frozen = [seg for seg in self._frozen if all(seg is not m for m in merging)]
+                self._generation = generation
+                self.counts["compactions"] += 1
+                self.counts["compact_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+            if os.path.exists(self._path("log.ndjson.prev")):
+                os.remove(self._path("log.ndjson.prev"))
+            if old_dir and old_dir != generation_dir:
+                shutil.rmtree(self._path(old_dir), ignore_errors=True)  # mapped pages stay valid until unmapped
+            print(f"🗜️ {self.name}: generation {generation} with {rows} row(s) in {self.counts['compact_ms']} ms")
+            return True
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _generation_dir(self):
+        return f"gen-{self._generation:06d}" if self._generation else None
+
+    def _write_generation(self, generation_dir, keep, dictionaries, dims, generation):
+        """Write the kept rows, sorted by id, as .npy columns; (sort order, rows)"""
+        tmp_dir = self._path(generation_dir + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        ids = np.concatenate([np.asarray(seg.ids[idx]) if seg.base
+                              else np.char.encode(seg.ids[idx].astype(str), "utf-8") for seg, idx in keep]) \
+            if keep else np.zeros(0, dtype="S1")
+        ids = ids.astype(f"S{max(1, max((len(i) for i in ids), default=1))}")
+        order = np.argsort(ids, kind="stable")
+
+        def save(name, array):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+        save("id", ids[order])
+        for c in CODED + FLOATS:
+            save(c, np.concatenate([seg.cols[c][idx] for seg, idx in keep])[order])
+        for kind in VECTORS:
+            save(f"has_{kind}", np.concatenate([seg.has[kind][idx] for seg, idx in keep])[order])
+            if dims[kind]:
+                save(kind, np.concatenate([seg.vectors[kind][idx] if seg.vectors[kind] is not None
+                                           else np.zeros((len(idx), dims[kind]), dtype=np.float32)
+                                           for seg, idx in keep])[order])
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+            json.dump({"generation": generation, "rows": int(len(ids)), "dictionaries": dictionaries,
+                       "dims": dims, "writtenAt": time.time()}, f)
+        final_dir = self._path(generation_dir)
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(tmp_dir, final_dir)
+        return order, int(len(ids))
@@ -0,0 +1,237 @@
+"""
+CPU runtime configuration for the Fixora inference server.
+
+TensorFlow (MobileNetV2) and PyTorch (SentenceTransformer) each size their
+thread pools to every core, so when /classify and /predict_urgency run at the
+same time the two frameworks oversubscribe the same cores. This module sets,
+per model:
+
+  threads    image: TensorFlow intra-op (+ inter-op) pool, or the TFLite / ONNX
+             Runtime thread count; text: torch.set_num_threads
+  cpus       a core subset ("0-3", "4-7,12") the model's threads are pinned to
+  precision  float32 (default), bfloat16 or float16, only where the CPU has native
+             support (avx512_bf16 / amx_bf16, avx512_fp16 / amx_fp16, ARM bf16 /
+             asimdhp); otherwise float32 with a warning. The text encoder is cast
+             with model.to(dtype). The image model only takes bfloat16, through
+             TensorFlow's oneDNN auto-mixed-precision graph rewrite (keras
+             backend): the float16 CPU rewrite leaves MobileNetV2 in float32
+             (identical features in fixora_runtime_bench.py)
+  onednn     TF_ENABLE_ONEDNN_OPTS=0/1 (only effective before TensorFlow is imported)
+
+Settings are FIXORA_* environment variables on top of an optional JSON profile
+(FIXORA_RUNTIME_PROFILE) written by `fixora_runtime_bench.py`, which sweeps them
+and records the best combination measured on the host. Unset = framework default.
+
+Pinning is sched_setaffinity on the calling thread (Linux). It is applied in the
+thread that loads a model (TensorFlow creates its pools there, and they inherit
+the mask) and in the batcher worker that runs it; torch creates its OpenMP pool
+on the first forward pass, i.e. in the pinned worker.
+
+Reduced precision changes embeddings / softmax rows around the third significant
+digit, so urgency predictions close to a decision boundary can flip; the
+benchmark reports the agreement with float32 for every precision it tries.
+"""
+
+import json
+import os
+import sys
+import threading
+
+
+PRECISIONS = ("float32", "bfloat16", "float16")
+
+# setting -> environment variable (also the key used in a profile's "env")
+ENV_VARS = {
+    "image_threads": "FIXORA_IMG_THREADS",
+    "image_inter_threads": "FIXORA_IMG_INTER_THREADS",
+    "image_cpus": "FIXORA_IMG_CPUS",
+    "image_precision": "FIXORA_IMG_PRECISION",
+    "text_threads": "FIXORA_TEXT_THREADS",
+    "text_cpus": "FIXORA_TEXT_CPUS",
+    "text_precision": "FIXORA_TEXT_PRECISION",
+    "onednn": "FIXORA_ONEDNN",
+}
+
+# /proc/cpuinfo flags (x86) / features (ARM) meaning native support
+_PRECISION_FLAGS = {
+    "bfloat16": {"avx512_bf16", "amx_bf16", "bf16"},
+    "float16": {"avx512_fp16", "amx_fp16", "asimdhp"},
+}
+
+# TensorFlow grappler rewrite per precision (CPU); the image model has no other reduced precision
+_TF_MIXED_PRECISION = {
+    "bfloat16": "auto_mixed_precision_onednn_bfloat16",
+}
+
+
+def parse_cpus(spec):
+    """"0-3,6" -> [0, 1, 2, 3, 6]; None for an empty spec"""
+    if not spec:
+        return None
+    cpus = set()
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            low, high = part.split("-", 1)
+            cpus.update(range(int(low), int(high) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus) or None
+
+
+def format_cpus(cpus):
+    return ",".join(str(c) for c in cpus) if cpus else ""
+
+
+def available_cpus():
+    """Cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_features():
+    """CPU feature flags from /proc/cpuinfo (empty where it isn't available)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def precision_supported(precision, features=None):
+    if precision == "float32":
+        return True
+    features = cpu_features() if features is None else features
+    return bool(_PRECISION_FLAGS.get(precision, set()) & features)
+
+
+class RuntimeConfig:
+    """
+        runtime = RuntimeConfig.from_env()
+        runtime.apply_env()              # before TensorFlow is imported
+        runtime.pin("image"); runtime.configure_tensorflow(); model = load(...)
+        runtime.pin("text"); runtime.configure_torch(); encoder = runtime.cast_text_model(...)
+    """
+
+    def __init__(self, image_threads=0, image_inter_threads=0, image_cpus=None, image_precision="float32",
+                 text_threads=0, text_cpus=None, text_precision="float32", onednn=None, profile=None):
+        self.image_threads = max(0, int(image_threads or 0))
+        self.image_inter_threads = max(0, int(image_inter_threads or 0))
+        self.text_threads = max(0, int(text_threads or 0))
+        self.onednn = None if onednn in (None, "") else str(onednn) not in ("0", "false", "off")
+        self.profile = profile
+        self.cpus = {}
+        self.precision = {}
+        self.requested_precision = {"image": image_precision or "float32", "text": text_precision or "float32"}
+
+        allowed = set(available_cpus())
+        for role, spec in (("image", image_cpus), ("text", text_cpus)):
+            cpus = parse_cpus(spec)
+            if cpus and not set(cpus) <= allowed:
+                print(f"⚠️ {role} cpus {format_cpus(cpus)} not all available ({format_cpus(sorted(allowed))}), "
+                      "keeping the ones that are")
+                cpus = sorted(set(cpus) & allowed) or None
+            self.cpus[role] = cpus
+
+        features = cpu_features()
+        for role, precision in self.requested_precision.items():
+            if precision not in PRECISIONS:
+                raise ValueError(f"Unknown {role} precision '{precision}' (expected one of {', '.join(PRECISIONS)})")
+            if role == "image" and precision != "float32" and precision not in _TF_MIXED_PRECISION:
+                print(f"⚠️ image precision {precision} has no TensorFlow CPU rewrite that applies; using float32")
+                precision = "float32"
+            if not precision_supported(precision, features):
+                print(f"⚠️ {role} precision {precision} requested but the CPU has no native support; using float32")
+                precision = "float32"
+            self.precision[role] = precision
+
+        self._tf_configured = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """FIXORA_* variables over FIXORA_RUNTIME_PROFILE's "env" (FIXORA_IMG_BACKEND_THREADS still works)"""
+        environ = os.environ if environ is None else environ
+        values = {}
+        profile = environ.get("FIXORA_RUNTIME_PROFILE")
+        if profile:
+            try:
+                with open(profile) as f:
+                    values.update(json.load(f).get("env", {}))
+                print(f"⚙️ Runtime profile: {profile}")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not read runtime profile {profile}: {e}")
+        values.update({var: environ[var] for var in ENV_VARS.values() if environ.get(var)})
+        if "FIXORA_IMG_THREADS" not in values and environ.get("FIXORA_IMG_BACKEND_THREADS"):
+            values["FIXORA_IMG_THREADS"] = environ["FIXORA_IMG_BACKEND_THREADS"]
+        return cls(profile=profile, **{key: values.get(var) for key, var in ENV_VARS.items()})
+
+    # -----------------------
+    # APPLY
+    # -----------------------
+    def apply_env(self):
+        """Process-wide switches that must be in place before the frameworks are imported"""
+        if self.onednn is not None:
+            if "tensorflow" in sys.modules:
+                print("⚠️ TensorFlow already imported; FIXORA_ONEDNN has no effect")
+            os.environ["TF_ENABLE_ONEDNN_OPTS"] = "1" if self.onednn else "0"
+
+    def pin(self, role):
+        """Restrict the calling thread (and threads it starts later) to `role`'s cores; False if not set"""
+        cpus = self.cpus.get(role)
+        if not cpus or not hasattr(os, "sched_setaffinity"):
+            return False
+        os.sched_setaffinity(0, cpus)
+        return True
+
+    def configure_tensorflow(self):
+        """Thread pools + mixed precision for the image model; must run before TensorFlow's first op"""
+        with self._lock:
+            if self._tf_configured:
+                return
+            self._tf_configured = True
+            import tensorflow as tf
+            try:
+                if self.image_threads:
+                    tf.config.threading.set_intra_op_parallelism_threads(self.image_threads)
+                if self.image_inter_threads:
+                    tf.config.threading.set_inter_op_parallelism_threads(self.image_inter_threads)
+            except RuntimeError as e:
+                print(f"⚠️ TensorFlow thread pools already initialized: {e}")
+            if self.precision["image"] != "float32":
+                tf.config.optimizer.set_experimental_options({_TF_MIXED_PRECISION[self.precision["image"]]: True})
+
+    def configure_torch(self):
+        if self.text_threads:
+            import torch
+            torch.set_num_threads(self.text_threads)
+
+    def cast_text_model(self, model):
+        """Cast a SentenceTransformer (any torch module) to the text precision"""
+        if self.precision["text"] == "float32":
+            return model
+        import torch
+        return model.to(getattr(torch, self.precision["text"]))
+
+    def summary(self):
+        return {
+            "profile": self.profile,
+            "image": {
+                "threads": self.image_threads or "default",
+                "inter_op_threads": self.image_inter_threads or "default",
+                "cpus": format_cpus(self.cpus["image"]) or "all",
+                "precision": self.precision["image"],
+            },
+            "text": {
+                "threads": self.text_threads or "default",
+                "cpus": format_cpus(self.cpus["text"]) or "all",
+                "precision": self.precision["text"],
+            },
+            "onednn": "default" if self.onednn is None else self.onednn,
+        }
@@ -0,0 +1,308 @@
+"""
+Benchmark: sweep the CPU runtime settings of fixora_runtime.py and record the best
+combination for this host.
+
+Every trial is a fresh process (thread pools and oneDNN can only be configured
+before the frameworks start) that loads the fixora_bench.py stand-in models with
+that trial's FIXORA_* settings, then runs a fixed mix at the same time - --images
+rows through MobileNetV2 (batches of --image-batch) and --texts rows through the
+SentenceTransformer (batches of --text-batch) - the way /classify and
+/predict_urgency overlap in the server. The trial's time is the makespan of the mix.
+
+  1. thread layouts at float32: framework defaults (every core each), split
+     thread counts, and disjoint pinned core sets
+  2. the best layout with oneDNN off
+  3. bfloat16 for MobileNetV2, bfloat16 / float16 for the text encoder, where the
+     CPU supports them natively
+
+A trial's score is the defaults' makespan divided by its own (higher is better);
+per-model rows/s are reported alongside. Reduced-precision trials must keep --min-agreement of the
+float32 urgency labels to count. They also report the largest change of MobileNetV2's pooled
+features, relative to their float32 magnitude, which shows whether TensorFlow's mixed-precision
+rewrite actually ran: the stand-in's random weights make its softmax uniform (0.125 per class),
+so a softmax difference alone reads 0.0 either way. An image trial whose features stay within
+float32 noise is refused.
+
+The best settings are written as a profile for the server:
+
+    python fixora_runtime_bench.py --out runtime_profile.json
+    FIXORA_RUNTIME_PROFILE=runtime_profile.json python fixora_serve.py --mode threads
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from fixora_bench import DEFAULT_MODELS_DIR, ensure_standins, environment, has_text_encoder, standin_env
+from fixora_bench import synthetic_descriptions
+from fixora_runtime import ENV_VARS, RuntimeConfig, available_cpus, format_cpus, precision_supported
+
+
+RESULT_PREFIX = "RUNTIME_RESULT "
+REWRITE_MIN_DIFF = 1e-4  # bfloat16 moves features ~1e-2 (relative); float32 reordering ~1e-7
+
+
+# -----------------------
+# TRIAL (child process)
+# -----------------------
+def run_trial(models_dir, image_rows, text_rows, image_batch, text_batch):
+    """Load the stand-ins under the FIXORA_* settings in os.environ and run both models concurrently"""
+    runtime = RuntimeConfig.from_env()
+    runtime.apply_env()
+    paths = standin_env(models_dir)
+
+    from fixora_backends import load_backend
+    runtime.pin("image")
+    runtime.configure_tensorflow()
+    backend = load_backend("keras", paths["FIXORA_IMG_MODEL_PATH"], num_threads=runtime.image_threads or None)
+
+    encoder = classify = None
+    texts = synthetic_descriptions(256, seed=3)
+    if has_text_encoder(models_dir):
+        import joblib
+        from sentence_transformers import SentenceTransformer
+        from fixora_urgency import classify_embeddings
+        runtime.pin("text")
+        runtime.configure_torch()
+        with open(paths["FIXORA_EMBEDDING_MODEL_NAME_PATH"]) as f:
+            encoder = runtime.cast_text_model(SentenceTransformer(f.read().strip()))
+        classifier = joblib.load(paths["FIXORA_TEXT_CLASSIFIER_PATH"])
+        label_encoder = joblib.load(paths["FIXORA_TEXT_LABEL_ENCODER_PATH"])
+        classify = lambda emb: classify_embeddings(np.asarray(emb, dtype=np.float32), classifier, label_encoder)[0]
+
+    rng = np.random.default_rng(0)
+    images = rng.random((image_batch, 224, 224, 3), dtype=np.float32)
+    reference_images = rng.random((16, 224, 224, 3), dtype=np.float32)
+    result = {"settings": runtime.summary()}
+    start = threading.Barrier(2 if encoder is not None else 1)
+    started = {}
+
+    def image_loop():
+        runtime.pin("image")
+        result["image_softmax"] = np.asarray(backend.predict(reference_images)).round(5).tolist()  # + warm-up
+        result["image_features"] = np.asarray(backend.embed(reference_images)).tolist()
+        backend.predict(images)
+        start.wait()
+        started.setdefault("t", time.perf_counter())
+        for _ in range(max(1, image_rows // image_batch)):
+            backend.predict(images)
+        result["image_s"] = time.perf_counter() - started["t"]
+        result["image_rows_per_s"] = round(max(1, image_rows // image_batch) * image_batch / result["image_s"], 2)
+
+    def text_loop():
+        runtime.pin("text")
+        result["urgency_labels"] = [str(label) for label in classify(encoder.encode(texts[:128]))]  # + warm-up
+        start.wait()
+        started.setdefault("t", time.perf_counter())
+        batches = max(1, text_rows // text_batch)
+        for i in range(batches):
+            offset = (i * text_batch) % (len(texts) - text_batch)
+            encoder.encode(texts[offset:offset + text_batch])
+        result["text_s"] = time.perf_counter() - started["t"]
+        result["text_rows_per_s"] = round(batches * text_batch / result["text_s"], 2)
+
+    threads = [threading.Thread(target=image_loop)]
+    if encoder is not None:
+        threads.append(threading.Thread(target=text_loop))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result["makespan_s"] = round(max(result.get("image_s", 0.0), result.get("text_s", 0.0)), 3)
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def spawn_trial(name, env, args):
+    """Run one trial in a fresh interpreter with `env` ({FIXORA_*: value}) on top of a clean environment"""
+    child_env = {k: v for k, v in os.environ.items() if k not in ENV_VARS.values() and k != "FIXORA_RUNTIME_PROFILE"}
+    child_env.update(env)
+    cmd = [sys.executable, os.path.abspath(__file__), "--trial", "--models", args.models,
+           "--images", str(args.images), "--texts", str(args.texts), "--image-batch", str(args.image_batch),
+           "--text-batch", str(args.text_batch)]
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, env=child_env, capture_output=True, text=True, cwd=os.path.dirname(cmd[1]))
+    line = next((l for l in proc.stdout.splitlines() if l.startswith(RESULT_PREFIX)), None)
+    if proc.returncode != 0 or line is None:
+        print(f"❌ {name}: trial failed\n{proc.stderr[-2000:]}")
+        return None
+    result = json.loads(line[len(RESULT_PREFIX):])
+    result.update(name=name, env=env, wall_s=round(time.perf_counter() - started, 1))
+    print(f"⏱️ {name:<34} {result['makespan_s']:>6.2f} s   image {result['image_rows_per_s']:>7} rows/s   "
+          f"text {result.get('text_rows_per_s', '-'):>7} rows/s")
+    return result
+
+
+# -----------------------
+# SWEEP
+# -----------------------
+def layouts(cpus):
+    """(name, env) thread / core layouts worth trying on these cores"""
+    n = len(cpus)
+    out = [("default", {})]
+    if n == 1:
+        out.append(("1+1 threads", {"FIXORA_IMG_THREADS": "1", "FIXORA_IMG_INTER_THREADS": "1",
+                                    "FIXORA_TEXT_THREADS": "1"}))
+        return out
+    for image_cores in sorted({n // 2, (2 * n) // 3, n - 1}):
+        if not 0 < image_cores < n:
+            continue
+        text_cores = n - image_cores
+        threads = {"FIXORA_IMG_THREADS": str(image_cores), "FIXORA_IMG_INTER_THREADS": "1",
+                   "FIXORA_TEXT_THREADS": str(text_cores)}
+        out.append((f"{image_cores}+{text_cores} threads", threads))
+        out.append((f"{image_cores}+{text_cores} pinned", dict(
+            threads, FIXORA_IMG_CPUS=format_cpus(cpus[:image_cores]), FIXORA_TEXT_CPUS=format_cpus(cpus[image_cores:]))))
+    return out
+
+
+def score(result, base):
+    return round(base["makespan_s"] / result["makespan_s"], 3)
+
+
+def compare_outputs(result, reference):
+    """Fill in urgency agreement / max softmax difference against the float32 run"""
+    if reference.get("urgency_labels") and result.get("urgency_labels"):
+        same = sum(a == b for a, b in zip(result["urgency_labels"], reference["urgency_labels"]))
+        result["urgency_agreement"] = round(same / len(reference["urgency_labels"]), 4)
+    result["image_max_abs_diff"] = float(np.max(np.abs(
+        np.asarray(result["image_softmax"]) - np.asarray(reference["image_softmax"]))))
+    features, expected = np.asarray(result["image_features"]), np.asarray(reference["image_features"])
+    result["image_feature_rel_diff"] = float(np.max(np.abs(features - expected)) / max(np.max(np.abs(expected)), 1e-30))
+
+
+def acceptable(result, min_agreement):
+    if result["env"].get("FIXORA_IMG_PRECISION") and result.get("image_feature_rel_diff", 0.0) < REWRITE_MIN_DIFF:
+        return False  # float32-identical features: the mixed-precision rewrite didn't run
+    agreement = result.get("urgency_agreement")
+    return agreement is None or agreement >= min_agreement
+
+
+def sweep(args):
+    ensure_standins(args.models)
+    trials = []
+
+    def run(name, env, reference=None):
+        result = spawn_trial(name, env, args)
+        if result is None:
+            return None
+        if reference is not None:
+            compare_outputs(result, reference)
+        result["score"] = score(result, trials[0] if trials else result)
+        trials.append(result)
+        return result
+
+    def pick(baseline, results):
+        """Best result that beats `baseline` by --min-gain (changing a setting for noise isn't worth it)"""
+        better = [r for r in results if r is not None and acceptable(r, args.min_agreement)
+                  and r["score"] > baseline["score"] * (1 + args.min_gain)]
+        return max(better, key=lambda r: r["score"]) if better else baseline
+
+    print("🔧 Stage 1: thread layouts (float32)")
+    for name, env in layouts(available_cpus()):
+        run(name, env)
+    if not trials:
+        raise SystemExit("No trial completed")
+    best = pick(trials[0], trials[1:])
+
+    print("🔧 Stage 2: oneDNN off")
+    best = pick(best, [run(f"{best['name']} + oneDNN off", dict(best["env"], FIXORA_ONEDNN="0"), reference=best)])
+    reference = best
+
+    print("🔧 Stage 3: reduced precision")
+    chosen = {}
+    for role, var, precisions in (("image", "FIXORA_IMG_PRECISION", ("bfloat16",)),
+                                  ("text", "FIXORA_TEXT_PRECISION", ("bfloat16", "float16"))):
+        if role == "text" and not reference.get("text_rows_per_s"):
+            continue
+        for precision in precisions:
+            if not precision_supported(precision):
+                print(f"   {role} {precision}: no native CPU support, skipped")
+                continue
+            result = run(f"{best['name']} + {role} {precision}", dict(best["env"], **{var: precision}), reference)
+            if result is not None and pick(chosen.get(role, reference), [result]) is result:
+                chosen[role] = result
+                result["precision"] = precision
+    if len(chosen) > 1:
+        env = dict(best["env"], **{("FIXORA_IMG_PRECISION" if role == "image" else "FIXORA_TEXT_PRECISION"):
+                                   r["precision"] for role, r in chosen.items()})
+        run(f"{best['name']} + " + " / ".join(f"{role} {r['precision']}" for role, r in chosen.items()), env,
+            reference)
+
+    best = pick(reference, [t for t in trials if t["env"].get("FIXORA_IMG_PRECISION") or
+                            t["env"].get("FIXORA_TEXT_PRECISION")])
+
+    return {
+        "environment": environment(),
+        "settings": {"images": args.images, "texts": args.texts, "image_batch": args.image_batch,
+                     "text_batch": args.text_batch,
+                     "min_agreement": args.min_agreement, "cpus": format_cpus(available_cpus())},
+        "best": best["name"],
+        "env": best["env"],
+        "trials": [{k: v for k, v in t.items() if k not in ("image_softmax", "image_features", "urgency_labels")} for t in trials],
+    }
+
+
+def _sig(value):
+    return "" if value is None else f"{value:.3g}"
+
+
+def write_markdown(profile, path):
+    lines = ["# Fixora CPU runtime sweep", "",
+             "Generated by `python fixora_runtime_bench.py`. Stand-in models; MobileNetV2 and the text",
+             "encoder run concurrently in every trial.", "",
+             ", ".join(f"{k}: {v}" for k, v in profile["settings"].items()), "",
+             "| trial | makespan s | image rows/s | text rows/s | score | urgency agreement | max softmax diff | "
+             "image feature rel diff |",
+             "|---|---:|---:|---:|---:|---:|---:|---:|"]
+    for t in profile["trials"]:
+        lines.append(f"| {t['name']} | {t['makespan_s']} | {t['image_rows_per_s']} | {t.get('text_rows_per_s', '')} | "
+                     f"{t['score']} | "
+                     f"{t.get('urgency_agreement', '')} | {t.get('image_max_abs_diff', '')} | "
+                     f"{_sig(t.get('image_feature_rel_diff'))} |")
+    lines += ["", f"Best: **{profile['best']}**", "", "```"]
+    lines += [f"{k}={v}" for k, v in profile["env"].items()] or ["# framework defaults"]
+    lines += ["```", "", "## Environment", ""]
+    lines += [f"- {k}: {v}" for k, v in profile["environment"].items()]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default=DEFAULT_MODELS_DIR, help="stand-in artifacts directory")
+    parser.add_argument("--images", type=int, default=160, help="image rows in each trial's mix")
+    parser.add_argument("--texts", type=int, default=480, help="description rows in each trial's mix")
+    parser.add_argument("--image-batch", type=int, default=4)
+    parser.add_argument("--text-batch", type=int, default=8)
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="urgency labels a reduced-precision trial must keep (fraction of float32's)")
+    parser.add_argument("--min-gain", type=float, default=0.05,
+                        help="speed-up a setting must bring over the one it replaces (0.05 = 5%%)")
+    parser.add_argument("--out", default="runtime_profile.json", help="profile for FIXORA_RUNTIME_PROFILE")
+    parser.add_argument("--markdown", help="also write the trial table as Markdown")
+    parser.add_argument("--trial", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trial:
+        run_trial(args.models, args.images, args.texts, args.image_batch, args.text_batch)
+        return
+
+    profile = sweep(args)
+    with open(args.out, "w") as f:
+        json.dump(profile, f, indent=2)
+    if args.markdown:
+        write_markdown(profile, args.markdown)
+    print(f"\n🏆 Best: {profile['best']}")
+    for var, value in profile["env"].items():
+        print(f"   {var}={value}")
+    print(f"📝 Profile written to {args.out} (FIXORA_RUNTIME_PROFILE={os.path.abspath(args.out)})")
+
+
+if __name__ == "__main__":
+    main()
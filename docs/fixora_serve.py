@@ -0,0 +1,144 @@
+"""
+Production launcher for the Fixora inference server (COLAB_FINAL_SERVER.py).
+
+Modes:
+  dev      Flask development server + ngrok tunnel (same as running COLAB_FINAL_SERVER.py)
+  threads  one gunicorn process with --threads request threads. Models are loaded once;
+           TensorFlow / torch release the GIL during inference and the micro-batchers
+           coalesce concurrent requests. Recommended default.
+  prefork  gunicorn master loads the fork-safe models (joblib artifacts, SentenceTransformer)
+           BEFORE forking --workers processes x --threads threads, so the workers share those
+           weights copy-on-write. TensorFlow is not fork-safe, so each worker loads its own
+           MobileNetV2 (~14 MB of weights) after the fork.
+
+In prefork mode each worker's TensorFlow/torch intra-op pools default to
+cores / workers threads (TF_NUM_INTRAOP_THREADS, OMP_NUM_THREADS), so N workers
+don't oversubscribe the CPU. Explicit environment values win, and so do the
+per-model FIXORA_IMG_THREADS / FIXORA_TEXT_THREADS (see fixora_runtime.py).
+
+Keep --threads above FIXORA_MAX_INFLIGHT (default 6): the server admits that many
+inference requests at once and answers the rest with an immediate 503 + Retry-After,
+which needs a free request thread.
+
+Model hot swaps (fixora_registry.py) happen per process: in prefork mode every worker
+polls the registry and swaps on its own, while POST /models/reload only reaches the
+worker that took the request, so switch versions by moving the registry's CURRENT.
+
+Server state lives in the process that holds it: the open-report geo index, async jobs,
+push tokens and fan-outs, org stats and the report store. In prefork mode each worker has
+its own copy, so /jobs/<id>, /notifications/<id>, /orgs/<id>/stats, /reports/* and
+/duplicates/* answer from whichever worker takes the request. Prefork is meant for
+inference-only deployments (/classify, /predict, /predict_urgency); run the stateful
+endpoints on a --mode threads instance. Their journals / snapshots have a single owner,
+so prefork refuses to start while any of them is configured (SINGLE_OWNER_PATHS).
+The image store (FIXORA_IMAGE_STORE_DIR) is content-addressed and written atomically
+with per-process temp files, so workers can share it.
+
+Usage:
+    python fixora_serve.py --mode threads --threads 8
+    python fixora_serve.py --mode prefork --workers 4 --threads 4 --ngrok
+"""
+
+import argparse
+import os
+
+
+# Journals / snapshots one process appends to and replays; a second writer corrupts them
+SINGLE_OWNER_PATHS = (
+    "FIXORA_GEO_JOURNAL_PATH",
+    "FIXORA_PUSH_TOKEN_JOURNAL",
+    "FIXORA_ORG_STATS_SNAPSHOT",
+    "FIXORA_REPORT_STORE_DIR",
+)
+
+
+def _gunicorn_application(options, prefork):
+    from gunicorn.app.base import BaseApplication
+
+    class FixoraApplication(BaseApplication):
+        def __init__(self):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import COLAB_FINAL_SERVER as server
+            if prefork:
+                print("🚀 Preloading fork-safe models in the master...")
+                server.models.preload()
+            return server.app
+
+    return FixoraApplication()
+
+
+def _post_fork(server, worker):
+    import COLAB_FINAL_SERVER as fixora
+    fixora.models.after_fork()
+    worker.log.info("Worker %s: loading remaining models", worker.pid)
+
+
+def _default_thread_env(workers):
+    per_worker = str(max(1, (os.cpu_count() or 1) // max(1, workers)))
+    for var in ("TF_NUM_INTRAOP_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, per_worker)
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", "2")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["dev", "threads", "prefork"],
+                        default=os.environ.get("FIXORA_SERVE_MODE", "threads"))
+    parser.add_argument("--host", default=os.environ.get("FIXORA_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("FIXORA_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("FIXORA_WORKERS", "2")),
+                        help="worker processes (prefork mode)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("FIXORA_THREADS", "8")),
+                        help="request threads per worker")
+    parser.add_argument("--timeout", type=int, default=60, help="gunicorn worker timeout (s)")
+    parser.add_argument("--ngrok", action="store_true", help="also open an ngrok tunnel to --port")
+    args = parser.parse_args()
+
+    if args.mode == "prefork":
+        shared = [var for var in SINGLE_OWNER_PATHS if os.environ.get(var)]
+        if shared:
+            parser.error(f"--mode prefork would give every worker its own writer for {', '.join(shared)}; "
+                         "unset them or use --mode threads (see the module docstring)")
+        print("⚠️ prefork: jobs, notifications, org stats, the report store and the duplicate index are "
+              "per worker; serve those endpoints from a --mode threads instance")
+
+    if args.ngrok or args.mode == "dev":
+        from pyngrok import ngrok
+        public_url = ngrok.connect(args.port)
+        print("=" * 70)
+        print("🌐 PUBLIC NGROK URL:", public_url)
+        print("=" * 70)
+
+    if args.mode == "dev":
+        import COLAB_FINAL_SERVER as server
+        server.app.run(host=args.host, port=args.port, threaded=True)
+        return
+
+    prefork = args.mode == "prefork"
+    workers = args.workers if prefork else 1
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "timeout": args.timeout,
+        "preload_app": prefork,
+    }
+    if prefork:
+        os.environ["FIXORA_DEFER_MODEL_LOAD"] = "1"
+        _default_thread_env(workers)
+        options["post_fork"] = _post_fork
+
+    print(f"🚀 Fixora serving: mode={args.mode} workers={workers} threads={args.threads} on {options['bind']}")
+    _gunicorn_application(options, prefork).run()
+
+
+if __name__ == "__main__":
+    main()
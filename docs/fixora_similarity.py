@@ -0,0 +1,245 @@
+"""
+Embedding-based duplicate scoring for Fixora reports.
+
+- VectorIndex: L2-normalized embeddings keyed by report id in one growable
+  float32 matrix (flat, exact cosine). With nlist > 0 it also trains an IVF
+  coarse quantizer (spherical k-means) once enough vectors are stored, and
+  `search()` then only scans the nprobe closest lists.
+- DuplicateScorer: takes the open reports near a location from the
+  GeoGridIndex and scores geo distance, image similarity (MobileNetV2
+  penultimate features) and text similarity (SentenceTransformer) together in
+  one vectorized pass over those candidates. Weights are renormalized over the
+  signals the query has; a candidate missing one of them (no vector, or one of
+  another size after a model swap) scores 0 on it, so nearness alone can't make
+  a duplicate of a query whose photo / description it can't be compared with.
+
+Vectors are kept in memory; the server also records them in its report store
+(fixora_reportstore.py) and re-adds the open reports' vectors after a restart.
+"""
+
+import threading
+
+import numpy as np
+
+
+def l2_normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """
+        index = VectorIndex(nlist=64)
+        index.add("r1", embedding)
+        index.search(query, k=10)        # -> [("r1", 0.93), ...], cosine similarity
+        matrix, present = index.rows(["r1", "r2"])
+    """
+
+    def __init__(self, dim=None, nlist=0, nprobe=8, name="vectors", initial_capacity=1024):
+        self.dim = dim
+        self.nlist = int(nlist)
+        self.nprobe = int(nprobe)
+        self.name = name
+        self._capacity = int(initial_capacity)
+        self._data = None            # (capacity, dim) float32, unit rows
+        self._ids = []               # row -> id (None = free)
+        self._rows = {}              # id -> row
+        self._free = []
+        self._lists = None           # row -> IVF list (-1 = free)
+        self._centroids = None
+        self._trained_size = 0
+        self._lock = threading.RLock()
+        self.searches = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    @property
+    def trained(self):
+        return self._centroids is not None
+
+    def _grow(self):
+        new_capacity = max(self._capacity, 2 * len(self._ids))
+        data = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        lists = np.full(new_capacity, -1, dtype=np.int32)
+        if self._data is not None:
+            data[:len(self._data)] = self._data
+            lists[:len(self._lists)] = self._lists
+        self._data, self._lists = data, lists
+
+    def add(self, key, vector):
+        vector = l2_normalize(np.ravel(vector))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vector.shape[0]
+            if vector.shape[0] != self.dim:
+                raise ValueError(f"{self.name}: expected a {self.dim}-d vector, got {vector.shape[0]}")
+            row = self._rows.get(key)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                    self._ids[row] = key
+                else:
+                    row = len(self._ids)
+                    self._ids.append(key)
+                    if self._data is None or row >= len(self._data):
+                        self._grow()
+                self._rows[key] = row
+            self._data[row] = vector
+            self._lists[row] = self._nearest_list(vector[None])[0] if self._centroids is not None else 0
+            self._maybe_train()
+
+    def remove(self, key):
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return False
+            self._ids[row] = None
+            self._lists[row] = -1
+            self._free.append(row)
+            return True
+
+    def rows(self, keys):
+        """(len(keys), dim) matrix of stored vectors (zeros where missing) and a present mask"""
+        with self._lock:
+            idx = np.fromiter((self._rows.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+            present = idx >= 0
+            if self._data is None:
+                return np.zeros((len(keys), self.dim or 1), dtype=np.float32), present
+            return self._data[np.where(present, idx, 0)] * present[:, None], present
+
+    def search(self, query, k=10):
+        """Top-k (id, cosine) for a query vector; IVF-approximate once trained"""
+        query = l2_normalize(np.ravel(query))
+        with self._lock:
+            self.searches += 1
+            if not self._rows:
+                return []
+            n = len(self._ids)
+            if self._centroids is not None:
+                probes = np.argsort(-(self._centroids @ query))[:self.nprobe]
+                candidates = np.flatnonzero(np.isin(self._lists[:n], probes))
+            else:
+                candidates = np.flatnonzero(self._lists[:n] >= 0)
+            if candidates.size == 0:
+                return []
+            sims = self._data[candidates] @ query
+            top = np.argpartition(-sims, min(k, sims.size) - 1)[:k] if sims.size > k else np.arange(sims.size)
+            top = top[np.argsort(-sims[top])]
+            return [(self._ids[candidates[i]], float(sims[i])) for i in top]
+
+    # -----------------------
+    # IVF
+    # -----------------------
+    def _nearest_list(self, vectors):
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _maybe_train(self, iterations=10, sample_size=20000):
+        """(Re)train the coarse quantizer once there are 8 vectors per list, and again on every doubling"""
+        live = len(self._rows)
+        if not self.nlist or live < 8 * self.nlist or live < 2 * self._trained_size:
+            return
+        rows = np.fromiter(self._rows.values(), dtype=np.int64, count=live)
+        rng = np.random.default_rng(0)
+        sample = self._data[rng.choice(rows, size=min(live, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=self.nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=self.nlist)
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = l2_normalize(sums)
+        self._centroids = centroids
+        self._lists[rows] = self._nearest_list(self._data[rows])
+        self._trained_size = live
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "vectors": len(self._rows),
+                "dim": self.dim,
+                "ivf_lists": len(self._centroids) if self._centroids is not None else 0,
+                "nprobe": self.nprobe if self._centroids is not None else None,
+                "searches": self.searches,
+                "bytes": int(self._data.nbytes) if self._data is not None else 0,
+            }
+
+
+class DuplicateScorer:
+    """
+    score = (w_geo * geo + w_image * image + w_text * text) / (sum of weights of the query's signals)
+
+    geo    exp(-distance / geo_scale_m)
+    image  cosine of MobileNetV2 features, rescaled so `image_floor` (typical
+           similarity of unrelated photos) maps to 0
+    text   cosine of description embeddings, rescaled from `text_floor`
+
+    A signal the candidate lacks counts as 0 (reported as None in `scores`).
+    """
+
+    def __init__(self, geo_index, image_index, text_index, weights=(0.4, 0.4, 0.2), geo_scale_m=150.0,
+                 image_floor=0.5, text_floor=0.3, max_candidates=512):
+        self.geo_index = geo_index
+        self.image_index = image_index
+        self.text_index = text_index
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.geo_scale_m = float(geo_scale_m)
+        self.floors = (float(image_floor), float(text_floor))
+        self.max_candidates = int(max_candidates)
+
+    def _narrow(self, hits, image_vec, text_vec):
+        """Dense area: keep the ANN neighbours of the query among the geo candidates, else the closest ones"""
+        keep = set()
+        for index, vec in ((self.image_index, image_vec), (self.text_index, text_vec)):
+            if vec is not None and index.trained:
+                keep.update(key for key, _ in index.search(vec, k=4 * self.max_candidates))
+        narrowed = [hit for hit in hits if hit[0]["id"] in keep][:self.max_candidates]
+        return narrowed or hits[:self.max_candidates]
+
+    def score(self, lat, lon, radius_m, image_vec=None, text_vec=None, organization_id=None, category=None,
+              exclude_id=None, limit=10):
+        """[{..report record, distance, score, scores: {geo, image, text}}], best first"""
+        hits = self.geo_index.within(lat, lon, radius_m, organization_id=organization_id, category=category,
+                                     exclude_id=exclude_id)
+        if len(hits) > self.max_candidates:
+            hits = self._narrow(hits, image_vec, text_vec)
+        if not hits:
+            return []
+
+        ids = [record["id"] for record, _ in hits]
+        distances = np.fromiter((d for _, d in hits), dtype=np.float32, count=len(hits))
+        sims = np.zeros((3, len(hits)), dtype=np.float32)
+        available = np.zeros((3, len(hits)), dtype=bool)
+        asked = np.array([True, image_vec is not None, text_vec is not None])
+        sims[0] = np.exp(-distances / self.geo_scale_m)
+        available[0] = True
+        for k, (index, vec, floor) in enumerate(
+                ((self.image_index, image_vec, self.floors[0]), (self.text_index, text_vec, self.floors[1])), 1):
+            if vec is None or not len(index):
+                continue
+            vec = np.ravel(vec)
+            if vec.shape[0] != index.dim:
+                continue  # stored by a model with another embedding size: nothing comparable
+            matrix, present = index.rows(ids)
+            cosine = matrix @ l2_normalize(vec)
+            sims[k] = np.clip((cosine - floor) / (1.0 - floor), 0.0, 1.0) * present
+            available[k] = present
+
+        w = self.weights * asked
+        combined = (w[:, None] * sims).sum(axis=0) / w.sum()
+        order = np.argsort(-combined, kind="stable")[:limit]
+        return [
+            dict(hits[i][0], distance=float(distances[i]), score=round(float(combined[i]), 4), scores={
+                "geo": round(float(sims[0, i]), 4),
+                "image": round(float(sims[1, i]), 4) if available[1, i] else None,
+                "text": round(float(sims[2, i]), 4) if available[2, i] else None,
+            })
+            for i in order
+        ]
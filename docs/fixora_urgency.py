@@ -0,0 +1,177 @@
+"""
+Urgency helpers shared by the Fixora server and the offline backfill CLI.
+
+- normalize_text / classify_embeddings: the single predict_proba urgency path
+- iter_records: incremental JSON-array / NDJSON parsing of description streams
+- score_stream: chunked encode + classify that yields one result per record, so
+  memory stays flat however large the input is; with a fast_model
+  (fixora_fast_urgency) only the descriptions it isn't confident about are encoded
+"""
+
+import codecs
+import json
+import re
+import unicodedata
+
+import numpy as np
+
+
+_WHITESPACE = re.compile(r"\s+")
+_READ_SIZE = 64 * 1024
+
+
+def normalize_text(text):
+    """Unicode/case/whitespace-normalized description (cache key; the encoder sees the original text)"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def classify_embeddings(embeddings, text_classifier, text_label_encoder):
+    """Urgency labels + confidences for an (N, D) embedding matrix from one predict_proba pass"""
+    if hasattr(text_classifier, "predict_proba"):
+        proba = text_classifier.predict_proba(embeddings)
+        best = np.argmax(proba, axis=1)
+        encoded = text_classifier.classes_[best]
+        confs = [float(c) for c in proba[np.arange(len(best)), best]]
+    else:
+        encoded = text_classifier.predict(embeddings)
+        confs = [None] * len(encoded)
+    labels = [str(u) for u in text_label_encoder.inverse_transform(encoded)]
+    return labels, confs
+
+
+# -----------------------
+# INPUT PARSING
+# -----------------------
+def _read_text(stream):
+    """Decode a binary stream chunk by chunk (multi-byte UTF-8 safe)"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = stream.read(_READ_SIZE)
+        if not chunk:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        text = chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        if text:
+            yield text
+
+
+def iter_json_array(stream):
+    """Yield the elements of a top-level JSON array without loading it whole"""
+    decoder = json.JSONDecoder()
+    chunks = _read_text(stream)
+    buf, started, final = "", False, False
+    while not final:
+        text = next(chunks, None)
+        if text is None:
+            final = True
+        else:
+            buf += text
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise ValueError("Malformed JSON array")
+                break  # element continues in the next chunk
+            if end >= len(buf) and not final:
+                break  # a number may continue in the next chunk
+            yield item
+            pos = end
+        buf = buf[pos:]
+    raise ValueError("Truncated JSON array")
+
+
+def _parse_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None  # reported as a record without a description
+
+
+def iter_ndjson(stream):
+    """Yield one JSON value per non-empty line (None for malformed lines)"""
+    buf = ""
+    for text in _read_text(stream):
+        buf += text
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buf.strip():
+        yield _parse_line(buf)
+
+
+def iter_records(stream, fmt="ndjson"):
+    """
+    (id, text) per input element. Elements may be plain strings or objects with
+    "text"/"description" and an optional "id" (e.g. a Firestore report id).
+    """
+    items = iter_json_array(stream) if fmt == "json" else iter_ndjson(stream)
+    for item in items:
+        if isinstance(item, str):
+            yield None, item
+        elif isinstance(item, dict):
+            yield item.get("id"), item.get("text", item.get("description"))
+        else:
+            yield None, None
+
+
+# -----------------------
+# CHUNKED SCORING
+# -----------------------
+def score_stream(records, embedding_model, text_classifier, text_label_encoder,
+                 chunk_size=256, encode_batch_size=64, fast_model=None):
+    """
+    Encode + classify `records` in chunks of `chunk_size`, yielding a result dict
+    per record in input order. Only one chunk is held in memory at a time.
+    With `fast_model`, results also carry the answering "tier" ("fast" / "full").
+    """
+    from fixora_fast_urgency import split_by_tier
+
+    def flush(chunk):
+        valid = [(i, rid, text) for i, rid, text in chunk if isinstance(text, str) and text.strip()]
+        labels, confs, tiers, remaining = split_by_tier(fast_model, [text for _, _, text in valid])
+        if remaining:
+            embeddings = embedding_model.encode(
+                [valid[k][2] for k in remaining], batch_size=encode_batch_size
+            )
+            full_labels, full_confs = classify_embeddings(np.asarray(embeddings), text_classifier, text_label_encoder)
+            for k, label, conf in zip(remaining, full_labels, full_confs):
+                labels[k], confs[k] = label, conf
+        scored = {i: k for k, (i, _, _) in enumerate(valid)}
+        for i, rid, _ in chunk:
+            result = {"index": i}
+            if rid is not None:
+                result["id"] = rid
+            if i in scored:
+                k = scored[i]
+                result["urgency"], result["confidence"] = labels[k], confs[k]
+                if fast_model is not None:
+                    result["tier"] = tiers[k]
+            else:
+                result["error"] = "No description provided"
+            yield result
+
+    chunk = []
+    for i, (rid, text) in enumerate(records):
+        chunk.append((i, rid, text))
+        if len(chunk) >= chunk_size:
+            yield from flush(chunk)
+            chunk = []
+    if chunk:
+        yield from flush(chunk)
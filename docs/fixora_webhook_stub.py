@@ -0,0 +1,71 @@
+"""
+Local webhook receiver for Fixora async jobs (POST /jobs with a callbackUrl).
+
+Prints every finished job the server delivers and appends it to an NDJSON
+file, so the webhook path can be tried without a public endpoint:
+
+    python fixora_webhook_stub.py --port 5055 --out jobs.ndjson
+    curl -F images=@photo.jpg -F description="Open manhole near the school" \\
+         -F callbackUrl=http://127.0.0.1:5055/hook http://127.0.0.1:5000/jobs
+
+--fail-first N answers the first N deliveries with 503, to exercise the
+server's retries.
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(out_path, fail_first):
+    lock = threading.Lock()
+    state = {"failures_left": fail_first, "received": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                if state["failures_left"] > 0:
+                    state["failures_left"] -= 1
+                    self.send_response(503)
+                    self.end_headers()
+                    print(f"↩️  503 for job {self.headers.get('X-Fixora-Job-Id')} (--fail-first)")
+                    return
+                state["received"] += 1
+                if out_path:
+                    with open(out_path, "a", encoding="utf-8") as f:
+                        f.write(body.decode("utf-8") + "\n")
+            try:
+                job = json.loads(body)
+            except ValueError:
+                job = {}
+            print(f"📨 #{state['received']} job {job.get('jobId')}: {job.get('status')} "
+                  f"{json.dumps(job.get('result'))} (queued {job.get('queuedMs')} ms, ran {job.get('runMs')} ms)")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--out", help="append received jobs to this NDJSON file")
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N deliveries with 503")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.out, args.fail_first))
+    print(f"🪝 Webhook stub listening on http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
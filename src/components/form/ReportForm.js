@@ -8,9 +8,9 @@ import { db } from '../../config/firebaseConfig';
 import { addDoc, collection, getDoc, doc, updateDoc } from 'firebase/firestore';
 import { useAuth } from '../../context/AuthContext';
 import { useNavigation, useRoute, useFocusEffect } from '@react-navigation/native';
-import { getPrediction, getFallbackPrediction, classifyMultipleImages } from '../../services/predictionService';
+import { getPrediction, getFallbackPrediction, classifyMultipleImages, startAnalysisJob, waitForAnalysisJob } from '../../services/predictionService';
 import { formatCategoryName } from '../../config/apiConfig';
-import { checkForDuplicates, linkDuplicateReports } from '../../services/duplicateDetectionService';
+import { checkForDuplicates, linkDuplicateReports, syncReportToDuplicateIndex } from '../../services/duplicateDetectionService';
 import { notifyAdminsNewReport } from '../../services/notificationService';
 
 const { width, height } = Dimensions.get('window');
@@ -392,6 +392,10 @@ const ReportForm = ({ userId }) => {
 
     setLoading(true);
     try {
+      // Start urgency prediction as a server job so it runs while we check duplicates and upload;
+      // not awaited here (startAnalysisJob never throws), so submitting it overlaps the duplicate check
+      const urgencyJobPromise = startAnalysisJob(description);
+
       // Check for duplicate reports at or near this location
       console.log('🔍 Checking for duplicate reports...');
       const duplicateCheck = await checkForDuplicates(
@@ -399,7 +403,8 @@ const ReportForm = ({ userId }) => {
         location.longitude,
         classificationResult.category, // Check same category
         100, // Within 100 meters
-        selectedOrganizationId
+        selectedOrganizationId,
+        { imageUris: images.map(image => image.uri), description } // Also compare photos + description
       );
 
       // Upload all images to Supabase Storage (no expo-file-system)
@@ -411,7 +416,11 @@ const ReportForm = ({ userId }) => {
       
       // Get urgency prediction automatically
       console.log('🔮 Getting urgency prediction...');
-      const result = await getPrediction(description);
+      const urgencyJobId = await urgencyJobPromise;
+      let result = urgencyJobId ? await waitForAnalysisJob(urgencyJobId) : { success: false };
+      if (!result.success) {
+        result = await getPrediction(description);
+      }
       let urgency = 'Medium';
       let isFallback = false;
       
@@ -436,6 +445,7 @@ const ReportForm = ({ userId }) => {
         description: description.trim(),
         imageUrls, // Array of image URLs
         imageUrl: imageUrls[0], // Keep first image as main image for backward compatibility
+        thumbnailPaths: classificationResult.thumbnailPaths || [], // Server thumbnails for report lists
         location: {
           latitude: location.latitude,
           longitude: location.longitude
@@ -545,6 +555,11 @@ const ReportForm = ({ userId }) => {
         isNewReport = true;
       }
       
+      // Add the new report to the server's duplicate index (fire-and-forget)
+      if (isNewReport) {
+        syncReportToDuplicateIndex(finalReportId, { ...reportData, signatureId: duplicateCheck.signatureId });
+      }
+      
       // Send notification to admins if organization is assigned AND we created a new report
       if (selectedOrganizationId && isNewReport) {
         console.log('🔔 Attempting to send notification to admins...');
@@ -11,10 +11,33 @@ export const API_CONFIG = {
   ENDPOINTS: {
     PREDICT: '/predict_urgency', // Urgency prediction endpoint (text only)
     CLASSIFY_IMAGE: '/classify', // Image classification endpoint
+    CLASSIFY_BATCH: '/classify_batch', // Multi-image classification endpoint (multipart, one round-trip)
+    DUPLICATES_NEARBY: '/duplicates/nearby', // Closest open report within a radius (server-side spatial index)
+    DUPLICATES_REPORTS: '/duplicates/reports', // Keep the server's open-report index in sync
+    JOBS: '/jobs', // Async analysis: POST returns a job id, GET /jobs/<id>?wait=N long-polls the result
+    NOTIFICATIONS_TOKENS: '/notifications/tokens', // Cache this user's Expo push token on the server
+    NOTIFICATIONS_SEND: '/notifications/send', // One notification to many users (server batches the Expo sends)
+    ORG_EVENTS: '/orgs/events', // Report / feedback changes for the server's per-organization counters
+    ORGS: '/orgs', // GET /orgs/<id>/stats: dashboard counts without scanning the organization's history
   },
   
   // Request timeout in milliseconds
   TIMEOUT: 10000, // 10 seconds
+
+  // Sent with every inference request so the server drops work we have already given up on
+  DEADLINE_HEADER: 'X-Request-Timeout-Ms',
+
+  // Must match the server's FIXORA_PUSH_API_KEY (leave empty if it isn't set)
+  PUSH_API_KEY: '',
+  PUSH_API_KEY_HEADER: 'X-Fixora-Push-Key',
+
+  // Must match the server's FIXORA_ORG_EVENTS_API_KEY (leave empty if it isn't set); sent on /orgs/events and /duplicates/reports
+  ORG_EVENTS_API_KEY: '',
+  ORG_EVENTS_API_KEY_HEADER: 'X-Fixora-Org-Key',
+
+  // Dashboards re-scan Firestore and re-seed the server's counters after this long (pull-to-refresh does it at once),
+  // so changes that never reached the server (offline edits, other clients) don't stay wrong
+  ORG_STATS_RESEED_HOURS: 6,
   
   // Image classification categories
   IMAGE_CATEGORIES: [
@@ -42,6 +65,52 @@ export const getImageClassificationUrl = () => {
   return `${API_CONFIG.IMAGE_CLASSIFICATION_URL}${API_CONFIG.ENDPOINTS.CLASSIFY_IMAGE}`;
 };
 
+// Helper function to get the full multi-image classification URL
+export const getBatchClassificationUrl = () => {
+  return `${API_CONFIG.IMAGE_CLASSIFICATION_URL}${API_CONFIG.ENDPOINTS.CLASSIFY_BATCH}`;
+};
+
+// Helper function to get the full nearby-duplicates URL
+export const getDuplicatesNearbyUrl = () => {
+  return `${API_CONFIG.PREDICTION_API_URL}${API_CONFIG.ENDPOINTS.DUPLICATES_NEARBY}`;
+};
+
+// Helper function to get the full duplicate-index sync URL
+export const getDuplicatesReportsUrl = () => {
+  return `${API_CONFIG.PREDICTION_API_URL}${API_CONFIG.ENDPOINTS.DUPLICATES_REPORTS}`;
+};
+
+// Helper function to get the async job URL (a job's status URL with jobId)
+export const getJobsUrl = (jobId) => {
+  const base = `${API_CONFIG.PREDICTION_API_URL}${API_CONFIG.ENDPOINTS.JOBS}`;
+  return jobId ? `${base}/${jobId}` : base;
+};
+
+// Helper function to get the push-token registration URL
+export const getNotificationTokensUrl = () => {
+  return `${API_CONFIG.PREDICTION_API_URL}${API_CONFIG.ENDPOINTS.NOTIFICATIONS_TOKENS}`;
+};
+
+// Helper function to get the notification fan-out URL
+export const getNotificationSendUrl = () => {
+  return `${API_CONFIG.PREDICTION_API_URL}${API_CONFIG.ENDPOINTS.NOTIFICATIONS_SEND}`;
+};
+
+// Helper function to get the organization-counter event URL
+export const getOrgEventsUrl = () => {
+  return `${API_CONFIG.PREDICTION_API_URL}${API_CONFIG.ENDPOINTS.ORG_EVENTS}`;
+};
+
+// Helper function to get an organization's dashboard stats URL
+export const getOrgStatsUrl = (organizationId) => {
+  return `${API_CONFIG.PREDICTION_API_URL}${API_CONFIG.ENDPOINTS.ORGS}/${encodeURIComponent(organizationId)}/stats`;
+};
+
+// Helper function to get a full URL for a server image path (e.g. a thumb_url from /classify)
+export const getServerImageUrl = (path) => {
+  return path ? `${API_CONFIG.IMAGE_CLASSIFICATION_URL}${path}` : null;
+};
+
 // Helper function to format category name for display
 export const formatCategoryName = (category) => {
   return category
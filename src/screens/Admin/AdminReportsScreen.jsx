@@ -18,13 +18,13 @@ import { useNavigation } from '@react-navigation/native';
 import { useAuth } from '../../context/AuthContext';
 import { db } from '../../config/firebaseConfig';
 import { collection, query, where, getDocs, getDoc, updateDoc, doc, deleteDoc, onSnapshot } from 'firebase/firestore';
-import { getCorrectedImageUrl } from '../../utils/imageUrlFixer';
+import { getReportListImageUrl } from '../../utils/imageUrlFixer';
 import MapView, { Marker, Callout } from 'react-native-maps';
 import BlueHeader from '../../components/layout/Header';
 import { sortReportsByUrgency, getUrgencyDisplay, getUrgencyColor } from '../../utils/reportSorting';
 import { createFeedbackRequest } from '../../services/feedbackService';
 import { notifyStaffAssignment, notifyUserReportResolved } from '../../services/notificationService';
-import { syncStatusToLinkedUsers } from '../../services/duplicateDetectionService';
+import { syncStatusToLinkedUsers, syncReportToDuplicateIndex } from '../../services/duplicateDetectionService';
 
 const AdminReportsScreen = () => {
   const navigation = useNavigation();
@@ -208,6 +208,9 @@ const AdminReportsScreen = () => {
         console.error('Failed to sync status to linked reports:', err);
       });
       
+      // Keep the server's open-report index current (closed statuses drop out)
+      syncReportToDuplicateIndex(reportId, { status: newStatus });
+      
       // Update local state
       setReports(prevReports => 
         prevReports.map(report => 
@@ -468,6 +471,7 @@ const AdminReportsScreen = () => {
           onPress: async () => {
             try {
               await deleteDoc(doc(db, 'reports', reportId));
+              syncReportToDuplicateIndex(reportId, { status: 'deleted' });
               // Remove from local state
               setReports(prevReports => 
                 prevReports.filter(report => report.id !== reportId)
@@ -564,7 +568,7 @@ const AdminReportsScreen = () => {
       {(item.imageUrls || item.imageUrl) && (
         <View style={styles.imageContainer}>
           <Image
-            source={{ uri: getCorrectedImageUrl(item.imageUrls ? item.imageUrls[0] : item.imageUrl) }}
+            source={{ uri: getReportListImageUrl(item) }}
             style={styles.reportImage}
             resizeMode="cover"
           />
@@ -1,11 +1,12 @@
 import React, { useState, useEffect } from 'react';
-import { View, Text, TouchableOpacity, StyleSheet, SafeAreaView, ScrollView, ActivityIndicator, Image } from 'react-native';
+import { View, Text, TouchableOpacity, StyleSheet, SafeAreaView, ScrollView, ActivityIndicator, Image, RefreshControl } from 'react-native';
 import { useNavigation, useFocusEffect } from '@react-navigation/native';
 import { useAuth } from '../../context/AuthContext';
 import { db } from '../../config/firebaseConfig';
 import { collection, query, where, getDocs, getDoc, doc } from 'firebase/firestore';
 import BlueHeader from '../../components/layout/Header';
 import { getOrganizationFeedbackStats } from '../../services/feedbackService';
+import { fetchOrgStats, isSeedFresh, syncOrgEvents } from '../../services/orgStatsService';
 
 const AdminDashboardScreen = () => {
   const navigation = useNavigation();
@@ -19,6 +20,7 @@ const AdminDashboardScreen = () => {
     totalFeedbacks: 0
   });
   const [loading, setLoading] = useState(true);
+  const [refreshing, setRefreshing] = useState(false);
   const [organizationName, setOrganizationName] = useState('');
   const [organizationLogo, setOrganizationLogo] = useState(null);
 
@@ -29,7 +31,14 @@ const AdminDashboardScreen = () => {
     }, [])
   );
 
-  const fetchDashboardStats = async () => {
+  // Pull-to-refresh re-scans Firestore and re-seeds the server's counters
+  const onRefresh = async () => {
+    setRefreshing(true);
+    await fetchDashboardStats({ reseed: true });
+    setRefreshing(false);
+  };
+
+  const fetchDashboardStats = async ({ reseed = false } = {}) => {
     try {
       setLoading(true);
       
@@ -45,18 +54,42 @@ const AdminDashboardScreen = () => {
           setOrganizationLogo(orgDoc.data()?.logo || null);
         }
         
-        // Fetch reports for this organization
-        const reportsQuery = query(
-          collection(db, 'reports'),
-          where('organizationId', '==', organizationId)
-        );
-        const reportsSnapshot = await getDocs(reportsQuery);
-        const totalReports = reportsSnapshot.size;
-        
-        // Count pending reports
-        const pendingReports = reportsSnapshot.docs.filter(
-          doc => doc.data().status === 'pending'
-        ).length;
+        // Report counts from the server's counters; without a fresh seed (ORG_STATS_RESEED_HOURS)
+        // or on pull-to-refresh, count in Firestore and seed them again
+        let totalReports;
+        let pendingReports;
+        const orgStats = await fetchOrgStats(organizationId);
+        if (!reseed && isSeedFresh(orgStats, 'report')) {
+          ({ totalReports, pendingReports } = orgStats.reports);
+        } else {
+          const reportsQuery = query(
+            collection(db, 'reports'),
+            where('organizationId', '==', organizationId)
+          );
+          const reportsSnapshot = await getDocs(reportsQuery);
+          totalReports = reportsSnapshot.size;
+          
+          // Count pending reports
+          pendingReports = reportsSnapshot.docs.filter(
+            doc => doc.data().status === 'pending'
+          ).length;
+
+          if (orgStats) {
+            syncOrgEvents(reportsSnapshot.docs.map(reportDoc => {
+              const data = reportDoc.data();
+              return {
+                type: 'report',
+                id: reportDoc.id,
+                organizationId,
+                status: data.status,
+                categorySlug: data.categorySlug || data.classificationMetadata?.category || data.category,
+                urgency: data.urgency,
+                location: data.location || null,
+                createdAt: data.createdAt || null
+              };
+            }), { organizationId, type: 'report' });
+          }
+        }
 
         // Fetch staff members (only active ones)
         const staffQuery = query(
@@ -80,7 +113,7 @@ const AdminDashboardScreen = () => {
         const pendingRequests = requestsSnapshot.size;
 
         // Fetch feedback stats
-        const feedbackStats = await getOrganizationFeedbackStats(organizationId);
+        const feedbackStats = await getOrganizationFeedbackStats(organizationId, { reseed });
 
         setStats({
           totalReports,
@@ -161,7 +194,11 @@ const AdminDashboardScreen = () => {
     <SafeAreaView style={styles.container}>
       <BlueHeader title="Admin Dashboard" subtitle="Manage your organization" />
       
-      <ScrollView style={styles.content} contentContainerStyle={styles.scrollContent}>
+      <ScrollView
+        style={styles.content}
+        contentContainerStyle={styles.scrollContent}
+        refreshControl={<RefreshControl refreshing={refreshing} onRefresh={onRefresh} />}
+      >
         <View style={styles.welcomeCard}>
           <View style={styles.welcomeHeader}>
             <View style={{ flex: 1 }}>
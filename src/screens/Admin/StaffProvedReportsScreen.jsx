@@ -3,7 +3,7 @@ import { View, Text, FlatList, TouchableOpacity, ActivityIndicator, SafeAreaView
 import { useNavigation } from '@react-navigation/native';
 import { db } from '../../config/firebaseConfig';
 import { collection, query, where, getDocs, getDoc, doc } from 'firebase/firestore';
-import { getCorrectedImageUrl } from '../../utils/imageUrlFixer';
+import { getReportListImageUrl } from '../../utils/imageUrlFixer';
 import { useAuth } from '../../context/AuthContext';
 import BlueHeader from '../../components/layout/Header';
 import { sortReportsByUrgency, getUrgencyDisplay, getUrgencyColor } from '../../utils/reportSorting';
@@ -90,7 +90,7 @@ const StaffProvedReportsScreen = () => {
       {(item.imageUrls || item.imageUrl) && (
         <View style={styles.imageContainer}>
           <Image
-            source={{ uri: getCorrectedImageUrl(item.imageUrls ? item.imageUrls[0] : item.imageUrl) }}
+            source={{ uri: getReportListImageUrl(item) }}
             style={styles.reportImage}
             resizeMode="cover"
           />
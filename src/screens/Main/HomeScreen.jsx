@@ -4,7 +4,7 @@ import { useNavigation } from '@react-navigation/native';
 import { useAuth } from '../../context/AuthContext';
 import { db } from '../../config/firebaseConfig';
 import { collection, query, where, getDocs, orderBy, limit } from 'firebase/firestore';
-import { getCorrectedImageUrl } from '../../utils/imageUrlFixer';
+import { getReportListImageUrl } from '../../utils/imageUrlFixer';
 import BlueHeader from '../../components/layout/Header';
 import { getCities, getDistricts, getVillages } from '../../services/locationService';
 import { sortReportsByUrgency, getUrgencyColor, getUrgencyDisplay } from '../../utils/reportSorting';
@@ -397,7 +397,7 @@ const HomeScreen = () => {
                 {(report.imageUrls || report.imageUrl) && (
                   <View style={styles.imageContainer}>
                     <Image
-                      source={{ uri: getCorrectedImageUrl(report.imageUrls ? report.imageUrls[0] : report.imageUrl) }}
+                      source={{ uri: getReportListImageUrl(report) }}
                       style={styles.reportImage}
                       resizeMode="cover"
                     />
@@ -9,7 +9,7 @@ import * as ImagePicker from 'expo-image-picker';
 import { uploadImageToStorage } from '../../services/issueService';
 import MapView, { Marker } from 'react-native-maps';
 import { KeyboardAvoidingView, Platform } from 'react-native';
-import { getDuplicateStats, getRelatedReports } from '../../services/duplicateDetectionService';
+import { getDuplicateStats, getRelatedReports, syncReportToDuplicateIndex } from '../../services/duplicateDetectionService';
 import { notifyAdminsProofUploaded, notifyUserReportResolved } from '../../services/notificationService';
 
 const IssueDetailScreen = () => {
@@ -107,6 +107,7 @@ const IssueDetailScreen = () => {
       const newProofImages = [...(issue.proofImages || []), ...newProofs];
       await updateDoc(doc(db, 'reports', issueId), { proofImages: newProofImages, status: 'staff_proved' });
       setIssue({ ...issue, proofImages: newProofImages, status: 'staff_proved' });
+      syncReportToDuplicateIndex(issueId, { status: 'staff_proved' });
       setProofDescription('');
       setProofImages([]);
       
@@ -158,6 +159,7 @@ const IssueDetailScreen = () => {
     try {
       await updateDoc(doc(db, 'reports', issueId), { status: 'resolved' });
       setIssue({ ...issue, status: 'resolved' });
+      syncReportToDuplicateIndex(issueId, { status: 'resolved' });
       
       // Send notification to user who submitted the report
       if (issue.userId) {
@@ -15,10 +15,11 @@ import { useNavigation } from '@react-navigation/native';
 import { useAuth } from '../../context/AuthContext';
 import { db } from '../../config/firebaseConfig';
 import { collection, query, where, getDocs, orderBy, deleteDoc, doc, updateDoc, onSnapshot } from 'firebase/firestore';
-import { getCorrectedImageUrl } from '../../utils/imageUrlFixer';
+import { getReportListImageUrl } from '../../utils/imageUrlFixer';
 import { sortReportsByUrgency, getUrgencyDisplay, getUrgencyColor } from '../../utils/reportSorting';
 import { getPendingFeedbackRequests, createFeedbackRequest } from '../../services/feedbackService';
 import FeedbackModal from '../../components/feedback/FeedbackModal';
+import { syncReportToDuplicateIndex } from '../../services/duplicateDetectionService';
 import BlueHeader from '../../components/layout/Header';
 
 const MyReportsScreen = () => {
@@ -211,6 +212,7 @@ const MyReportsScreen = () => {
           onPress: async () => {
             try {
               await deleteDoc(doc(db, 'reports', reportId));
+              syncReportToDuplicateIndex(reportId, { status: 'deleted' });
               // Remove from local state
               setReports(prevReports => 
                 prevReports.filter(report => report.id !== reportId)
@@ -328,7 +330,7 @@ const MyReportsScreen = () => {
       {(item.imageUrls || item.imageUrl) && (
         <View style={styles.imageContainer}>
           <Image
-            source={{ uri: getCorrectedImageUrl(item.imageUrls ? item.imageUrls[0] : item.imageUrl) }}
+            source={{ uri: getReportListImageUrl(item) }}
             style={styles.reportImage}
             resizeMode="cover"
           />
@@ -15,9 +15,10 @@ import { useNavigation } from '@react-navigation/native';
 import { useAuth } from '../../context/AuthContext';
 import { db } from '../../config/firebaseConfig';
 import { collection, query, where, getDocs, updateDoc, doc, orderBy, deleteDoc, onSnapshot } from 'firebase/firestore';
-import { getCorrectedImageUrl } from '../../utils/imageUrlFixer';
+import { getReportListImageUrl } from '../../utils/imageUrlFixer';
 import MapView, { Marker, Callout } from 'react-native-maps';
 import BlueHeader from '../../components/layout/Header';
+import { syncReportToDuplicateIndex } from '../../services/duplicateDetectionService';
 import { sortReportsByUrgency, getUrgencyDisplay, getUrgencyColor } from '../../utils/reportSorting';
 
 const StaffReportsScreen = () => {
@@ -90,6 +91,9 @@ const StaffReportsScreen = () => {
         updatedBy: user.uid
       });
       
+      // Keep the server's open-report index current (closed statuses drop out)
+      syncReportToDuplicateIndex(reportId, { status: newStatus });
+      
       // Update local state
       setReports(prevReports => 
         prevReports.map(report => 
@@ -193,7 +197,7 @@ const StaffReportsScreen = () => {
       {(item.imageUrls || item.imageUrl) && (
         <View style={styles.imageContainer}>
           <Image
-            source={{ uri: getCorrectedImageUrl(item.imageUrls ? item.imageUrls[0] : item.imageUrl) }}
+            source={{ uri: getReportListImageUrl(item) }}
             style={styles.reportImage}
             resizeMode="cover"
           />
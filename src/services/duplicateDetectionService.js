@@ -1,5 +1,9 @@
 import { collection, query, where, getDocs, updateDoc, doc, getDoc } from 'firebase/firestore';
 import { db } from '../config/firebaseConfig';
+import { API_CONFIG, getDuplicatesNearbyUrl, getDuplicatesReportsUrl } from '../config/apiConfig';
+
+// Statuses the server's open-report index keeps (same as the Firestore query below)
+const OPEN_STATUSES = ['pending', 'assigned', 'in_progress'];
 
 // Haversine formula to calculate distance between two coordinates in meters
 export const calculateDistance = (lat1, lon1, lat2, lon2) => {
@@ -17,20 +21,131 @@ export const calculateDistance = (lat1, lon1, lat2, lon2) => {
   return R * c; // Distance in meters
 };
 
+/**
+ * Ask the server's spatial index for the closest open report within the radius.
+ * With photos and/or a description the server also compares image and text embeddings.
+ * @returns {Promise<Object|null>} - checkForDuplicates result, or null if the server is unavailable
+ */
+const checkForDuplicatesOnServer = async (latitude, longitude, category, radiusMeters, organizationId, imageUris, description) => {
+  const params = { latitude, longitude, radiusMeters, category, organizationId, description };
+  let body;
+  let headers = { 'Accept': 'application/json', [API_CONFIG.DEADLINE_HEADER]: String(API_CONFIG.TIMEOUT) };
+  if (imageUris && imageUris.length > 0) {
+    body = new FormData();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== null && value !== undefined) {
+        body.append(key, String(value));
+      }
+    });
+    imageUris.forEach((uri, index) => {
+      body.append('images', { uri, name: `image_${index}.jpg`, type: 'image/jpeg' });
+    });
+    headers['Content-Type'] = 'multipart/form-data';
+  } else {
+    body = JSON.stringify(params);
+    headers['Content-Type'] = 'application/json';
+  }
+
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), API_CONFIG.TIMEOUT);
+  try {
+    const response = await fetch(getDuplicatesNearbyUrl(), {
+      method: 'POST',
+      headers,
+      body,
+      signal: controller.signal,
+    });
+    if (!response.ok) {
+      console.log(`⚠️ Duplicate index returned ${response.status}, scanning Firestore instead`);
+      return null;
+    }
+
+    const data = await response.json();
+    if (!data.isDuplicate) {
+      return { isDuplicate: false, originalReport: null, distance: null, distanceText: null, signatureId: data.signatureId || null };
+    }
+
+    // The index only holds location/status metadata; read the full original report once
+    const originalDoc = await getDoc(doc(db, 'reports', data.originalReport.id));
+    if (!originalDoc.exists()) {
+      return null; // index is stale, fall back to the authoritative scan
+    }
+    return {
+      isDuplicate: true,
+      originalReport: { id: originalDoc.id, ...originalDoc.data(), distance: data.distance },
+      distance: data.distance,
+      distanceText: data.distanceText,
+      score: data.score,
+      signatureId: data.signatureId || null
+    };
+  } catch (error) {
+    console.log('⚠️ Duplicate index unavailable, scanning Firestore instead:', error.message);
+    return null;
+  } finally {
+    clearTimeout(timeoutId);
+  }
+};
+
+/**
+ * Add, update or remove a report in the server's open-report index.
+ * Call after creating a report and after every status change; closed statuses remove it.
+ * The server also counts the change in the organization's dashboard stats and its report store.
+ * Never throws - the Firestore scan in checkForDuplicates covers a missed sync.
+ * @param {string} reportId - ID of the report
+ * @param {Object} report - Report fields (location, organizationId, categorySlug / classificationMetadata, status,
+ *                          urgency, createdAt, signatureId from checkForDuplicates to store its image/text embeddings)
+ */
+export const syncReportToDuplicateIndex = async (reportId, report = {}) => {
+  const headers = { 'Content-Type': 'application/json' };
+  if (API_CONFIG.ORG_EVENTS_API_KEY) {
+    headers[API_CONFIG.ORG_EVENTS_API_KEY_HEADER] = API_CONFIG.ORG_EVENTS_API_KEY;
+  }
+  try {
+    const response = await fetch(getDuplicatesReportsUrl(), {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({
+        id: reportId,
+        location: report.location || null,
+        organizationId: report.organizationId || null,
+        categorySlug: report.categorySlug || report.classificationMetadata?.category || null,
+        status: report.status || 'pending',
+        urgency: report.urgency || null,
+        createdAt: report.createdAt || null,
+        signatureId: report.signatureId || null
+      }),
+    });
+    return { success: response.ok };
+  } catch (error) {
+    console.log('⚠️ Could not sync report to duplicate index:', error.message);
+    return { success: false, error: error.message };
+  }
+};
+
 /**
  * Check for duplicate reports within a specified radius
+ * Uses the server's spatial index (/duplicates/nearby) and falls back to scanning
+ * the open reports in Firestore if the server can't answer.
  * @param {number} latitude - Latitude of the new report
  * @param {number} longitude - Longitude of the new report
  * @param {string} category - Category of the report (optional filter)
  * @param {number} radiusMeters - Search radius in meters (default: 100m)
  * @param {string} organizationId - Organization ID (optional filter)
- * @returns {Promise<Object>} - { isDuplicate: boolean, originalReport: Object|null, distance: number|null }
+ * @param {Object} similarity - Optional { imageUris, description } to also match on photo / text similarity
+ * @returns {Promise<Object>} - { isDuplicate: boolean, originalReport: Object|null, distance: number|null, signatureId }
  */
-export const checkForDuplicates = async (latitude, longitude, category = null, radiusMeters = 100, organizationId = null) => {
+export const checkForDuplicates = async (latitude, longitude, category = null, radiusMeters = 100, organizationId = null, similarity = {}) => {
+  const serverResult = await checkForDuplicatesOnServer(
+    latitude, longitude, category, radiusMeters, organizationId, similarity.imageUris, similarity.description
+  );
+  if (serverResult) {
+    return serverResult;
+  }
+
   try {
     // Query for pending or assigned reports in the same organization
     let queryConstraints = [
-      where('status', 'in', ['pending', 'assigned', 'in_progress'])
+      where('status', 'in', OPEN_STATUSES)
     ];
 
     // Add organization filter if provided
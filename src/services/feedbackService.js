@@ -1,6 +1,7 @@
 import { collection, addDoc, query, where, getDocs, updateDoc, doc, getDoc, orderBy, limit } from 'firebase/firestore';
 import { db } from '../config/firebaseConfig';
 import { notifyAdminsNewReport } from './notificationService';
+import { fetchOrgStats, isSeedFresh, syncOrgEvents } from './orgStatsService';
 
 /**
  * Create a feedback request when a report is marked as resolved
@@ -27,6 +28,7 @@ export const createFeedbackRequest = async (reportId, userId, reportData) => {
     };
 
     const docRef = await addDoc(collection(db, 'feedbackRequests'), feedbackData);
+    syncOrgEvents([{ type: 'feedback', id: docRef.id, organizationId: feedbackData.organizationId, status: 'pending' }]);
     
     // Update the report with feedback request ID
     await updateDoc(doc(db, 'reports', reportId), {
@@ -69,6 +71,7 @@ export const submitFeedback = async (feedbackRequestId, reportId, feedbackData,
       wouldRecommend: wouldRecommend,
       submittedAt: new Date()
     });
+    syncOrgEvents([{ type: 'feedback', id: feedbackRequestId, status: 'completed', isResolved, rating, wouldRecommend }]);
 
     // Update report with feedback
     const reportUpdate = {
@@ -101,6 +104,7 @@ export const submitFeedback = async (feedbackRequestId, reportId, feedbackData,
     }
 
     await updateDoc(doc(db, 'reports', reportId), reportUpdate);
+    syncOrgEvents([{ type: 'report', id: reportId, status: reportUpdate.status }]);
 
     return { success: true, isResolved, shouldResubmit };
   } catch (error) {
@@ -152,6 +156,14 @@ export const resubmitReport = async (originalReportData, originalReportId, userC
     };
 
     const docRef = await addDoc(collection(db, 'reports'), newReportData);
+    syncOrgEvents([{
+      type: 'report',
+      id: docRef.id,
+      organizationId: newReportData.organizationId,
+      status: 'pending',
+      category: newReportData.category,
+      urgency: newReportData.urgency
+    }]);
     
     // Notify admins about the resubmitted report
     if (originalReportData.organizationId) {
@@ -235,10 +247,26 @@ export const getPendingFeedbackRequests = async (userId) => {
 
 /**
  * Get feedback statistics for an organization
+ * Served from the server's counters while its seed of this organization's feedback is fresh;
+ * otherwise (or with reseed) scans the feedback requests and seeds the server with them again.
  * @param {string} organizationId - Organization ID
+ * @param {Object} options - { reseed: true } to scan even if the server's counters are fresh (pull-to-refresh)
  * @returns {Promise<Object>} - Feedback statistics
  */
-export const getOrganizationFeedbackStats = async (organizationId) => {
+export const getOrganizationFeedbackStats = async (organizationId, { reseed = false } = {}) => {
+  const serverStats = await fetchOrgStats(organizationId);
+  if (!reseed && isSeedFresh(serverStats, 'feedback')) {
+    const { totalFeedbacks, averageRating, resolvedCount, notResolvedCount, resolutionRate, recommendationRate } = serverStats.feedback;
+    return {
+      totalFeedbacks,
+      averageRating: totalFeedbacks > 0 ? averageRating.toFixed(1) : 0,
+      resolvedCount,
+      notResolvedCount,
+      resolutionRate: totalFeedbacks > 0 ? resolutionRate.toFixed(1) : 0,
+      recommendationRate: totalFeedbacks > 0 ? recommendationRate.toFixed(1) : 0
+    };
+  }
+
   try {
     // Query only by organizationId to avoid composite index
     const q = query(
@@ -278,6 +306,13 @@ export const getOrganizationFeedbackStats = async (organizationId) => {
         wouldRecommendCount++;
       }
     });
+
+    if (serverStats) {
+      syncOrgEvents(snapshot.docs.map(docSnap => {
+        const { status, rating, isResolved, wouldRecommend } = docSnap.data();
+        return { type: 'feedback', id: docSnap.id, organizationId, status, rating, isResolved, wouldRecommend };
+      }), { organizationId, type: 'feedback' });
+    }
     
     return {
       totalFeedbacks,
@@ -4,6 +4,7 @@ import { Platform } from 'react-native';
 import Constants from 'expo-constants';
 import { db } from '../config/firebaseConfig';
 import { doc, updateDoc, getDoc, collection, query, where, getDocs } from 'firebase/firestore';
+import { API_CONFIG, getNotificationTokensUrl, getNotificationSendUrl } from '../config/apiConfig';
 
 // Configure notification behavior
 Notifications.setNotificationHandler({
@@ -21,6 +22,62 @@ const isExpoGo = () => {
   return Constants.appOwnership === 'expo';
 };
 
+// Push tokens already read from Firestore (e.g. with the admin query), passed to the server's fan-out
+const knownPushTokens = {};
+
+const notificationHeaders = () => {
+  const headers = { 'Content-Type': 'application/json', Accept: 'application/json' };
+  if (API_CONFIG.PUSH_API_KEY) {
+    headers[API_CONFIG.PUSH_API_KEY_HEADER] = API_CONFIG.PUSH_API_KEY;
+  }
+  return headers;
+};
+
+/**
+ * Cache a user's push token on the server so its fan-out needs no Firestore read.
+ * Never throws - the server is also given tokens at send time.
+ */
+const syncPushTokenToServer = async (userId, token) => {
+  try {
+    const response = await fetch(getNotificationTokensUrl(), {
+      method: 'POST',
+      headers: notificationHeaders(),
+      body: JSON.stringify({ userId, pushToken: token }),
+    });
+    return response.ok;
+  } catch (error) {
+    console.log('⚠️ Could not register push token with the server:', error.message);
+    return false;
+  }
+};
+
+/**
+ * One POST to the server's fan-out, which batches the Expo sends (100 per request) and retries them.
+ * @returns {Promise<Object|null>} - { recipients, missingTokens, notificationId }, or null if the server is unavailable
+ */
+const sendNotificationsViaServer = async (userIds, title, body, data, tokens) => {
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), API_CONFIG.TIMEOUT);
+  try {
+    const response = await fetch(getNotificationSendUrl(), {
+      method: 'POST',
+      headers: notificationHeaders(),
+      body: JSON.stringify({ userIds, title, body, data, tokens }),
+      signal: controller.signal,
+    });
+    if (!response.ok) {
+      console.log(`⚠️ Notification server returned ${response.status}, sending from the device instead`);
+      return null;
+    }
+    return await response.json();
+  } catch (error) {
+    console.log('⚠️ Notification server unavailable, sending from the device instead:', error.message);
+    return null;
+  } finally {
+    clearTimeout(timeoutId);
+  }
+};
+
 /**
  * Register device for push notifications and save token to user profile
  * @param {string} userId - User ID
@@ -90,6 +147,8 @@ export const registerForPushNotifications = async (userId) => {
         pushTokenUpdatedAt: new Date(),
       });
       console.log('Push token saved to user profile');
+      knownPushTokens[userId] = token;
+      await syncPushTokenToServer(userId, token);
     }
 
     // Platform-specific configuration
@@ -263,6 +322,43 @@ export const sendNotificationToMultipleUsers = async (userIds, title, body, data
       }
     }
 
+    // Server fan-out: tokens it hasn't cached yet are read once here and passed along
+    const tokens = {};
+    userIds.forEach(userId => {
+      if (knownPushTokens[userId]) {
+        tokens[userId] = knownPushTokens[userId];
+      }
+    });
+    let serverResult = await sendNotificationsViaServer(userIds, title, body, data, tokens);
+    if (serverResult && serverResult.missingTokens?.length > 0) {
+      const missing = serverResult.missingTokens;
+      const docs = await Promise.all(missing.map(userId => getDoc(doc(db, 'users', userId))));
+      const found = {};
+      docs.forEach((userDoc, i) => {
+        const pushToken = userDoc.exists() ? userDoc.data()?.pushToken : null;
+        if (pushToken) {
+          found[missing[i]] = pushToken;
+          knownPushTokens[missing[i]] = pushToken;
+        }
+      });
+      if (Object.keys(found).length > 0) {
+        const retry = await sendNotificationsViaServer(Object.keys(found), title, body, data, found);
+        if (retry) {
+          const retried = new Set(Object.keys(found));
+          serverResult = {
+            ...serverResult,
+            recipients: serverResult.recipients.filter(r => !retried.has(r.userId)).concat(retry.recipients),
+          };
+        }
+      }
+    }
+    if (serverResult) {
+      const successCount = serverResult.recipients.filter(r => ['queued', 'sent', 'delivered'].includes(r.status)).length;
+      const failureCount = serverResult.recipients.length - successCount;
+      console.log(`Notifications sent via server: ${successCount} succeeded, ${failureCount} failed`);
+      return { successCount, failureCount, total: serverResult.recipients.length, notificationId: serverResult.notificationId };
+    }
+
     const results = await Promise.allSettled(
       userIds.map(userId => sendNotificationToUser(userId, title, body, data, currentUserId))
     );
@@ -292,6 +388,12 @@ export const getOrganizationAdmins = async (organizationId) => {
     );
     
     const snapshot = await getDocs(q);
+    snapshot.docs.forEach(adminDoc => {
+      const pushToken = adminDoc.data()?.pushToken;
+      if (pushToken) {
+        knownPushTokens[adminDoc.id] = pushToken;
+      }
+    });
     return snapshot.docs.map(doc => doc.id);
   } catch (error) {
     console.error('Error fetching organization admins:', error);
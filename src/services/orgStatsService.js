@@ -0,0 +1,71 @@
+import { API_CONFIG, getOrgEventsUrl, getOrgStatsUrl } from '../config/apiConfig';
+
+/**
+ * Dashboard counters the server keeps per organization (updated as reports / feedback change).
+ * @param {string} organizationId - Organization ID
+ * @returns {Promise<Object|null>} - { reports, feedback, seeded: { report, feedback }, seededAt: { report?, feedback? } }
+ *   (seededAt in epoch seconds), or null if the server is unavailable
+ */
+export const fetchOrgStats = async (organizationId) => {
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), API_CONFIG.TIMEOUT);
+  try {
+    const response = await fetch(getOrgStatsUrl(organizationId), {
+      headers: { Accept: 'application/json' },
+      signal: controller.signal,
+    });
+    if (!response.ok) {
+      console.log(`⚠️ Organization stats returned ${response.status}, counting in Firestore instead`);
+      return null;
+    }
+    return await response.json();
+  } catch (error) {
+    console.log('⚠️ Organization stats unavailable, counting in Firestore instead:', error.message);
+    return null;
+  } finally {
+    clearTimeout(timeoutId);
+  }
+};
+
+/**
+ * Whether the server's counters of one type can be shown as they are: seeded, and less than
+ * API_CONFIG.ORG_STATS_RESEED_HOURS ago. Otherwise the caller scans Firestore and re-seeds them.
+ * @param {Object|null} orgStats - fetchOrgStats() result
+ * @param {string} type - 'report' | 'feedback'
+ * @returns {boolean}
+ */
+export const isSeedFresh = (orgStats, type) => {
+  const seededAt = orgStats?.seededAt?.[type];
+  if (!orgStats?.seeded?.[type] || !seededAt) {
+    return false;
+  }
+  return Date.now() - seededAt * 1000 < API_CONFIG.ORG_STATS_RESEED_HOURS * 60 * 60 * 1000;
+};
+
+/**
+ * Send report / feedback changes to the server's organization counters.
+ * With seed = { organizationId, type } the events are that organization's complete set of the type
+ * (after a Firestore scan); the server drops anything else it held for it and serves its stats
+ * until the seed is older than ORG_STATS_RESEED_HOURS or the user pulls to refresh, when the
+ * caller scans and seeds again.
+ * Never throws - a missed event stays wrong until that next seed.
+ * @param {Array<Object>} events - [{ type: 'report' | 'feedback', id, ...changed fields }]
+ * @param {Object|null} seed - { organizationId, type } for a full scan
+ */
+export const syncOrgEvents = async (events, seed = null) => {
+  const headers = { 'Content-Type': 'application/json' };
+  if (API_CONFIG.ORG_EVENTS_API_KEY) {
+    headers[API_CONFIG.ORG_EVENTS_API_KEY_HEADER] = API_CONFIG.ORG_EVENTS_API_KEY;
+  }
+  try {
+    const response = await fetch(getOrgEventsUrl(), {
+      method: 'POST',
+      headers,
+      body: JSON.stringify(seed ? { events, seed } : { events }),
+    });
+    return { success: response.ok };
+  } catch (error) {
+    console.log('⚠️ Could not sync organization stats:', error.message);
+    return { success: false, error: error.message };
+  }
+};
@@ -3,7 +3,39 @@
  * Handles communication with the ML model API hosted on Colab via ngrok
  */
 
-import { getPredictionUrl, getImageClassificationUrl, API_CONFIG, formatCategoryName } from '../config/apiConfig';
+import { getPredictionUrl, getImageClassificationUrl, getBatchClassificationUrl, getJobsUrl, API_CONFIG, formatCategoryName } from '../config/apiConfig';
+
+/**
+ * Log where a request's time went: the server's Server-Timing breakdown vs network / ngrok
+ * @param {string} label - Endpoint name for the log line
+ * @param {Response} response - fetch response
+ * @param {number} startedAt - Date.now() before the request was sent
+ */
+const logServerTiming = (label, response, startedAt) => {
+  const header = response.headers && response.headers.get('Server-Timing');
+  if (!header) {
+    return;
+  }
+  const roundTrip = Date.now() - startedAt;
+  const total = header.split(',').map(part => part.trim()).find(part => part.startsWith('total;'));
+  const serverMs = total ? parseFloat(total.split('dur=')[1]) : NaN;
+  if (!Number.isNaN(serverMs)) {
+    console.log(`⏱️ ${label}: ${roundTrip} ms round-trip = server ${Math.round(serverMs)} ms + network/ngrok ${Math.max(0, Math.round(roundTrip - serverMs))} ms (${header})`);
+  }
+};
+
+/**
+ * Error for a non-OK response; a busy server (429/503 + Retry-After) gets a retry hint
+ * @param {Response} response - fetch response
+ * @param {string} errorText - Response body
+ */
+const apiError = (response, errorText) => {
+  const retryAfter = response.headers && response.headers.get('Retry-After');
+  if ((response.status === 429 || response.status === 503) && retryAfter) {
+    return new Error(`Server is busy - please try again in ${retryAfter} s`);
+  }
+  return new Error(`API returned status ${response.status}: ${errorText}`);
+};
 
 /**
  * Sends issue description to the prediction model and returns the predicted urgency
@@ -28,11 +60,13 @@ export const getPrediction = async (description) => {
     console.log('📝 Description:', description.substring(0, 100) + '...');
 
     // Make API request
+    const startedAt = Date.now();
     const response = await fetch(url, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
+        [API_CONFIG.DEADLINE_HEADER]: String(API_CONFIG.TIMEOUT),
       },
       body: JSON.stringify({
         text: description, // Adjust field name based on your model's expected input
@@ -41,12 +75,13 @@ export const getPrediction = async (description) => {
     });
 
     clearTimeout(timeoutId);
+    logServerTiming('predict_urgency', response, startedAt);
 
     // Check if response is OK
     if (!response.ok) {
       const errorText = await response.text();
       console.error('❌ Prediction API error:', response.status, errorText);
-      throw new Error(`API returned status ${response.status}: ${errorText}`);
+      throw apiError(response, errorText);
     }
 
     // Parse response
@@ -90,6 +125,89 @@ export const getPrediction = async (description) => {
   }
 };
 
+/**
+ * Starts an async analysis job (urgency for the description, plus the image verdict when
+ * photos are included) and returns its id immediately, so the work overlaps with uploads
+ *
+ * @param {string} description - The issue description text
+ * @param {Array} imageUris - Optional image URIs (omit when the images were already classified)
+ * @returns {Promise<string|null>} - Job id, or null if the server has no job API / is busy
+ */
+export const startAnalysisJob = async (description, imageUris = []) => {
+  try {
+    let request;
+    if (imageUris.length > 0) {
+      const form = new FormData();
+      form.append('description', description);
+      imageUris.forEach((uri, index) => {
+        form.append('images', { uri, name: `image_${index}.jpg`, type: 'image/jpeg' });
+      });
+      request = { headers: { 'Content-Type': 'multipart/form-data', 'Accept': 'application/json' }, body: form };
+    } else {
+      request = {
+        headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+        body: JSON.stringify({ description }),
+      };
+    }
+    const response = await fetch(getJobsUrl(), { method: 'POST', ...request });
+    if (response.status !== 202) {
+      console.log(`⚠️ Job API returned ${response.status}, using the synchronous endpoints`);
+      return null;
+    }
+    const data = await response.json();
+    console.log('📥 Analysis job started:', data.jobId);
+    return data.jobId;
+  } catch (error) {
+    console.log('⚠️ Could not start analysis job:', error.message);
+    return null;
+  }
+};
+
+/**
+ * Long-polls an analysis job until it finishes (or timeoutMs passes)
+ *
+ * @param {string} jobId - Id from startAnalysisJob
+ * @param {number} timeoutMs - Overall budget
+ * @returns {Promise<Object>} - getPrediction-style result ({success, urgency, confidence, verdict})
+ */
+export const waitForAnalysisJob = async (jobId, timeoutMs = API_CONFIG.TIMEOUT) => {
+  const deadline = Date.now() + timeoutMs;
+  try {
+    while (Date.now() < deadline) {
+      const pollStarted = Date.now();
+      const waitSeconds = Math.max(1, Math.min(20, Math.floor((deadline - Date.now()) / 1000)));
+      const response = await fetch(`${getJobsUrl(jobId)}?wait=${waitSeconds}`, {
+        headers: { 'Accept': 'application/json' },
+      });
+      if (!response.ok) {
+        throw new Error(`Job status returned ${response.status}`);
+      }
+      const job = await response.json();
+      if (job.status === 'done') {
+        const result = job.result || {};
+        return {
+          success: !!result.urgency,
+          urgency: result.urgency || null,
+          confidence: result.urgency_confidence || null,
+          verdict: result,
+        };
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Analysis job failed');
+      }
+      // Answered at once (all long-poll slots busy): back off before asking again
+      const retryAfter = parseFloat(response.headers.get('Retry-After') || '1');
+      if (Date.now() - pollStarted < 1000) {
+        await new Promise(resolve => setTimeout(resolve, Math.min(retryAfter * 1000, 2000)));
+      }
+    }
+    return { success: false, error: 'Analysis job timed out', urgency: null };
+  } catch (error) {
+    console.error('❌ Analysis job error:', error);
+    return { success: false, error: error.message, urgency: null };
+  }
+};
+
 /**
  * Validates if the prediction API is reachable
  * 
@@ -194,11 +312,13 @@ export const classifyImage = async (imageUri) => {
     const timeoutId = setTimeout(() => controller.abort(), API_CONFIG.TIMEOUT);
 
     // Make API request
+    const startedAt = Date.now();
     const response = await fetch(url, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
+        [API_CONFIG.DEADLINE_HEADER]: String(API_CONFIG.TIMEOUT),
       },
       body: JSON.stringify({
         image: base64Image, // Adjust field name based on your model's expected input
@@ -207,12 +327,13 @@ export const classifyImage = async (imageUri) => {
     });
 
     clearTimeout(timeoutId);
+    logServerTiming('classify', response, startedAt);
 
     // Check if response is OK
     if (!response.ok) {
       const errorText = await response.text();
       console.error('❌ Image classification API error:', response.status, errorText);
-      throw new Error(`API returned status ${response.status}: ${errorText}`);
+      throw apiError(response, errorText);
     }
 
     // Parse response
@@ -230,6 +351,7 @@ export const classifyImage = async (imageUri) => {
       categoryDisplay: formatCategoryName(category),
       confidence: confidence,
       meetsThreshold: confidence >= API_CONFIG.MIN_ACCURACY_THRESHOLD,
+      thumbPath: data.thumb_url || null, // Server thumbnail, only when the image store is enabled
       rawResponse: data,
     };
 
@@ -267,6 +389,76 @@ export const classifyImage = async (imageUri) => {
   }
 };
 
+/**
+ * Classifies several images in a single multipart request (raw bytes, no base64)
+ * Returns per-image results in the same shape as classifyImage, or null when the
+ * server does not have the /classify_batch endpoint yet
+ * 
+ * @param {Array} imageUris - Array of image URIs to classify
+ * @returns {Promise<Array|null>} - Per-image classification results
+ */
+const classifyImagesBatch = async (imageUris) => {
+  const url = getBatchClassificationUrl();
+
+  const form = new FormData();
+  imageUris.forEach((uri, index) => {
+    form.append('images', {
+      uri,
+      name: `image_${index}.jpg`,
+      type: 'image/jpeg',
+    });
+  });
+
+  // Create abort controller for timeout
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), API_CONFIG.TIMEOUT);
+
+  try {
+    const startedAt = Date.now();
+    const response = await fetch(url, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'multipart/form-data',
+        'Accept': 'application/json',
+        [API_CONFIG.DEADLINE_HEADER]: String(API_CONFIG.TIMEOUT),
+      },
+      body: form,
+      signal: controller.signal,
+    });
+    logServerTiming('classify_batch', response, startedAt);
+
+    // Older servers only have /classify
+    if (response.status === 404) {
+      return null;
+    }
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      console.error('❌ Batch classification API error:', response.status, errorText);
+      throw apiError(response, errorText);
+    }
+
+    const data = await response.json();
+    console.log('✅ Batch classification received:', data.status, data.categories);
+
+    return (data.results || []).map(r => {
+      const category = r.category || r.predicted_category || 'unknown';
+      const confidence = r.confidence || r.accuracy || 0;
+      return {
+        success: true,
+        category: category,
+        categoryDisplay: formatCategoryName(category),
+        confidence: confidence,
+        meetsThreshold: confidence >= API_CONFIG.MIN_ACCURACY_THRESHOLD,
+        thumbPath: r.thumb_url || null, // Server thumbnail, only when the image store is enabled
+        rawResponse: r,
+      };
+    });
+  } finally {
+    clearTimeout(timeoutId);
+  }
+};
+
 /**
  * Classifies multiple images and validates consistency
  * 
@@ -277,10 +469,13 @@ export const classifyMultipleImages = async (imageUris) => {
   try {
     console.log(`🖼️ Classifying ${imageUris.length} images...`);
 
-    // Classify all images
-    const results = await Promise.all(
-      imageUris.map(uri => classifyImage(uri))
-    );
+    // Classify all images in one round-trip, falling back to one request per image
+    let results = await classifyImagesBatch(imageUris);
+    if (!results) {
+      results = await Promise.all(
+        imageUris.map(uri => classifyImage(uri))
+      );
+    }
 
     // Check if all classifications were successful
     const failedResults = results.filter(r => !r.success);
@@ -329,11 +524,20 @@ export const classifyMultipleImages = async (imageUris) => {
       categoryDisplay: results[0].categoryDisplay,
       confidence: avgConfidence,
       imageCount: results.length,
+      thumbnailPaths: results.map(r => r.thumbPath).filter(Boolean),
       allResults: results,
     };
 
   } catch (error) {
     console.error('❌ Multiple image classification error:', error);
+
+    if (error.name === 'AbortError') {
+      return {
+        success: false,
+        error: 'Request timeout - Image classification took too long',
+      };
+    }
+
     return {
       success: false,
       error: error.message || 'Unknown error occurred',
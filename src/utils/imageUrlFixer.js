@@ -1,4 +1,5 @@
 import { supabase } from '../config/supabaseConfig';
+import { getServerImageUrl } from '../config/apiConfig';
 
 // Utility function to check and fix image URLs
 export const checkImageUrl = async (url) => {
@@ -34,6 +35,15 @@ export const getCorrectedImageUrl = (originalUrl) => {
   return originalUrl;
 };
 
+// Function to get the image to show for a report in a list: the server thumbnail
+// when the report has one, otherwise the (corrected) first full-size image
+export const getReportListImageUrl = (report) => {
+  if (report.thumbnailPaths && report.thumbnailPaths.length > 0) {
+    return getServerImageUrl(report.thumbnailPaths[0]);
+  }
+  return getCorrectedImageUrl(report.imageUrls ? report.imageUrls[0] : report.imageUrl);
+};
+
 // Function to list all files in the reports bucket for debugging
 export const listBucketFiles = async () => {
   try {